@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -56,19 +57,67 @@ TEMPLATES = [
 WSGI_APPLICATION = "ev3backend.wsgi.application"
 
 # Database configuration: MySQL (Industrial Database Requirement)
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': os.getenv('MYSQL_DB_NAME', 'ev3backend'),
-        'USER': os.getenv('MYSQL_USER', 'root'),
-        'PASSWORD': os.getenv('MYSQL_PASSWORD', ''),
-        'HOST': os.getenv('MYSQL_HOST', 'localhost'),
-        'PORT': os.getenv('MYSQL_PORT', '3306'),
-        'OPTIONS': {
-            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
-        },
+# Conexiones persistentes: cada hilo del servidor reutiliza su conexión
+# durante DB_CONN_MAX_AGE segundos en vez de abrir una por petición, de modo
+# que un servidor con N hilos mantiene un conjunto estable de N conexiones.
+# Con DB_CONN_HEALTH_CHECKS una conexión reutilizada se verifica al iniciar
+# cada petición y se reemplaza si el servidor la cerró (wait_timeout,
+# reinicio). DB_CONN_MAX_AGE debe ser menor que wait_timeout de MySQL.
+# Bajo ASGI las vistas asíncronas usan hilos que no se reutilizan entre
+# peticiones: se recomienda DB_CONN_MAX_AGE=0 y un pool externo (ProxySQL).
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', '1') == '1'
+
+# DB_MOTOR=sqlite usa un archivo SQLite local en modo WAL (lectores que no
+# bloquean al escritor) para ejecutar las mismas pruebas de carga sin un
+# servidor MySQL. Las transacciones toman el bloqueo de escritura al
+# comenzar (IMMEDIATE), con espera de DB_SQLITE_ESPERA_MS, en vez de fallar
+# con "database is locked" al pasar de lectura a escritura.
+DB_MOTOR = os.getenv('DB_MOTOR', 'mysql')
+
+if DB_MOTOR == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_SQLITE_ARCHIVO', str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+            'OPTIONS': {
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f'PRAGMA busy_timeout={int(os.getenv("DB_SQLITE_ESPERA_MS", "5000"))};'
+                ),
+                'transaction_mode': 'IMMEDIATE',
+            },
+            # Base de pruebas (y del comando benchmark) en archivo y no en
+            # memoria, para medir conexiones y WAL como en el servidor
+            'TEST': {'NAME': os.getenv('DB_SQLITE_ARCHIVO_PRUEBAS', str(BASE_DIR / 'test_db.sqlite3'))},
+        }
     }
-}
+elif DB_MOTOR == 'mysql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.getenv('MYSQL_DB_NAME', 'ev3backend'),
+            'USER': os.getenv('MYSQL_USER', 'root'),
+            'PASSWORD': os.getenv('MYSQL_PASSWORD', ''),
+            'HOST': os.getenv('MYSQL_HOST', 'localhost'),
+            'PORT': os.getenv('MYSQL_PORT', '3306'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+            'OPTIONS': {
+                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+                'charset': 'utf8mb4',
+                'connect_timeout': int(os.getenv('MYSQL_CONNECT_TIMEOUT', '5')),
+                # LOAD DATA LOCAL INFILE para inicializar_bd --datos; el
+                # servidor también debe tener local_infile=ON
+                'local_infile': os.getenv('MYSQL_LOCAL_INFILE', '0') == '1',
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f'DB_MOTOR inválido: "{DB_MOTOR}" (opciones: mysql, sqlite)')
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -94,3 +143,131 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 LOGIN_REDIRECT_URL = 'insumo_list'  # Redirige a /insumos/ después del login
 LOGOUT_REDIRECT_URL = 'login'  # Redirige al login después del logout
 LOGIN_URL = 'login'  # URL del login para @login_required
+
+# Cache de lecturas (inventario.cache_versionada)
+# 'locmem' guarda la cache en la memoria de cada proceso (un solo proceso de
+# desarrollo); 'archivo' la comparte entre los procesos del mismo servidor,
+# lo que se necesita con varios workers para que las invalidaciones de uno
+# lleguen a los demás. CACHE_TIMEOUT acota además cuánto puede vivir una
+# entrada si alguna escritura no pasa por las señales.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', '300'))
+
+if CACHE_BACKEND == 'archivo':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIRECTORIO', str(BASE_DIR / 'cache')),
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'inventario',
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {'MAX_ENTRIES': 1000},
+        }
+    }
+INVENTARIO_CACHE = 'default'
+
+# Sesiones
+# SESSION_MODO elige dónde se guardan las sesiones:
+# - 'db': tabla django_session; una consulta por petición autenticada.
+# - 'cached_db': cache con respaldo en la tabla; la tabla solo se lee si la
+#   sesión no está en la cache. Con varios workers requiere CACHE_BACKEND
+#   compartido ('archivo'): con 'locmem' un cierre de sesión no se entera
+#   en la cache de los demás procesos.
+# - 'cache': solo la cache (sin escrituras en la tabla); también requiere un
+#   backend compartido, y las sesiones se pierden si la cache se vacía.
+# - 'firmada': cookie firmada con SECRET_KEY, sin estado en el servidor. El
+#   cierre de sesión no invalida copias anteriores de la cookie.
+# Las sesiones vencidas de la tabla se eliminan con el comando
+# purgar_sesiones (por ejemplo, desde un cron nocturno).
+MOTORES_SESION = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'firmada': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_MODO = os.getenv('SESSION_MODO', 'db')
+if SESSION_MODO not in MOTORES_SESION:
+    raise ImproperlyConfigured(
+        f'SESSION_MODO inválido: "{SESSION_MODO}" (opciones: {", ".join(MOTORES_SESION)})'
+    )
+SESSION_ENGINE = MOTORES_SESION[SESSION_MODO]
+
+# Cache propia de las sesiones: vaciar o reducir la cache de lecturas no
+# cierra sesiones. Cada sesión se guarda con su propio vencimiento.
+SESSION_CACHE_ALIAS = 'sesiones'
+if CACHE_BACKEND == 'archivo':
+    CACHES[SESSION_CACHE_ALIAS] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SESSION_CACHE_DIRECTORIO', str(BASE_DIR / 'cache_sesiones')),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+else:
+    CACHES[SESSION_CACHE_ALIAS] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sesiones',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
+# Canal en vivo de cambios de stock (inventario.feed, requiere ASGI)
+# BrokerLocal reparte los eventos dentro del proceso (un solo worker); con
+# varios workers se debe configurar un broker compartido con la misma
+# interfaz. FEED_LATIDO son los segundos entre latidos de una conexión
+# inactiva y FEED_MAX_CONEXIONES el máximo de conexiones por proceso.
+INVENTARIO_BROKER = os.getenv('INVENTARIO_BROKER', 'inventario.feed.BrokerLocal')
+FEED_LATIDO = float(os.getenv('FEED_LATIDO', '15'))
+FEED_MAX_CONEXIONES = int(os.getenv('FEED_MAX_CONEXIONES', '5000'))
+
+# Perfilado de peticiones (inventario.middleware.PerfilMiddleware)
+# Agrega encabezados Server-Timing y una línea de log JSON por petición con
+# tiempos totales, de base de datos y de templates. Con PERFIL_MUESTREO > 0
+# esa fracción de peticiones se perfila con cProfile y las que superen
+# PERFIL_UMBRAL_LENTO_MS se guardan en PERFIL_DIRECTORIO.
+PERFIL_HABILITADO = os.getenv('PERFIL_HABILITADO', '0') == '1'
+PERFIL_MUESTREO = float(os.getenv('PERFIL_MUESTREO', '0'))
+PERFIL_UMBRAL_LENTO_MS = float(os.getenv('PERFIL_UMBRAL_LENTO_MS', '500'))
+PERFIL_DIRECTORIO = os.getenv('PERFIL_DIRECTORIO', str(BASE_DIR / 'perfiles'))
+
+if PERFIL_HABILITADO:
+    MIDDLEWARE.insert(0, 'inventario.middleware.PerfilMiddleware')
+
+# Archivo de movimientos (inventario.archivo)
+# Los movimientos con más de ARCHIVO_DIAS_RETENCION días se trasladan a la
+# tabla de archivo con el comando archivar_movimientos (por ejemplo, desde
+# un cron nocturno). Los listados y exportaciones leen ambas tablas.
+ARCHIVO_DIAS_RETENCION = int(os.getenv('ARCHIVO_DIAS_RETENCION', '365'))
+# El mismo comando congela los meses archivados que terminaron hace más de
+# ARCHIVO_DIAS_TABLA días: se escriben en ARCHIVO_DIRECTORIO como CSV
+# comprimidos (uno por mes) y salen de la base de datos. Las exportaciones
+# de movimientos los siguen incluyendo.
+ARCHIVO_DIAS_TABLA = int(os.getenv('ARCHIVO_DIAS_TABLA', '730'))
+ARCHIVO_DIRECTORIO = os.getenv('ARCHIVO_DIRECTORIO', str(BASE_DIR / 'archivo'))
+
+# Claves de idempotencia de movimientos (inventario.idempotencia)
+# Un reintento con la misma clave dentro de IDEMPOTENCIA_TTL_HORAS recibe el
+# resultado original; las claves vencidas se eliminan con purgar_idempotencia.
+IDEMPOTENCIA_TTL_HORAS = int(os.getenv('IDEMPOTENCIA_TTL_HORAS', '24'))
+
+# Pruebas: las etiquetadas benchmark y stress solo corren con --tag
+TEST_RUNNER = 'inventario.ejecutor_pruebas.EjecutorPruebas'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'inventario.perfil': {
+            'handlers': ['console'],
+            'level': os.getenv('PERFIL_LOG_NIVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,115 @@
+"""
+Alertas de stock en o bajo el nivel de reorden (``Insumo.stock_minimo``).
+
+El conjunto de insumos en alerta se guarda en la tabla ``AlertaStock`` y
+se mantiene de forma incremental:
+
+- ``services.registrar_movimiento`` y ``services.registrar_lote`` llaman a
+  ``evaluar`` con el stock resultante y la variación aplicada, dentro de
+  la misma transacción que ajusta el stock. Solo se escribe si el stock
+  cruzó el nivel de reorden; un movimiento que no lo cruza no agrega
+  ninguna escritura. La fila del insumo ya quedó bloqueada por el UPDATE
+  del stock, por lo que dos movimientos del mismo insumo no se cruzan.
+- Guardar un insumo (formulario, admin) lo reevalúa con sus valores.
+- Las cargas que usan ``bulk_create``/``update()`` y las reparaciones de
+  ``reconciliar_stock`` llaman a ``recalcular``, que compara toda la tabla.
+
+Consultar las alertas (``activas``) recorre solo ``AlertaStock`` unida por
+clave primaria con ``Insumo``: el costo depende de la cantidad de alertas,
+no de la cantidad de insumos.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import AlertaStock, Insumo
+
+# Insumos por sentencia al recalcular
+TAMANO_BLOQUE = 1000
+
+
+def en_alerta(stock, minimo):
+    """Indica si un stock está en o bajo el nivel de reorden"""
+    return stock <= minimo
+
+
+def evaluar(insumo_id, stock, minimo, delta=None):
+    """
+    Actualiza la alerta de un insumo según su stock vigente.
+
+    Debe llamarse dentro de la transacción que modificó el stock.
+
+    Args:
+        insumo_id (int): Insumo a evaluar
+        stock (int): Stock resultante
+        minimo (int): Nivel de reorden del insumo
+        delta (int): Variación que llevó al stock resultante; si se indica
+            y el stock no cruzó el nivel, no se consulta ni escribe nada
+
+    Returns:
+        bool: True si se creó la alerta, False si se eliminó, None sin cambios
+    """
+    ahora = en_alerta(stock, minimo)
+    if delta is not None and en_alerta(stock - delta, minimo) == ahora:
+        return None
+    if ahora:
+        _, creada = AlertaStock.objects.get_or_create(insumo_id=insumo_id)
+        return True if creada else None
+    eliminadas, _ = AlertaStock.objects.filter(insumo_id=insumo_id).delete()
+    return False if eliminadas else None
+
+
+@receiver(post_save, sender=Insumo, dispatch_uid='alerta_insumo_guardado')
+def _insumo_guardado(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'stock_actual', 'stock_minimo'} & set(update_fields):
+        return
+    evaluar(instance.pk, instance.stock_actual, instance.stock_minimo)
+
+
+def recalcular(insumo_ids=None):
+    """
+    Sincroniza la tabla de alertas con el stock de los insumos.
+
+    Args:
+        insumo_ids (iterable): Insumos a revisar (por defecto, todos)
+
+    Returns:
+        tuple: (alertas creadas, alertas eliminadas)
+    """
+    insumos = Insumo.objects.order_by()
+    alertas = AlertaStock.objects.order_by()
+    if insumo_ids is not None:
+        insumo_ids = list(insumo_ids)
+        insumos = insumos.filter(pk__in=insumo_ids)
+        alertas = alertas.filter(insumo_id__in=insumo_ids)
+    with transaction.atomic():
+        bajo_minimo = set(
+            insumos.filter(stock_actual__lte=F('stock_minimo')).values_list('pk', flat=True)
+        )
+        existentes = set(alertas.values_list('insumo_id', flat=True))
+        sobrantes = sorted(existentes - bajo_minimo)
+        for inicio in range(0, len(sobrantes), TAMANO_BLOQUE):
+            AlertaStock.objects.filter(insumo_id__in=sobrantes[inicio:inicio + TAMANO_BLOQUE]).delete()
+        nuevas = [AlertaStock(insumo_id=pk) for pk in sorted(bajo_minimo - existentes)]
+        AlertaStock.objects.bulk_create(nuevas, batch_size=TAMANO_BLOQUE)
+    return len(nuevas), len(sobrantes)
+
+
+def activas():
+    """
+    Alertas vigentes con los datos del insumo, de la más antigua a la más reciente.
+
+    Returns:
+        QuerySet: ``AlertaStock`` anotadas con ``faltante`` (unidades para
+        volver al nivel de reorden)
+    """
+    return (
+        AlertaStock.objects.select_related('insumo')
+        .only(
+            'desde', 'insumo__codigo', 'insumo__nombre', 'insumo__stock_actual',
+            'insumo__stock_minimo', 'insumo__ubicacion',
+        )
+        .annotate(faltante=F('insumo__stock_minimo') - F('insumo__stock_actual'))
+        .order_by('desde', 'insumo_id')
+    )
@@ -0,0 +1,345 @@
+"""
+Serialización de la API JSON de solo lectura.
+
+Selección de campos
+    Cada recurso publica un conjunto fijo de campos (``CAMPOS_INSUMO``,
+    ``CAMPOS_MOVIMIENTO``) que se traducen a columnas de ``.values()``. Con
+    ``?fields=codigo,stock_actual`` solo se consultan y envían esos campos
+    (más los que necesite el cursor de paginación, que no se envían).
+
+Serialización en flujo
+    Las filas se leen en bloques (``iterator``/``aiterator``) y se escriben
+    como JSON a medida que llegan, sin construir instancias del modelo ni
+    la página completa en memoria. Bajo ASGI el flujo es asíncrono; bajo
+    WSGI se recorre con el ORM síncrono en el hilo que envía la respuesta.
+
+Compresión
+    ``comprimido`` negocia ``Accept-Encoding``: usa brotli si el cliente lo
+    acepta y el paquete ``brotli`` está instalado (opcional), y si no gzip.
+    Se comprime el flujo completo con un solo compresor, no cada bloque por
+    separado. Las respuestas de la API no contienen secretos (como el token
+    CSRF de los formularios), por lo que comprimirlas no expone a BREACH.
+"""
+import zlib
+from functools import wraps
+
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+# Campo publicado -> columna de ``.values()``
+CAMPOS_INSUMO = {
+    'id': 'pk',
+    'codigo': 'codigo',
+    'nombre': 'nombre',
+    'descripcion': 'descripcion',
+    'stock_actual': 'stock_actual',
+    'stock_minimo': 'stock_minimo',
+    'ubicacion': 'ubicacion',
+}
+CAMPOS_MOVIMIENTO = {
+    'id': 'pk',
+    'fecha': 'fecha',
+    'tipo': 'tipo',
+    'cantidad': 'cantidad',
+    'insumo': 'insumo_id',
+    'insumo_codigo': 'insumo__codigo',
+    'usuario': 'usuario__username',
+    'origen': 'origen__nombre',
+    'destino': 'destino__nombre',
+}
+
+# Filas leídas de la base de datos y serializadas por bloque del flujo
+FILAS_POR_BLOQUE = 500
+
+# Niveles de compresión: priorizan la CPU sobre la última fracción de bytes
+NIVEL_GZIP = 5
+NIVEL_BROTLI = 5
+
+# Respuestas no streaming más cortas no se comprimen
+MIN_BYTES_COMPRESION = 200
+
+_codificador = DjangoJSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+class CamposInvalidos(ValueError):
+    """Se pidió en ``?fields=`` un campo que el recurso no publica"""
+
+    def __init__(self, invalidos, disponibles):
+        self.invalidos = invalidos
+        self.disponibles = disponibles
+        super().__init__(f'Campos desconocidos: {", ".join(invalidos)}')
+
+    def respuesta(self):
+        return JsonResponse(
+            {'error': str(self), 'disponibles': list(self.disponibles)}, status=400
+        )
+
+
+def campos_solicitados(parametro, disponibles):
+    """
+    Interpreta el parámetro ``fields``.
+
+    Args:
+        parametro (str): Nombres separados por coma (vacío o None = todos)
+        disponibles (dict): Campos del recurso (``CAMPOS_*``)
+
+    Returns:
+        list: Pares (nombre publicado, columna de ``.values()``)
+
+    Raises:
+        CamposInvalidos: Si algún nombre no está en ``disponibles``
+    """
+    nombres = [n.strip() for n in (parametro or '').split(',') if n.strip()]
+    if not nombres:
+        return list(disponibles.items())
+    invalidos = [n for n in nombres if n not in disponibles]
+    if invalidos:
+        raise CamposInvalidos(invalidos, disponibles)
+    return [(nombre, disponibles[nombre]) for nombre in dict.fromkeys(nombres)]
+
+
+def columnas(campos, *necesarias):
+    """Columnas de ``.values()`` para los campos pedidos más las ``necesarias``"""
+    return list(dict.fromkeys([columna for _, columna in campos] + list(necesarias)))
+
+
+def serializar(fila, campos):
+    """
+    Serializa una fila de ``.values()`` con los campos pedidos.
+
+    Returns:
+        str: Objeto JSON compacto
+    """
+    return _codificador.encode({nombre: fila[columna] for nombre, columna in campos})
+
+
+class Recorrido:
+    """
+    Filas de una página que se leen por bloques mientras se envían.
+
+    La consulta debe traer una fila más que ``limite``: si llega, no se
+    envía y solo indica que hay una página siguiente. Los cursores quedan
+    disponibles después de recorrer las filas.
+
+    Args:
+        consulta (QuerySet): Consulta de ``.values()`` ya ordenada y recortada
+        limite (int): Filas de la página
+        cursor (callable): Función fila -> cursor de esa posición
+    """
+
+    def __init__(self, consulta, limite, cursor):
+        self.consulta = consulta
+        self.limite = limite
+        self.cursor = cursor
+        self.primera = self.ultima = None
+        self.hay_mas = False
+
+    def _ver(self, indice, fila):
+        """Registra la fila; retorna False si es la fila adicional"""
+        if indice == self.limite:
+            self.hay_mas = True
+            return False
+        if indice == 0:
+            self.primera = fila
+        self.ultima = fila
+        return True
+
+    def __iter__(self):
+        filas = self.consulta.iterator(chunk_size=FILAS_POR_BLOQUE)
+        for indice, fila in enumerate(filas):
+            if not self._ver(indice, fila):
+                break
+            yield fila
+
+    async def __aiter__(self):
+        indice = 0
+        async for fila in self.consulta.aiterator(chunk_size=FILAS_POR_BLOQUE):
+            if not self._ver(indice, fila):
+                break
+            indice += 1
+            yield fila
+
+    @property
+    def siguiente(self):
+        return self.cursor(self.ultima) if self.hay_mas else None
+
+    @property
+    def anterior(self):
+        return self.cursor(self.primera) if self.primera is not None else None
+
+
+class _Escritor:
+    """Arma el documento ``{"resultados": [...], <pie>}`` por partes"""
+
+    def __init__(self, campos):
+        self.campos = campos
+        self.separador = ''
+
+    def abrir(self):
+        return '{"resultados":['
+
+    def bloque(self, filas):
+        texto = self.separador + ','.join(serializar(fila, self.campos) for fila in filas)
+        self.separador = ','
+        return texto
+
+    def cerrar(self, pie):
+        return ']' + ''.join(
+            f',{_codificador.encode(clave)}:{_codificador.encode(valor)}'
+            for clave, valor in pie.items()
+        ) + '}'
+
+
+def _flujo(filas, campos, pie):
+    escritor = _Escritor(campos)
+    yield escritor.abrir()
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) == FILAS_POR_BLOQUE:
+            yield escritor.bloque(bloque)
+            bloque = []
+    if bloque:
+        yield escritor.bloque(bloque)
+    yield escritor.cerrar(pie())
+
+
+async def _aflujo(filas, campos, pie):
+    escritor = _Escritor(campos)
+    yield escritor.abrir()
+    bloque = []
+    async for fila in filas:
+        bloque.append(fila)
+        if len(bloque) == FILAS_POR_BLOQUE:
+            yield escritor.bloque(bloque)
+            bloque = []
+    if bloque:
+        yield escritor.bloque(bloque)
+    yield escritor.cerrar(pie())
+
+
+async def _en_async(filas):
+    for fila in filas:
+        yield fila
+
+
+def respuesta_en_flujo(request, filas, campos, pie):
+    """
+    Respuesta JSON que se serializa mientras se envía.
+
+    Args:
+        request: Petición (define si el flujo es síncrono o asíncrono)
+        filas: ``Recorrido`` o lista de filas de ``.values()``
+        campos (list): Pares de ``campos_solicitados``
+        pie (callable): Retorna las claves que siguen a ``resultados``; se
+            llama al terminar de recorrer las filas (por ejemplo, cursores)
+
+    Returns:
+        StreamingHttpResponse: Documento ``{"resultados": [...], ...}``
+    """
+    if not isinstance(request, ASGIRequest):
+        contenido = _flujo(filas, campos, pie)
+    elif hasattr(filas, '__aiter__'):
+        contenido = _aflujo(filas, campos, pie)
+    else:
+        contenido = _aflujo(_en_async(filas), campos, pie)
+    return StreamingHttpResponse(contenido, content_type='application/json')
+
+
+def negociar_codificacion(request):
+    """
+    Elige la codificación de la respuesta según ``Accept-Encoding``.
+
+    Returns:
+        str: ``'br'``, ``'gzip'`` o None si el cliente no acepta ninguna
+    """
+    aceptadas = {}
+    for parte in request.headers.get('Accept-Encoding', '').split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        calidad = 1.0
+        if parametros.strip().startswith('q='):
+            try:
+                calidad = float(parametros.strip()[2:])
+            except ValueError:
+                calidad = 0.0
+        if nombre:
+            aceptadas[nombre.lower()] = calidad
+    opciones = (['br'] if brotli is not None else []) + ['gzip']
+    candidatas = [
+        c for c in opciones if aceptadas.get(c, aceptadas.get('*', 0)) > 0
+    ]
+    if not candidatas:
+        return None
+    # A igual calidad se prefiere el orden de ``opciones`` (brotli primero)
+    return max(candidatas, key=lambda c: aceptadas.get(c, aceptadas.get('*', 0)))
+
+
+def _compresor(codificacion):
+    """Retorna (comprimir, terminar) de un compresor incremental"""
+    if codificacion == 'br':
+        compresor = brotli.Compressor(quality=NIVEL_BROTLI)
+        return compresor.process, compresor.finish
+    compresor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return compresor.compress, compresor.flush
+
+
+def _comprimir_flujo(contenido, codificacion):
+    comprimir, terminar = _compresor(codificacion)
+    for parte in contenido:
+        datos = comprimir(parte)
+        if datos:
+            yield datos
+    yield terminar()
+
+
+async def _acomprimir_flujo(contenido, codificacion):
+    comprimir, terminar = _compresor(codificacion)
+    async for parte in contenido:
+        datos = comprimir(parte)
+        if datos:
+            yield datos
+    yield terminar()
+
+
+def comprimir_respuesta(request, response):
+    """
+    Comprime la respuesta con la codificación negociada.
+
+    Returns:
+        HttpResponse: La misma respuesta, comprimida si corresponde
+    """
+    if response.has_header('Content-Encoding'):
+        return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    codificacion = negociar_codificacion(request)
+    if codificacion is None:
+        return response
+    if response.streaming:
+        if response.is_async:
+            response.streaming_content = _acomprimir_flujo(response.streaming_content, codificacion)
+        else:
+            response.streaming_content = _comprimir_flujo(response.streaming_content, codificacion)
+        del response.headers['Content-Length']
+    else:
+        if len(response.content) < MIN_BYTES_COMPRESION:
+            return response
+        comprimir, terminar = _compresor(codificacion)
+        response.content = comprimir(response.content) + terminar()
+        response.headers['Content-Length'] = str(len(response.content))
+    response.headers['Content-Encoding'] = codificacion
+    return response
+
+
+def comprimido(vista):
+    """Decorador de vistas asíncronas que comprime su respuesta"""
+    @wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        return comprimir_respuesta(request, await vista(request, *args, **kwargs))
+    return envoltura
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class InventarioConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "inventario"
+
+    def ready(self):
+        # Registra las señales que invalidan la cache y la marca de cambios,
+        # y las que reevalúan la alerta de stock de un insumo guardado
+        from . import alertas, cambios  # noqa: F401
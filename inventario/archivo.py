@@ -0,0 +1,362 @@
+"""
+Archivo de movimientos antiguos, en dos niveles.
+
+El historial activo (``Movimiento``) crece sin límite y con él el costo de
+sus índices, de los listados y de los respaldos.
+
+Tabla de archivo
+    ``archivar(corte)`` traslada los movimientos con fecha hasta ``corte``
+    a ``MovimientoArchivado``, una tabla de solo inserción con las mismas
+    columnas e ids:
+
+    1. Registra primero un ``CierreStock`` a la fecha de corte con el saldo
+       de cada insumo. La reconciliación y el stock histórico parten del
+       último cierre, por lo que el stock vigente no necesita leer el archivo.
+    2. Traslada los movimientos por bloques en orden de fecha. Cada bloque
+       se inserta en el archivo y se elimina del historial activo en una
+       misma transacción: una interrupción deja el archivo incompleto, nunca
+       filas duplicadas ni perdidas, y basta con volver a ejecutar.
+
+    Las lecturas que pueden llegar a fechas archivadas (listado de
+    movimientos, API, exportación, stock histórico, reconciliación y consumo
+    diario) usan ``historiales()``, que agrega la tabla de archivo solo si
+    guarda movimientos del intervalo consultado.
+
+Almacenamiento en frío
+    La tabla de archivo tampoco debe crecer sin límite. ``congelar(hasta)``
+    particiona por mes: cada mes calendario cerrado (terminado antes de
+    ``hasta`` y sin movimientos en el historial activo) se escribe en
+    ``ARCHIVO_DIRECTORIO/movimientos-AAAA-MM.csv.gz`` y sus filas se
+    eliminan de la tabla. Se eligió CSV comprimido con gzip en vez de
+    tablas por periodo porque ni SQLite ni las tablas con claves foráneas
+    de MySQL admiten particiones, y porque así el periodo sale también de
+    los respaldos de la base de datos. Antes de eliminar nada se registra
+    un ``CierreStock`` al fin del mes, y el archivo se escribe completo a
+    un temporal que se renombra: si existe, está completo, y una ejecución
+    interrumpida solo termina de eliminar las filas.
+
+    Con un cierre al fin de cada mes congelado, el stock desde el
+    ``horizonte()`` en adelante se calcula sin leer los archivos. Las
+    exportaciones de movimientos leen los periodos congelados
+    (``filas_congeladas``) antes que las tablas. El listado y la API solo
+    muestran lo que sigue en la base de datos, el stock histórico no se
+    consulta a fechas anteriores al horizonte, y los agregados de
+    ``ConsumoDiario`` de esos días se conservan sin recalcularse.
+"""
+import csv
+import gzip
+import os
+import re
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import cambios, exportacion, purga, reconciliacion
+from .models import CierreStock, Movimiento, MovimientoArchivado
+
+# Movimientos trasladados por transacción
+TAMANO_BLOQUE = 2000
+
+COLUMNAS = [
+    'id', 'insumo_id', 'tipo', 'cantidad', 'fecha', 'usuario_id', 'origen_id', 'destino_id', 'ajuste',
+]
+
+# Archivos de los periodos congelados
+_PERIODO = re.compile(r'^movimientos-(\d{4})-(\d{2})\.csv\.gz$')
+
+# Valor por defecto de ``archivado_hasta``: se consulta en la base de datos
+_CONSULTAR = object()
+
+
+def dias_retencion():
+    """Días de historial que se mantienen en la tabla activa"""
+    return getattr(settings, 'ARCHIVO_DIAS_RETENCION', 365)
+
+
+def corte_por_defecto(dias=None):
+    """Fecha de corte que conserva ``dias`` (por defecto, ``ARCHIVO_DIAS_RETENCION``)"""
+    return timezone.now() - timedelta(days=dias_retencion() if dias is None else dias)
+
+
+def dias_tabla():
+    """Días de historial que se mantienen en la base de datos (activo y tabla de archivo)"""
+    return getattr(settings, 'ARCHIVO_DIAS_TABLA', 730)
+
+
+def directorio():
+    """Directorio de los periodos congelados (``ARCHIVO_DIRECTORIO``)"""
+    return Path(getattr(settings, 'ARCHIVO_DIRECTORIO', Path(settings.BASE_DIR) / 'archivo'))
+
+
+def _inicio_del_mes(dia):
+    return timezone.make_aware(datetime.combine(dia.replace(day=1), time.min))
+
+
+def _mes_siguiente(dia):
+    return (dia.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def ruta_periodo(mes):
+    """Archivo comprimido del mes indicado (cualquier día del mes)"""
+    return directorio() / f'movimientos-{mes:%Y-%m}.csv.gz'
+
+
+def periodos_congelados():
+    """
+    Meses guardados en el almacenamiento en frío.
+
+    Returns:
+        list: Primer día de cada mes, en orden
+    """
+    try:
+        nombres = os.listdir(directorio())
+    except FileNotFoundError:
+        return []
+    coincidencias = (_PERIODO.match(nombre) for nombre in nombres)
+    return sorted(date(int(m[1]), int(m[2]), 1) for m in coincidencias if m)
+
+
+def horizonte():
+    """
+    Inicio del historial que sigue en la base de datos.
+
+    Returns:
+        datetime: Fin del último mes congelado, o None si no hay ninguno
+    """
+    periodos = periodos_congelados()
+    return _inicio_del_mes(_mes_siguiente(periodos[-1])) if periodos else None
+
+
+def ultimo_archivado():
+    """
+    Fecha del movimiento archivado más reciente (usa el índice por fecha).
+
+    Returns:
+        datetime: Fecha o None si el archivo está vacío
+    """
+    return MovimientoArchivado.objects.aggregate(ultimo=Max('fecha'))['ultimo']
+
+
+def historiales(desde=None, archivado_hasta=_CONSULTAR):
+    """
+    Modelos con movimientos posteriores a ``desde``.
+
+    Args:
+        desde (datetime): Inicio (exclusivo) del intervalo a leer; None = todo
+        archivado_hasta (datetime): Resultado de ``ultimo_archivado()`` si
+            ya se conoce (evita repetir la consulta en un recorrido por días)
+
+    Returns:
+        list: ``[Movimiento]`` o ``[Movimiento, MovimientoArchivado]``
+    """
+    if archivado_hasta is _CONSULTAR:
+        archivado_hasta = ultimo_archivado()
+    if archivado_hasta is not None and (desde is None or archivado_hasta > desde):
+        return [Movimiento, MovimientoArchivado]
+    return [Movimiento]
+
+
+def pendientes(corte):
+    """Movimientos del historial activo que ``archivar(corte)`` trasladaría"""
+    return Movimiento.objects.filter(fecha__lte=corte)
+
+
+def archivar(corte, tamano=TAMANO_BLOQUE):
+    """
+    Traslada al archivo los movimientos con fecha hasta ``corte`` (inclusive).
+
+    Args:
+        corte (datetime): Fecha de corte; no puede ser futura
+        tamano (int): Movimientos por transacción
+
+    Returns:
+        tuple: (cierres registrados, movimientos archivados)
+
+    Raises:
+        ValueError: Si el corte es posterior a la fecha actual o anterior
+            al almacenamiento en frío
+    """
+    if corte > timezone.now():
+        raise ValueError('La fecha de corte del archivo no puede ser futura.')
+    limite = horizonte()
+    if limite is not None and corte < limite:
+        raise ValueError(
+            f'La fecha de corte es anterior al almacenamiento en frío ({timezone.localtime(limite):%Y-%m-%d}).'
+        )
+
+    # Saldos de arrastre: el cierre se calcula con el historial completo
+    # (activo más lo ya archivado) antes de mover nada
+    cierres = 0
+    if not CierreStock.objects.filter(fecha=corte).exists():
+        cierres = reconciliacion.tomar_cierre(corte)
+
+    consulta = pendientes(corte).order_by('fecha', 'pk').values_list(*COLUMNAS)
+    # Sin señales por fila: el cambio se registra una vez al final
+    archivados = purga.purgar_por_bloques(
+        Movimiento, consulta, tamano,
+        antes_de_borrar=lambda filas: MovimientoArchivado.objects.bulk_create(
+            [MovimientoArchivado(**dict(zip(COLUMNAS, fila))) for fila in filas]
+        ),
+    )
+    if archivados:
+        cambios.registrar_cambio()
+    return cierres, archivados
+
+
+def pendientes_de_congelar(hasta):
+    """Movimientos archivados de los meses anteriores al de ``hasta``"""
+    return MovimientoArchivado.objects.filter(fecha__lt=_inicio_del_mes(timezone.localdate(hasta)))
+
+
+def _a_texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return int(valor)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+
+def _escribir_periodo(ruta, consulta):
+    """Escribe el periodo a un temporal comprimido y lo renombra al terminar"""
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    with open(temporal, 'wb') as crudo:
+        with gzip.open(crudo, 'wt', encoding='utf-8', newline='') as salida:
+            escritor = csv.writer(salida)
+            escritor.writerow(COLUMNAS)
+            for fila in exportacion.recorrer_por_bloques(consulta, COLUMNAS):
+                escritor.writerow([_a_texto(valor) for valor in fila])
+        crudo.flush()
+        os.fsync(crudo.fileno())
+    os.replace(temporal, ruta)
+
+
+def congelar(hasta, tamano=TAMANO_BLOQUE):
+    """
+    Traslada los meses cerrados de la tabla de archivo a archivos comprimidos.
+
+    Un mes está cerrado si terminó antes del mes de ``hasta`` y el historial
+    activo no tiene movimientos anteriores a su fin.
+
+    Args:
+        hasta (datetime): Se congelan los meses anteriores al de esta fecha
+        tamano (int): Movimientos eliminados de la tabla por transacción
+
+    Returns:
+        tuple: (meses congelados, movimientos congelados)
+    """
+    primera = MovimientoArchivado.objects.aggregate(primera=Min('fecha'))['primera']
+    if primera is None:
+        return 0, 0
+    limite = _inicio_del_mes(timezone.localdate(hasta))
+    meses = congelados = 0
+    mes = timezone.localdate(primera).replace(day=1)
+    while True:
+        inicio, fin = _inicio_del_mes(mes), _inicio_del_mes(_mes_siguiente(mes))
+        if fin > limite or Movimiento.objects.filter(fecha__lt=fin).exists():
+            break
+        consulta = MovimientoArchivado.objects.filter(fecha__gte=inicio, fecha__lt=fin)
+        if consulta.exists():
+            # Saldo de arrastre al fin del mes, calculado antes de sacar sus filas
+            if not CierreStock.objects.filter(fecha=fin).exists():
+                reconciliacion.tomar_cierre(fin)
+            ruta = ruta_periodo(mes)
+            if not ruta.exists():
+                ruta.parent.mkdir(parents=True, exist_ok=True)
+                _escribir_periodo(ruta, consulta)
+            congelados += purga.purgar_por_bloques(
+                MovimientoArchivado, consulta.order_by('fecha', 'pk').values_list('pk', flat=True), tamano
+            )
+            meses += 1
+        mes = _mes_siguiente(mes)
+    if congelados:
+        cambios.registrar_cambio()
+    return meses, congelados
+
+
+def _de_texto(fila):
+    movimiento = {columna: int(fila[columna]) if fila[columna] else None for columna in (
+        'id', 'insumo_id', 'cantidad', 'usuario_id', 'origen_id', 'destino_id',
+    )}
+    movimiento.update(
+        tipo=fila['tipo'], fecha=datetime.fromisoformat(fila['fecha']), ajuste=fila['ajuste'] == '1',
+    )
+    return movimiento
+
+
+def leer_congelados(desde=None, hasta=None):
+    """
+    Movimientos de los periodos congelados con ``desde <= fecha < hasta``.
+
+    Solo se abren los archivos de los meses que tocan el intervalo.
+
+    Yields:
+        dict: Valores de ``COLUMNAS`` de cada movimiento
+    """
+    for mes in periodos_congelados():
+        if hasta is not None and _inicio_del_mes(mes) >= hasta:
+            return
+        if desde is not None and _inicio_del_mes(_mes_siguiente(mes)) <= desde:
+            continue
+        with gzip.open(ruta_periodo(mes), 'rt', encoding='utf-8', newline='') as entrada:
+            for fila in csv.DictReader(entrada):
+                movimiento = _de_texto(fila)
+                if (desde is None or movimiento['fecha'] >= desde) and (
+                    hasta is None or movimiento['fecha'] < hasta
+                ):
+                    yield movimiento
+
+
+def _valores(movimientos, campos):
+    """Tuplas de ``campos`` (admite ``relacion__campo``) con una consulta por relación"""
+    relacionados = {}
+    for campo in campos:
+        if '__' in campo:
+            relacion, atributo = campo.split('__', 1)
+            field = MovimientoArchivado._meta.get_field(relacion)
+            claves = {movimiento[field.attname] for movimiento in movimientos} - {None}
+            relacionados[campo] = (field.attname, dict(
+                field.related_model._default_manager.filter(pk__in=claves).values_list('pk', atributo)
+            ))
+    for movimiento in movimientos:
+        yield tuple(
+            relacionados[campo][1].get(movimiento[relacionados[campo][0]]) if campo in relacionados
+            else movimiento['id' if campo == 'pk' else campo]
+            for campo in campos
+        )
+
+
+def filas_congeladas(campos, desde=None, hasta=None, insumo=None, tipo=None, usuario=None,
+                     tamano=exportacion.TAMANO_BLOQUE):
+    """
+    Filas de los periodos congelados con los filtros del historial.
+
+    Args:
+        campos (list): Campos como en ``values_list`` (``'pk'``,
+            ``'insumo__nombre'``...)
+        desde (datetime): Fecha inicial (inclusive)
+        hasta (datetime): Fecha final (exclusiva)
+        insumo, usuario: Instancia o id a filtrar
+        tipo (str): Tipo de movimiento a filtrar
+        tamano (int): Filas por consulta de los campos relacionados
+
+    Yields:
+        tuple: Valores de cada fila
+    """
+    filtros = {
+        'insumo_id': getattr(insumo, 'pk', insumo), 'tipo': tipo or None,
+        'usuario_id': getattr(usuario, 'pk', usuario),
+    }
+    filtros = {columna: valor for columna, valor in filtros.items() if valor is not None}
+    bloque = []
+    for movimiento in leer_congelados(desde, hasta):
+        if all(movimiento[columna] == valor for columna, valor in filtros.items()):
+            bloque.append(movimiento)
+            if len(bloque) == tamano:
+                yield from _valores(bloque, campos)
+                bloque = []
+    yield from _valores(bloque, campos)
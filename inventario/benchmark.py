@@ -0,0 +1,472 @@
+"""
+Benchmark de extremo a extremo de las vistas de inventario.
+
+Recorre cada ruta de ``inventario/urls.py`` con el cliente de pruebas de
+Django y registra, por escenario, percentiles de latencia, cantidad de
+consultas SQL y bytes generados. Los resultados se guardan en JSON para
+compararlos entre ejecuciones (ver el comando ``benchmark``).
+"""
+import json
+import math
+import platform
+import time
+import uuid
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import idempotencia, urls
+from .models import Insumo, Movimiento, Ubicacion
+
+# Escalas predefinidas: (insumos, movimientos, usuarios)
+ESCALAS = {
+    'pequena': (200, 5000, 5),
+    'mediana': (5000, 200000, 50),
+    'grande': (100000, 5000000, 500),
+}
+
+USUARIO = 'benchmark'
+CLAVE = 'benchmark-clave-123'
+
+
+def percentil(valores, p):
+    """Percentil ``p`` (0-100) por el método del rango más cercano"""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    rango = max(1, math.ceil(p / 100 * len(ordenados)))
+    return ordenados[rango - 1]
+
+
+class Escenario:
+    """
+    Petición a medir sobre una ruta.
+
+    Attributes:
+        nombre (str): Identificador del escenario en el JSON de resultados
+        ruta (str): Nombre de la URL que ejercita
+        preparar (callable): Recibe ``(contexto, iteración)`` y retorna
+            ``(cliente, método, url, datos, extra)``; se ejecuta fuera de la
+            medición
+    """
+
+    def __init__(self, nombre, ruta, preparar):
+        self.nombre = nombre
+        self.ruta = ruta
+        self.preparar = preparar
+
+
+class Contexto:
+    """Clientes y datos compartidos por los escenarios"""
+
+    def __init__(self):
+        User = get_user_model()
+        self.usuario, creado = User.objects.get_or_create(username=USUARIO)
+        if creado or not self.usuario.check_password(CLAVE):
+            self.usuario.set_password(CLAVE)
+            self.usuario.save()
+        self.cliente = Client()
+        self.cliente.force_login(self.usuario)
+        self.anonimo = Client()
+        self.sufijo = f'{time.time_ns():x}'
+        self.insumos = list(Insumo.objects.order_by('pk').values_list('pk', 'codigo')[:100])
+        if not self.insumos:
+            insumo = Insumo.objects.create(codigo=f'BEN-{self.sufijo}', nombre='Benchmark', ubicacion='-')
+            self.insumos = [(insumo.pk, insumo.codigo)]
+        self.movimiento = Movimiento.objects.values_list('pk', flat=True).first() or 0
+        self.ubicacion = Ubicacion.objects.values_list('pk', flat=True).first()
+
+    def insumo(self, i):
+        return self.insumos[i % len(self.insumos)]
+
+
+def _get(nombre, ruta, params=None, anonimo=False, args=None, headers=None):
+    def preparar(ctx, i):
+        cliente = ctx.anonimo if anonimo else ctx.cliente
+        url = reverse(ruta, args=args(ctx, i) if args else None)
+        extra = {'headers': headers} if headers else {}
+        return cliente, 'get', url, params(ctx, i) if callable(params) else params, extra
+    return Escenario(nombre, ruta, preparar)
+
+
+def _datos_insumo(ctx, i, prefijo):
+    return {
+        'codigo': f'{prefijo}-{ctx.sufijo}-{i}',
+        'nombre': f'Insumo benchmark {i}',
+        'descripcion': 'Creado por el benchmark',
+        'stock_actual': 10,
+        'stock_minimo': 5,
+        'ubicacion': 'Benchmark',
+    }
+
+
+def _post_login(ctx, i):
+    return ctx.anonimo, 'post', reverse('login'), {'username': USUARIO, 'password': CLAVE}, {}
+
+
+def _post_logout(ctx, i):
+    cliente = Client()
+    cliente.force_login(ctx.usuario)
+    return cliente, 'post', reverse('logout'), None, {}
+
+
+def _post_registro(ctx, i):
+    clave = 'Clave-Segura-987'
+    datos = {'username': f'bench-{ctx.sufijo}-{i}', 'password1': clave, 'password2': clave}
+    return Client(), 'post', reverse('register'), datos, {}
+
+
+def _post_insumo_create(ctx, i):
+    return ctx.cliente, 'post', reverse('insumo_create'), _datos_insumo(ctx, i, 'NEW'), {}
+
+
+def _post_insumo_update(ctx, i):
+    pk, codigo = ctx.insumo(i)
+    datos = {**_datos_insumo(ctx, i, 'UPD'), 'codigo': codigo}
+    return ctx.cliente, 'post', reverse('insumo_update', args=[pk]), datos, {}
+
+
+def _post_insumo_delete(ctx, i):
+    insumo = Insumo.objects.create(**_datos_insumo(ctx, i, 'DEL'))
+    return ctx.cliente, 'post', reverse('insumo_delete', args=[insumo.pk]), None, {}
+
+
+def _post_ubicacion(ctx, i):
+    datos = {'nombre': f'Almacén benchmark {ctx.sufijo}-{i}'}
+    return ctx.cliente, 'post', reverse('ubicacion_create'), datos, {}
+
+
+def _post_movimiento(ctx, i, clave=None):
+    pk, _ = ctx.insumo(i)
+    datos = {'insumo': pk, 'tipo': 'ENTRADA', 'cantidad': 1}
+    extra = {'headers': {idempotencia.CABECERA: clave}} if clave else {}
+    return ctx.cliente, 'post', reverse('movimiento_create'), datos, extra
+
+
+def _post_movimiento_clave(ctx, i):
+    return _post_movimiento(ctx, i, clave=uuid.uuid4().hex)
+
+
+def _post_movimiento_reintento(ctx, i):
+    """Reenvío de un movimiento ya registrado (el envío original no se mide)"""
+    cliente, metodo, url, datos, extra = _post_movimiento(ctx, 0, clave=f'reintento-{ctx.sufijo}')
+    cliente.post(url, datos, **extra)
+    return cliente, metodo, url, datos, extra
+
+
+def _post_lote(ctx, i):
+    eventos = [
+        {'codigo': ctx.insumo(i + j)[1], 'tipo': 'ENTRADA', 'cantidad': 1}
+        for j in range(100)
+    ]
+    extra = {'content_type': 'application/json'}
+    return ctx.cliente, 'post', reverse('movimiento_lote'), json.dumps(eventos), extra
+
+
+def _hace_30_dias(ctx, i):
+    return {'as_of': (timezone.localdate() - timedelta(days=30)).isoformat()}
+
+
+def _filtro_ubicacion(ctx, i):
+    return {'ubicacion': ctx.ubicacion} if ctx.ubicacion else None
+
+
+def _filtro_insumo(ctx, i):
+    return {'insumo': ctx.insumo(i)[0]}
+
+
+def _pagina_siguiente(ctx, i):
+    """Cursor de la segunda página del historial (obtenido fuera de la medición)"""
+    page = ctx.cliente.get(reverse('movimiento_list')).context['page_obj']
+    return {'despues': page.next_cursor} if page.next_cursor else None
+
+
+ESCENARIOS = [
+    _get('login_get', 'login', anonimo=True),
+    Escenario('login_post', 'login', _post_login),
+    Escenario('logout_post', 'logout', _post_logout),
+    _get('registro_get', 'register', anonimo=True),
+    Escenario('registro_post', 'register', _post_registro),
+    _get('insumo_list', 'insumo_list'),
+    _get('insumo_list_as_of', 'insumo_list', params=_hace_30_dias),
+    _get('insumo_list_busqueda', 'insumo_list', params={'q': 'motosierra stihl'}),
+    _get('insumo_list_ubicacion', 'insumo_list', params=_filtro_ubicacion),
+    _get('insumo_buscar', 'insumo_buscar', params={'q': 'HER'}),
+    _get('insumo_create_get', 'insumo_create'),
+    Escenario('insumo_create_post', 'insumo_create', _post_insumo_create),
+    _get('insumo_update_get', 'insumo_update', args=lambda ctx, i: [ctx.insumo(i)[0]]),
+    Escenario('insumo_update_post', 'insumo_update', _post_insumo_update),
+    _get('insumo_delete_get', 'insumo_delete', args=lambda ctx, i: [ctx.insumo(i)[0]]),
+    Escenario('insumo_delete_post', 'insumo_delete', _post_insumo_delete),
+    _get('insumo_exportar', 'insumo_exportar'),
+    _get('movimiento_list', 'movimiento_list'),
+    _get('movimiento_list_pagina_2', 'movimiento_list', params=_pagina_siguiente),
+    _get('movimiento_list_filtro', 'movimiento_list', params=_filtro_insumo),
+    _get('movimiento_create_get', 'movimiento_create'),
+    Escenario('movimiento_create_post', 'movimiento_create', _post_movimiento),
+    Escenario('movimiento_create_post_clave', 'movimiento_create', _post_movimiento_clave),
+    Escenario('movimiento_create_post_reintento', 'movimiento_create', _post_movimiento_reintento),
+    Escenario('movimiento_lote_post', 'movimiento_lote', _post_lote),
+    _get('movimiento_exportar', 'movimiento_exportar', params=_filtro_insumo),
+    _get('alerta_list', 'alerta_list'),
+    _get('consumo_reporte', 'consumo_reporte'),
+    _get('ubicacion_list', 'ubicacion_list'),
+    _get('ubicacion_create_get', 'ubicacion_create'),
+    Escenario('ubicacion_create_post', 'ubicacion_create', _post_ubicacion),
+    _get('insumo_list_async', 'insumo_list_async'),
+    _get('movimiento_list_async', 'movimiento_list_async'),
+    _get('api_insumos', 'api_insumos'),
+    _get('api_insumo_detalle', 'api_insumo_detalle', args=lambda ctx, i: [ctx.insumo(i)[0]]),
+    _get('api_movimientos', 'api_movimientos', params=_filtro_insumo),
+    _get('api_movimientos_1000', 'api_movimientos', params={'limite': 1000}),
+    _get(
+        'api_movimientos_1000_gzip', 'api_movimientos',
+        params={'limite': 1000, 'fields': 'id,fecha,cantidad'}, headers={'accept-encoding': 'gzip'},
+    ),
+    _get('api_movimiento_detalle', 'api_movimiento_detalle', args=lambda ctx, i: [ctx.movimiento]),
+]
+
+
+# Rutas que no se miden petición por petición, con el motivo
+RUTAS_EXCLUIDAS = {
+    # Flujo SSE que no termina; su capacidad se mide en las pruebas de carga
+    # del broker (``FeedBenchmark``)
+    'stock_feed': 'conexión de larga duración',
+    # Diagnóstico para el personal, fuera del uso normal de la aplicación
+    'cache_estadisticas': 'solo personal',
+}
+
+
+def rutas_sin_escenario():
+    """Nombres de rutas de ``inventario/urls.py`` que ningún escenario ejercita"""
+    cubiertas = {escenario.ruta for escenario in ESCENARIOS} | set(RUTAS_EXCLUIDAS)
+    return sorted(
+        patron.name for patron in urls.urlpatterns
+        if patron.name and patron.name not in cubiertas
+    )
+
+
+def _medir(escenario, ctx, i):
+    """Ejecuta una iteración del escenario y retorna (segundos, consultas, bytes, status)"""
+    cliente, metodo, url, datos, extra = escenario.preparar(ctx, i)
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = time.perf_counter()
+        response = getattr(cliente, metodo)(url, datos, **extra)
+        if response.streaming:
+            tamano = sum(len(parte) for parte in response.streaming_content)
+        else:
+            tamano = len(response.content)
+        duracion = time.perf_counter() - inicio
+    return duracion, len(consultas.captured_queries), tamano, response.status_code
+
+
+def ejecutar(repeticiones=20, calentamiento=2, escenarios=None):
+    """
+    Ejecuta los escenarios sobre la base de datos actual.
+
+    Args:
+        repeticiones (int): Iteraciones medidas por escenario
+        calentamiento (int): Iteraciones previas no medidas
+        escenarios (list): Nombres a ejecutar (por defecto, todos)
+
+    Returns:
+        dict: Métricas por escenario
+    """
+    ctx = Contexto()
+    resultados = {}
+    for escenario in ESCENARIOS:
+        if escenarios and escenario.nombre not in escenarios:
+            continue
+        resultados[escenario.nombre] = _resumir(escenario, ctx, repeticiones, calentamiento)
+    return resultados
+
+
+def _resumir(escenario, ctx, repeticiones, calentamiento):
+    """Mide las iteraciones de un escenario y resume sus métricas"""
+    for i in range(calentamiento):
+        _medir(escenario, ctx, -1 - i)
+    tiempos, consultas, tamanos, estados = [], [], [], set()
+    for i in range(repeticiones):
+        duracion, n_consultas, tamano, status = _medir(escenario, ctx, i)
+        tiempos.append(duracion * 1000)
+        consultas.append(n_consultas)
+        tamanos.append(tamano)
+        estados.add(status)
+    return {
+        'ruta': escenario.ruta,
+        'repeticiones': repeticiones,
+        'p50_ms': round(percentil(tiempos, 50), 3),
+        'p90_ms': round(percentil(tiempos, 90), 3),
+        'p99_ms': round(percentil(tiempos, 99), 3),
+        'media_ms': round(sum(tiempos) / len(tiempos), 3),
+        'consultas': max(consultas),
+        'bytes': max(tamanos),
+        'status': sorted(estados),
+    }
+
+
+class _ClientePorPeticion:
+    """Cliente que cierra la conexión antes de cada petición (``CONN_MAX_AGE=0``)"""
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+
+    def get(self, *args, **kwargs):
+        connection.close()
+        return self.cliente.get(*args, **kwargs)
+
+
+def comparar_conexiones(repeticiones=20, calentamiento=2, rutas=('insumo_list', 'movimiento_list')):
+    """
+    Mide los listados con conexión persistente y con una conexión por petición.
+
+    El cliente de pruebas no cierra la conexión al terminar cada petición,
+    por lo que el modo 'por_peticion' la cierra antes de cada una dentro de
+    la medición: incluye el costo de conectarse (y de autenticarse, en
+    MySQL) que paga un servidor con ``CONN_MAX_AGE=0``. Con SQLite en
+    memoria la conexión no se cierra y ambos modos son equivalentes.
+
+    Debe ejecutarse fuera de una transacción.
+
+    Args:
+        repeticiones (int): Iteraciones medidas por ruta y modo
+        calentamiento (int): Iteraciones previas no medidas
+        rutas (tuple): Nombres de las URLs a medir
+
+    Returns:
+        dict: Métricas por ``<ruta>_<modo>``, con ``diferencia_p50_ms`` del
+        modo 'por_peticion' respecto del persistente
+    """
+    ctx = Contexto()
+    resultados = {}
+    for ruta in rutas:
+        for modo, cliente in (
+            ('persistente', ctx.cliente), ('por_peticion', _ClientePorPeticion(ctx.cliente)),
+        ):
+            escenario = Escenario(
+                f'{ruta}_{modo}', ruta, lambda ctx, i, c=cliente, r=ruta: (c, 'get', reverse(r), None, {})
+            )
+            resultados[escenario.nombre] = _resumir(escenario, ctx, repeticiones, calentamiento)
+        persistente, por_peticion = resultados[f'{ruta}_persistente'], resultados[f'{ruta}_por_peticion']
+        por_peticion['diferencia_p50_ms'] = round(por_peticion['p50_ms'] - persistente['p50_ms'], 3)
+    return resultados
+
+
+def comparar_sesiones(repeticiones=20, calentamiento=2, ruta='insumo_list'):
+    """
+    Mide una ruta autenticada con cada motor de sesión (``SESSION_MODO``).
+
+    Cada modo usa un cliente con su propia sesión iniciada. El calentamiento
+    deja la sesión en la cache en los modos que la usan, de modo que se mide
+    el estado estable de un usuario que navega.
+
+    Args:
+        repeticiones (int): Iteraciones medidas por modo
+        calentamiento (int): Iteraciones previas no medidas
+        ruta (str): Nombre de la URL a medir (por defecto, ``/insumos/``)
+
+    Returns:
+        dict: Métricas por modo, con ``consultas_ahorradas`` respecto de 'db'
+    """
+    ctx = Contexto()
+    resultados = {}
+    for modo, motor in settings.MOTORES_SESION.items():
+        with override_settings(SESSION_ENGINE=motor):
+            cliente = Client()
+            cliente.force_login(ctx.usuario)
+            escenario = Escenario(
+                f'{ruta}_{modo}', ruta, lambda ctx, i: (cliente, 'get', reverse(ruta), None, {})
+            )
+            resultados[modo] = _resumir(escenario, ctx, repeticiones, calentamiento)
+    base = resultados.get('db')
+    for metricas in resultados.values():
+        metricas['consultas_ahorradas'] = base['consultas'] - metricas['consultas'] if base else None
+    return resultados
+
+
+def comparar_idempotencia(repeticiones=20, calentamiento=2):
+    """
+    Mide el costo de las claves de idempotencia al registrar movimientos.
+
+    Compara el envío sin clave, el envío con una clave nueva (busca la
+    clave e inserta su fila junto con el movimiento) y el reenvío de una
+    clave ya usada (responde el resultado guardado sin escribir).
+
+    Args:
+        repeticiones (int): Iteraciones medidas por modo
+        calentamiento (int): Iteraciones previas no medidas
+
+    Returns:
+        dict: Métricas por modo, con ``diferencia_p50_ms`` y
+        ``consultas_extra`` respecto del envío sin clave
+    """
+    ctx = Contexto()
+    modos = {
+        'sin_clave': 'movimiento_create_post',
+        'con_clave': 'movimiento_create_post_clave',
+        'reintento': 'movimiento_create_post_reintento',
+    }
+    escenarios = {escenario.nombre: escenario for escenario in ESCENARIOS}
+    resultados = {
+        modo: _resumir(escenarios[nombre], ctx, repeticiones, calentamiento)
+        for modo, nombre in modos.items()
+    }
+    base = resultados['sin_clave']
+    for metricas in resultados.values():
+        metricas['diferencia_p50_ms'] = round(metricas['p50_ms'] - base['p50_ms'], 3)
+        metricas['consultas_extra'] = metricas['consultas'] - base['consultas']
+    return resultados
+
+
+def metadatos(**extra):
+    """Datos del entorno para interpretar los resultados"""
+    return {
+        'fecha': timezone.now().isoformat(),
+        'django': django.get_version(),
+        'python': platform.python_version(),
+        'base_de_datos': connection.vendor,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'insumos': Insumo.objects.count(),
+        'movimientos': Movimiento.objects.count(),
+        **extra,
+    }
+
+
+def comparar(actual, base, umbral=0.2, metrica='p50_ms'):
+    """
+    Compara dos ejecuciones y retorna las regresiones encontradas.
+
+    Un escenario presenta regresión si ``metrica`` empeora más que
+    ``umbral`` (proporción) o si ejecuta más consultas SQL que en la base.
+
+    Args:
+        actual (dict): Resultados de la ejecución actual (clave ``escenarios``)
+        base (dict): Resultados de referencia
+        umbral (float): Aumento tolerado, por ejemplo 0.2 = 20 %
+        metrica (str): Métrica de latencia a comparar
+
+    Returns:
+        list: Descripciones de cada regresión
+    """
+    regresiones = []
+    for nombre, metricas in actual['escenarios'].items():
+        referencia = base['escenarios'].get(nombre)
+        if referencia is None:
+            continue
+        if referencia[metrica] and metricas[metrica] > referencia[metrica] * (1 + umbral):
+            regresiones.append(
+                f'{nombre}: {metrica} {referencia[metrica]:.2f} -> {metricas[metrica]:.2f} '
+                f'(+{(metricas[metrica] / referencia[metrica] - 1) * 100:.0f}%)'
+            )
+        if metricas['consultas'] > referencia['consultas']:
+            regresiones.append(
+                f'{nombre}: consultas {referencia["consultas"]} -> {metricas["consultas"]}'
+            )
+    return regresiones
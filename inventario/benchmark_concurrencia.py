@@ -0,0 +1,212 @@
+"""
+Comparación de WSGI y ASGI con muchos clientes lentos.
+
+Cada cliente pide una ruta y tarda ``lentitud`` segundos en recibir la
+respuesta (como un cliente móvil o una red lenta). Se ejecuta la aplicación
+de Django en el mismo proceso, sin servidor HTTP, para aislar el modelo de
+concurrencia:
+
+- **WSGI**: un grupo fijo de ``hilos`` (como ``gunicorn --threads``). Cada
+  respuesta ocupa un hilo hasta que el cliente termina de recibirla, por lo
+  que con clientes lentos el rendimiento queda limitado a
+  ``hilos / lentitud`` peticiones por segundo.
+- **ASGI**: un solo event loop. El envío a un cliente lento es una espera
+  asíncrona que no ocupa hilos; las vistas síncronas igual se ejecutan de a
+  una en el hilo de trabajo de Django, mientras que las asíncronas solo
+  pasan por él para las consultas.
+
+Para cada modo se registran peticiones por segundo, percentiles de
+latencia y el pico de memoria Python (``tracemalloc``, en una pasada
+aparte) dividido por la cantidad de peticiones concurrentes. La
+memoria de las pilas de los hilos WSGI no la registra ``tracemalloc``; se
+informa la cantidad de hilos para tenerla en cuenta.
+"""
+import asyncio
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.urls import reverse
+
+from .benchmark import Contexto, percentil
+
+# Rutas comparadas: (nombre, ruta síncrona, ruta asíncrona)
+VISTAS = [
+    ('insumos', 'insumo_list', 'insumo_list_async'),
+    ('movimientos', 'movimiento_list', 'movimiento_list_async'),
+    ('api_movimientos', 'api_movimientos', 'api_movimientos'),
+]
+
+
+def _cookie_sesion(ctx):
+    """Cookie de la sesión iniciada por el cliente del benchmark"""
+    return f'{settings.SESSION_COOKIE_NAME}={ctx.cliente.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+def _peticion_wsgi(aplicacion, ruta, cookie, lentitud):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': ruta,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'testserver',
+        'HTTP_COOKIE': cookie,
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': BytesIO(),
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    estado = []
+    inicio = time.perf_counter()
+    cuerpo = aplicacion(environ, lambda status, headers, exc_info=None: estado.append(status))
+    try:
+        for _ in cuerpo:
+            pass
+        # El hilo queda ocupado mientras el cliente recibe la respuesta
+        time.sleep(lentitud)
+    finally:
+        if hasattr(cuerpo, 'close'):
+            cuerpo.close()
+    return time.perf_counter() - inicio, int(estado[0].split()[0])
+
+
+def ejecutar_wsgi(ruta, cookie, clientes, hilos, lentitud):
+    """
+    Atiende ``clientes`` peticiones simultáneas con un grupo de ``hilos``.
+
+    Returns:
+        tuple: (duración total, latencias, estados)
+    """
+    aplicacion = WSGIHandler()
+
+    def atender(_):
+        try:
+            return _peticion_wsgi(aplicacion, ruta, cookie, lentitud)
+        finally:
+            connections.close_all()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as grupo:
+        resultados = list(grupo.map(atender, range(clientes)))
+    return time.perf_counter() - inicio, [r[0] for r in resultados], {r[1] for r in resultados}
+
+
+async def _peticion_asgi(aplicacion, ruta, cookie, lentitud):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': ruta,
+        'raw_path': ruta.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+    pedido = False
+    desconexion = asyncio.Event()
+
+    async def receive():
+        nonlocal pedido
+        if not pedido:
+            pedido = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await desconexion.wait()
+        return {'type': 'http.disconnect'}
+
+    estado = []
+
+    async def send(mensaje):
+        if mensaje['type'] == 'http.response.start':
+            estado.append(mensaje['status'])
+        elif not mensaje.get('more_body'):
+            # Cliente lento: el envío termina cuando terminó de recibir
+            await asyncio.sleep(lentitud)
+
+    inicio = time.perf_counter()
+    await aplicacion(scope, receive, send)
+    desconexion.set()
+    return time.perf_counter() - inicio, estado[0]
+
+
+def ejecutar_asgi(ruta, cookie, clientes, lentitud):
+    """
+    Atiende ``clientes`` peticiones simultáneas en un event loop.
+
+    Returns:
+        tuple: (duración total, latencias, estados)
+    """
+    aplicacion = get_asgi_application()
+
+    async def todas():
+        return await asyncio.gather(*[
+            _peticion_asgi(aplicacion, ruta, cookie, lentitud) for _ in range(clientes)
+        ])
+
+    inicio = time.perf_counter()
+    resultados = asyncio.run(todas())
+    connections.close_all()
+    return time.perf_counter() - inicio, [r[0] for r in resultados], {r[1] for r in resultados}
+
+
+def _medir(funcion, clientes, *args):
+    duracion, latencias, estados = funcion(*args)
+    # La memoria se mide en una segunda pasada: tracemalloc hace varias
+    # veces más lento el código Python y distorsionaría los tiempos
+    tracemalloc.start()
+    try:
+        funcion(*args)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'peticiones_por_segundo': round(clientes / duracion, 2),
+        'p50_ms': round(percentil(latencias, 50) * 1000, 2),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 2),
+        'kb_por_peticion': round(pico / clientes / 1024, 1),
+        'status': sorted(estados),
+    }
+
+
+def ejecutar(clientes=100, hilos=8, lentitud=0.5, vistas=None):
+    """
+    Compara WSGI, ASGI con la vista síncrona y ASGI con la vista asíncrona.
+
+    Args:
+        clientes (int): Peticiones simultáneas por medición
+        hilos (int): Hilos del servidor WSGI simulado
+        lentitud (float): Segundos que tarda cada cliente en recibir la respuesta
+        vistas (list): Nombres de ``VISTAS`` a medir (por defecto, todas)
+
+    Returns:
+        dict: Métricas por vista y modo
+    """
+    ctx = Contexto()
+    cookie = _cookie_sesion(ctx)
+    resultados = {}
+    for nombre, sincrona, asincrona in VISTAS:
+        if vistas and nombre not in vistas:
+            continue
+        ruta_sincrona, ruta_asincrona = reverse(sincrona), reverse(asincrona)
+        resultados[nombre] = {
+            'wsgi': {
+                'hilos': hilos,
+                **_medir(ejecutar_wsgi, clientes, ruta_sincrona, cookie, clientes, hilos, lentitud),
+            },
+            'asgi_vista_sincrona': _medir(ejecutar_asgi, clientes, ruta_sincrona, cookie, clientes, lentitud),
+            'asgi_vista_asincrona': _medir(ejecutar_asgi, clientes, ruta_asincrona, cookie, clientes, lentitud),
+        }
+    return resultados
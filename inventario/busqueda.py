@@ -0,0 +1,289 @@
+"""
+Búsqueda de texto completo sobre código, nombre y descripción de insumos.
+
+En MySQL se usa el índice FULLTEXT ``insumo_texto_ft`` (migración 0006)
+con ``MATCH ... AGAINST`` en modo booleano: ordena por relevancia y acepta
+prefijos (``motos*``). MySQL ignora los términos más cortos que
+``innodb_ft_min_token_size`` (3 por defecto).
+
+En los demás motores (SQLite en desarrollo) se usa un índice invertido en
+la memoria del proceso. Se construye en el primer uso, se mantiene con las
+señales de guardado y eliminación de ``Insumo`` y se reconstruye si cambia
+la cantidad de insumos, el último id (cargas con ``bulk_create``) o la
+marca de cambios ``insumos`` (ediciones hechas por otro proceso), de modo
+que nunca se recorre la tabla por cada búsqueda.
+
+Ambos caminos normalizan igual: minúsculas, sin tildes y separando en
+cualquier carácter no alfanumérico (``HER-002`` se indexa como ``her`` y
+``002``). Cada término de la consulta coincide por prefijo y basta con que
+coincida uno; los insumos con más términos, o con términos menos comunes,
+aparecen primero.
+"""
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+
+from django.db import connection
+from django.db.models import Count, Max
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cambios
+from .models import Insumo
+
+# Términos de la consulta que se consideran (el resto se ignora)
+MAX_TERMINOS = 10
+
+# Peso de cada campo en la relevancia del índice en memoria
+PESOS = (('codigo', 3), ('nombre', 3), ('descripcion', 1))
+
+# Una coincidencia exacta vale más que una por prefijo
+FACTOR_PREFIJO = 0.5
+
+
+def terminos(texto):
+    """
+    Separa un texto en términos normalizados.
+
+    Returns:
+        list: Términos en minúsculas y sin tildes
+    """
+    texto = unicodedata.normalize('NFKD', (texto or '').lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.findall(r'[^\W_]+', texto)
+
+
+def _terminos_consulta(consulta):
+    """Términos únicos de la consulta, en orden, hasta ``MAX_TERMINOS``"""
+    return list(dict.fromkeys(terminos(consulta)))[:MAX_TERMINOS]
+
+
+class IndiceInvertido:
+    """
+    Índice invertido de insumos en memoria.
+
+    Attributes:
+        entradas (dict): Término -> {insumo_id: peso}
+        documentos (dict): insumo_id -> (código, Counter de términos)
+        firma (tuple): (cantidad, último id, marca de cambios) con que se construyó
+    """
+
+    def __init__(self):
+        self.entradas = {}
+        self.documentos = {}
+        self.firma = None
+        self._vocabulario = None
+        self._lock = threading.RLock()
+
+    def construir(self, filas, firma=None):
+        """Reemplaza el contenido con ``filas`` (id, código, nombre, descripción)"""
+        with self._lock:
+            self.entradas = {}
+            self.documentos = {}
+            for pk, codigo, nombre, descripcion in filas:
+                self._agregar(pk, codigo, nombre, descripcion)
+            self.firma = firma
+            self._vocabulario = None
+
+    def _agregar(self, pk, codigo, nombre, descripcion):
+        pesos = Counter()
+        for (_, peso), texto in zip(PESOS, (codigo, nombre, descripcion)):
+            for termino in terminos(texto):
+                pesos[termino] += peso
+        self.documentos[pk] = (codigo, pesos)
+        for termino, peso in pesos.items():
+            self.entradas.setdefault(termino, {})[pk] = peso
+
+    def _quitar(self, pk):
+        documento = self.documentos.pop(pk, None)
+        if documento is None:
+            return
+        for termino in documento[1]:
+            ids = self.entradas.get(termino)
+            if ids is not None:
+                ids.pop(pk, None)
+                if not ids:
+                    del self.entradas[termino]
+
+    def actualizar(self, insumo):
+        """Reindexa un insumo guardado"""
+        with self._lock:
+            self._quitar(insumo.pk)
+            self._agregar(insumo.pk, insumo.codigo, insumo.nombre, insumo.descripcion)
+            self._vocabulario = None
+
+    def quitar(self, pk):
+        """Quita un insumo eliminado"""
+        with self._lock:
+            self._quitar(pk)
+            self._vocabulario = None
+
+    def _expandir(self, prefijo):
+        """Términos del vocabulario que empiezan con ``prefijo``"""
+        if self._vocabulario is None:
+            self._vocabulario = sorted(self.entradas)
+        inicio = bisect_left(self._vocabulario, prefijo)
+        for termino in self._vocabulario[inicio:]:
+            if not termino.startswith(prefijo):
+                break
+            yield termino
+
+    def buscar(self, consulta):
+        """
+        Busca los insumos que coinciden con la consulta.
+
+        La relevancia suma, por cada término de la consulta, el peso del
+        término en el insumo multiplicado por su IDF; las coincidencias por
+        prefijo valen ``FACTOR_PREFIJO`` de una exacta.
+
+        Returns:
+            list: Ids de insumos ordenados por relevancia y luego por código
+        """
+        with self._lock:
+            total = len(self.documentos)
+            puntajes = Counter()
+            for buscado in _terminos_consulta(consulta):
+                for termino in self._expandir(buscado):
+                    ids = self.entradas[termino]
+                    idf = math.log(1 + total / len(ids))
+                    factor = idf if termino == buscado else idf * FACTOR_PREFIJO
+                    for pk, peso in ids.items():
+                        puntajes[pk] += peso * factor
+            return sorted(puntajes, key=lambda pk: (-puntajes[pk], self.documentos[pk][0]))
+
+
+_indice = IndiceInvertido()
+
+
+def _firma_actual():
+    datos = Insumo.objects.aggregate(cantidad=Count('pk'), ultimo=Max('pk'))
+    return datos['cantidad'], datos['ultimo'], cambios.version(cambios.CLAVE_INSUMOS)
+
+
+def indice_en_memoria():
+    """
+    Retorna el índice del proceso, reconstruyéndolo si quedó desactualizado.
+
+    Returns:
+        IndiceInvertido: Índice listo para buscar
+    """
+    firma = _firma_actual()
+    if _indice.firma != firma:
+        filas = Insumo.objects.order_by().values_list(
+            'pk', 'codigo', 'nombre', 'descripcion'
+        ).iterator(chunk_size=2000)
+        _indice.construir(filas, firma)
+    return _indice
+
+
+@receiver(post_save, sender=Insumo, dispatch_uid='busqueda_insumo_guardado')
+def _insumo_guardado(sender, instance, created, **kwargs):
+    if _indice.firma is None:
+        return
+    _indice.actualizar(instance)
+    # La firma cambia con cada guardado (y la marca ``insumos`` sube al
+    # confirmarse); se ajusta para no reconstruir todo en este proceso
+    cantidad, ultimo, version = _indice.firma
+    if created:
+        cantidad, ultimo = cantidad + 1, max(ultimo or 0, instance.pk)
+    _indice.firma = (cantidad, ultimo, version + 1)
+
+
+@receiver(post_delete, sender=Insumo, dispatch_uid='busqueda_insumo_eliminado')
+def _insumo_eliminado(sender, instance, **kwargs):
+    if _indice.firma is None:
+        return
+    _indice.quitar(instance.pk)
+    # Si era el último id la firma ya no se puede deducir: se reconstruye
+    _indice.firma = None
+
+
+def usa_fulltext():
+    """Indica si la base de datos tiene el índice FULLTEXT de insumos"""
+    return connection.vendor == 'mysql'
+
+
+def _relevancia_mysql(buscados):
+    tabla = connection.ops.quote_name(Insumo._meta.db_table)
+    columnas = ', '.join(f'{tabla}.{connection.ops.quote_name(c)}' for c, _ in PESOS)
+    return RawSQL(
+        f'MATCH ({columnas}) AGAINST (%s IN BOOLEAN MODE)',
+        (' '.join(f'{t}*' for t in buscados),),
+    )
+
+
+class ResultadosRanqueados:
+    """
+    Resultados del índice en memoria, en orden de relevancia.
+
+    Se comporta como una secuencia para ``Paginator``: ``count()`` y los
+    recortes no consultan la base de datos, y cada página se carga al
+    recorrerla con una sola consulta sobre el queryset original
+    (conservando sus anotaciones).
+    """
+
+    def __init__(self, queryset, ids):
+        self.queryset = queryset
+        self.ids = ids
+
+    def count(self):
+        return len(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        por_id = self.queryset.in_bulk(self.ids)
+        return iter([por_id[pk] for pk in self.ids if pk in por_id])
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            # Como en un QuerySet, recortar no consulta la base de datos: el
+            # listado limita los resultados y ``Paginator`` carga solo la página
+            return ResultadosRanqueados(self.queryset, self.ids[indice])
+        return list(ResultadosRanqueados(self.queryset, [self.ids[indice]]))[0]
+
+
+def buscar(queryset, consulta):
+    """
+    Filtra ``queryset`` por la consulta y lo ordena por relevancia.
+
+    Args:
+        queryset (QuerySet): Insumos a considerar (puede estar anotado)
+        consulta (str): Texto buscado
+
+    Returns:
+        QuerySet | ResultadosRanqueados: Resultados paginables
+    """
+    buscados = _terminos_consulta(consulta)
+    if not buscados:
+        return queryset.none()
+    if usa_fulltext():
+        return (
+            queryset.annotate(relevancia=_relevancia_mysql(buscados))
+            .filter(relevancia__gt=0)
+            .order_by('-relevancia', 'codigo')
+        )
+    return ResultadosRanqueados(queryset, indice_en_memoria().buscar(consulta))
+
+
+def filtrar(queryset, consulta):
+    """
+    Restringe ``queryset`` a los insumos que coinciden, sin ordenar.
+
+    Útil cuando el orden lo define quien consume el queryset (por ejemplo,
+    la exportación, que recorre por clave primaria).
+
+    Returns:
+        QuerySet: Insumos coincidentes
+    """
+    buscados = _terminos_consulta(consulta)
+    if not buscados:
+        return queryset.none()
+    if usa_fulltext():
+        return queryset.alias(relevancia=_relevancia_mysql(buscados)).filter(relevancia__gt=0)
+    return queryset.filter(pk__in=indice_en_memoria().buscar(consulta))
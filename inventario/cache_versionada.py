@@ -0,0 +1,167 @@
+"""
+Cache de lectura versionada para listados y catálogos de insumos.
+
+Cada entrada se guarda bajo una clave que incluye la versión actual del
+inventario. Cualquier escritura sobre ``Insumo`` o ``Movimiento`` cambia
+la versión (ver ``cambios.registrar_cambio``), de modo que las entradas
+anteriores dejan de leerse sin tener que borrarlas una por una: expiran
+solas por ``TIMEOUT``.
+
+La versión se reemplaza por un valor nuevo en vez de incrementarse, porque
+el backend de archivos no tiene un ``incr`` atómico: dos cambios
+simultáneos escriben valores distintos y ninguno se pierde. También se
+renueva al confirmar la transacción, para que una lectura concurrente no
+guarde datos anteriores al commit bajo la versión nueva.
+
+Los aciertos y fallos se cuentan por espacio en memoria del proceso
+(``estadisticas``): cada worker lleva sus propios contadores, que se
+reinician al reiniciarlo. El personal los consulta en la ruta
+``cache_estadisticas`` (``/estado/cache/``), que responde los del proceso
+que atiende la petición junto con su pid.
+
+Funciona con cualquier backend de ``CACHES``. Con ``locmem`` la versión es
+propia de cada proceso (adecuado para un solo proceso de desarrollo); con
+varios workers se debe usar un backend compartido, como el de archivos.
+"""
+import hashlib
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+CLAVE_VERSION = 'inventario:version'
+
+_sin_valor = object()
+_contadores = Counter()
+_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'INVENTARIO_CACHE', 'default')]
+
+
+def version_actual():
+    """
+    Retorna la versión vigente del inventario, creándola si no existe.
+
+    Returns:
+        str: Identificador de la versión
+    """
+    cache = _cache()
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+async def aversion_actual():
+    """Versión asíncrona de ``version_actual``"""
+    cache = _cache()
+    version = await cache.aget(CLAVE_VERSION)
+    if version is None:
+        await cache.aadd(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+        version = await cache.aget(CLAVE_VERSION)
+    return version
+
+
+def _renovar():
+    _cache().set(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+
+
+def invalidar():
+    """Cambia la versión: las entradas guardadas hasta ahora dejan de usarse"""
+    _renovar()
+    transaction.on_commit(_renovar)
+
+
+def _registrar(espacio, resultado):
+    with _lock:
+        _contadores[espacio, resultado] += 1
+
+
+def estadisticas():
+    """
+    Aciertos y fallos del proceso actual, por espacio.
+
+    Los contadores no se comparten entre procesos ni se guardan en la
+    cache: con varios workers cada uno responde solo los suyos.
+
+    Returns:
+        dict: ``{espacio: {'aciertos', 'fallos', 'tasa'}}``
+    """
+    with _lock:
+        espacios = sorted({espacio for espacio, _ in _contadores})
+        datos = {}
+        for espacio in espacios:
+            aciertos = _contadores[espacio, 'aciertos']
+            fallos = _contadores[espacio, 'fallos']
+            datos[espacio] = {
+                'aciertos': aciertos,
+                'fallos': fallos,
+                'tasa': round(aciertos / (aciertos + fallos), 4),
+            }
+        return datos
+
+
+def reiniciar_estadisticas():
+    with _lock:
+        _contadores.clear()
+
+
+def _clave(espacio, partes, version):
+    resumen = hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()
+    return f'inventario:{espacio}:{version}:{resumen}'
+
+
+def obtener(espacio, partes, calcular, timeout=None):
+    """
+    Lee una entrada de la cache o la calcula y la guarda.
+
+    Args:
+        espacio (str): Grupo de la entrada (``insumos``, ``catalogo``...)
+        partes (tuple): Valores que identifican la entrada dentro del espacio
+        calcular (callable): Función sin argumentos que produce el valor
+        timeout (int): Segundos de vida (por defecto, el del backend)
+
+    Returns:
+        object: Valor guardado o recién calculado
+    """
+    cache = _cache()
+    clave = _clave(espacio, partes, version_actual())
+    valor = cache.get(clave, _sin_valor)
+    if valor is not _sin_valor:
+        _registrar(espacio, 'aciertos')
+        return valor
+    _registrar(espacio, 'fallos')
+    valor = calcular()
+    if timeout is None:
+        cache.set(clave, valor)
+    else:
+        cache.set(clave, valor, timeout)
+    return valor
+
+
+async def aobtener(espacio, partes, calcular, timeout=None):
+    """
+    Versión asíncrona de ``obtener``.
+
+    Args:
+        calcular (callable): Función asíncrona sin argumentos que produce el valor
+    """
+    cache = _cache()
+    clave = _clave(espacio, partes, await aversion_actual())
+    valor = await cache.aget(clave, _sin_valor)
+    if valor is not _sin_valor:
+        _registrar(espacio, 'aciertos')
+        return valor
+    _registrar(espacio, 'fallos')
+    valor = await calcular()
+    if timeout is None:
+        await cache.aset(clave, valor)
+    else:
+        await cache.aset(clave, valor, timeout)
+    return valor
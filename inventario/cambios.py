@@ -0,0 +1,154 @@
+"""
+Registro de cambios del inventario y respuestas condicionales.
+
+Toda escritura sobre ``Insumo``, ``Movimiento`` o ``Ubicacion`` pasa por
+``registrar_cambio()``: las señales ``post_save``/``post_delete`` lo llaman
+automáticamente y las operaciones que usan ``bulk_create`` o ``update()``
+(que no emiten señales) lo llaman de forma explícita. Cada cambio:
+
+- invalida la cache de lecturas (``cache_versionada``), y
+- al confirmarse la transacción, incrementa la fila ``MarcaCambios`` con
+  la que los listados calculan su ``ETag`` y ``Last-Modified``.
+
+La marca se incrementa después del commit y fuera de la transacción del
+movimiento, de modo que la fila compartida solo se bloquea durante su
+propio ``UPDATE`` y un cliente nunca recibe una ``ETag`` nueva con datos
+anteriores al cambio.
+"""
+import hashlib
+
+from django.contrib import messages
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache_versionada
+from .models import Insumo, MarcaCambios, Movimiento, Ubicacion
+
+CLAVE_INVENTARIO = 'inventario'
+
+# Marca que solo sube con escrituras sobre ``Insumo`` (la usa el índice de
+# búsqueda en memoria, que no depende del stock)
+CLAVE_INSUMOS = 'insumos'
+
+
+def _incrementar_marca(clave=CLAVE_INVENTARIO):
+    actualizadas = MarcaCambios.objects.filter(clave=clave).update(
+        version=F('version') + 1, modificado=timezone.now()
+    )
+    if not actualizadas:
+        try:
+            MarcaCambios.objects.create(clave=clave, version=1)
+        except IntegrityError:
+            # Otro proceso la creó al mismo tiempo
+            _incrementar_marca(clave)
+
+
+def registrar_cambio(insumos=False):
+    """
+    Invalida la cache y programa el incremento de la marca de cambios.
+
+    Args:
+        insumos (bool): El cambio escribió código, nombre o descripción de
+            insumos; también incrementa la marca ``CLAVE_INSUMOS``
+    """
+    cache_versionada.invalidar()
+    transaction.on_commit(_incrementar_marca)
+    if insumos:
+        transaction.on_commit(lambda: _incrementar_marca(CLAVE_INSUMOS))
+
+
+def version(clave):
+    """Retorna la versión de la marca ``clave`` (0 si aún no hubo cambios)"""
+    return MarcaCambios.objects.filter(clave=clave).values_list('version', flat=True).first() or 0
+
+
+def marca_actual():
+    """
+    Retorna la marca de cambios vigente (una consulta por clave primaria).
+
+    Returns:
+        MarcaCambios: Marca actual; sin guardar si aún no hubo cambios
+    """
+    try:
+        return MarcaCambios.objects.get(clave=CLAVE_INVENTARIO)
+    except MarcaCambios.DoesNotExist:
+        return MarcaCambios(clave=CLAVE_INVENTARIO, version=0)
+
+
+def _marca_de_peticion(request):
+    """La marca se consulta una sola vez aunque la pidan ETag y Last-Modified"""
+    if not hasattr(request, '_marca_cambios'):
+        request._marca_cambios = marca_actual()
+    return request._marca_cambios
+
+
+def _admite_condicional(request):
+    # Una página con mensajes pendientes no debe reemplazarse por la del caché
+    # del navegador: se renderiza para consumirlos
+    return request.user.is_authenticated and not len(messages.get_messages(request))
+
+
+def etag_listado(request, *args, **kwargs):
+    """
+    ``ETag`` de un listado: versión del inventario, usuario y parámetros.
+
+    El contenido depende del usuario (barra de navegación) y de los filtros
+    y la página pedidos, por lo que también forman parte de la etiqueta.
+
+    Returns:
+        str: Etiqueta, o None si la petición no admite respuesta condicional
+    """
+    if not _admite_condicional(request):
+        return None
+    return _etag(request, _marca_de_peticion(request))
+
+
+def _etag(request, marca):
+    variante = hashlib.sha1(
+        f'{request.user.pk}|{request.get_full_path()}'.encode('utf-8')
+    ).hexdigest()[:16]
+    return f'{marca.version}-{variante}'
+
+
+def ultima_modificacion(request, *args, **kwargs):
+    """
+    ``Last-Modified`` de un listado: fecha del último cambio del inventario.
+
+    Returns:
+        datetime: Fecha del último cambio, o None si no admite condicional
+    """
+    if not _admite_condicional(request):
+        return None
+    return _marca_de_peticion(request).modificado
+
+
+async def acondicion(request):
+    """
+    ``ETag`` y ``Last-Modified`` para vistas asíncronas.
+
+    Requiere que ``request.user`` ya esté resuelto (``await request.auser()``),
+    lo que además deja la sesión cargada para revisar los mensajes.
+
+    Returns:
+        tuple: (etag, fecha de modificación), o (None, None)
+    """
+    if not _admite_condicional(request):
+        return None, None
+    try:
+        marca = await MarcaCambios.objects.aget(clave=CLAVE_INVENTARIO)
+    except MarcaCambios.DoesNotExist:
+        marca = MarcaCambios(clave=CLAVE_INVENTARIO, version=0)
+    return _etag(request, marca), marca.modificado
+
+
+@receiver(post_save, sender=Insumo, dispatch_uid='cambio_insumo_guardado')
+@receiver(post_delete, sender=Insumo, dispatch_uid='cambio_insumo_eliminado')
+@receiver(post_save, sender=Movimiento, dispatch_uid='cambio_movimiento_guardado')
+@receiver(post_delete, sender=Movimiento, dispatch_uid='cambio_movimiento_eliminado')
+@receiver(post_save, sender=Ubicacion, dispatch_uid='cambio_ubicacion_guardada')
+@receiver(post_delete, sender=Ubicacion, dispatch_uid='cambio_ubicacion_eliminada')
+def _inventario_modificado(sender, **kwargs):
+    registrar_cambio(insumos=sender is Insumo)
@@ -0,0 +1,355 @@
+"""
+Analítica de consumo y pronóstico de reposición.
+
+Agregados diarios
+    ``ConsumoDiario`` guarda, por insumo, día y tipo, las unidades movidas y
+    la cantidad de movimientos. ``actualizar()`` recalcula completos, con un
+    ``GROUP BY`` por día acotado por rango de fechas, los días que tocan
+    los movimientos con id mayor que la marca ``consumo_diario`` (una fila
+    de ``MarcaCambios``), y reemplaza sus filas. Los ids se asignan al
+    insertar pero los movimientos son visibles al confirmarse, por lo que
+    uno con id menor al de la marca puede aparecer después de avanzarla: por
+    eso cada actualización recalcula también los días transcurridos desde la
+    anterior, menos ``MARGEN_CONFIRMACION`` (la duración máxima esperada de
+    una transacción). Un movimiento confirmado más tarde que ese margen solo
+    se incorpora con ``reconstruir()``. Se recalcula el día completo en vez
+    de sumar deltas desde la marca porque, con ids que no siguen el orden de
+    confirmación, un delta puede saltarse un movimiento o contarlo dos
+    veces; reemplazar el día es idempotente. El ``GROUP BY`` de un día lee
+    solo el rango de ese día en el índice por fecha: su costo depende de los
+    movimientos del día, no del historial, y una ejecución periódica
+    recalcula uno o dos días. La actualización escribe, por lo que la
+    ejecuta el comando ``consumo`` (por ejemplo, desde un cron cada pocos
+    minutos) y no el reporte, que solo lee los agregados.
+    ``reconstruir()`` rehace los agregados desde el historial (por ejemplo,
+    tras una carga con fechas antiguas). Ambos leen también los movimientos
+    archivados de cada día (ver ``inventario/archivo.py``), por lo que
+    archivar no altera los agregados; los días ya congelados en el
+    almacenamiento en frío conservan sus agregados y no se recalculan.
+
+Pronóstico
+    ``pronosticar()`` lee las salidas diarias de la ventana pedida, arma una
+    matriz insumos × días y calcula con NumPy la media móvil corta (por
+    defecto, 7 días) y la de la ventana completa (28 días). La tasa de
+    consumo es la mayor de las dos, para no subestimar un consumo que se
+    aceleró; con ella se estiman los días hasta agotar el stock actual. Si
+    NumPy no está instalado (dependencia opcional) se usa un cálculo
+    equivalente en Python. El reporte muestra una página: la base de datos
+    ordena los insumos por la misma tasa y cuenta los totales, y el cálculo
+    anterior se hace solo para los insumos de esa página.
+"""
+import math
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Max, Min, Q, Sum
+from django.db.models.functions import Cast, Greatest
+from django.utils import timezone
+
+from . import archivo
+from .models import ConsumoDiario, Insumo, MarcaCambios, Movimiento, MovimientoArchivado
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dependencia opcional
+    np = None
+
+CLAVE_MARCA = 'consumo_diario'
+
+# Filas por sentencia INSERT
+TAMANO_INSERCION = 1000
+
+# Duración máxima esperada de una transacción que registra movimientos: un
+# movimiento toma su fecha al insertarse, pero es visible al confirmarse
+MARGEN_CONFIRMACION = timedelta(minutes=10)
+
+# Días de stock a partir de los cuales no se estima la fecha de quiebre
+HORIZONTE_DIAS = 3650
+
+
+def _inicio_del_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _marca_bloqueada():
+    """Marca de procesamiento, bloqueada hasta el fin de la transacción"""
+    MarcaCambios.objects.get_or_create(clave=CLAVE_MARCA)
+    return MarcaCambios.objects.select_for_update().get(clave=CLAVE_MARCA)
+
+
+def _agregados_del_dia(dia, archivado_hasta):
+    """Agregados de un día calculados desde el historial (activo y archivado)"""
+    inicio, fin = _inicio_del_dia(dia), _inicio_del_dia(dia + timedelta(days=1))
+    # ``historiales`` recibe el inicio exclusivo del intervalo
+    modelos = archivo.historiales(inicio - timedelta(microseconds=1), archivado_hasta)
+    totales = {}
+    for modelo in modelos:
+        # Rango sobre ``fecha`` en vez de funciones de fecha sobre la columna:
+        # usa el índice y no depende de las tablas de zonas horarias de MySQL
+        grupos = (
+            # Los traspasos entre almacenes y los ajustes de stock no son consumo
+            modelo.objects.filter(
+                fecha__gte=inicio, fecha__lt=fin, tipo__in=('ENTRADA', 'SALIDA'), ajuste=False
+            )
+            .order_by()
+            .values_list('insumo_id', 'tipo')
+            .annotate(cantidad=Sum('cantidad'), movimientos=Count('pk'))
+        )
+        for insumo_id, tipo, cantidad, movimientos in grupos:
+            anterior = totales.get((insumo_id, tipo), (0, 0))
+            totales[insumo_id, tipo] = (anterior[0] + cantidad, anterior[1] + movimientos)
+    return [
+        ConsumoDiario(dia=dia, insumo_id=insumo_id, tipo=tipo, cantidad=cantidad, movimientos=movimientos)
+        for (insumo_id, tipo), (cantidad, movimientos) in totales.items()
+    ]
+
+
+def _primer_dia_en_base():
+    """Primer día cuyos movimientos siguen en la base de datos (None = todos)"""
+    limite = archivo.horizonte()
+    return timezone.localdate(limite) if limite is not None else None
+
+
+def _recalcular_dias(dias):
+    """
+    Reemplaza los agregados de los días indicados por los del historial.
+
+    Los días congelados en el almacenamiento en frío conservan sus agregados.
+
+    Returns:
+        int: Filas de agregados escritas
+    """
+    archivado_hasta = archivo.ultimo_archivado()
+    primero = _primer_dia_en_base()
+    escritas = 0
+    for dia in sorted(dia for dia in dias if primero is None or dia >= primero):
+        ConsumoDiario.objects.filter(dia=dia).delete()
+        escritas += len(ConsumoDiario.objects.bulk_create(
+            _agregados_del_dia(dia, archivado_hasta), batch_size=TAMANO_INSERCION
+        ))
+    return escritas
+
+
+def _dias_entre(desde, hasta):
+    """Días locales desde ``desde`` hasta ``hasta`` (ambos inclusive)"""
+    dia, final = timezone.localdate(desde), timezone.localdate(hasta)
+    while dia <= final:
+        yield dia
+        dia += timedelta(days=1)
+
+
+def actualizar():
+    """
+    Incorpora a los agregados los movimientos registrados desde la última vez.
+
+    Recalcula los días de los movimientos con id mayor que la marca y,
+    además, los días desde la actualización anterior menos
+    ``MARGEN_CONFIRMACION``, que recogen los movimientos confirmados tarde
+    con un id menor al de la marca. Las ejecuciones concurrentes se
+    serializan con la fila de la marca.
+
+    Returns:
+        int: Días recalculados
+    """
+    inicio = timezone.now()
+    with transaction.atomic():
+        marca = _marca_bloqueada()
+        ultimo = Movimiento.objects.aggregate(ultimo=Max('pk'))['ultimo'] or 0
+        dias = set()
+        if marca.version:
+            dias.update(_dias_entre(marca.modificado - MARGEN_CONFIRMACION, inicio))
+        if ultimo > marca.version:
+            fechas = (
+                Movimiento.objects.filter(pk__gt=marca.version, pk__lte=ultimo)
+                .order_by().values_list('fecha', flat=True)
+            )
+            dias.update(timezone.localdate(fecha) for fecha in fechas.iterator(chunk_size=TAMANO_INSERCION))
+        _recalcular_dias(dias)
+        marca.version = max(ultimo, marca.version)
+        marca.modificado = inicio
+        marca.save(update_fields=['version', 'modificado'])
+    return len(dias)
+
+
+def actualizado():
+    """
+    Fecha de la última actualización de los agregados (solo lectura).
+
+    Returns:
+        datetime: Fecha, o None si nunca se actualizaron
+    """
+    return MarcaCambios.objects.filter(clave=CLAVE_MARCA).values_list('modificado', flat=True).first()
+
+
+def reconstruir():
+    """
+    Rehace los agregados a partir del historial de movimientos en la base de
+    datos (los días congelados conservan los suyos).
+
+    Returns:
+        int: Filas de agregados escritas
+    """
+    with transaction.atomic():
+        marca = _marca_bloqueada()
+        limites = Movimiento.objects.aggregate(
+            ultimo=Max('pk'), primera=Min('fecha'), final=Max('fecha')
+        )
+        archivados = MovimientoArchivado.objects.aggregate(primera=Min('fecha'), final=Max('fecha'))
+        fechas = [
+            fecha for fecha in (
+                limites['primera'], limites['final'], archivados['primera'], archivados['final']
+            ) if fecha is not None
+        ]
+        # Los días congelados conservan sus agregados
+        primero = _primer_dia_en_base()
+        borrar = ConsumoDiario.objects.all()
+        if primero is not None:
+            borrar = borrar.filter(dia__gte=primero)
+        borrar.delete()
+        escritas = 0
+        if fechas:
+            dia = timezone.localdate(min(fechas))
+            if primero is not None:
+                dia = max(dia, primero)
+            final = timezone.localdate(max(fechas))
+            while dia <= final:
+                escritas += len(ConsumoDiario.objects.bulk_create(
+                    _agregados_del_dia(dia, archivados['final']), batch_size=TAMANO_INSERCION
+                ))
+                dia += timedelta(days=1)
+        marca.version = limites['ultimo'] or 0
+        marca.modificado = timezone.now()
+        marca.save(update_fields=['version', 'modificado'])
+    return escritas
+
+
+def _salidas_de_la_ventana(hoy, ventana, insumo_ids):
+    consulta = ConsumoDiario.objects.filter(
+        tipo='SALIDA', dia__gt=hoy - timedelta(days=ventana), dia__lte=hoy
+    ).order_by()
+    if insumo_ids is not None:
+        consulta = consulta.filter(insumo_id__in=insumo_ids)
+    return consulta
+
+
+def _candidatos(hoy, ventana, corta, insumo_ids):
+    """
+    Insumos con salidas en la ventana, ordenados por días hasta el quiebre.
+
+    Calcula en la base de datos la misma tasa que ``pronosticar`` (la mayor
+    de las dos medias), para elegir y contar los insumos sin leer la ventana
+    completa de todo el catálogo.
+    """
+    tasa = Greatest(
+        Cast(Sum('cantidad'), FloatField()) / ventana,
+        Cast(Sum('cantidad', filter=Q(dia__gt=hoy - timedelta(days=corta)), default=0), FloatField()) / corta,
+    )
+    return (
+        _salidas_de_la_ventana(hoy, ventana, insumo_ids)
+        .values('insumo')
+        .annotate(dias=Cast(F('insumo__stock_actual'), FloatField()) / tasa)
+        .order_by('dias', 'insumo__codigo')
+    )
+
+
+def contar(ventana=28, corta=7, plazo=7, hoy=None):
+    """
+    Totales del pronóstico, calculados en la base de datos.
+
+    Returns:
+        tuple: (insumos con salidas en la ventana, insumos para reponer)
+    """
+    totales = _candidatos(hoy or timezone.localdate(), ventana, min(corta, ventana), None).aggregate(
+        total=Count('insumo'), reponer=Count('insumo', filter=Q(dias__lte=plazo)),
+    )
+    return totales['total'], totales['reponer']
+
+
+def _medias_numpy(filas, ids, hoy, ventana, corta):
+    """Medias diarias (corta, ventana) por insumo con una matriz insumos × días"""
+    posicion = {pk: i for i, pk in enumerate(ids)}
+    insumos, dias, cantidades = zip(*filas)
+    matriz = np.zeros((len(ids), ventana))
+    filas_matriz = np.fromiter((posicion[pk] for pk in insumos), dtype=np.intp, count=len(filas))
+    # Columna 0 = día más antiguo de la ventana; la última = hoy
+    columnas = np.fromiter(
+        (ventana - 1 - (hoy - dia).days for dia in dias), dtype=np.intp, count=len(filas)
+    )
+    np.add.at(matriz, (filas_matriz, columnas), np.fromiter(cantidades, dtype=float, count=len(filas)))
+    media_corta = matriz[:, -corta:].sum(axis=1) / corta
+    media_larga = matriz.sum(axis=1) / ventana
+    return dict(zip(ids, zip(media_corta.tolist(), media_larga.tolist())))
+
+
+def _medias_python(filas, ids, hoy, ventana, corta):
+    totales = {pk: [0, 0] for pk in ids}
+    for pk, dia, cantidad in filas:
+        totales[pk][1] += cantidad
+        if (hoy - dia).days < corta:
+            totales[pk][0] += cantidad
+    return {pk: (corto / corta, largo / ventana) for pk, (corto, largo) in totales.items()}
+
+
+def pronosticar(ventana=28, corta=7, plazo=7, insumo_ids=None, hoy=None, limite=None):
+    """
+    Estima el consumo diario y los días hasta agotar el stock de cada insumo.
+
+    Solo se consideran los insumos con salidas en la ventana: sin consumo
+    no hay quiebre que pronosticar. Con ``limite`` la base de datos elige
+    primero los insumos más próximos al quiebre (``_candidatos``) y solo
+    para ellos se leen las salidas diarias y se calculan las medias.
+
+    Args:
+        ventana (int): Días de historial considerados (incluye hoy)
+        corta (int): Días de la media móvil corta (no más que ``ventana``)
+        plazo (int): Días de reposición; con menos días de stock se marca
+            el insumo para reponer
+        insumo_ids (iterable): Restringe el pronóstico a estos insumos
+        hoy (date): Último día de la ventana (por defecto, hoy)
+        limite (int): Cantidad máxima de insumos, los más próximos al quiebre
+
+    Returns:
+        list: Diccionarios por insumo ordenados por días hasta el quiebre
+    """
+    hoy = hoy or timezone.localdate()
+    corta = min(corta, ventana)
+    if limite is not None:
+        insumo_ids = [
+            fila['insumo'] for fila in _candidatos(hoy, ventana, corta, insumo_ids)[:limite]
+        ]
+    salidas = _salidas_de_la_ventana(hoy, ventana, insumo_ids)
+    filas = list(salidas.values_list('insumo_id', 'dia', 'cantidad'))
+    if not filas:
+        return []
+    ids = sorted({pk for pk, _, _ in filas})
+    calcular = _medias_numpy if np is not None else _medias_python
+    medias = calcular(filas, ids, hoy, ventana, corta)
+    # Subconsulta en vez de la lista de ids: sin límite pueden ser todo el catálogo
+    insumos = Insumo.objects.filter(pk__in=salidas.values('insumo_id')).only(
+        'codigo', 'nombre', 'stock_actual', 'stock_minimo'
+    )
+
+    resultado = []
+    for insumo in insumos:
+        media_corta, media_larga = medias[insumo.pk]
+        tasa = max(media_corta, media_larga)
+        dias = insumo.stock_actual / tasa if tasa > 0 else math.inf
+        # Más allá de ``HORIZONTE_DIAS`` no se informa una fecha
+        fecha = hoy + timedelta(days=math.floor(dias)) if dias <= HORIZONTE_DIAS else None
+        resultado.append({
+            'insumo_id': insumo.pk,
+            'codigo': insumo.codigo,
+            'nombre': insumo.nombre,
+            'stock': insumo.stock_actual,
+            'stock_minimo': insumo.stock_minimo,
+            'media_corta': round(media_corta, 3),
+            'media_larga': round(media_larga, 3),
+            'consumo_semanal': round(tasa * 7, 2),
+            'dias_hasta_quiebre': round(dias, 1) if dias != math.inf else None,
+            'fecha_quiebre': fecha,
+            'reponer': dias <= plazo,
+        })
+    resultado.sort(key=lambda fila: (
+        fila['dias_hasta_quiebre'] is None, fila['dias_hasta_quiebre'] or 0, fila['codigo']
+    ))
+    return resultado
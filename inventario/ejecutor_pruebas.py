@@ -0,0 +1,22 @@
+"""
+Ejecutor de pruebas del proyecto (``TEST_RUNNER``).
+
+Las pruebas etiquetadas ``benchmark`` y ``stress`` levantan servidores,
+hilos o miles de conexiones y tardan bastante más que el resto, por lo
+que ``manage.py test`` las omite. Se ejecutan pidiendo su etiqueta::
+
+    python manage.py test --tag benchmark
+    python manage.py test --tag stress
+"""
+from django.test.runner import DiscoverRunner
+
+# Etiquetas omitidas salvo que se pidan con --tag
+ETIQUETAS_LENTAS = {'benchmark', 'stress'}
+
+
+class EjecutorPruebas(DiscoverRunner):
+    """``DiscoverRunner`` que excluye las etiquetas lentas no pedidas"""
+
+    def __init__(self, *args, tags=None, exclude_tags=None, **kwargs):
+        excluidas = set(exclude_tags or ()) | (ETIQUETAS_LENTAS - set(tags or ()))
+        super().__init__(*args, tags=tags, exclude_tags=excluidas, **kwargs)
@@ -0,0 +1,164 @@
+"""
+Exportación de insumos y movimientos a CSV o XLSX.
+
+Las filas se leen en bloques por clave primaria (``pk > último visto``) y se
+escriben a medida que se generan, por lo que la memoria usada es la misma
+para mil o diez millones de filas. Se evita depender solo de
+``.iterator()`` porque el driver de MySQL carga el resultado completo en
+memoria aunque se itere por partes.
+
+La exportación a XLSX requiere ``openpyxl`` (opcional); se usa su modo
+``write_only``, que escribe las filas a un archivo temporal sin mantenerlas
+en memoria.
+"""
+import csv
+import tempfile
+
+from django.utils import timezone
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover - dependencia opcional
+    Workbook = None
+
+# Filas leídas por consulta al recorrer la tabla
+TAMANO_BLOQUE = 2000
+
+FORMATOS = ('csv', 'xlsx')
+
+# Columnas exportadas: (encabezado, campo en values_list)
+COLUMNAS_INSUMO = [
+    ('ID', 'pk'),
+    ('Código', 'codigo'),
+    ('Nombre', 'nombre'),
+    ('Descripción', 'descripcion'),
+    ('Stock Actual', 'stock_actual'),
+    ('Stock Mínimo', 'stock_minimo'),
+    ('Ubicación', 'ubicacion'),
+]
+
+COLUMNAS_MOVIMIENTO = [
+    ('ID', 'pk'),
+    ('Fecha', 'fecha'),
+    ('Tipo', 'tipo'),
+    ('Código Insumo', 'insumo__codigo'),
+    ('Insumo', 'insumo__nombre'),
+    ('Cantidad', 'cantidad'),
+    ('Origen', 'origen__nombre'),
+    ('Destino', 'destino__nombre'),
+    ('Usuario', 'usuario__username'),
+    # Stock inicial y correcciones: no son entradas ni salidas reales
+    ('Ajuste', 'ajuste'),
+]
+
+
+class FormatoNoDisponible(Exception):
+    """Se lanza cuando se solicita un formato sin su dependencia instalada"""
+
+
+def recorrer_por_bloques(queryset, campos, tamano=TAMANO_BLOQUE):
+    """
+    Recorre un queryset en bloques ordenados por clave primaria.
+
+    Cada bloque es una consulta independiente que continúa desde la última
+    clave vista, de modo que nunca hay más de ``tamano`` filas en memoria.
+    Los campos relacionados (``insumo__nombre``) se resuelven con un JOIN
+    dentro de la misma consulta.
+
+    Args:
+        queryset (QuerySet): Queryset ya filtrado
+        campos (list): Campos a leer; el primero debe ser ``'pk'``
+        tamano (int): Filas por bloque
+
+    Yields:
+        tuple: Valores de cada fila
+    """
+    ultimo = None
+    while True:
+        bloque = queryset.order_by('pk')
+        if ultimo is not None:
+            bloque = bloque.filter(pk__gt=ultimo)
+        filas = list(bloque.values_list(*campos)[:tamano])
+        yield from filas
+        if len(filas) < tamano:
+            return
+        ultimo = filas[-1][0]
+
+
+def recorrer_consultas(querysets, campos, tamano=TAMANO_BLOQUE):
+    """
+    Recorre varias consultas una tras otra con ``recorrer_por_bloques``.
+
+    Se usa para exportar el archivo de movimientos seguido del historial
+    activo: como los ids archivados son anteriores, el resultado sigue en
+    orden de id.
+
+    Yields:
+        tuple: Valores de cada fila
+    """
+    for queryset in querysets:
+        yield from recorrer_por_bloques(queryset, campos, tamano)
+
+
+def _formatear(valor):
+    """Convierte fechas a la zona horaria local, booleanos a Sí/No y None a texto vacío"""
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'Sí' if valor else 'No'
+    if hasattr(valor, 'tzinfo') and valor.tzinfo is not None:
+        return timezone.localtime(valor).strftime('%Y-%m-%d %H:%M:%S')
+    return valor
+
+
+class _Eco:
+    """Objeto tipo archivo que retorna lo escrito en vez de guardarlo"""
+
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(columnas, filas):
+    """
+    Genera el contenido CSV línea por línea.
+
+    Args:
+        columnas (list): Pares (encabezado, campo)
+        filas (iterable): Tuplas de valores
+
+    Yields:
+        str: Líneas CSV listas para enviar
+    """
+    escritor = csv.writer(_Eco())
+    # BOM para que Excel reconozca la codificación UTF-8
+    yield '\ufeff' + escritor.writerow([encabezado for encabezado, _ in columnas])
+    for fila in filas:
+        yield escritor.writerow([_formatear(valor) for valor in fila])
+
+
+def generar_xlsx(columnas, filas, titulo='Datos'):
+    """
+    Escribe las filas en un libro XLSX temporal en modo ``write_only``.
+
+    Args:
+        columnas (list): Pares (encabezado, campo)
+        filas (iterable): Tuplas de valores
+        titulo (str): Nombre de la hoja
+
+    Returns:
+        file: Archivo temporal posicionado al inicio (se elimina al cerrarlo)
+
+    Raises:
+        FormatoNoDisponible: Si openpyxl no está instalado
+    """
+    if Workbook is None:
+        raise FormatoNoDisponible('La exportación a XLSX requiere el paquete openpyxl.')
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(title=titulo)
+    hoja.append([encabezado for encabezado, _ in columnas])
+    for fila in filas:
+        hoja.append([_formatear(valor) for valor in fila])
+    archivo = tempfile.TemporaryFile()
+    libro.save(archivo)
+    archivo.seek(0)
+    return archivo
@@ -0,0 +1,251 @@
+"""
+Canal en vivo de cambios de stock (Server-Sent Events sobre ASGI).
+
+Los servicios de ``services.py`` publican un evento por insumo afectado
+después de cada commit. Las conexiones del endpoint ``stock_feed`` se
+suscriben a un broker y reciben los eventos como ``text/event-stream``.
+
+Broker
+    Se elige con ``INVENTARIO_BROKER`` (ruta a la clase). ``BrokerLocal``
+    reparte los eventos dentro del proceso: sirve con un solo worker y en
+    las pruebas. Con varios workers se necesita un broker compartido con
+    la misma interfaz (``publicar`` y ``suscribir``), por ejemplo sobre
+    Redis pub/sub. ``configurar_broker`` permite reemplazarlo en pruebas.
+
+Contrapresión
+    Cada suscripción tiene una cola acotada (``capacidad``). Publicar nunca
+    bloquea ni hace crecer la memoria: si un cliente lento llena su cola,
+    se descartan sus eventos pendientes y recibe un evento ``reinicio``
+    para que vuelva a cargar el estado completo.
+
+Conexiones inactivas
+    Cada conexión es una corrutina esperando en su cola (sin hilo propio),
+    por lo que un worker ASGI mantiene miles de conexiones abiertas. Se
+    envía un comentario de latido periódico para que los proxies no las
+    cierren. Bajo WSGI cada conexión ocuparía un hilo, por eso el endpoint
+    responde 501 si no se ejecuta en ASGI.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Suscripcion:
+    """
+    Cola de eventos de un cliente.
+
+    Se crea desde el event loop del cliente; el broker entrega los eventos
+    con ``call_soon_threadsafe``, por lo que se puede publicar desde
+    cualquier hilo.
+    """
+
+    def __init__(self, broker, capacidad, filtro=None):
+        self.broker = broker
+        self.filtro = filtro
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=capacidad)
+        self.descartados = 0
+        self.cerrada = False
+
+    def _entregar(self, evento):
+        """Se ejecuta en el loop del cliente"""
+        if self.cerrada:
+            return
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: se vacía la cola y se le pide recargar
+            self.descartados += self.cola.qsize()
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait({'tipo': 'reinicio'})
+
+    def acepta(self, evento):
+        return self.filtro is None or evento.get('insumo') in self.filtro
+
+    async def siguiente(self, timeout=None):
+        """
+        Espera el próximo evento.
+
+        Returns:
+            dict: Evento, o None si pasaron ``timeout`` segundos sin eventos
+        """
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def cerrar(self):
+        self.cerrada = True
+        self.broker.cancelar(self)
+
+
+class BrokerLocal:
+    """
+    Publicación y suscripción dentro del proceso.
+
+    Args:
+        capacidad (int): Eventos pendientes por suscripción antes de descartar
+        historial (int): Eventos recientes guardados para reanudar conexiones
+            (encabezado ``Last-Event-ID``)
+    """
+
+    def __init__(self, capacidad=100, historial=500):
+        self.capacidad = capacidad
+        self.historial = deque(maxlen=historial)
+        self.suscripciones = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def publicar(self, evento):
+        """
+        Entrega un evento a todas las suscripciones sin esperar a ninguna.
+
+        Returns:
+            int: Id asignado al evento
+        """
+        with self._lock:
+            evento = {'id': next(self._ids), **evento}
+            self.historial.append(evento)
+            suscripciones = list(self.suscripciones)
+        for suscripcion in suscripciones:
+            if not suscripcion.acepta(evento):
+                continue
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion._entregar, evento)
+            except RuntimeError:
+                # El loop del cliente ya terminó
+                self.cancelar(suscripcion)
+        return evento['id']
+
+    def suscribir(self, desde=None, filtro=None):
+        """
+        Crea una suscripción (debe llamarse desde el event loop del cliente).
+
+        Args:
+            desde (int): Último id recibido por el cliente; se reenvían los
+                eventos posteriores si siguen en el historial
+            filtro (set): Ids de insumos de interés (None = todos)
+
+        Returns:
+            Suscripcion: Suscripción registrada
+        """
+        suscripcion = Suscripcion(self, self.capacidad, filtro)
+        with self._lock:
+            self.suscripciones.add(suscripcion)
+            if desde is not None:
+                pendientes = [evento for evento in self.historial if evento['id'] > desde]
+                perdidos = not self.historial or self.historial[0]['id'] > desde + 1
+        if desde is not None:
+            if perdidos:
+                suscripcion._entregar({'tipo': 'reinicio'})
+            for evento in pendientes:
+                if suscripcion.acepta(evento):
+                    suscripcion._entregar(evento)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            self.suscripciones.discard(suscripcion)
+
+    @property
+    def conexiones(self):
+        return len(self.suscripciones)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def obtener_broker():
+    """Retorna el broker configurado en ``INVENTARIO_BROKER`` (uno por proceso)"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            clase = import_string(getattr(settings, 'INVENTARIO_BROKER', 'inventario.feed.BrokerLocal'))
+            _broker = clase()
+        return _broker
+
+
+def configurar_broker(broker):
+    """
+    Reemplaza el broker del proceso (por ejemplo, por uno de pruebas).
+
+    Returns:
+        object: Broker anterior
+    """
+    global _broker
+    with _broker_lock:
+        anterior, _broker = _broker, broker
+    return anterior
+
+
+def publicar_stock(insumo_id, codigo, delta, stock=None, movimiento_id=None):
+    """
+    Publica la variación de stock de un insumo.
+
+    Args:
+        insumo_id (int): Insumo afectado
+        codigo (str): Código del insumo
+        delta (int): Variación del stock (negativa en salidas)
+        stock (int): Stock resultante, si se conoce sin otra consulta
+        movimiento_id (int): Movimiento que originó el cambio
+
+    Returns:
+        int: Id del evento
+    """
+    return obtener_broker().publicar({
+        'tipo': 'stock',
+        'insumo': insumo_id,
+        'codigo': codigo,
+        'delta': delta,
+        'stock': stock,
+        'movimiento': movimiento_id,
+    })
+
+
+def formatear_sse(evento):
+    """
+    Serializa un evento en el formato de Server-Sent Events.
+
+    Returns:
+        str: Bloque ``id``/``event``/``data`` terminado en línea en blanco
+    """
+    lineas = []
+    if 'id' in evento:
+        lineas.append(f'id: {evento["id"]}')
+    lineas.append(f'event: {evento["tipo"]}')
+    lineas.append(f'data: {json.dumps(evento, ensure_ascii=False)}')
+    return '\n'.join(lineas) + '\n\n'
+
+
+async def eventos_sse(broker, desde=None, filtro=None, latido=15):
+    """
+    Genera el flujo SSE de un cliente hasta que se desconecta.
+
+    La suscripción se crea al empezar a enviar el flujo y no al crear la
+    respuesta: si el cliente se desconecta antes, el generador nunca se
+    ejecuta y no queda una suscripción sin cerrar en el broker.
+
+    Args:
+        broker: Broker del que se reciben los eventos
+        desde (int): Último id recibido por el cliente (``Last-Event-ID``)
+        filtro (set): Ids de insumos de interés (None = todos)
+        latido (float): Segundos sin eventos antes de enviar un latido
+
+    Yields:
+        str: Fragmentos del flujo ``text/event-stream``
+    """
+    suscripcion = broker.suscribir(desde=desde, filtro=filtro)
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            evento = await suscripcion.siguiente(timeout=latido)
+            yield ': latido\n\n' if evento is None else formatear_sse(evento)
+    finally:
+        suscripcion.cerrar()
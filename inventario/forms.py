@@ -2,8 +2,52 @@
 Formularios de la aplicación de inventario.
 Define los formularios para la creación y edición de Insumos y Movimientos.
 """
+import uuid
+from datetime import datetime, time, timedelta
+
 from django import forms
-from .models import Insumo, Movimiento
+from django.contrib.auth.models import User
+from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.choices import CallableChoiceIterator
+from . import archivo, busqueda, cache_versionada, ubicaciones
+from .exportacion import COLUMNAS_INSUMO
+from .models import Insumo, Movimiento, StockUbicacion, Ubicacion
+
+
+class InsumoBusquedaWidget(forms.Widget):
+    """
+    Selector de insumo con búsqueda por código o nombre a medida que se escribe.
+    
+    En lugar de renderizar todos los insumos como ``<option>`` (lo que con
+    miles de insumos genera páginas enormes y consulta la tabla completa en
+    cada petición), consulta el endpoint ``insumo_buscar`` y guarda el id
+    elegido en un campo oculto. Al volver a mostrar el formulario con un
+    valor ya elegido se obtiene solo ese insumo por su clave primaria.
+    """
+    template_name = 'inventario/widgets/insumo_busqueda.html'
+    url = reverse_lazy('insumo_buscar')
+    placeholder = 'Escribe un código (HER-001) o nombre...'
+    minimo = 2  # Caracteres mínimos antes de buscar
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        etiqueta = ''
+        try:
+            pk = int(value)
+        except (TypeError, ValueError):
+            pk = None
+        if pk is not None:
+            etiqueta = cache_versionada.obtener('catalogo', ('etiqueta', pk), lambda: str(
+                Insumo.objects.filter(pk=pk).only('codigo', 'nombre').first() or ''
+            ))
+        context['widget'].update({
+            'url': self.url,
+            'etiqueta': etiqueta,
+            'placeholder': self.placeholder,
+            'minimo': self.minimo,
+        })
+        return context
 
 
 class InsumoForm(forms.ModelForm):
@@ -11,13 +55,16 @@ class InsumoForm(forms.ModelForm):
     Formulario para crear y editar insumos.
     
     Incluye todos los campos necesarios para registrar un insumo:
-    código, nombre, descripción, stock actual y ubicación.
+    código, nombre, descripción, stock actual, stock mínimo y ubicación.
     Todos los campos tienen estilos Bootstrap aplicados.
     """
     
     class Meta:
         model = Insumo
-        fields = ['codigo', 'nombre', 'descripcion', 'stock_actual', 'ubicacion']
+        fields = [
+            'codigo', 'nombre', 'descripcion', 'stock_actual', 'stock_minimo',
+            'ubicacion_principal', 'ubicacion',
+        ]
         
         # Widgets personalizados con clases de Bootstrap
         widgets = {
@@ -39,6 +86,13 @@ class InsumoForm(forms.ModelForm):
                 'min': '0',
                 'placeholder': '0'
             }),
+            'stock_minimo': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': '0',
+            }),
+            'ubicacion_principal': forms.Select(attrs={
+                'class': 'form-control'
+            }),
             'ubicacion': forms.TextInput(attrs={
                 'class': 'form-control',
                 'placeholder': 'Ej: Almacén Principal - Sección A1'
@@ -51,6 +105,8 @@ class InsumoForm(forms.ModelForm):
             'nombre': 'Nombre del Insumo',
             'descripcion': 'Descripción',
             'stock_actual': 'Stock Actual',
+            'stock_minimo': 'Stock Mínimo (Reorden)',
+            'ubicacion_principal': 'Almacén Principal',
             'ubicacion': 'Ubicación en Almacén',
         }
         
@@ -60,26 +116,55 @@ class InsumoForm(forms.ModelForm):
             'nombre': 'Nombre descriptivo del insumo',
             'descripcion': 'Descripción detallada (opcional)',
             'stock_actual': 'Cantidad inicial en inventario',
+            'stock_minimo': 'Con este stock o menos el insumo aparece en las alertas de reorden',
+            'ubicacion_principal': 'Almacén donde se registran las entradas y salidas que no indican otro',
             'ubicacion': 'Ubicación física en el almacén',
         }
 
 
+class UbicacionForm(forms.ModelForm):
+    """Formulario para registrar un almacén"""
+    
+    class Meta:
+        model = Ubicacion
+        fields = ['nombre']
+        widgets = {
+            'nombre': forms.TextInput(attrs={
+                'class': 'form-control',
+                'placeholder': 'Ej: Almacén EPP'
+            }),
+        }
+        labels = {
+            'nombre': 'Nombre del Almacén',
+        }
+
+
 class MovimientoForm(forms.ModelForm):
     """
     Formulario para registrar movimientos de stock.
     
-    Permite crear entradas o salidas de stock para un insumo específico.
-    Incluye validación automática para evitar salidas cuando no hay
-    stock suficiente.
+    Permite crear entradas, salidas o traspasos entre almacenes para un
+    insumo específico. Incluye validación automática para evitar salidas
+    cuando no hay stock suficiente, en total o en el almacén de origen.
+    
+    El campo oculto ``clave_idempotencia`` lleva una clave nueva cada vez
+    que se muestra el formulario vacío: un doble clic o un reenvío del
+    mismo formulario registran un solo movimiento (ver
+    ``inventario/idempotencia.py``).
     """
+    clave_idempotencia = forms.CharField(
+        required=False,
+        max_length=64,
+        widget=forms.HiddenInput
+    )
     
     class Meta:
         model = Movimiento
-        fields = ['insumo', 'tipo', 'cantidad']
+        fields = ['insumo', 'tipo', 'cantidad', 'origen', 'destino']
         
         # Widgets personalizados con clases de Bootstrap
         widgets = {
-            'insumo': forms.Select(attrs={
+            'insumo': InsumoBusquedaWidget(attrs={
                 'class': 'form-control'
             }),
             'tipo': forms.Select(attrs={
@@ -90,6 +175,12 @@ class MovimientoForm(forms.ModelForm):
                 'min': '1',
                 'placeholder': '1'
             }),
+            'origen': forms.Select(attrs={
+                'class': 'form-control'
+            }),
+            'destino': forms.Select(attrs={
+                'class': 'form-control'
+            }),
         }
         
         # Labels personalizados en español
@@ -97,21 +188,37 @@ class MovimientoForm(forms.ModelForm):
             'insumo': 'Insumo',
             'tipo': 'Tipo de Movimiento',
             'cantidad': 'Cantidad',
+            'origen': 'Almacén de Origen',
+            'destino': 'Almacén de Destino',
         }
         
         # Textos de ayuda para cada campo
         help_texts = {
-            'insumo': 'Selecciona el insumo a mover',
-            'tipo': 'Entrada (ingreso) o Salida (egreso) de stock',
+            'insumo': 'Busca el insumo por código o nombre',
+            'tipo': 'Entrada (ingreso), Salida (egreso) o Traspaso entre almacenes',
             'cantidad': 'Cantidad de unidades a mover',
+            'origen': 'Salidas y traspasos (por defecto, el almacén principal del insumo)',
+            'destino': 'Entradas y traspasos (por defecto, el almacén principal del insumo)',
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.is_bound:
+            self.fields['clave_idempotencia'].initial = uuid.uuid4().hex
+        # Las opciones se leen de la cache; el queryset solo valida lo elegido
+        for campo in ('origen', 'destino'):
+            self.fields[campo].widget.choices = CallableChoiceIterator(
+                lambda: ubicaciones.opciones('---------')
+            )
+
     def clean(self):
         """
         Validación personalizada del formulario.
         
         Verifica que haya stock suficiente antes de permitir una salida.
         Si el tipo es SALIDA y no hay stock suficiente, genera un error.
+        Un traspaso requiere dos almacenes distintos y stock suficiente en
+        el de origen.
         
         Returns:
             dict: Datos limpios y validados del formulario
@@ -123,6 +230,14 @@ class MovimientoForm(forms.ModelForm):
         tipo = cleaned_data.get('tipo')
         cantidad = cleaned_data.get('cantidad')
         insumo = cleaned_data.get('insumo')
+        origen = cleaned_data.get('origen')
+        destino = cleaned_data.get('destino')
+
+        if tipo == 'TRASPASO':
+            if not origen or not destino:
+                raise forms.ValidationError('Un traspaso requiere almacén de origen y de destino.')
+            if origen == destino:
+                raise forms.ValidationError('El almacén de origen y el de destino deben ser distintos.')
 
         # Validar solo si es una SALIDA
         if tipo == 'SALIDA' and insumo and cantidad:
@@ -132,5 +247,256 @@ class MovimientoForm(forms.ModelForm):
                     f'Stock insuficiente. Disponible: {insumo.stock_actual} unidades. '
                     f'Solicitado: {cantidad} unidades.'
                 )
+
+        # Stock del almacén del que sale la mercadería
+        ubicacion_id = origen.pk if origen else insumo.ubicacion_principal_id if insumo else None
+        if tipo in ('SALIDA', 'TRASPASO') and insumo and cantidad and ubicacion_id:
+            disponible = (
+                StockUbicacion.objects.filter(insumo=insumo, ubicacion_id=ubicacion_id)
+                .values_list('cantidad', flat=True).first() or 0
+            )
+            if disponible < cantidad:
+                nombre = origen or Ubicacion.objects.get(pk=ubicacion_id)
+                raise forms.ValidationError(
+                    f'Stock insuficiente en {nombre}. Disponible: {disponible} unidades. '
+                    f'Solicitado: {cantidad} unidades.'
+                )
         
         return cleaned_data
+
+
+class MovimientoFiltroForm(forms.Form):
+    """
+    Formulario de filtros para el historial de movimientos.
+
+    Todos los campos son opcionales. Los filtros se aplican en la base de
+    datos sobre columnas indexadas; el rango de fechas se convierte en
+    límites de fecha/hora para no aplicar funciones sobre la columna
+    ``fecha`` (lo que impediría usar el índice).
+    """
+    insumo = forms.ModelChoiceField(
+        queryset=Insumo.objects.all(),
+        required=False,
+        label='Insumo',
+        widget=InsumoBusquedaWidget(attrs={'class': 'form-control form-control-sm'})
+    )
+    tipo = forms.ChoiceField(
+        choices=[('', 'Todos')] + Movimiento.TIPO_CHOICES,
+        required=False,
+        label='Tipo',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    usuario = forms.ModelChoiceField(
+        queryset=User.objects.only('username'),
+        required=False,
+        label='Usuario',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    fecha_desde = forms.DateField(
+        required=False,
+        label='Desde',
+        widget=forms.DateInput(attrs={'class': 'form-control form-control-sm', 'type': 'date'})
+    )
+    fecha_hasta = forms.DateField(
+        required=False,
+        label='Hasta',
+        widget=forms.DateInput(attrs={'class': 'form-control form-control-sm', 'type': 'date'})
+    )
+
+    def clean(self):
+        """
+        Valida que el rango de fechas sea coherente.
+
+        Raises:
+            ValidationError: Si la fecha inicial es posterior a la final
+        """
+        cleaned_data = super().clean()
+        desde = cleaned_data.get('fecha_desde')
+        hasta = cleaned_data.get('fecha_hasta')
+        if desde and hasta and desde > hasta:
+            raise forms.ValidationError('La fecha "Desde" no puede ser posterior a "Hasta".')
+        return cleaned_data
+
+    def filtrar(self, queryset):
+        """
+        Aplica los filtros válidos sobre un queryset de movimientos.
+
+        Args:
+            queryset (QuerySet): Queryset de Movimiento a filtrar
+
+        Returns:
+            QuerySet: Queryset filtrado
+        """
+        datos = self.cleaned_data
+        if datos.get('insumo'):
+            queryset = queryset.filter(insumo=datos['insumo'])
+        if datos.get('tipo'):
+            queryset = queryset.filter(tipo=datos['tipo'])
+        if datos.get('usuario'):
+            queryset = queryset.filter(usuario=datos['usuario'])
+        if datos.get('fecha_desde'):
+            queryset = queryset.filter(fecha__gte=_inicio_del_dia(datos['fecha_desde']))
+        if datos.get('fecha_hasta'):
+            siguiente = datos['fecha_hasta'] + timedelta(days=1)
+            queryset = queryset.filter(fecha__lt=_inicio_del_dia(siguiente))
+        return queryset
+
+    def congelados(self, campos):
+        """
+        Aplica los filtros válidos sobre los periodos congelados del archivo.
+
+        Args:
+            campos (list): Campos a leer, como en ``values_list``
+
+        Returns:
+            iterator: Tuplas de valores (ver ``archivo.filas_congeladas``)
+        """
+        datos = self.cleaned_data
+        desde = hasta = None
+        if datos.get('fecha_desde'):
+            desde = _inicio_del_dia(datos['fecha_desde'])
+        if datos.get('fecha_hasta'):
+            hasta = _inicio_del_dia(datos['fecha_hasta'] + timedelta(days=1))
+        return archivo.filas_congeladas(
+            campos, desde=desde, hasta=hasta,
+            insumo=datos.get('insumo'), tipo=datos.get('tipo'), usuario=datos.get('usuario'),
+        )
+
+
+class InsumoFiltroForm(forms.Form):
+    """
+    Formulario de filtros para el listado de insumos.
+    
+    Permite buscar por texto en código, nombre y descripción (parámetro
+    ``q``), consultar el stock que tenía cada insumo al cierre de un día
+    pasado (parámetro ``as_of`` de la URL) y mostrar solo los insumos con
+    stock en un almacén (parámetro ``ubicacion``).
+
+    ``ubicacion`` se valida como entero, sin consultar la base de datos:
+    las opciones del selector se leen solo al renderizar.
+    """
+    q = forms.CharField(
+        required=False,
+        max_length=200,
+        label='Buscar',
+        widget=forms.TextInput(attrs={
+            'class': 'form-control form-control-sm',
+            'placeholder': 'Código, nombre o descripción',
+        })
+    )
+    as_of = forms.DateField(
+        required=False,
+        label='Stock al día',
+        widget=forms.DateInput(attrs={'class': 'form-control form-control-sm', 'type': 'date'})
+    )
+    ubicacion = forms.IntegerField(
+        required=False,
+        min_value=1,
+        label='Almacén',
+        widget=forms.Select(
+            attrs={'class': 'form-control form-control-sm'},
+            choices=CallableChoiceIterator(lambda: ubicaciones.opciones('Todos')),
+        )
+    )
+
+    def clean_as_of(self):
+        """
+        Rechaza días anteriores al almacenamiento en frío del archivo.
+
+        Raises:
+            ValidationError: Si los movimientos de ese día ya no están en la
+                base de datos
+        """
+        dia = self.cleaned_data.get('as_of')
+        limite = archivo.horizonte()
+        if dia and limite is not None and timezone.make_aware(datetime.combine(dia, time.max)) < limite:
+            raise forms.ValidationError(
+                f'Los movimientos anteriores al {timezone.localtime(limite):%d/%m/%Y} están '
+                'en el almacenamiento en frío; consulte la exportación de movimientos.'
+            )
+        return dia
+
+    def fecha_consulta(self):
+        """
+        Retorna el instante de consulta para ``as_of`` (fin del día indicado).
+        
+        Returns:
+            datetime: Fin del día en la zona horaria actual, o None
+        """
+        dia = self.cleaned_data.get('as_of')
+        if not dia:
+            return None
+        return timezone.make_aware(datetime.combine(dia, time.max))
+
+    def exportacion(self):
+        """
+        Columnas y consulta de la exportación de insumos con los filtros válidos.
+
+        ``q`` restringe a los insumos encontrados, ``as_of`` agrega la
+        columna de stock a esa fecha y ``ubicacion`` la del stock en ese
+        almacén. La usan la vista de exportación y el comando ``exportar``.
+
+        Returns:
+            tuple: (columnas, queryset)
+        """
+        queryset = Insumo.objects.all()
+        columnas = list(COLUMNAS_INSUMO)
+        fecha = self.fecha_consulta()
+        if fecha is not None:
+            queryset = queryset.con_stock_al(fecha)
+            columnas.append((f'Stock al {self.cleaned_data["as_of"]:%d/%m/%Y}', 'stock_al'))
+        ubicacion = self.cleaned_data.get('ubicacion')
+        if ubicacion:
+            queryset = ubicaciones.con_stock_en(queryset, ubicacion)
+            columnas.append(('Stock en Almacén', 'stock_ubicacion'))
+        termino = self.cleaned_data.get('q', '').strip()
+        if termino:
+            queryset = busqueda.filtrar(queryset, termino)
+        return columnas, queryset
+
+
+def _inicio_del_dia(dia):
+    """Retorna el inicio del día indicado en la zona horaria actual"""
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+class PronosticoForm(forms.Form):
+    """
+    Parámetros del reporte de consumo y pronóstico de quiebre.
+
+    Todos los campos son opcionales; los valores por defecto son los de
+    ``consumo.pronosticar``.
+    """
+    ventana = forms.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=365,
+        label='Ventana (días)',
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'placeholder': '28'})
+    )
+    corta = forms.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=365,
+        label='Media corta (días)',
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'placeholder': '7'})
+    )
+    plazo = forms.IntegerField(
+        required=False,
+        min_value=0,
+        max_value=365,
+        label='Plazo de reposición (días)',
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'placeholder': '7'})
+    )
+
+    def parametros(self):
+        """
+        Argumentos para ``consumo.pronosticar`` (solo los indicados).
+
+        Returns:
+            dict: Parámetros válidos con valor
+        """
+        return {
+            campo: valor for campo, valor in self.cleaned_data.items()
+            if valor is not None
+        }
@@ -0,0 +1,182 @@
+"""
+Generador de datos sintéticos de alto volumen para pruebas de carga.
+
+Usado por ``populate_db`` en modo escalable. Los datos son deterministas:
+cada insumo usa su propio generador aleatorio derivado de la semilla y de
+su índice, por lo que el resultado no depende de cuántos procesos se usen
+ni del orden en que terminen.
+
+Las funciones que se ejecutan en procesos hijos importan los modelos
+dentro de la función: con el método de inicio ``spawn`` (Windows, macOS)
+el módulo se importa antes de que el proceso hijo ejecute ``django.setup()``.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+# Categorías de insumos: prefijo de código, nombres base y ubicaciones
+CATEGORIAS = [
+    ('HER', ['Motosierra', 'Hacha Forestal', 'Desbrozadora', 'Podadora de Altura', 'Cuña de Tala'],
+     'Almacén Principal - Sección A'),
+    ('EPP', ['Casco de Seguridad', 'Guantes Anti-corte', 'Pantalón Anticorte', 'Protector Auditivo',
+             'Botas Forestales'], 'Almacén EPP - Estante B'),
+    ('REP', ['Cadena para Motosierra', 'Filtro de Aire', 'Bujía', 'Espada Guía', 'Piñón'],
+     'Almacén Repuestos - Cajón C'),
+    ('COM', ['Aceite para Cadena', 'Combustible Mezcla 2T', 'Grasa Multiuso', 'Aceite 2T'],
+     'Almacén Químicos - Estante D'),
+]
+
+MARCAS = ['STIHL', 'Husqvarna', 'Echo', 'Oregon', '3M', 'MSA', 'Truper', 'Makita']
+
+# Prefijo de los usuarios generados
+PREFIJO_USUARIO = 'carga'
+
+
+def codigo_insumo(indice):
+    """Código determinista del insumo generado número ``indice``"""
+    return f'{CATEGORIAS[indice % len(CATEGORIAS)][0]}-{indice:06d}'
+
+
+def _rng(semilla, *partes):
+    """Generador aleatorio propio para cada elemento (independiente del proceso)"""
+    return random.Random('-'.join(str(p) for p in (semilla, *partes)))
+
+
+def datos_insumo(indice, semilla):
+    """
+    Genera los campos de un insumo a partir de su índice.
+
+    Returns:
+        dict: Campos para construir el ``Insumo``
+    """
+    rng = _rng(semilla, 'insumo', indice)
+    prefijo, nombres, ubicacion = CATEGORIAS[indice % len(CATEGORIAS)]
+    nombre = f'{rng.choice(nombres)} {rng.choice(MARCAS)} {rng.randint(10, 999)}'
+    return {
+        'codigo': codigo_insumo(indice),
+        'nombre': nombre[:100],
+        'descripcion': f'{nombre} para faenas forestales ({prefijo}).',
+        'stock_actual': 0,
+        'ubicacion': f'{ubicacion}{rng.randint(1, 40)}',
+    }
+
+
+def repartir(total, partes, semilla):
+    """
+    Reparte ``total`` movimientos entre ``partes`` insumos con popularidad desigual.
+
+    Unos pocos insumos concentran gran parte de los movimientos (como en
+    un almacén real). La suma de la lista retornada es exactamente ``total``.
+
+    Returns:
+        list: Cantidad de movimientos para cada insumo
+    """
+    if partes <= 0:
+        return []
+    rangos = list(range(1, partes + 1))
+    _rng(semilla, 'popularidad').shuffle(rangos)
+    pesos = [1 / rango ** 0.8 for rango in rangos]
+    suma = sum(pesos)
+    cantidades = [int(total * peso / suma) for peso in pesos]
+    faltantes = total - sum(cantidades)
+    for indice in sorted(range(partes), key=lambda i: -pesos[i])[:faltantes]:
+        cantidades[indice] += 1
+    return cantidades
+
+
+@contextmanager
+def fecha_manual():
+    """
+    Permite asignar ``Movimiento.fecha`` al crear registros.
+
+    ``auto_now_add`` sobrescribe la fecha en cada inserción; para generar un
+    historial con fechas pasadas se desactiva dentro del proceso mientras
+    dura la carga.
+    """
+    from .models import Movimiento
+
+    campo = Movimiento._meta.get_field('fecha')
+    anterior = campo.auto_now_add
+    campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        campo.auto_now_add = anterior
+
+
+def generar_tramo(tarea):
+    """
+    Genera los movimientos de un tramo de insumos y ajusta su stock.
+
+    Para cada insumo se crea una secuencia ordenada por fecha que parte con
+    una entrada y nunca deja el stock negativo; al final se guarda el saldo
+    resultante en ``stock_actual``, de modo que el contador coincide con el
+    historial generado.
+
+    Args:
+        tarea (dict): ``inicio`` (índice del primer insumo), ``cantidades``
+            (movimientos por insumo), ``usuarios`` (ids), ``semilla``,
+            ``fin`` (fecha del último movimiento), ``dias`` y ``lote``
+
+    Returns:
+        int: Cantidad de movimientos creados
+    """
+    from django.db import transaction
+    from .models import Insumo, Movimiento
+
+    inicio = tarea['inicio']
+    cantidades = tarea['cantidades']
+    usuarios = tarea['usuarios']
+    fin = tarea['fin']
+    segundos = tarea['dias'] * 86400
+    lote = tarea['lote']
+
+    codigos = [codigo_insumo(inicio + i) for i in range(len(cantidades))]
+    ids = dict(Insumo.objects.filter(codigo__in=codigos).values_list('codigo', 'pk'))
+
+    pendientes = []
+    saldos = []
+    creados = 0
+    # Cada tramo se escribe en una transacción: si se interrumpe, no quedan
+    # movimientos sin su stock correspondiente
+    with fecha_manual(), transaction.atomic():
+        for desplazamiento, cantidad in enumerate(cantidades):
+            indice = inicio + desplazamiento
+            insumo_id = ids[codigos[desplazamiento]]
+            rng = _rng(tarea['semilla'], 'movimientos', indice)
+            instantes = sorted(rng.randrange(segundos) for _ in range(cantidad))
+            stock = 0
+            for instante in instantes:
+                salida = rng.randint(1, 30)
+                if stock >= salida and rng.random() < 0.6:
+                    tipo, unidades = 'SALIDA', salida
+                    stock -= salida
+                else:
+                    tipo, unidades = 'ENTRADA', rng.randint(10, 200)
+                    stock += unidades
+                pendientes.append(Movimiento(
+                    insumo_id=insumo_id,
+                    tipo=tipo,
+                    cantidad=unidades,
+                    fecha=fin - timedelta(seconds=segundos - instante),
+                    usuario_id=rng.choice(usuarios) if usuarios else None,
+                ))
+                if len(pendientes) >= lote:
+                    Movimiento.objects.bulk_create(pendientes, batch_size=lote)
+                    creados += len(pendientes)
+                    pendientes = []
+            saldos.append(Insumo(pk=insumo_id, stock_actual=stock))
+        Movimiento.objects.bulk_create(pendientes, batch_size=lote)
+        creados += len(pendientes)
+        Insumo.objects.bulk_update(saldos, ['stock_actual'], batch_size=lote)
+    return creados
+
+
+def generar_tramo_en_proceso(tarea):
+    """Ejecuta ``generar_tramo`` en un proceso hijo y libera su conexión"""
+    from django.db import connection
+
+    try:
+        return generar_tramo(tarea)
+    finally:
+        connection.close()
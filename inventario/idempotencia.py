@@ -0,0 +1,174 @@
+"""
+Claves de idempotencia para el registro de movimientos.
+
+Un doble clic o el reintento de un cliente con mala conexión reenvían el
+mismo movimiento; sin protección cada envío descuenta stock otra vez. Con
+una clave de idempotencia (cabecera ``Idempotency-Key`` o el campo oculto
+``clave_idempotencia`` que el formulario genera al mostrarse):
+
+1. Antes de validar el formulario se busca la clave del usuario (una
+   consulta por la restricción única (usuario, clave)). Si ya se usó, se
+   responde con el resultado guardado sin escribir nada; la validación de
+   stock no se repite, por lo que el reintento de la salida que agotó el
+   stock también recibe el resultado original.
+2. Si no existe, el movimiento y la fila ``ClaveIdempotencia`` se insertan
+   en una misma transacción. Si dos envíos con la misma clave llegan a la
+   vez, la restricción única hace fallar el INSERT del segundo, que revierte
+   su movimiento completo y responde con el resultado del primero (también
+   si lo que falla es su salida, porque el primero agotó el stock).
+
+Solo se guardan los envíos exitosos: un envío rechazado (por ejemplo, por
+stock insuficiente) no deja la clave ocupada y se puede reintentar. La
+misma clave con datos distintos se rechaza. Las claves vencen después de
+``IDEMPOTENCIA_TTL_HORAS``.
+"""
+import hashlib
+import json
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import purga
+from .models import ClaveIdempotencia
+from .services import StockInsuficiente
+
+# Claves vencidas eliminadas por transacción
+TAMANO_BLOQUE = 5000
+
+CABECERA = 'Idempotency-Key'
+CAMPO = 'clave_idempotencia'
+
+_FORMATO = re.compile(r'^[A-Za-z0-9_.:-]{1,64}$')
+
+
+class ClaveReutilizada(Exception):
+    """Se lanza cuando una clave ya usada llega con datos distintos"""
+
+    def __init__(self, clave):
+        self.clave = clave
+        super().__init__(
+            f'La clave de idempotencia "{clave}" ya se usó para registrar otro movimiento.'
+        )
+
+
+def ttl():
+    """Tiempo durante el que una clave devuelve el resultado original"""
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCIA_TTL_HORAS', 24))
+
+
+def clave_de(request):
+    """
+    Clave de idempotencia enviada en la petición.
+
+    La cabecera tiene prioridad sobre el campo del formulario.
+
+    Returns:
+        str: Clave, o None si la petición no trae una
+
+    Raises:
+        ValueError: Si la clave no tiene el formato admitido
+    """
+    clave = request.headers.get(CABECERA) or request.POST.get(CAMPO)
+    if not clave:
+        return None
+    if not _FORMATO.match(clave):
+        raise ValueError(
+            'Clave de idempotencia inválida: use hasta 64 letras, dígitos o los caracteres "_.:-".'
+        )
+    return clave
+
+
+def huella(datos, campos):
+    """
+    SHA-256 de los campos enviados, para reconocer la misma clave con otros datos.
+
+    Args:
+        datos (QueryDict): Datos del formulario
+        campos (list): Nombres de los campos que identifican el envío
+    """
+    valores = [str(datos.get(campo, '')).strip() for campo in campos]
+    return hashlib.sha256(json.dumps(valores).encode()).hexdigest()
+
+
+def buscar(usuario, clave, huella_datos):
+    """
+    Registro vigente de la clave del usuario.
+
+    Una clave vencida que todavía no se purgó se elimina para que se pueda
+    volver a usar.
+
+    Returns:
+        ClaveIdempotencia: Registro vigente, o None si la clave está libre
+
+    Raises:
+        ClaveReutilizada: Si la clave se usó con datos distintos
+    """
+    registro = ClaveIdempotencia.objects.filter(usuario=usuario, clave=clave).first()
+    if registro is None:
+        return None
+    if registro.expira <= timezone.now():
+        ClaveIdempotencia.objects.filter(pk=registro.pk, expira=registro.expira).delete()
+        return None
+    if registro.huella != huella_datos:
+        raise ClaveReutilizada(clave)
+    return registro
+
+
+def registrar(usuario, clave, huella_datos, operacion):
+    """
+    Ejecuta ``operacion`` y guarda su resultado con la clave, en una transacción.
+
+    Args:
+        usuario (User): Usuario que envía el movimiento
+        clave (str): Clave de idempotencia
+        huella_datos (str): Resultado de ``huella`` para los datos enviados
+        operacion (callable): Registra el movimiento; retorna
+            ``(movimiento, mensaje)``
+
+    Returns:
+        tuple: (registro, repetido). ``repetido`` es True si otro envío con
+        la misma clave se registró primero; en ese caso ``operacion`` no
+        tuvo efecto y el registro es el del otro envío.
+
+    Raises:
+        ClaveReutilizada: Si el otro envío usó la clave con datos distintos
+    """
+    try:
+        with transaction.atomic():
+            movimiento, mensaje = operacion()
+            registro = ClaveIdempotencia.objects.create(
+                usuario=usuario, clave=clave, huella=huella_datos,
+                movimiento=movimiento, mensaje=mensaje[:255], expira=timezone.now() + ttl(),
+            )
+    except (IntegrityError, StockInsuficiente):
+        # Envío concurrente con la misma clave: su transacción confirmó la
+        # fila primero y la de este envío se revirtió completa, al fallar el
+        # INSERT de la clave o, si el primero agotó el stock, la salida
+        registro = buscar(usuario, clave, huella_datos)
+        if registro is None:
+            raise
+        return registro, True
+    return registro, False
+
+
+def vencidas(hasta=None):
+    """Claves vencidas antes de ``hasta`` (por defecto, ahora)"""
+    return ClaveIdempotencia.objects.filter(expira__lt=hasta or timezone.now())
+
+
+def purgar(tamano=TAMANO_BLOQUE, hasta=None):
+    """
+    Elimina las claves vencidas por bloques, recorriendo el índice de ``expira``.
+
+    Args:
+        tamano (int): Claves eliminadas por transacción
+        hasta (datetime): Elimina las vencidas antes de esta fecha
+
+    Returns:
+        int: Claves eliminadas
+    """
+    consulta = vencidas(hasta).order_by('expira').values_list('pk', flat=True)
+    return purga.purgar_por_bloques(ClaveIdempotencia, consulta, tamano)
@@ -0,0 +1,339 @@
+"""
+Inicialización rápida de la base de datos desde un volcado.
+
+Un entorno nuevo se levanta con ``manage.py inicializar_bd``: el esquema se
+crea con las migraciones (que aplican el DDL en orden de dependencias) y
+los datos se cargan desde un volcado generado con ``manage.py volcar_datos``
+en otro entorno. El volcado es un directorio con un archivo
+``<tabla>.csv`` por modelo, con los nombres de columna en la primera fila.
+
+La carga de tablas grandes es mucho más rápida si los índices se construyen
+una sola vez al final y no fila por fila, por lo que antes de cargar se
+quitan de las tablas del volcado, con la API pública del editor de esquema
+(``remove_index``/``add_index``):
+
+- los índices de ``Meta.indexes``,
+- los índices de las columnas de clave foránea (salvo en MySQL, donde la
+  clave foránea necesita su índice),
+
+y se vuelven a crear después de una carga exitosa. Las claves foráneas no
+se quitan: su verificación se desactiva durante la carga y al final se
+validan todas las filas con ``check_constraints``. Las claves primarias y
+las restricciones de unicidad tampoco se quitan.
+
+Si la carga falla, los índices se recrean igual antes de informar el
+error, de modo que el esquema sigue siendo el de las migraciones: basta con
+vaciar la base de datos (``manage.py flush``) y reintentar.
+
+Cada tabla se carga con ``LOAD DATA LOCAL INFILE`` en MySQL (si la conexión
+lo permite, ver ``MYSQL_LOCAL_INFILE``) o con ``INSERT`` de varias filas.
+El formato de los archivos es el que lee ``LOAD DATA`` con
+``ESCAPED BY '\\'``: NULL se escribe ``\\N`` y las barras invertidas y los
+saltos de línea de los textos se escapan.
+"""
+import csv
+import re
+from pathlib import Path
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection, models, transaction
+
+# Filas por INSERT al cargar (y por consulta al volcar)
+TAMANO_BLOQUE = 1000
+
+NULO = '\\N'
+
+_ESCAPES = {'\\': '\\\\', '\n': '\\n', '\r': '\\r'}
+_POR_ESCAPAR = re.compile(r'[\\\n\r]')
+_ESCAPADO = re.compile(r'\\(.)')
+_SIN_ESCAPE = {'\\': '\\', 'n': '\n', 'r': '\r', '0': '\0', 't': '\t'}
+
+
+def modelos():
+    """
+    Modelos que se vuelcan y cargan, en orden de dependencias.
+
+    Son los usuarios y los modelos del inventario; cada modelo aparece
+    después de los modelos a los que referencia. Los tipos de contenido y
+    permisos los crean las migraciones y las sesiones no se trasladan.
+
+    Returns:
+        list: Clases de modelo
+    """
+    candidatos = [get_user_model()] + [
+        modelo for modelo in apps.get_app_config('inventario').get_models()
+        if modelo._meta.managed and not modelo._meta.proxy
+    ]
+    pendientes = {
+        modelo: {
+            campo.related_model for campo in _claves_foraneas(modelo)
+            if campo.related_model in candidatos and campo.related_model is not modelo
+        }
+        for modelo in candidatos
+    }
+    ordenados = []
+    while pendientes:
+        listos = [modelo for modelo in candidatos if modelo in pendientes and not pendientes[modelo] - set(ordenados)]
+        if not listos:
+            raise ValueError('Dependencias circulares entre modelos: no se puede ordenar la carga.')
+        for modelo in listos:
+            ordenados.append(modelo)
+            del pendientes[modelo]
+    return ordenados
+
+
+def _claves_foraneas(modelo):
+    return [campo for campo in modelo._meta.concrete_fields if campo.many_to_one or campo.one_to_one]
+
+
+def _columnas(modelo):
+    return [campo.column for campo in modelo._meta.concrete_fields]
+
+
+def archivo_de(directorio, modelo):
+    """Ruta del archivo de la tabla del modelo dentro del volcado"""
+    return Path(directorio) / f'{modelo._meta.db_table}.csv'
+
+
+def _a_texto(valor):
+    if valor is None:
+        return NULO
+    if isinstance(valor, bool):
+        return '1' if valor else '0'
+    texto = str(valor)
+    if not _POR_ESCAPAR.search(texto):
+        return texto
+    return _POR_ESCAPAR.sub(lambda m: _ESCAPES[m.group()], texto)
+
+
+def _de_texto(texto):
+    if texto == NULO:
+        return None
+    if '\\' not in texto:
+        return texto
+    return _ESCAPADO.sub(lambda m: _SIN_ESCAPE.get(m.group(1), m.group(1)), texto)
+
+
+def volcar(directorio, tamano=TAMANO_BLOQUE):
+    """
+    Escribe un archivo por modelo con todas sus filas.
+
+    Las filas se leen por bloques en orden de clave primaria (una consulta
+    por bloque, sin cargar la tabla completa en memoria).
+
+    Args:
+        directorio (str): Directorio de destino (se crea si no existe)
+        tamano (int): Filas por consulta
+
+    Returns:
+        list: Pares (tabla, filas volcadas) en orden de carga
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    resumen = []
+    for modelo in modelos():
+        tabla = connection.ops.quote_name(modelo._meta.db_table)
+        columnas = _columnas(modelo)
+        clave = connection.ops.quote_name(modelo._meta.pk.column)
+        indice_clave = columnas.index(modelo._meta.pk.column)
+        seleccion = ', '.join(connection.ops.quote_name(columna) for columna in columnas)
+        filas = 0
+        with open(archivo_de(directorio, modelo), 'w', newline='', encoding='utf-8') as archivo, \
+                connection.cursor() as cursor:
+            escritor = csv.writer(archivo)
+            escritor.writerow(columnas)
+            ultima = None
+            while True:
+                if ultima is None:
+                    cursor.execute(f'SELECT {seleccion} FROM {tabla} ORDER BY {clave} LIMIT %s', [tamano])
+                else:
+                    cursor.execute(
+                        f'SELECT {seleccion} FROM {tabla} WHERE {clave} > %s ORDER BY {clave} LIMIT %s',
+                        [ultima, tamano],
+                    )
+                bloque = cursor.fetchall()
+                escritor.writerows([_a_texto(valor) for valor in fila] for fila in bloque)
+                filas += len(bloque)
+                if len(bloque) < tamano:
+                    break
+                ultima = bloque[-1][indice_clave]
+        resumen.append((modelo._meta.db_table, filas))
+    return resumen
+
+
+def modelos_en(directorio):
+    """
+    Modelos con archivo en el volcado, en orden de carga.
+
+    Raises:
+        ValueError: Si el directorio no existe o no tiene archivos de ningún modelo
+    """
+    if not Path(directorio).is_dir():
+        raise ValueError(f'No existe el directorio de datos "{directorio}".')
+    encontrados = [modelo for modelo in modelos() if archivo_de(directorio, modelo).exists()]
+    if not encontrados:
+        raise ValueError(f'"{directorio}" no contiene archivos <tabla>.csv de ningún modelo.')
+    return encontrados
+
+
+def verificar_vacias(lista):
+    """
+    Exige que las tablas a cargar no tengan filas.
+
+    Raises:
+        ValueError: Si alguna tabla ya tiene datos
+    """
+    ocupadas = [modelo._meta.db_table for modelo in lista if modelo._base_manager.exists()]
+    if ocupadas:
+        raise ValueError(
+            f'Las tablas {", ".join(ocupadas)} ya tienen datos; '
+            'vacíe la base de datos (manage.py flush) antes de cargar un volcado.'
+        )
+
+
+def _indices_de_columna(modelo, columna):
+    """Índices no únicos de una sola columna que Django creó para un campo"""
+    with connection.cursor() as cursor:
+        restricciones = connection.introspection.get_constraints(cursor, modelo._meta.db_table)
+    propios = {indice.name for indice in modelo._meta.indexes}
+    return [
+        nombre for nombre, datos in restricciones.items()
+        if datos['index'] and not datos['unique'] and not datos['primary_key']
+        and datos['columns'] == [columna] and nombre not in propios
+    ]
+
+
+def quitar_indices(lista):
+    """
+    Quita los índices que se recrean después de la carga.
+
+    Los índices de las columnas de clave foránea se quitan con su nombre
+    actual (leído por introspección) y se recrean como ``models.Index`` del
+    mismo nombre, de modo que el esquema queda igual al de las migraciones.
+    En MySQL una clave foránea necesita su índice: esas columnas conservan
+    el índice y la clave, y solo se desactiva su verificación.
+
+    Args:
+        lista (list): Modelos a cargar
+
+    Returns:
+        list: Pendientes ``(modelo, índice)`` para ``crear_indices``
+    """
+    pendientes = []
+    es_mysql = connection.vendor == 'mysql'
+    with connection.schema_editor() as editor:
+        for modelo in lista:
+            for campo in _claves_foraneas(modelo):
+                if (es_mysql and campo.db_constraint) or not campo.db_index or campo.unique:
+                    continue
+                for nombre in _indices_de_columna(modelo, campo.column):
+                    indice = models.Index(fields=[campo.name], name=nombre)
+                    editor.remove_index(modelo, indice)
+                    pendientes.append((modelo, indice))
+            for indice in modelo._meta.indexes:
+                editor.remove_index(modelo, indice)
+                pendientes.append((modelo, indice))
+    return pendientes
+
+
+def crear_indices(pendientes):
+    """
+    Recrea los índices que quitó ``quitar_indices``.
+
+    El editor no se usa como contexto: al salir, el de SQLite verifica las
+    claves foráneas y, si la carga dejó claves inválidas, falla con la
+    transacción abierta. Cada índice se crea en su propia sentencia y las
+    claves se verifican aparte, con ``check_constraints``.
+    """
+    editor = connection.schema_editor()
+    for modelo, indice in pendientes:
+        editor.add_index(modelo, indice)
+
+
+def _encabezado(modelo, ruta):
+    with open(ruta, newline='', encoding='utf-8') as archivo:
+        columnas = next(csv.reader(archivo), [])
+    esperadas = _columnas(modelo)
+    if sorted(columnas) != sorted(esperadas):
+        faltan = sorted(set(esperadas) - set(columnas))
+        sobran = sorted(set(columnas) - set(esperadas))
+        raise ValueError(
+            f'{ruta.name}: columnas distintas a las de la tabla '
+            f'(faltan: {", ".join(faltan) or "-"}; sobran: {", ".join(sobran) or "-"}).'
+        )
+    return columnas
+
+
+def _cargar_infile(modelo, ruta, columnas):
+    tabla = connection.ops.quote_name(modelo._meta.db_table)
+    lista = ', '.join(connection.ops.quote_name(columna) for columna in columnas)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {tabla} CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '\\\\' "
+            f"LINES TERMINATED BY '\\r\\n' IGNORE 1 LINES ({lista})",
+            [str(ruta.resolve())],
+        )
+        return cursor.rowcount
+
+
+def _cargar_inserts(modelo, ruta, columnas, tamano):
+    tabla = connection.ops.quote_name(modelo._meta.db_table)
+    lista = ', '.join(connection.ops.quote_name(columna) for columna in columnas)
+    fila_sql = f'({", ".join(["%s"] * len(columnas))})'
+    # El límite de parámetros por consulta de SQLite acota las filas por INSERT
+    limite = connection.features.max_query_params
+    if limite:
+        tamano = max(1, min(tamano, limite // len(columnas)))
+    filas = 0
+    with open(ruta, newline='', encoding='utf-8') as archivo, connection.cursor() as cursor:
+        lector = csv.reader(archivo)
+        next(lector)
+        bloque = []
+        for fila in lector:
+            bloque.append(fila)
+            if len(bloque) == tamano:
+                cursor.execute(
+                    f'INSERT INTO {tabla} ({lista}) VALUES {", ".join([fila_sql] * len(bloque))}',
+                    [_de_texto(valor) for fila in bloque for valor in fila],
+                )
+                filas += len(bloque)
+                bloque = []
+        if bloque:
+            cursor.execute(
+                f'INSERT INTO {tabla} ({lista}) VALUES {", ".join([fila_sql] * len(bloque))}',
+                [_de_texto(valor) for fila in bloque for valor in fila],
+            )
+            filas += len(bloque)
+    return filas
+
+
+def cargar_tabla(modelo, directorio, tamano=TAMANO_BLOQUE, infile=True):
+    """
+    Carga el archivo del modelo en su tabla en una transacción.
+
+    Args:
+        modelo: Clase del modelo
+        directorio (str): Directorio del volcado
+        tamano (int): Filas por INSERT
+        infile (bool): Intentar ``LOAD DATA LOCAL INFILE`` (solo MySQL); si el
+            servidor o la conexión no lo permiten se usan INSERT
+
+    Returns:
+        tuple: (filas cargadas, método usado: 'infile' o 'insert')
+
+    Raises:
+        ValueError: Si las columnas del archivo no son las de la tabla
+    """
+    ruta = archivo_de(directorio, modelo)
+    columnas = _encabezado(modelo, ruta)
+    if infile and connection.vendor == 'mysql':
+        try:
+            with transaction.atomic():
+                return _cargar_infile(modelo, ruta, columnas), 'infile'
+        except DatabaseError:
+            # local_infile desactivado en el servidor o en la conexión
+            pass
+    with transaction.atomic():
+        return _cargar_inserts(modelo, ruta, columnas, tamano), 'insert'
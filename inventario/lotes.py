@@ -0,0 +1,58 @@
+"""
+Lectura de lotes de movimientos en formato JSON o CSV.
+Usado por el endpoint de carga masiva y por el comando importar_movimientos.
+"""
+import csv
+import io
+import json
+
+# Columnas reconocidas en cada fila del lote
+COLUMNAS = ('codigo', 'tipo', 'cantidad')
+
+
+class LoteInvalido(ValueError):
+    """Se lanza cuando el contenido del lote no se puede interpretar"""
+
+
+def leer_lote(contenido, formato):
+    """
+    Convierte el contenido de un lote en una lista de filas.
+
+    El JSON puede ser una lista de objetos o un objeto con la clave
+    ``movimientos``. El CSV debe incluir una fila de encabezado con las
+    columnas ``codigo``, ``tipo`` y ``cantidad``.
+
+    Args:
+        contenido (str): Texto del lote
+        formato (str): 'json' o 'csv'
+
+    Returns:
+        list: Diccionarios con las columnas de cada fila
+
+    Raises:
+        LoteInvalido: Si el contenido no corresponde al formato indicado
+    """
+    if formato == 'json':
+        try:
+            datos = json.loads(contenido)
+        except json.JSONDecodeError as exc:
+            raise LoteInvalido(f'JSON inválido: {exc}') from exc
+        if isinstance(datos, dict):
+            datos = datos.get('movimientos')
+        if not isinstance(datos, list) or not all(isinstance(fila, dict) for fila in datos):
+            raise LoteInvalido('Se esperaba una lista de movimientos.')
+        return datos
+    if formato == 'csv':
+        lector = csv.DictReader(io.StringIO(contenido))
+        faltantes = set(COLUMNAS) - set(lector.fieldnames or ())
+        if faltantes:
+            raise LoteInvalido(f'Faltan columnas en el CSV: {", ".join(sorted(faltantes))}.')
+        return list(lector)
+    raise LoteInvalido(f'Formato no soportado: "{formato}".')
+
+
+def formato_desde_content_type(content_type):
+    """Deduce el formato del lote a partir del Content-Type de la petición"""
+    if 'csv' in (content_type or ''):
+        return 'csv'
+    return 'json'
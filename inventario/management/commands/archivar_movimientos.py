@@ -0,0 +1,91 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from inventario import archivo
+
+
+class Command(BaseCommand):
+    help = (
+        'Traslada los movimientos anteriores a la fecha de corte a la tabla de archivo, '
+        'registrando antes un cierre de stock a esa fecha, y congela en archivos CSV '
+        'comprimidos los meses cerrados de la tabla de archivo'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=None,
+            help='Conserva en el historial activo los últimos N días '
+                 '(por defecto, ARCHIVO_DIAS_RETENCION)'
+        )
+        parser.add_argument(
+            '--corte',
+            help='Fecha de corte en formato ISO (inclusive); reemplaza a --dias'
+        )
+        parser.add_argument(
+            '--dias-tabla', type=int, default=None,
+            help='Congela los meses archivados que terminaron hace más de N días '
+                 '(por defecto, ARCHIVO_DIAS_TABLA)'
+        )
+        parser.add_argument(
+            '--tamano', type=int, default=archivo.TAMANO_BLOQUE,
+            help=f'Movimientos por transacción (default: {archivo.TAMANO_BLOQUE})'
+        )
+        parser.add_argument(
+            '--simular', action='store_true',
+            help='Solo informa cuántos movimientos se archivarían'
+        )
+
+    def handle(self, *args, **options):
+        if options['corte']:
+            corte = parse_datetime(options['corte'])
+            if corte is None:
+                raise CommandError(f'Fecha inválida: "{options["corte"]}"')
+            if timezone.is_naive(corte):
+                corte = timezone.make_aware(corte)
+        else:
+            if options['dias'] is not None and options['dias'] < 0:
+                raise CommandError('--dias no puede ser negativo')
+            corte = archivo.corte_por_defecto(options['dias'])
+        if options['tamano'] < 1:
+            raise CommandError('--tamano debe ser positivo')
+        if options['dias_tabla'] is not None and options['dias_tabla'] < 0:
+            raise CommandError('--dias-tabla no puede ser negativo')
+        congelar_hasta = archivo.corte_por_defecto(
+            archivo.dias_tabla() if options['dias_tabla'] is None else options['dias_tabla']
+        )
+
+        if options['simular']:
+            cantidad = archivo.pendientes(corte).count()
+            self.stdout.write(
+                f'{cantidad} movimientos hasta {timezone.localtime(corte):%Y-%m-%d %H:%M} se archivarían'
+            )
+            cantidad = archivo.pendientes_de_congelar(congelar_hasta).count()
+            self.stdout.write(
+                f'Hasta {cantidad} movimientos archivados de meses anteriores a '
+                f'{timezone.localtime(congelar_hasta):%Y-%m} se congelarían'
+            )
+            return
+
+        inicio = time.perf_counter()
+        try:
+            cierres, archivados = archivo.archivar(corte, tamano=options['tamano'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        segundos = time.perf_counter() - inicio
+        if cierres:
+            self.stdout.write(f'Cierre registrado para {cierres} insumos')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {archivados} movimientos hasta {timezone.localtime(corte):%Y-%m-%d %H:%M} '
+            f'archivados en {segundos:.1f} s'
+        ))
+
+        inicio = time.perf_counter()
+        meses, congelados = archivo.congelar(congelar_hasta, tamano=options['tamano'])
+        if meses:
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {meses} meses ({congelados} movimientos) congelados en {archivo.directorio()} '
+                f'en {time.perf_counter() - inicio:.1f} s'
+            ))
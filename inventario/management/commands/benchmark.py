@@ -0,0 +1,167 @@
+import json
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from inventario import benchmark
+from inventario.models import Insumo
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta el benchmark de extremo a extremo de todas las rutas de inventario '
+        'sobre una base de datos de prueba poblada a la escala indicada'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escala', choices=sorted(benchmark.ESCALAS), default='pequena',
+            help='Tamaño de los datos generados (por defecto: pequena)'
+        )
+        parser.add_argument('--insumos', type=int, help='Reemplaza la cantidad de insumos de la escala')
+        parser.add_argument('--movimientos', type=int, help='Reemplaza la cantidad de movimientos de la escala')
+        parser.add_argument('--usuarios', type=int, help='Reemplaza la cantidad de usuarios de la escala')
+        parser.add_argument('--seed', type=int, default=42, help='Semilla de los datos generados')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Iteraciones medidas por escenario')
+        parser.add_argument('--calentamiento', type=int, default=2, help='Iteraciones previas no medidas')
+        parser.add_argument(
+            '--escenario', action='append', dest='escenarios',
+            help='Ejecuta solo este escenario (se puede repetir)'
+        )
+        parser.add_argument(
+            '--salida', default='benchmark.json',
+            help='Archivo JSON de resultados (por defecto: benchmark.json)'
+        )
+        parser.add_argument(
+            '--comparar',
+            help='JSON de una ejecución anterior; falla si hay regresiones'
+        )
+        parser.add_argument(
+            '--umbral', type=float, default=0.2,
+            help='Empeoramiento tolerado de latencia al comparar (por defecto 0.2 = 20%%)'
+        )
+        parser.add_argument(
+            '--metrica', choices=['p50_ms', 'p90_ms', 'p99_ms', 'media_ms'], default='p50_ms',
+            help='Métrica de latencia usada al comparar (por defecto p50_ms)'
+        )
+        parser.add_argument(
+            '--sesiones', action='store_true',
+            help='Mide además /insumos/ con cada modo de sesión (SESSION_MODO)'
+        )
+        parser.add_argument(
+            '--conexiones', action='store_true',
+            help='Mide además los listados con conexión persistente y con una conexión por petición'
+        )
+        parser.add_argument(
+            '--idempotencia', action='store_true',
+            help='Mide además el registro de movimientos sin clave, con clave de idempotencia y reenviado'
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Conserva la base de datos de prueba poblada entre ejecuciones'
+        )
+
+    def handle(self, *args, **options):
+        insumos, movimientos, usuarios = benchmark.ESCALAS[options['escala']]
+        insumos = options['insumos'] or insumos
+        movimientos = options['movimientos'] if options['movimientos'] is not None else movimientos
+        usuarios = options['usuarios'] or usuarios
+
+        base = None
+        if options['comparar']:
+            try:
+                base = json.loads(Path(options['comparar']).read_text(encoding='utf-8'))
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'No se pudo leer "{options["comparar"]}": {exc}')
+
+        setup_test_environment()
+        configuracion = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            if not Insumo.objects.exists():
+                self.stdout.write(self.style.WARNING(
+                    f'Poblando base de prueba: {insumos} insumos, {movimientos} movimientos...'
+                ))
+                call_command(
+                    'populate_db', insumos=insumos, movimientos=movimientos, users=usuarios,
+                    seed=options['seed'], stdout=self.stdout,
+                )
+            meta = benchmark.metadatos(escala=options['escala'], seed=options['seed'])
+            escenarios = benchmark.ejecutar(
+                repeticiones=max(1, options['repeticiones']),
+                calentamiento=max(0, options['calentamiento']),
+                escenarios=options['escenarios'],
+            )
+            conexiones = None
+            if options['conexiones']:
+                conexiones = benchmark.comparar_conexiones(
+                    repeticiones=max(1, options['repeticiones']),
+                    calentamiento=max(0, options['calentamiento']),
+                )
+            sesiones = None
+            if options['sesiones']:
+                sesiones = benchmark.comparar_sesiones(
+                    repeticiones=max(1, options['repeticiones']),
+                    calentamiento=max(0, options['calentamiento']),
+                )
+            idempotencia = None
+            if options['idempotencia']:
+                idempotencia = benchmark.comparar_idempotencia(
+                    repeticiones=max(1, options['repeticiones']),
+                    calentamiento=max(0, options['calentamiento']),
+                )
+        finally:
+            teardown_databases(configuracion, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        resultados = {'meta': meta, 'escenarios': escenarios}
+        if conexiones is not None:
+            resultados['conexiones'] = conexiones
+        if sesiones is not None:
+            resultados['sesiones'] = sesiones
+        if idempotencia is not None:
+            resultados['idempotencia'] = idempotencia
+        Path(options['salida']).write_text(
+            json.dumps(resultados, indent=2, ensure_ascii=False), encoding='utf-8'
+        )
+
+        self.stdout.write(f'\n{"escenario":<28}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}{"SQL":>6}{"bytes":>10}')
+        for nombre, m in escenarios.items():
+            self.stdout.write(
+                f'{nombre:<28}{m["p50_ms"]:>10.2f}{m["p90_ms"]:>10.2f}{m["p99_ms"]:>10.2f}'
+                f'{m["consultas"]:>6}{m["bytes"]:>10}'
+            )
+        if conexiones is not None:
+            self.stdout.write(f'\n{"conexión":<32}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}{"Δ p50":>8}')
+            for nombre, m in conexiones.items():
+                diferencia = m.get('diferencia_p50_ms')
+                self.stdout.write(
+                    f'{nombre:<32}{m["p50_ms"]:>10.2f}{m["p90_ms"]:>10.2f}{m["p99_ms"]:>10.2f}'
+                    f'{"" if diferencia is None else f"{diferencia:+.2f}":>8}'
+                )
+        if sesiones is not None:
+            self.stdout.write(f'\n{"sesión (/insumos/)":<28}{"p50 ms":>10}{"p90 ms":>10}{"SQL":>6}{"ahorro":>8}')
+            for modo, m in sesiones.items():
+                self.stdout.write(
+                    f'{modo:<28}{m["p50_ms"]:>10.2f}{m["p90_ms"]:>10.2f}'
+                    f'{m["consultas"]:>6}{m["consultas_ahorradas"]:>8}'
+                )
+        if idempotencia is not None:
+            self.stdout.write(f'\n{"movimiento (POST)":<28}{"p50 ms":>10}{"p90 ms":>10}{"SQL":>6}{"Δ p50":>8}')
+            for modo, m in idempotencia.items():
+                self.stdout.write(
+                    f'{modo:<28}{m["p50_ms"]:>10.2f}{m["p90_ms"]:>10.2f}'
+                    f'{m["consultas"]:>6}{m["diferencia_p50_ms"]:>+8.2f}'
+                )
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Resultados guardados en {options["salida"]}'))
+
+        if base is not None:
+            regresiones = benchmark.comparar(
+                resultados, base, umbral=options['umbral'], metrica=options['metrica']
+            )
+            if regresiones:
+                raise CommandError('Regresiones detectadas:\n' + '\n'.join(regresiones))
+            self.stdout.write(self.style.SUCCESS(f'✓ Sin regresiones respecto de {options["comparar"]}'))
@@ -0,0 +1,83 @@
+import json
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from inventario import benchmark, benchmark_concurrencia
+from inventario.models import Insumo
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara peticiones por segundo y memoria por petición de los listados '
+        'bajo WSGI (grupo de hilos) y ASGI (event loop) con muchos clientes lentos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escala', choices=sorted(benchmark.ESCALAS), default='pequena',
+            help='Tamaño de los datos generados (por defecto: pequena)'
+        )
+        parser.add_argument('--clientes', type=int, default=100, help='Peticiones simultáneas por medición')
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos del servidor WSGI simulado')
+        parser.add_argument(
+            '--lentitud', type=float, default=0.5,
+            help='Segundos que tarda cada cliente en recibir la respuesta (por defecto 0.5)'
+        )
+        parser.add_argument(
+            '--vista', action='append', dest='vistas',
+            choices=[nombre for nombre, _, _ in benchmark_concurrencia.VISTAS],
+            help='Mide solo esta vista (se puede repetir)'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Semilla de los datos generados')
+        parser.add_argument(
+            '--salida', default='benchmark_concurrencia.json',
+            help='Archivo JSON de resultados (por defecto: benchmark_concurrencia.json)'
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Conserva la base de datos de prueba poblada entre ejecuciones'
+        )
+
+    def handle(self, *args, **options):
+        insumos, movimientos, usuarios = benchmark.ESCALAS[options['escala']]
+
+        setup_test_environment()
+        configuracion = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            if not Insumo.objects.exists():
+                self.stdout.write(self.style.WARNING(
+                    f'Poblando base de prueba: {insumos} insumos, {movimientos} movimientos...'
+                ))
+                call_command(
+                    'populate_db', insumos=insumos, movimientos=movimientos, users=usuarios,
+                    seed=options['seed'], stdout=self.stdout,
+                )
+            meta = benchmark.metadatos(escala=options['escala'], seed=options['seed'])
+            vistas = benchmark_concurrencia.ejecutar(
+                clientes=max(1, options['clientes']),
+                hilos=max(1, options['hilos']),
+                lentitud=max(0.0, options['lentitud']),
+                vistas=options['vistas'],
+            )
+        finally:
+            teardown_databases(configuracion, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        meta.update(clientes=options['clientes'], hilos=options['hilos'], lentitud=options['lentitud'])
+        Path(options['salida']).write_text(
+            json.dumps({'meta': meta, 'vistas': vistas}, indent=2, ensure_ascii=False), encoding='utf-8'
+        )
+
+        self.stdout.write(f'\n{"vista":<18}{"modo":<22}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"KB/req":>10}')
+        for nombre, modos in vistas.items():
+            for modo, m in modos.items():
+                self.stdout.write(
+                    f'{nombre:<18}{modo:<22}{m["peticiones_por_segundo"]:>10.1f}'
+                    f'{m["p50_ms"]:>10.1f}{m["p99_ms"]:>10.1f}{m["kb_por_peticion"]:>10.1f}'
+                )
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Resultados guardados en {options["salida"]}'))
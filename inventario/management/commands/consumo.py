@@ -0,0 +1,75 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario import consumo
+
+
+class Command(BaseCommand):
+    help = (
+        'Actualiza los agregados diarios de consumo y lista el pronóstico '
+        'de días hasta agotar el stock de cada insumo'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reconstruir', action='store_true',
+            help='Rehace todos los agregados desde el historial en vez de actualizarlos'
+        )
+        parser.add_argument(
+            '--ventana', type=int, default=28,
+            help='Días de historial considerados (default: 28)'
+        )
+        parser.add_argument(
+            '--corta', type=int, default=7,
+            help='Días de la media móvil corta (default: 7)'
+        )
+        parser.add_argument(
+            '--plazo', type=int, default=7,
+            help='Días de reposición; con menos días de stock se marca el insumo (default: 7)'
+        )
+        parser.add_argument(
+            '--limite', type=int, default=None,
+            help='Muestra solo los N insumos más próximos al quiebre'
+        )
+        parser.add_argument(
+            '--csv', action='store_true',
+            help='Escribe el pronóstico en formato CSV'
+        )
+
+    def handle(self, *args, **options):
+        if options['ventana'] < 1 or options['corta'] < 1 or options['plazo'] < 0:
+            raise CommandError('--ventana y --corta deben ser positivos y --plazo no negativo')
+
+        if options['reconstruir']:
+            escritas = consumo.reconstruir()
+            self.stderr.write(f'Agregados reconstruidos: {escritas} filas')
+        else:
+            dias = consumo.actualizar()
+            self.stderr.write(f'Agregados actualizados: {dias} días recalculados')
+
+        filas = consumo.pronosticar(
+            ventana=options['ventana'], corta=options['corta'], plazo=options['plazo'],
+            limite=options['limite'],
+        )
+
+        if options['csv']:
+            campos = [
+                'codigo', 'nombre', 'stock', 'stock_minimo', 'media_corta', 'media_larga',
+                'consumo_semanal', 'dias_hasta_quiebre', 'fecha_quiebre', 'reponer',
+            ]
+            escritor = csv.DictWriter(self.stdout, fieldnames=campos, extrasaction='ignore')
+            escritor.writeheader()
+            escritor.writerows(filas)
+            return
+
+        for fila in filas:
+            dias = fila['dias_hasta_quiebre']
+            estilo = self.style.ERROR if fila['reponer'] else self.style.SUCCESS
+            self.stdout.write(estilo(
+                f"{fila['codigo']:<15} {fila['nombre'][:40]:<40} stock={fila['stock']:<6} "
+                f"consumo/semana={fila['consumo_semanal']:<8} "
+                f"días={'-' if dias is None else dias:<7} {fila['fecha_quiebre'] or ''}"
+            ))
+        reponer = sum(1 for fila in filas if fila['reponer'])
+        self.stdout.write(f'\n{len(filas)} insumos con consumo, {reponer} para reponer')
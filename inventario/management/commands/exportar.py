@@ -0,0 +1,97 @@
+import itertools
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.exportacion import (
+    COLUMNAS_MOVIMIENTO, FormatoNoDisponible,
+    generar_csv, generar_xlsx, recorrer_consultas,
+)
+from inventario.forms import InsumoFiltroForm, MovimientoFiltroForm
+from inventario.models import Insumo, Movimiento, MovimientoArchivado, Ubicacion
+
+
+class Command(BaseCommand):
+    help = 'Exporta insumos o movimientos a CSV o XLSX con los mismos filtros de los listados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('modelo', choices=['insumos', 'movimientos'])
+        parser.add_argument('--formato', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument(
+            '--salida',
+            help='Archivo de destino (por defecto, salida estándar; obligatorio para XLSX)'
+        )
+        parser.add_argument('--as-of', help='Insumos: agrega el stock al final de este día (AAAA-MM-DD)')
+        parser.add_argument('--q', help='Insumos: búsqueda por código, nombre o descripción')
+        parser.add_argument('--ubicacion', help='Insumos: nombre del almacén; agrega el stock en ese almacén')
+        parser.add_argument('--insumo', help='Movimientos: código del insumo')
+        parser.add_argument('--tipo', choices=['ENTRADA', 'SALIDA', 'TRASPASO'], help='Movimientos: tipo')
+        parser.add_argument('--usuario', help='Movimientos: nombre de usuario')
+        parser.add_argument('--desde', help='Movimientos: fecha inicial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', help='Movimientos: fecha final (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        if options['modelo'] == 'insumos':
+            columnas, querysets, previas = self.insumos(options)
+        else:
+            columnas, querysets, previas = self.movimientos(options)
+        filas = itertools.chain(previas, recorrer_consultas(querysets, [campo for _, campo in columnas]))
+
+        if options['formato'] == 'xlsx':
+            if not options['salida']:
+                raise CommandError('La exportación a XLSX requiere --salida')
+            try:
+                contenido = generar_xlsx(columnas, filas, titulo=options['modelo'].capitalize())
+            except FormatoNoDisponible as exc:
+                raise CommandError(str(exc))
+            with contenido, open(options['salida'], 'wb') as destino:
+                while bloque := contenido.read(1024 * 1024):
+                    destino.write(bloque)
+        elif options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8', newline='') as destino:
+                destino.writelines(generar_csv(columnas, filas))
+        else:
+            for linea in generar_csv(columnas, filas):
+                self.stdout.write(linea, ending='')
+
+        if options['salida']:
+            self.stderr.write(self.style.SUCCESS(f'✓ Exportación escrita en {options["salida"]}'))
+
+    def insumos(self, options):
+        datos = {'as_of': options['as_of'], 'q': options['q']}
+        if options['ubicacion']:
+            ubicacion = Ubicacion.objects.filter(nombre=options['ubicacion']).first()
+            if ubicacion is None:
+                raise CommandError(f'No existe el almacén "{options["ubicacion"]}"')
+            datos['ubicacion'] = ubicacion.pk
+        form = InsumoFiltroForm(datos)
+        if not form.is_valid():
+            raise CommandError(f'Filtros inválidos: {form.errors.as_text()}')
+        columnas, queryset = form.exportacion()
+        return columnas, [queryset], ()
+
+    def movimientos(self, options):
+        datos = {
+            'tipo': options['tipo'],
+            'fecha_desde': options['desde'],
+            'fecha_hasta': options['hasta'],
+        }
+        if options['insumo']:
+            insumo = Insumo.objects.filter(codigo=options['insumo']).first()
+            if insumo is None:
+                raise CommandError(f'No existe el insumo "{options["insumo"]}"')
+            datos['insumo'] = insumo.pk
+        if options['usuario']:
+            usuario = get_user_model().objects.filter(username=options['usuario']).first()
+            if usuario is None:
+                raise CommandError(f'No existe el usuario "{options["usuario"]}"')
+            datos['usuario'] = usuario.pk
+        form = MovimientoFiltroForm(datos)
+        if not form.is_valid():
+            raise CommandError(f'Filtros inválidos: {form.errors.as_text()}')
+        # El archivo primero (los periodos congelados, luego la tabla): sus
+        # ids son anteriores a los del historial activo
+        return COLUMNAS_MOVIMIENTO, [
+            form.filtrar(MovimientoArchivado.objects.all()),
+            form.filtrar(Movimiento.objects.all()),
+        ], form.congelados([campo for _, campo in COLUMNAS_MOVIMIENTO])
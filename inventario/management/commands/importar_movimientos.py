@@ -0,0 +1,62 @@
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.lotes import leer_lote, LoteInvalido
+from inventario.services import registrar_lote
+
+
+class Command(BaseCommand):
+    help = 'Importa movimientos de stock desde un archivo JSON o CSV en lotes transaccionales'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta al archivo .json o .csv')
+        parser.add_argument(
+            '--formato', choices=['json', 'csv'],
+            help='Formato del archivo (por defecto se deduce de la extensión)'
+        )
+        parser.add_argument(
+            '--usuario',
+            help='Nombre del usuario responsable de los movimientos'
+        )
+        parser.add_argument(
+            '--tamano-lote', type=int, default=5000,
+            help='Filas registradas por transacción (por defecto 5000)'
+        )
+
+    def handle(self, *args, **options):
+        ruta = Path(options['archivo'])
+        if not ruta.exists():
+            raise CommandError(f'No existe el archivo "{ruta}"')
+        formato = options['formato'] or ruta.suffix.lstrip('.').lower()
+
+        usuario = None
+        if options['usuario']:
+            User = get_user_model()
+            try:
+                usuario = User.objects.get(username=options['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f'No existe el usuario "{options["usuario"]}"')
+
+        try:
+            filas = leer_lote(ruta.read_text(encoding='utf-8-sig'), formato)
+        except LoteInvalido as exc:
+            raise CommandError(str(exc))
+
+        tamano = max(1, options['tamano_lote'])
+        creados = 0
+        rechazados = []
+        for inicio in range(0, len(filas), tamano):
+            resultado = registrar_lote(filas[inicio:inicio + tamano], usuario=usuario)
+            creados += len(resultado.creados)
+            # Los números de fila se reportan respecto del archivo completo
+            for rechazo in resultado.rechazados:
+                rechazados.append({**rechazo, 'fila': rechazo['fila'] + inicio})
+            self.stdout.write(f'  Procesadas {min(inicio + tamano, len(filas))}/{len(filas)} filas')
+
+        for rechazo in rechazados:
+            self.stdout.write(self.style.ERROR(f'✗ Fila {rechazo["fila"]}: {rechazo["error"]}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {creados} movimientos importados, {len(rechazados)} filas rechazadas'
+        ))
@@ -0,0 +1,96 @@
+import time
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection
+
+from inventario import cambios, inicializacion
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea el esquema con las migraciones y, con --datos, carga un volcado de '
+        'volcar_datos creando los índices después de la carga'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--datos',
+            help='Directorio con un archivo <tabla>.csv por modelo (generado con volcar_datos)'
+        )
+        parser.add_argument(
+            '--tamano', type=int, default=inicializacion.TAMANO_BLOQUE,
+            help=f'Filas por INSERT (default: {inicializacion.TAMANO_BLOQUE})'
+        )
+        parser.add_argument(
+            '--sin-infile', action='store_true',
+            help='Carga con INSERT de varias filas aunque MySQL admita LOAD DATA LOCAL INFILE'
+        )
+
+    @contextmanager
+    def fase(self, nombre):
+        """Informa la duración de una fase de la inicialización"""
+        inicio = time.perf_counter()
+        yield
+        self.tiempos.append((nombre, time.perf_counter() - inicio))
+        self.stdout.write(f'✓ {nombre}: {self.tiempos[-1][1]:.2f} s')
+
+    def handle(self, *args, **options):
+        if options['tamano'] < 1:
+            raise CommandError('--tamano debe ser positivo')
+        self.tiempos = []
+        inicio = time.perf_counter()
+
+        with self.fase('Esquema (migraciones)'):
+            call_command('migrate', interactive=False, verbosity=0)
+
+        if options['datos']:
+            try:
+                modelos = inicializacion.modelos_en(options['datos'])
+                inicializacion.verificar_vacias(modelos)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+            with self.fase('Quitar índices'):
+                pendientes = inicializacion.quitar_indices(modelos)
+
+            try:
+                # Las claves foráneas se mantienen: se desactiva su
+                # verificación y se valida todo al final
+                with self.fase('Carga de datos'), connection.constraint_checks_disabled():
+                    for modelo in modelos:
+                        desde = time.perf_counter()
+                        filas, metodo = inicializacion.cargar_tabla(
+                            modelo, options['datos'], tamano=options['tamano'],
+                            infile=not options['sin_infile'],
+                        )
+                        self.stdout.write(
+                            f'  {modelo._meta.db_table:<35} {filas:>10} filas '
+                            f'({metodo}, {time.perf_counter() - desde:.2f} s)'
+                        )
+            except Exception as exc:
+                # Los índices se recrean antes de informar el error (si eso
+                # también falla, el error original queda encadenado): el
+                # esquema vuelve a ser el de las migraciones y basta con
+                # vaciar las tablas para reintentar
+                inicializacion.crear_indices(pendientes)
+                mensaje = str(exc) if isinstance(exc, ValueError) else f'La carga falló: {exc}'
+                raise CommandError(f'{mensaje} Vacíe la base de datos (manage.py flush) y reintente.') from exc
+
+            with self.fase('Crear índices'):
+                inicializacion.crear_indices(pendientes)
+
+            with self.fase('Verificar claves foráneas'):
+                try:
+                    connection.check_constraints(table_names=[modelo._meta.db_table for modelo in modelos])
+                except IntegrityError as exc:
+                    raise CommandError(
+                        f'El volcado tiene claves foráneas inválidas: {exc} '
+                        'Vacíe la base de datos (manage.py flush), corrija el volcado y reintente.'
+                    ) from exc
+            cambios.registrar_cambio(insumos=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Base de datos inicializada en {time.perf_counter() - inicio:.2f} s'
+        ))
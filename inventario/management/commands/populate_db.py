@@ -1,13 +1,58 @@
-from django.core.management.base import BaseCommand
+import multiprocessing
+import os
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
 from inventario.models import Insumo, Movimiento
+from inventario import alertas, cambios, generador, reconciliacion, ubicaciones
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.utils import timezone
 from datetime import timedelta
 
 class Command(BaseCommand):
-    help = 'Pobla la base de datos con datos de ejemplo para Insumo y Movimiento'
+    help = (
+        'Pobla la base de datos con datos de ejemplo para Insumo y Movimiento. '
+        'Con --insumos genera datos sintéticos de alto volumen para pruebas de carga '
+        '(ej: --insumos 100000 --movimientos 20000000 --users 500 --seed 42)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--insumos', type=int,
+            help='Modo escalable: cantidad de insumos a generar'
+        )
+        parser.add_argument(
+            '--movimientos', type=int, default=0,
+            help='Modo escalable: cantidad total de movimientos a generar'
+        )
+        parser.add_argument(
+            '--users', type=int, default=10,
+            help='Modo escalable: cantidad de usuarios a generar (por defecto 10)'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help='Semilla para que los datos generados sean reproducibles (por defecto 42)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Filas por sentencia INSERT (por defecto 5000)'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Procesos que generan movimientos en paralelo (por defecto, uno por CPU)'
+        )
+        parser.add_argument(
+            '--dias', type=int, default=365,
+            help='Días de historial que abarcan los movimientos (por defecto 365)'
+        )
 
     def handle(self, *args, **options):
+        if options['insumos']:
+            return self.poblar_volumen(options)
+
         User = get_user_model()
         
         # Crear usuarios de prueba
@@ -176,12 +221,26 @@ class Command(BaseCommand):
             ]
             
             for mov_data in movimientos_data:
-                movimiento, created = Movimiento.objects.get_or_create(**mov_data)
-                if created:
-                    self.stdout.write(self.style.SUCCESS(
-                        f'✓ Movimiento {mov_data["tipo"]} de {mov_data["cantidad"]} unidades '
-                        f'para "{mov_data["insumo"].nombre}"'
-                    ))
+                fecha = mov_data.pop('fecha')
+                movimiento = Movimiento.objects.create(**mov_data)
+                # ``fecha`` se asigna al crear: se lleva a la fecha del ejemplo
+                Movimiento.objects.filter(pk=movimiento.pk).update(fecha=fecha)
+                self.stdout.write(self.style.SUCCESS(
+                    f'✓ Movimiento {mov_data["tipo"]} de {mov_data["cantidad"]} unidades '
+                    f'para "{mov_data["insumo"].nombre}"'
+                ))
+            
+            # El stock de los insumos de ejemplo es el saldo después de los
+            # movimientos: la diferencia entra al historial como stock
+            # inicial, anterior al primer movimiento
+            reconciliacion.reconciliar(ajustar=True)
+            Movimiento.objects.filter(ajuste=True, insumo__in=insumos_creados).update(
+                fecha=timezone.now() - timedelta(days=31)
+            )
+        
+        # Almacenes según el texto de ubicación y stock inicial en cada uno
+        ubicaciones.asignar_almacenes()
+        ubicaciones.sincronizar()
         
         # Resumen final
         self.stdout.write(self.style.SUCCESS('\n' + '='*60))
@@ -195,3 +254,102 @@ class Command(BaseCommand):
         self.stdout.write('Superusuario: admin / admin123')
         self.stdout.write('Usuario prueba: testuser / testpass')
         self.stdout.write('Operador: operador / operador123')
+
+
+    def poblar_volumen(self, options):
+        """
+        Genera datos sintéticos deterministas de alto volumen.
+        
+        Crea usuarios e insumos con ``bulk_create`` y reparte la generación
+        de movimientos en tramos de insumos que se procesan en paralelo. Cada
+        tramo deja ``stock_actual`` igual al saldo de su historial.
+        """
+        User = get_user_model()
+        cantidad_insumos = options['insumos']
+        semilla = options['seed']
+        lote = max(1, options['batch_size'])
+        workers = max(1, options['workers'])
+        if connection.vendor == 'sqlite' and workers > 1:
+            # SQLite admite un solo escritor a la vez
+            self.stdout.write(self.style.WARNING('SQLite detectado: se usará un solo proceso'))
+            workers = 1
+
+        if Insumo.objects.filter(codigo=generador.codigo_insumo(0)).exists():
+            raise CommandError(
+                'Ya existen insumos generados en esta base de datos; '
+                'vacíela (manage.py flush) antes de generar nuevamente.'
+            )
+        inicio = time.perf_counter()
+
+        # Usuarios: una sola contraseña hasheada para todos (el hash es lento)
+        self.stdout.write(self.style.WARNING(f'Creando {options["users"]} usuarios...'))
+        clave = make_password('carga123')
+        User.objects.bulk_create(
+            [
+                User(username=f'{generador.PREFIJO_USUARIO}{i:05d}', password=clave)
+                for i in range(options['users'])
+            ],
+            batch_size=lote,
+            ignore_conflicts=True,
+        )
+        usuarios = list(
+            User.objects.filter(username__startswith=generador.PREFIJO_USUARIO)
+            .order_by('username')
+            .values_list('pk', flat=True)[:options['users']]
+        )
+
+        self.stdout.write(self.style.WARNING(f'Creando {cantidad_insumos} insumos...'))
+        for desde in range(0, cantidad_insumos, lote):
+            hasta = min(desde + lote, cantidad_insumos)
+            Insumo.objects.bulk_create(
+                [Insumo(**generador.datos_insumo(i, semilla)) for i in range(desde, hasta)]
+            )
+
+        cantidades = generador.repartir(options['movimientos'], cantidad_insumos, semilla)
+        tramo = max(1, min(1000, cantidad_insumos // (workers * 4) or 1))
+        fin = timezone.now()
+        tareas = [
+            {
+                'inicio': desde,
+                'cantidades': cantidades[desde:desde + tramo],
+                'usuarios': usuarios,
+                'semilla': semilla,
+                'fin': fin,
+                'dias': options['dias'],
+                'lote': lote,
+            }
+            for desde in range(0, cantidad_insumos, tramo)
+        ]
+
+        self.stdout.write(self.style.WARNING(
+            f'Creando {options["movimientos"]} movimientos con {workers} procesos...'
+        ))
+        creados = 0
+        if workers == 1:
+            for tarea in tareas:
+                creados += generador.generar_tramo(tarea)
+                self.stdout.write(f'  {creados}/{options["movimientos"]} movimientos', ending='\r')
+        else:
+            # Los procesos hijos no deben heredar conexiones abiertas
+            connections.close_all()
+            with multiprocessing.Pool(workers, initializer=django.setup) as pool:
+                for cantidad in pool.imap_unordered(generador.generar_tramo_en_proceso, tareas):
+                    creados += cantidad
+                    self.stdout.write(
+                        f'  {creados}/{options["movimientos"]} movimientos', ending='\r'
+                    )
+
+        # La carga usa bulk_create, que no emite señales
+        cambios.registrar_cambio(insumos=True)
+        alertas.recalcular()
+        ubicaciones.asignar_almacenes()
+        ubicaciones.sincronizar()
+        duracion = time.perf_counter() - inicio
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(usuarios)} usuarios, {cantidad_insumos} insumos y {creados} movimientos '
+            f'generados en {duracion:.1f}s ({creados / max(duracion, 1e-9):.0f} movimientos/s)'
+        ))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write('Contraseña de los usuarios generados: carga123')
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario import idempotencia
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina las claves de idempotencia vencidas (IDEMPOTENCIA_TTL_HORAS), por '
+        'bloques y en transacciones cortas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamano', type=int, default=idempotencia.TAMANO_BLOQUE,
+            help=f'Claves eliminadas por transacción (default: {idempotencia.TAMANO_BLOQUE})'
+        )
+        parser.add_argument(
+            '--simular', action='store_true',
+            help='Solo informa cuántas claves vencidas hay'
+        )
+
+    def handle(self, *args, **options):
+        if options['tamano'] < 1:
+            raise CommandError('--tamano debe ser positivo')
+
+        if options['simular']:
+            self.stdout.write(f'{idempotencia.vencidas().count()} claves vencidas se eliminarían')
+            return
+
+        inicio = time.perf_counter()
+        eliminadas = idempotencia.purgar(tamano=options['tamano'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {eliminadas} claves vencidas eliminadas en {time.perf_counter() - inicio:.1f} s'
+        ))
@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario import sesiones
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina de la tabla django_session las sesiones vencidas, por bloques '
+        'de claves y en transacciones cortas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamano', type=int, default=sesiones.TAMANO_BLOQUE,
+            help=f'Sesiones eliminadas por transacción (default: {sesiones.TAMANO_BLOQUE})'
+        )
+        parser.add_argument(
+            '--pausa', type=float, default=0,
+            help='Segundos de espera entre bloques (default: 0)'
+        )
+        parser.add_argument(
+            '--simular', action='store_true',
+            help='Solo informa cuántas sesiones vencidas hay'
+        )
+
+    def handle(self, *args, **options):
+        if options['tamano'] < 1:
+            raise CommandError('--tamano debe ser positivo')
+        if options['pausa'] < 0:
+            raise CommandError('--pausa no puede ser negativa')
+        if not sesiones.usa_tabla():
+            # Filas que quedaron de cuando se usaba la tabla
+            self.stdout.write(
+                f'{settings.SESSION_ENGINE}: las sesiones nuevas no se guardan en la tabla'
+            )
+
+        if options['simular']:
+            self.stdout.write(f'{sesiones.vencidas().count()} sesiones vencidas se eliminarían')
+            return
+
+        inicio = time.perf_counter()
+        eliminadas = sesiones.purgar(tamano=options['tamano'], pausa=options['pausa'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {eliminadas} sesiones vencidas eliminadas en {time.perf_counter() - inicio:.1f} s'
+        ))
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+
+from inventario.models import Insumo
+from inventario.reconciliacion import reconciliar, tomar_cierre
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el stock actual de cada insumo con el historial de movimientos '
+        '(último cierre + movimientos posteriores) y opcionalmente lo corrige'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cierre', action='store_true',
+            help='Registra un nuevo cierre de stock antes de reconciliar'
+        )
+        parser.add_argument(
+            '--fecha-cierre',
+            help='Fecha de corte del cierre en formato ISO (por defecto, ahora)'
+        )
+        parser.add_argument(
+            '--reparar', action='store_true',
+            help='Corrige stock_actual con el saldo según el historial (salvo saldos negativos)'
+        )
+        parser.add_argument(
+            '--ajustar', action='store_true',
+            help='Registra las diferencias en el historial como movimientos de ajuste'
+        )
+
+    def handle(self, *args, **options):
+        if options['reparar'] and options['ajustar']:
+            raise CommandError('Use --reparar o --ajustar, no ambos')
+        if options['cierre']:
+            fecha = None
+            if options['fecha_cierre']:
+                fecha = parse_datetime(options['fecha_cierre'])
+                if fecha is None:
+                    raise CommandError(f'Fecha inválida: "{options["fecha_cierre"]}"')
+                if timezone.is_naive(fecha):
+                    fecha = timezone.make_aware(fecha)
+            creados = tomar_cierre(fecha)
+            self.stdout.write(self.style.SUCCESS(f'✓ Cierre registrado para {creados} insumos'))
+
+        discrepancias = reconciliar(reparar=options['reparar'], ajustar=options['ajustar'])
+        if not discrepancias:
+            self.stdout.write(self.style.SUCCESS('✓ El stock de todos los insumos coincide con el historial'))
+            return
+
+        codigos = dict(
+            Insumo.objects.filter(pk__in=[d.insumo_id for d in discrepancias])
+            .values_list('pk', 'codigo')
+        )
+        for d in discrepancias:
+            estado = ''
+            if d.reparada:
+                estado = ' (ajuste registrado)' if options['ajustar'] else ' (reparado)'
+            elif options['reparar'] and d.stock_libro < 0:
+                estado = ' (historial negativo: use --ajustar)'
+            self.stdout.write(self.style.WARNING(
+                f'✗ {codigos.get(d.insumo_id, d.insumo_id)}: stock_actual={d.stock_actual} '
+                f'historial={d.stock_libro} diferencia={d.diferencia:+d}{estado}'
+            ))
+        reparadas = sum(1 for d in discrepancias if d.reparada)
+        self.stdout.write(
+            f'\n{len(discrepancias)} insumos con diferencias, {reparadas} reparados'
+        )
@@ -0,0 +1,54 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from inventario import alertas
+
+
+class Command(BaseCommand):
+    help = (
+        'Lista los insumos en o bajo su stock mínimo (alertas de reorden) '
+        'con las unidades faltantes para volver al nivel de reorden'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recalcular', action='store_true',
+            help='Sincroniza antes la tabla de alertas con el stock de todos los insumos'
+        )
+        parser.add_argument(
+            '--csv', action='store_true',
+            help='Escribe el reporte en formato CSV'
+        )
+
+    def handle(self, *args, **options):
+        if options['recalcular']:
+            creadas, eliminadas = alertas.recalcular()
+            self.stderr.write(f'Alertas recalculadas: {creadas} creadas, {eliminadas} eliminadas')
+
+        filas = (
+            (
+                alerta.insumo.codigo, alerta.insumo.nombre, alerta.insumo.stock_actual,
+                alerta.insumo.stock_minimo, alerta.faltante, alerta.insumo.ubicacion,
+                alerta.desde.isoformat(),
+            )
+            for alerta in alertas.activas().iterator(chunk_size=alertas.TAMANO_BLOQUE)
+        )
+        if options['csv']:
+            escritor = csv.writer(self.stdout)
+            escritor.writerow(['codigo', 'nombre', 'stock', 'stock_minimo', 'faltante', 'ubicacion', 'desde'])
+            escritor.writerows(filas)
+            return
+
+        cantidad = 0
+        for codigo, nombre, stock, minimo, faltante, ubicacion, _ in filas:
+            cantidad += 1
+            estilo = self.style.ERROR if stock <= 0 else self.style.WARNING
+            self.stdout.write(estilo(
+                f'{codigo:<15} {nombre[:40]:<40} stock={stock:<6} mínimo={minimo:<6} '
+                f'faltante={faltante:<6} {ubicacion}'
+            ))
+        if cantidad:
+            self.stdout.write(f'\n{cantidad} insumos para reponer')
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ Ningún insumo está bajo su stock mínimo'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario import inicializacion
+
+
+class Command(BaseCommand):
+    help = (
+        'Vuelca usuarios e inventario a un directorio con un archivo CSV por tabla, '
+        'para inicializar otros entornos con manage.py inicializar_bd --datos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directorio', help='Directorio de destino (se crea si no existe)')
+        parser.add_argument(
+            '--tamano', type=int, default=inicializacion.TAMANO_BLOQUE,
+            help=f'Filas por consulta (default: {inicializacion.TAMANO_BLOQUE})'
+        )
+
+    def handle(self, *args, **options):
+        if options['tamano'] < 1:
+            raise CommandError('--tamano debe ser positivo')
+
+        inicio = time.perf_counter()
+        resumen = inicializacion.volcar(options['directorio'], tamano=options['tamano'])
+        for tabla, filas in resumen:
+            self.stdout.write(f'  {tabla:<35} {filas:>10} filas')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {sum(filas for _, filas in resumen)} filas volcadas en '
+            f'{options["directorio"]} en {time.perf_counter() - inicio:.1f} s'
+        ))
@@ -0,0 +1,160 @@
+"""
+Middleware de perfilado de peticiones e instrumentación SQL.
+
+Se habilita desde ``settings.py`` (``PERFIL_HABILITADO``). Por cada petición
+mide el tiempo total, el tiempo y la cantidad de consultas SQL, las
+consultas duplicadas (misma sentencia con los mismos parámetros, síntoma
+típico de N+1) y el tiempo de renderizado de templates. Los resultados se
+envían en el encabezado ``Server-Timing`` y como una línea JSON en el
+logger ``inventario.perfil``.
+
+Opcionalmente, una fracción de las peticiones (``PERFIL_MUESTREO``) se
+ejecuta bajo ``cProfile`` y, si supera ``PERFIL_UMBRAL_LENTO_MS``, el perfil
+se guarda en ``PERFIL_DIRECTORIO`` para analizarlo con ``pstats`` o
+``snakeviz``. Con muestreo 0 el costo por petición es solo el de medir
+tiempos y contar consultas.
+
+Las consultas se capturan con ``connection.execute_wrapper``, por lo que
+no es necesario activar ``DEBUG``. En respuestas en streaming solo se mide
+hasta que la vista retorna, no el envío del contenido.
+"""
+import cProfile
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+
+logger = logging.getLogger('inventario.perfil')
+
+# Tiempo acumulado de renderizado de templates de la petición en curso
+_tiempo_plantillas = ContextVar('tiempo_plantillas', default=None)
+
+
+def _instrumentar_plantillas():
+    """Envuelve ``Template.render`` del backend de Django para medir su duración"""
+    if getattr(Template.render, '_perfilado', False):
+        return
+    render_original = Template.render
+
+    def render(self, context=None, request=None):
+        acumulado = _tiempo_plantillas.get()
+        if acumulado is None:
+            return render_original(self, context, request)
+        inicio = time.perf_counter()
+        try:
+            return render_original(self, context, request)
+        finally:
+            acumulado[0] += time.perf_counter() - inicio
+
+    render._perfilado = True
+    Template.render = render
+
+
+class _RegistroConsultas:
+    """``execute_wrapper`` que cuenta consultas, su duración y las repetidas"""
+
+    def __init__(self):
+        self.cantidad = 0
+        self.duracion = 0.0
+        self.sentencias = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duracion += time.perf_counter() - inicio
+            self.cantidad += 1
+            self.sentencias[(sql, repr(params))] += 1
+
+    @property
+    def duplicadas(self):
+        return sum(veces - 1 for veces in self.sentencias.values() if veces > 1)
+
+    def mas_repetidas(self, limite=3):
+        return [
+            {'sql': sql[:200], 'veces': veces}
+            for (sql, _), veces in self.sentencias.most_common(limite) if veces > 1
+        ]
+
+
+class PerfilMiddleware:
+    """
+    Mide cada petición y expone los resultados como ``Server-Timing`` y log.
+
+    Configuración (``settings.py``):
+        PERFIL_MUESTREO (float): Fracción de peticiones perfiladas con cProfile
+        PERFIL_UMBRAL_LENTO_MS (float): Duración desde la que se guarda el perfil
+        PERFIL_DIRECTORIO (str): Carpeta donde se guardan los perfiles
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.muestreo = float(getattr(settings, 'PERFIL_MUESTREO', 0))
+        self.umbral_lento = float(getattr(settings, 'PERFIL_UMBRAL_LENTO_MS', 500))
+        self.directorio = Path(getattr(settings, 'PERFIL_DIRECTORIO', 'perfiles'))
+        _instrumentar_plantillas()
+
+    def __call__(self, request):
+        registro = _RegistroConsultas()
+        plantillas = [0.0]
+        token = _tiempo_plantillas.set(plantillas)
+        perfil = cProfile.Profile() if self.muestreo and random.random() < self.muestreo else None
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as pila:
+                for conexion in connections.all():
+                    pila.enter_context(conexion.execute_wrapper(registro))
+                if perfil is not None:
+                    perfil.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if perfil is not None:
+                        perfil.disable()
+        finally:
+            _tiempo_plantillas.reset(token)
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        metricas = {
+            'metodo': request.method,
+            'ruta': request.path,
+            'vista': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'db_ms': round(registro.duracion * 1000, 2),
+            'consultas': registro.cantidad,
+            'duplicadas': registro.duplicadas,
+            'plantilla_ms': round(plantillas[0] * 1000, 2),
+        }
+        if registro.duplicadas:
+            metricas['mas_repetidas'] = registro.mas_repetidas()
+        if perfil is not None and total_ms >= self.umbral_lento:
+            metricas['perfil'] = self.guardar_perfil(perfil, request)
+
+        response['Server-Timing'] = (
+            f'total;dur={metricas["total_ms"]}, '
+            f'db;dur={metricas["db_ms"]};desc="{registro.cantidad} consultas, '
+            f'{registro.duplicadas} duplicadas", '
+            f'tpl;dur={metricas["plantilla_ms"]}'
+        )
+        nivel = logging.WARNING if registro.duplicadas or total_ms >= self.umbral_lento else logging.INFO
+        logger.log(nivel, json.dumps(metricas, ensure_ascii=False))
+        return response
+
+    def guardar_perfil(self, perfil, request):
+        """Guarda el perfil de una petición lenta y retorna la ruta del archivo"""
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        nombre = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'raiz'
+        archivo = self.directorio / f'{time.strftime("%Y%m%d-%H%M%S")}_{nombre}_{time.time_ns() % 10**6}.prof'
+        perfil.dump_stats(archivo)
+        return str(archivo)
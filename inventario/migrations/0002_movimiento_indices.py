@@ -0,0 +1,147 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="insumo",
+            options={
+                "ordering": ["codigo"],
+                "verbose_name": "Insumo",
+                "verbose_name_plural": "Insumos",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="movimiento",
+            options={
+                "ordering": ["-fecha"],
+                "verbose_name": "Movimiento",
+                "verbose_name_plural": "Movimientos",
+            },
+        ),
+        migrations.AlterField(
+            model_name="insumo",
+            name="codigo",
+            field=models.CharField(
+                help_text="Código único del insumo (ej: HER-001)",
+                max_length=50,
+                unique=True,
+                verbose_name="Código",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="insumo",
+            name="descripcion",
+            field=models.TextField(
+                blank=True,
+                help_text="Descripción detallada del insumo (opcional)",
+                verbose_name="Descripción",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="insumo",
+            name="nombre",
+            field=models.CharField(
+                help_text="Nombre descriptivo del insumo",
+                max_length=100,
+                verbose_name="Nombre",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="insumo",
+            name="stock_actual",
+            field=models.IntegerField(
+                default=0,
+                help_text="Cantidad disponible en inventario",
+                verbose_name="Stock Actual",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="insumo",
+            name="ubicacion",
+            field=models.CharField(
+                help_text="Ubicación física en el almacén",
+                max_length=100,
+                verbose_name="Ubicación",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="movimiento",
+            name="cantidad",
+            field=models.PositiveIntegerField(
+                help_text="Cantidad de unidades a mover", verbose_name="Cantidad"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="movimiento",
+            name="fecha",
+            field=models.DateTimeField(
+                auto_now_add=True,
+                help_text="Fecha y hora del movimiento",
+                verbose_name="Fecha",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="movimiento",
+            name="insumo",
+            field=models.ForeignKey(
+                help_text="Insumo relacionado con este movimiento",
+                on_delete=django.db.models.deletion.CASCADE,
+                to="inventario.insumo",
+                verbose_name="Insumo",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="movimiento",
+            name="tipo",
+            field=models.CharField(
+                choices=[("ENTRADA", "Entrada"), ("SALIDA", "Salida")],
+                help_text="Tipo de movimiento: Entrada o Salida",
+                max_length=10,
+                verbose_name="Tipo de Movimiento",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="movimiento",
+            name="usuario",
+            field=models.ForeignKey(
+                help_text="Usuario que registró este movimiento",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Usuario Responsable",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movimiento",
+            index=models.Index(fields=["-fecha", "-id"], name="mov_fecha_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="movimiento",
+            index=models.Index(
+                fields=["insumo", "-fecha", "-id"], name="mov_insumo_fecha_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movimiento",
+            index=models.Index(
+                fields=["tipo", "-fecha", "-id"], name="mov_tipo_fecha_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movimiento",
+            index=models.Index(
+                fields=["usuario", "-fecha", "-id"], name="mov_usuario_fecha_idx"
+            ),
+        ),
+    ]
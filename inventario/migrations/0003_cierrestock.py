@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0002_movimiento_indices"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CierreStock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "fecha",
+                    models.DateTimeField(
+                        help_text="Incluye los movimientos registrados hasta esta fecha",
+                        verbose_name="Fecha de Corte",
+                    ),
+                ),
+                (
+                    "stock",
+                    models.IntegerField(
+                        help_text="Saldo según el historial de movimientos",
+                        verbose_name="Stock",
+                    ),
+                ),
+                (
+                    "insumo",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cierres",
+                        to="inventario.insumo",
+                        verbose_name="Insumo",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Cierre de Stock",
+                "verbose_name_plural": "Cierres de Stock",
+                "ordering": ["-fecha", "insumo"],
+                "indexes": [
+                    models.Index(
+                        fields=["fecha", "insumo"], name="cierre_fecha_insumo_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("insumo", "fecha"), name="cierre_insumo_fecha_uniq"
+                    )
+                ],
+            },
+        ),
+    ]
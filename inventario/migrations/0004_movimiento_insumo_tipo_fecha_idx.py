@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0003_cierrestock"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="movimiento",
+            index=models.Index(
+                fields=["insumo", "tipo", "fecha"], name="mov_insumo_tipo_fecha_idx"
+            ),
+        ),
+    ]
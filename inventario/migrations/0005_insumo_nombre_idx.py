@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0004_movimiento_insumo_tipo_fecha_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="insumo",
+            index=models.Index(fields=["nombre"], name="insumo_nombre_idx"),
+        ),
+    ]
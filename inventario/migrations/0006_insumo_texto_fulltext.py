@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# Índice de texto completo para la búsqueda de insumos (ver inventario/busqueda.py).
+# Solo MySQL lo soporta; en otros motores la búsqueda usa un índice en memoria.
+CREAR = (
+    "CREATE FULLTEXT INDEX insumo_texto_ft "
+    "ON inventario_insumo (codigo, nombre, descripcion)"
+)
+ELIMINAR = "DROP INDEX insumo_texto_ft ON inventario_insumo"
+
+
+def crear_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(CREAR)
+
+
+def eliminar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(ELIMINAR)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0005_insumo_nombre_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0006_insumo_texto_fulltext"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MarcaCambios",
+            fields=[
+                (
+                    "clave",
+                    models.CharField(
+                        max_length=50,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Clave",
+                    ),
+                ),
+                ("version", models.BigIntegerField(default=0, verbose_name="Versión")),
+                (
+                    "modificado",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Última Modificación",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Marca de Cambios",
+                "verbose_name_plural": "Marcas de Cambios",
+            },
+        ),
+    ]
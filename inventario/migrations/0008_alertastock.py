@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def crear_alertas(apps, schema_editor):
+    # Alertas iniciales de los insumos que ya están en o bajo su nivel de reorden
+    Insumo = apps.get_model("inventario", "Insumo")
+    AlertaStock = apps.get_model("inventario", "AlertaStock")
+    bajo_minimo = Insumo.objects.filter(stock_actual__lte=F("stock_minimo"))
+    AlertaStock.objects.bulk_create(
+        [AlertaStock(insumo_id=pk) for pk in bajo_minimo.values_list("pk", flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0007_marcacambios"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="insumo",
+            name="stock_minimo",
+            field=models.PositiveIntegerField(
+                default=10,
+                help_text="Nivel de reorden: con este stock o menos se genera una alerta",
+                verbose_name="Stock Mínimo",
+            ),
+        ),
+        migrations.CreateModel(
+            name="AlertaStock",
+            fields=[
+                (
+                    "insumo",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="alerta",
+                        serialize=False,
+                        to="inventario.insumo",
+                        verbose_name="Insumo",
+                    ),
+                ),
+                (
+                    "desde",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="En Alerta Desde",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Alerta de Stock",
+                "verbose_name_plural": "Alertas de Stock",
+                "ordering": ["desde"],
+                "indexes": [models.Index(fields=["desde"], name="alerta_desde_idx")],
+            },
+        ),
+        migrations.RunPython(crear_alertas, migrations.RunPython.noop),
+    ]
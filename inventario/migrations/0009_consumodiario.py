@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0008_alertastock"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConsumoDiario",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("dia", models.DateField(verbose_name="Día")),
+                (
+                    "tipo",
+                    models.CharField(
+                        choices=[("ENTRADA", "Entrada"), ("SALIDA", "Salida")],
+                        max_length=10,
+                        verbose_name="Tipo de Movimiento",
+                    ),
+                ),
+                (
+                    "cantidad",
+                    models.BigIntegerField(default=0, verbose_name="Cantidad"),
+                ),
+                (
+                    "movimientos",
+                    models.PositiveIntegerField(default=0, verbose_name="Movimientos"),
+                ),
+                (
+                    "insumo",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="consumos",
+                        to="inventario.insumo",
+                        verbose_name="Insumo",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Consumo Diario",
+                "verbose_name_plural": "Consumos Diarios",
+                "ordering": ["dia", "insumo", "tipo"],
+                "indexes": [
+                    models.Index(
+                        fields=["tipo", "dia", "insumo"], name="consumo_tipo_dia_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("insumo", "dia", "tipo"),
+                        name="consumo_insumo_dia_tipo_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
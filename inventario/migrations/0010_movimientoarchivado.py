@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0009_consumodiario"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MovimientoArchivado",
+            fields=[
+                (
+                    "id",
+                    models.BigIntegerField(
+                        primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "tipo",
+                    models.CharField(
+                        choices=[("ENTRADA", "Entrada"), ("SALIDA", "Salida")],
+                        max_length=10,
+                        verbose_name="Tipo de Movimiento",
+                    ),
+                ),
+                ("cantidad", models.PositiveIntegerField(verbose_name="Cantidad")),
+                ("fecha", models.DateTimeField(verbose_name="Fecha")),
+                (
+                    "insumo",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="movimientos_archivados",
+                        to="inventario.insumo",
+                        verbose_name="Insumo",
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Usuario Responsable",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Movimiento Archivado",
+                "verbose_name_plural": "Movimientos Archivados",
+                "ordering": ["-fecha"],
+                "indexes": [
+                    models.Index(fields=["-fecha", "-id"], name="arch_fecha_id_idx"),
+                    models.Index(
+                        fields=["insumo", "-fecha", "-id"], name="arch_insumo_fecha_idx"
+                    ),
+                    models.Index(
+                        fields=["tipo", "-fecha", "-id"], name="arch_tipo_fecha_idx"
+                    ),
+                    models.Index(
+                        fields=["usuario", "-fecha", "-id"],
+                        name="arch_usuario_fecha_idx",
+                    ),
+                    models.Index(
+                        fields=["insumo", "tipo", "fecha"],
+                        name="arch_insumo_tipo_fecha_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
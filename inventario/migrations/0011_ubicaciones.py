@@ -0,0 +1,223 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def crear_ubicaciones(apps, schema_editor):
+    # Un almacén por cada texto "Almacén X - Estante Y" y el stock actual
+    # de cada insumo en su almacén principal
+    Insumo = apps.get_model("inventario", "Insumo")
+    Ubicacion = apps.get_model("inventario", "Ubicacion")
+    StockUbicacion = apps.get_model("inventario", "StockUbicacion")
+    por_almacen = {}
+    for pk, texto in Insumo.objects.values_list("pk", "ubicacion").iterator(chunk_size=1000):
+        nombre = (texto or "").split(" - ", 1)[0].strip()[:100]
+        if nombre:
+            por_almacen.setdefault(nombre, []).append(pk)
+    for nombre, ids in por_almacen.items():
+        ubicacion = Ubicacion.objects.create(nombre=nombre)
+        for inicio in range(0, len(ids), 1000):
+            bloque = ids[inicio:inicio + 1000]
+            Insumo.objects.filter(pk__in=bloque).update(ubicacion_principal=ubicacion)
+            StockUbicacion.objects.bulk_create(
+                [
+                    StockUbicacion(insumo_id=pk, ubicacion=ubicacion, cantidad=stock)
+                    for pk, stock in Insumo.objects.filter(pk__in=bloque, stock_actual__gt=0)
+                    .values_list("pk", "stock_actual")
+                ],
+                batch_size=1000,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0010_movimientoarchivado"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Ubicacion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "nombre",
+                    models.CharField(
+                        help_text="Nombre del almacén o bodega (ej: Almacén EPP)",
+                        max_length=100,
+                        unique=True,
+                        verbose_name="Nombre",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ubicación",
+                "verbose_name_plural": "Ubicaciones",
+                "ordering": ["nombre"],
+            },
+        ),
+        migrations.AlterField(
+            model_name="consumodiario",
+            name="tipo",
+            field=models.CharField(
+                choices=[
+                    ("ENTRADA", "Entrada"),
+                    ("SALIDA", "Salida"),
+                    ("TRASPASO", "Traspaso"),
+                ],
+                max_length=10,
+                verbose_name="Tipo de Movimiento",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="movimiento",
+            name="tipo",
+            field=models.CharField(
+                choices=[
+                    ("ENTRADA", "Entrada"),
+                    ("SALIDA", "Salida"),
+                    ("TRASPASO", "Traspaso"),
+                ],
+                help_text="Tipo de movimiento: Entrada o Salida",
+                max_length=10,
+                verbose_name="Tipo de Movimiento",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="movimientoarchivado",
+            name="tipo",
+            field=models.CharField(
+                choices=[
+                    ("ENTRADA", "Entrada"),
+                    ("SALIDA", "Salida"),
+                    ("TRASPASO", "Traspaso"),
+                ],
+                max_length=10,
+                verbose_name="Tipo de Movimiento",
+            ),
+        ),
+        migrations.AddField(
+            model_name="insumo",
+            name="ubicacion_principal",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Almacén donde entran y salen los movimientos sin ubicación indicada",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="insumos",
+                to="inventario.ubicacion",
+                verbose_name="Almacén Principal",
+            ),
+        ),
+        migrations.AddField(
+            model_name="movimiento",
+            name="destino",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Ubicación a la que entra el stock",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="inventario.ubicacion",
+                verbose_name="Destino",
+            ),
+        ),
+        migrations.AddField(
+            model_name="movimiento",
+            name="origen",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Ubicación de la que sale el stock",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="inventario.ubicacion",
+                verbose_name="Origen",
+            ),
+        ),
+        migrations.AddField(
+            model_name="movimientoarchivado",
+            name="destino",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="inventario.ubicacion",
+                verbose_name="Destino",
+            ),
+        ),
+        migrations.AddField(
+            model_name="movimientoarchivado",
+            name="origen",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="inventario.ubicacion",
+                verbose_name="Origen",
+            ),
+        ),
+        migrations.CreateModel(
+            name="StockUbicacion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "cantidad",
+                    models.PositiveIntegerField(default=0, verbose_name="Cantidad"),
+                ),
+                (
+                    "insumo",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stocks",
+                        to="inventario.insumo",
+                        verbose_name="Insumo",
+                    ),
+                ),
+                (
+                    "ubicacion",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="stocks",
+                        to="inventario.ubicacion",
+                        verbose_name="Ubicación",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Stock por Ubicación",
+                "verbose_name_plural": "Stock por Ubicación",
+                "ordering": ["ubicacion", "insumo"],
+                "indexes": [
+                    models.Index(
+                        fields=["ubicacion", "insumo", "cantidad"],
+                        name="stock_ubicacion_insumo_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("insumo", "ubicacion"),
+                        name="stock_insumo_ubicacion_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(crear_ubicaciones, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0011_ubicaciones"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClaveIdempotencia",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("clave", models.CharField(max_length=64, verbose_name="Clave")),
+                (
+                    "huella",
+                    models.CharField(max_length=64, verbose_name="Huella de los Datos"),
+                ),
+                (
+                    "mensaje",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="Mensaje"
+                    ),
+                ),
+                ("expira", models.DateTimeField(verbose_name="Expira")),
+                (
+                    "movimiento",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="inventario.movimiento",
+                        verbose_name="Movimiento",
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Usuario",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Clave de Idempotencia",
+                "verbose_name_plural": "Claves de Idempotencia",
+                "indexes": [models.Index(fields=["expira"], name="idem_expira_idx")],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("usuario", "clave"), name="idem_usuario_clave_uniq"
+                    )
+                ],
+            },
+        ),
+    ]
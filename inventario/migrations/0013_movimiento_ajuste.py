@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0012_claves_idempotencia"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movimiento",
+            name="ajuste",
+            field=models.BooleanField(
+                default=False,
+                help_text="Stock inicial o corrección manual del stock, no un consumo",
+                verbose_name="Ajuste",
+            ),
+        ),
+        migrations.AddField(
+            model_name="movimientoarchivado",
+            name="ajuste",
+            field=models.BooleanField(default=False, verbose_name="Ajuste"),
+        ),
+    ]
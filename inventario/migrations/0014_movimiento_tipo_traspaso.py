@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventario", "0013_movimiento_ajuste"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="movimiento",
+            name="tipo",
+            field=models.CharField(
+                choices=[
+                    ("ENTRADA", "Entrada"),
+                    ("SALIDA", "Salida"),
+                    ("TRASPASO", "Traspaso"),
+                ],
+                help_text="Tipo de movimiento: Entrada, Salida o Traspaso",
+                max_length=10,
+                verbose_name="Tipo de Movimiento",
+            ),
+        ),
+    ]
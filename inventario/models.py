@@ -3,7 +3,93 @@ Modelos de la aplicación de inventario.
 Define las estructuras de datos para Insumos y Movimientos de stock.
 """
 from django.db import models
+from django.db.models import Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+
+class InsumoQuerySet(models.QuerySet):
+    """QuerySet de insumos con consultas de stock histórico"""
+
+    def con_stock_al(self, fecha):
+        """
+        Anota cada insumo con su stock a una fecha pasada (``stock_al``).
+        
+        Parte del último cierre de stock no posterior a ``fecha`` y suma los
+        movimientos registrados entre ese cierre y ``fecha`` (inclusive),
+        incluidos los archivados si el intervalo llega al archivo. El stock
+        inicial y las correcciones manuales son movimientos de ajuste, por
+        lo que a la fecha actual el resultado coincide con ``stock_actual``.
+        Cada insumo se resuelve con subconsultas sobre los índices
+        (insumo, fecha) de cierres y movimientos, por lo que el costo no
+        depende del largo total del historial.
+        
+        Args:
+            fecha (datetime): Instante de la consulta (inclusive)
+            
+        Returns:
+            QuerySet: Insumos anotados con ``stock_al``
+        """
+        corte = CierreStock.objects.filter(fecha__lte=fecha).aggregate(
+            ultimo=Max('fecha')
+        )['ultimo']
+        # El archivo solo se consulta si guarda movimientos posteriores al
+        # cierre (normalmente el archivo termina en un cierre)
+        archivado = MovimientoArchivado.objects.aggregate(ultimo=Max('fecha'))['ultimo']
+        historiales = [Movimiento]
+        if archivado is not None and (corte is None or archivado > corte):
+            historiales.append(MovimientoArchivado)
+        if corte is not None:
+            stock_cierre = Subquery(
+                CierreStock.objects.filter(insumo=OuterRef('pk'), fecha=corte).values('stock')[:1]
+            )
+        else:
+            stock_cierre = Value(0)
+
+        def total(modelo, tipo):
+            movimientos = modelo.objects.filter(insumo=OuterRef('pk'), fecha__lte=fecha, tipo=tipo)
+            if corte is not None:
+                movimientos = movimientos.filter(fecha__gt=corte)
+            return Coalesce(Subquery(
+                movimientos.order_by()
+                .values('insumo')
+                .annotate(total=Sum('cantidad'))
+                .values('total')
+            ), 0, output_field=models.IntegerField())
+
+        stock = Coalesce(stock_cierre, 0, output_field=models.IntegerField())
+        for modelo in historiales:
+            stock = stock + total(modelo, 'ENTRADA') - total(modelo, 'SALIDA')
+        return self.annotate(stock_al=stock)
+
+
+class Ubicacion(models.Model):
+    """
+    Almacén o bodega donde se guarda stock.
+    
+    El stock de cada insumo en cada ubicación se lleva en ``StockUbicacion``;
+    ``Insumo.ubicacion`` sigue siendo el texto libre con el estante o la
+    sección dentro del almacén.
+    
+    Attributes:
+        nombre (str): Nombre único de la ubicación (ej: Almacén EPP)
+    """
+    nombre = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name="Nombre",
+        help_text="Nombre del almacén o bodega (ej: Almacén EPP)"
+    )
+
+    class Meta:
+        verbose_name = "Ubicación"
+        verbose_name_plural = "Ubicaciones"
+        ordering = ['nombre']
+
+    def __str__(self):
+        """Representación en texto de la ubicación"""
+        return self.nombre
 
 
 class Insumo(models.Model):
@@ -15,7 +101,11 @@ class Insumo(models.Model):
         nombre (str): Nombre descriptivo del insumo
         descripcion (str): Descripción detallada del insumo (opcional)
         stock_actual (int): Cantidad actual disponible en inventario
+        stock_minimo (int): Nivel de reorden; con stock igual o menor el
+            insumo queda en alerta (ver ``inventario/alertas.py``)
         ubicacion (str): Ubicación física del insumo en el almacén
+        ubicacion_principal (Ubicacion): Almacén donde entran y salen los
+            movimientos que no indican ubicación
     """
     codigo = models.CharField(
         max_length=50, 
@@ -38,40 +128,80 @@ class Insumo(models.Model):
         verbose_name="Stock Actual",
         help_text="Cantidad disponible en inventario"
     )
+    stock_minimo = models.PositiveIntegerField(
+        default=10,
+        verbose_name="Stock Mínimo",
+        help_text="Nivel de reorden: con este stock o menos se genera una alerta"
+    )
     ubicacion = models.CharField(
         max_length=100, 
         verbose_name="Ubicación",
         help_text="Ubicación física en el almacén"
     )
+    ubicacion_principal = models.ForeignKey(
+        Ubicacion,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='insumos',
+        verbose_name="Almacén Principal",
+        help_text="Almacén donde entran y salen los movimientos sin ubicación indicada"
+    )
+
+    objects = InsumoQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Insumo"
         verbose_name_plural = "Insumos"
         ordering = ['codigo']  # Ordenar por código por defecto
+        indexes = [
+            # Búsqueda por prefijo del nombre en el selector de insumos
+            models.Index(fields=['nombre'], name='insumo_nombre_idx'),
+        ]
 
     def __str__(self):
         """Representación en texto del insumo"""
         return f"{self.codigo} - {self.nombre}"
 
+    def stock_al(self, fecha):
+        """
+        Retorna el stock que tenía el insumo en una fecha pasada.
+        
+        Args:
+            fecha (datetime): Instante de la consulta (inclusive)
+            
+        Returns:
+            int: Stock según el último cierre y los movimientos posteriores
+        """
+        return Insumo.objects.filter(pk=self.pk).con_stock_al(fecha).values_list(
+            'stock_al', flat=True
+        ).get()
+
 
 class Movimiento(models.Model):
     """
-    Modelo que representa un movimiento de stock (entrada o salida).
+    Modelo que representa un movimiento de stock (entrada, salida o traspaso).
     
     Cada movimiento registra una entrada o salida de insumos del inventario,
-    manteniendo un historial completo de todas las transacciones.
+    o un traspaso entre ubicaciones, manteniendo un historial completo de
+    todas las transacciones.
     
     Attributes:
         insumo (Insumo): Insumo relacionado con este movimiento
-        tipo (str): Tipo de movimiento (ENTRADA o SALIDA)
+        tipo (str): Tipo de movimiento (ENTRADA, SALIDA o TRASPASO)
         cantidad (int): Cantidad de unidades movidas
         fecha (datetime): Fecha y hora del movimiento (auto-generada)
         usuario (User): Usuario que registró el movimiento
+        origen (Ubicacion): Ubicación de la que sale el stock (SALIDA y TRASPASO)
+        destino (Ubicacion): Ubicación a la que entra el stock (ENTRADA y TRASPASO)
+        ajuste (bool): Si el movimiento registra un stock inicial o una
+            corrección manual del stock (no es consumo)
     """
     # Opciones para el tipo de movimiento
     TIPO_CHOICES = [
         ('ENTRADA', 'Entrada'),  # Ingreso de stock al inventario
         ('SALIDA', 'Salida'),    # Egreso de stock del inventario
+        ('TRASPASO', 'Traspaso'),  # Cambio de ubicación (no altera el stock total)
     ]
 
     insumo = models.ForeignKey(
@@ -84,7 +214,7 @@ class Movimiento(models.Model):
         max_length=10, 
         choices=TIPO_CHOICES, 
         verbose_name="Tipo de Movimiento",
-        help_text="Tipo de movimiento: Entrada o Salida"
+        help_text="Tipo de movimiento: Entrada, Salida o Traspaso"
     )
     cantidad = models.PositiveIntegerField(
         verbose_name="Cantidad",
@@ -102,12 +232,385 @@ class Movimiento(models.Model):
         verbose_name="Usuario Responsable",
         help_text="Usuario que registró este movimiento"
     )
+    origen = models.ForeignKey(
+        Ubicacion,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Origen",
+        help_text="Ubicación de la que sale el stock"
+    )
+    destino = models.ForeignKey(
+        Ubicacion,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Destino",
+        help_text="Ubicación a la que entra el stock"
+    )
+    ajuste = models.BooleanField(
+        default=False,
+        verbose_name="Ajuste",
+        help_text="Stock inicial o corrección manual del stock, no un consumo"
+    )
 
     class Meta:
         verbose_name = "Movimiento"
         verbose_name_plural = "Movimientos"
         ordering = ['-fecha']  # Ordenar por fecha descendente (más recientes primero)
+        # Índices compuestos para la paginación keyset sobre (fecha, id)
+        # y para cada filtro del historial de movimientos
+        indexes = [
+            models.Index(fields=['-fecha', '-id'], name='mov_fecha_id_idx'),
+            models.Index(fields=['insumo', '-fecha', '-id'], name='mov_insumo_fecha_idx'),
+            models.Index(fields=['tipo', '-fecha', '-id'], name='mov_tipo_fecha_idx'),
+            models.Index(fields=['usuario', '-fecha', '-id'], name='mov_usuario_fecha_idx'),
+            # Sumas por insumo y tipo en un rango de fechas (stock histórico)
+            models.Index(fields=['insumo', 'tipo', 'fecha'], name='mov_insumo_tipo_fecha_idx'),
+        ]
 
     def __str__(self):
         """Representación en texto del movimiento"""
         return f"{self.tipo} - {self.insumo.nombre} ({self.cantidad} unidades)"
+
+
+class MovimientoArchivado(models.Model):
+    """
+    Movimiento trasladado al archivo (ver ``inventario/archivo.py``).
+    
+    Tabla de solo inserción con las mismas columnas que ``Movimiento`` y
+    el mismo id que tenía el movimiento en el historial activo, de modo
+    que los cursores de paginación y las exportaciones siguen siendo
+    válidos. Todos los movimientos archivados son anteriores o iguales al
+    corte de archivo, que coincide con un ``CierreStock``.
+    
+    Attributes:
+        id (int): Id original del movimiento
+        insumo (Insumo): Insumo movido
+        tipo (str): 'ENTRADA', 'SALIDA' o 'TRASPASO'
+        cantidad (int): Cantidad de unidades movidas
+        fecha (datetime): Fecha y hora original del movimiento
+        usuario (User): Usuario que registró el movimiento
+        origen (Ubicacion): Ubicación de la que salió el stock
+        destino (Ubicacion): Ubicación a la que entró el stock
+        ajuste (bool): Si el movimiento fue un stock inicial o una corrección
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID")
+    insumo = models.ForeignKey(
+        Insumo,
+        on_delete=models.CASCADE,
+        related_name='movimientos_archivados',
+        verbose_name="Insumo"
+    )
+    tipo = models.CharField(
+        max_length=10,
+        choices=Movimiento.TIPO_CHOICES,
+        verbose_name="Tipo de Movimiento"
+    )
+    cantidad = models.PositiveIntegerField(verbose_name="Cantidad")
+    fecha = models.DateTimeField(verbose_name="Fecha")
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name="Usuario Responsable"
+    )
+    origen = models.ForeignKey(
+        Ubicacion, on_delete=models.PROTECT, null=True, related_name='+', verbose_name="Origen"
+    )
+    destino = models.ForeignKey(
+        Ubicacion, on_delete=models.PROTECT, null=True, related_name='+', verbose_name="Destino"
+    )
+    ajuste = models.BooleanField(default=False, verbose_name="Ajuste")
+
+    class Meta:
+        verbose_name = "Movimiento Archivado"
+        verbose_name_plural = "Movimientos Archivados"
+        ordering = ['-fecha']
+        # Los mismos índices del historial activo: el listado, los filtros y
+        # las sumas del stock histórico leen el archivo con las mismas consultas
+        indexes = [
+            models.Index(fields=['-fecha', '-id'], name='arch_fecha_id_idx'),
+            models.Index(fields=['insumo', '-fecha', '-id'], name='arch_insumo_fecha_idx'),
+            models.Index(fields=['tipo', '-fecha', '-id'], name='arch_tipo_fecha_idx'),
+            models.Index(fields=['usuario', '-fecha', '-id'], name='arch_usuario_fecha_idx'),
+            models.Index(fields=['insumo', 'tipo', 'fecha'], name='arch_insumo_tipo_fecha_idx'),
+        ]
+
+    def __str__(self):
+        """Representación en texto del movimiento archivado"""
+        return f"{self.tipo} - {self.insumo.nombre} ({self.cantidad} unidades, archivado)"
+
+
+class StockUbicacion(models.Model):
+    """
+    Stock de un insumo en una ubicación.
+    
+    Se ajusta en la misma transacción que cada movimiento (ver
+    ``services.registrar_movimiento``). La suma de las filas de un insumo
+    coincide con ``Insumo.stock_actual`` cuando todo su stock está ubicado
+    (ver ``inventario/ubicaciones.py``).
+    
+    Attributes:
+        insumo (Insumo): Insumo almacenado
+        ubicacion (Ubicacion): Ubicación donde está el stock
+        cantidad (int): Unidades del insumo en la ubicación
+    """
+    insumo = models.ForeignKey(
+        Insumo,
+        on_delete=models.CASCADE,
+        related_name='stocks',
+        verbose_name="Insumo"
+    )
+    ubicacion = models.ForeignKey(
+        Ubicacion,
+        on_delete=models.PROTECT,
+        related_name='stocks',
+        verbose_name="Ubicación"
+    )
+    cantidad = models.PositiveIntegerField(default=0, verbose_name="Cantidad")
+
+    class Meta:
+        verbose_name = "Stock por Ubicación"
+        verbose_name_plural = "Stock por Ubicación"
+        ordering = ['ubicacion', 'insumo']
+        constraints = [
+            models.UniqueConstraint(fields=['insumo', 'ubicacion'], name='stock_insumo_ubicacion_uniq'),
+        ]
+        indexes = [
+            # Índice cubriente: los totales por ubicación y el filtro del
+            # listado de insumos se resuelven sin leer la tabla
+            models.Index(fields=['ubicacion', 'insumo', 'cantidad'], name='stock_ubicacion_insumo_idx'),
+        ]
+
+    def __str__(self):
+        """Representación en texto del stock ubicado"""
+        return f"{self.insumo_id} @ {self.ubicacion_id}: {self.cantidad}"
+
+
+class CierreStock(models.Model):
+    """
+    Modelo que representa un cierre (snapshot) periódico del stock de un insumo.
+    
+    Cada cierre guarda el saldo que resulta del historial de movimientos
+    hasta una fecha de corte. Todos los insumos se cierran con la misma
+    fecha, de modo que para reconstruir el stock basta con partir del
+    último cierre y sumar los movimientos posteriores, sin recorrer el
+    historial completo.
+    
+    Attributes:
+        insumo (Insumo): Insumo al que corresponde el cierre
+        fecha (datetime): Fecha de corte (incluye movimientos hasta esta fecha)
+        stock (int): Saldo del insumo según el historial a la fecha de corte
+    """
+    insumo = models.ForeignKey(
+        Insumo,
+        on_delete=models.CASCADE,
+        related_name='cierres',
+        verbose_name="Insumo"
+    )
+    fecha = models.DateTimeField(
+        verbose_name="Fecha de Corte",
+        help_text="Incluye los movimientos registrados hasta esta fecha"
+    )
+    stock = models.IntegerField(
+        verbose_name="Stock",
+        help_text="Saldo según el historial de movimientos"
+    )
+
+    class Meta:
+        verbose_name = "Cierre de Stock"
+        verbose_name_plural = "Cierres de Stock"
+        ordering = ['-fecha', 'insumo']
+        constraints = [
+            models.UniqueConstraint(fields=['insumo', 'fecha'], name='cierre_insumo_fecha_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha', 'insumo'], name='cierre_fecha_insumo_idx'),
+        ]
+
+    def __str__(self):
+        """Representación en texto del cierre"""
+        return f"{self.insumo_id} @ {self.fecha:%Y-%m-%d %H:%M}: {self.stock}"
+
+
+class MarcaCambios(models.Model):
+    """
+    Contador de cambios del inventario.
+    
+    Tabla de una fila por clave que se incrementa después de cada escritura
+    confirmada sobre insumos o movimientos (ver ``inventario/cambios.py``).
+    Las vistas de listado la usan para responder ``304 Not Modified`` con
+    una sola consulta por clave primaria. Otras claves guardan marcas de
+    procesos incrementales, como el último movimiento incorporado a
+    ``ConsumoDiario`` (ver ``inventario/consumo.py``).
+    
+    Attributes:
+        clave (str): Identificador del contador
+        version (int): Cantidad de cambios registrados
+        modificado (datetime): Fecha del último cambio
+    """
+    clave = models.CharField(
+        max_length=50,
+        primary_key=True,
+        verbose_name="Clave"
+    )
+    version = models.BigIntegerField(
+        default=0,
+        verbose_name="Versión"
+    )
+    modificado = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Última Modificación"
+    )
+
+    class Meta:
+        verbose_name = "Marca de Cambios"
+        verbose_name_plural = "Marcas de Cambios"
+
+    def __str__(self):
+        """Representación en texto de la marca"""
+        return f"{self.clave} v{self.version}"
+
+
+class AlertaStock(models.Model):
+    """
+    Insumo cuyo stock está en o bajo su nivel de reorden.
+    
+    Solo existen filas para los insumos en alerta: se crean y eliminan en
+    el camino de cada movimiento cuando el stock cruza ``stock_minimo``
+    (ver ``inventario/alertas.py``), de modo que listar las alertas recorre
+    únicamente esta tabla y no todos los insumos.
+    
+    Attributes:
+        insumo (Insumo): Insumo en alerta (también es la clave primaria)
+        desde (datetime): Momento en que el stock cruzó el nivel de reorden
+    """
+    insumo = models.OneToOneField(
+        Insumo,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='alerta',
+        verbose_name="Insumo"
+    )
+    desde = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="En Alerta Desde"
+    )
+
+    class Meta:
+        verbose_name = "Alerta de Stock"
+        verbose_name_plural = "Alertas de Stock"
+        ordering = ['desde']
+        indexes = [
+            models.Index(fields=['desde'], name='alerta_desde_idx'),
+        ]
+
+    def __str__(self):
+        """Representación en texto de la alerta"""
+        return f"Alerta {self.insumo_id} desde {self.desde:%Y-%m-%d %H:%M}"
+
+
+class ConsumoDiario(models.Model):
+    """
+    Agregado diario de movimientos por insumo y tipo.
+    
+    Resume el historial de ``Movimiento`` para los reportes de consumo y
+    pronóstico (ver ``inventario/consumo.py``). Se construye de forma
+    incremental a partir de los movimientos nuevos; nunca se edita a mano.
+    
+    Attributes:
+        insumo (Insumo): Insumo movido
+        dia (date): Día (en la zona horaria del proyecto)
+        tipo (str): 'ENTRADA' o 'SALIDA'
+        cantidad (int): Unidades movidas en el día
+        movimientos (int): Cantidad de movimientos del día
+    """
+    insumo = models.ForeignKey(
+        Insumo,
+        on_delete=models.CASCADE,
+        related_name='consumos',
+        verbose_name="Insumo"
+    )
+    dia = models.DateField(verbose_name="Día")
+    tipo = models.CharField(
+        max_length=10,
+        choices=Movimiento.TIPO_CHOICES,
+        verbose_name="Tipo de Movimiento"
+    )
+    cantidad = models.BigIntegerField(default=0, verbose_name="Cantidad")
+    movimientos = models.PositiveIntegerField(default=0, verbose_name="Movimientos")
+
+    class Meta:
+        verbose_name = "Consumo Diario"
+        verbose_name_plural = "Consumos Diarios"
+        ordering = ['dia', 'insumo', 'tipo']
+        constraints = [
+            models.UniqueConstraint(fields=['insumo', 'dia', 'tipo'], name='consumo_insumo_dia_tipo_uniq'),
+        ]
+        indexes = [
+            # Ventana de días de todos los insumos (pronóstico y reconstrucción)
+            models.Index(fields=['tipo', 'dia', 'insumo'], name='consumo_tipo_dia_idx'),
+        ]
+
+    def __str__(self):
+        """Representación en texto del agregado"""
+        return f"{self.insumo_id} {self.dia:%Y-%m-%d} {self.tipo}: {self.cantidad}"
+
+
+class ClaveIdempotencia(models.Model):
+    """
+    Resultado de un movimiento registrado con una clave de idempotencia.
+    
+    El cliente envía una clave única por envío (cabecera
+    ``Idempotency-Key`` o campo oculto del formulario). Un reintento con la
+    misma clave recibe el resultado guardado sin registrar otro movimiento
+    (ver ``inventario/idempotencia.py``). Las filas vencen después de
+    ``IDEMPOTENCIA_TTL_HORAS`` y se eliminan con ``purgar_idempotencia``.
+    
+    Attributes:
+        usuario (User): Usuario que envió el movimiento
+        clave (str): Clave enviada por el cliente (única por usuario)
+        huella (str): SHA-256 de los datos enviados
+        movimiento (Movimiento): Movimiento registrado
+        mensaje (str): Mensaje mostrado al registrarlo
+        expira (datetime): Fecha desde la que la clave se puede reutilizar
+    """
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Usuario"
+    )
+    clave = models.CharField(max_length=64, verbose_name="Clave")
+    huella = models.CharField(max_length=64, verbose_name="Huella de los Datos")
+    # Sin restricción en la base de datos: el archivo de movimientos borra
+    # filas de Movimiento sin pasar por el ORM
+    movimiento = models.ForeignKey(
+        Movimiento,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='+',
+        verbose_name="Movimiento"
+    )
+    mensaje = models.CharField(max_length=255, blank=True, verbose_name="Mensaje")
+    expira = models.DateTimeField(verbose_name="Expira")
+
+    class Meta:
+        verbose_name = "Clave de Idempotencia"
+        verbose_name_plural = "Claves de Idempotencia"
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'clave'], name='idem_usuario_clave_uniq'),
+        ]
+        indexes = [
+            # Purga de claves vencidas
+            models.Index(fields=['expira'], name='idem_expira_idx'),
+        ]
+
+    def __str__(self):
+        """Representación en texto de la clave"""
+        return f"{self.usuario_id}/{self.clave} -> {self.movimiento_id}"
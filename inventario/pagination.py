@@ -0,0 +1,313 @@
+"""
+Paginación por cursor (keyset) para listados ordenados por fecha.
+
+A diferencia de la paginación por OFFSET, cada página se obtiene filtrando
+a partir de la última fila vista, por lo que el costo de una página no
+depende de cuán profundo se encuentre el usuario en el historial.
+
+Las variantes ``*_union`` paginan varias consultas como si fueran una sola
+(por ejemplo, el historial activo y el archivo de movimientos): cada una
+lee su propia página y las filas se mezclan por (fecha, id).
+
+``PaginadorContado`` reconstruye una página por número guardada en cache
+(sus filas y el total) sin volver a consultar.
+"""
+import base64
+import binascii
+import heapq
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(fecha, pk):
+    """
+    Codifica la posición (fecha, id) de una fila como un token opaco.
+
+    Args:
+        fecha (datetime): Fecha de la fila
+        pk (int): Clave primaria de la fila
+
+    Returns:
+        str: Token seguro para usar en la URL
+    """
+    raw = f'{fecha.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Decodifica un token generado por ``encode_cursor``.
+
+    Args:
+        token (str): Token recibido en la URL
+
+    Returns:
+        tuple: Par (fecha, id)
+
+    Raises:
+        ValueError: Si el token está mal formado
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        fecha_txt, pk_txt = base64.urlsafe_b64decode(padded).decode().split('|')
+        fecha = parse_datetime(fecha_txt)
+        pk = int(pk_txt)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError('Cursor inválido') from exc
+    if fecha is None:
+        raise ValueError('Cursor inválido')
+    return fecha, pk
+
+
+class KeysetPage:
+    """
+    Página obtenida mediante paginación keyset.
+
+    Expone una interfaz similar a ``django.core.paginator.Page`` para que
+    los templates puedan usarla sin cambios mayores.
+
+    Attributes:
+        object_list (list): Filas de la página
+        next_cursor (str): Cursor para la página siguiente (o None)
+        previous_cursor (str): Cursor para la página anterior (o None)
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _valor(fila, campo):
+    """Lee un campo de una instancia o de una fila de ``.values()``"""
+    return fila[campo] if isinstance(fila, dict) else getattr(fila, campo)
+
+
+def _consulta_keyset(queryset, per_page, after, before, field):
+    """
+    Construye la consulta de una página (más una fila adicional).
+
+    Returns:
+        QuerySet: Consulta a evaluar; si ``before`` está presente, sus filas
+        vienen en orden ascendente y se deben invertir
+    """
+    # La cota simple sobre ``field`` acompaña al OR: sin ella MySQL no
+    # siempre convierte el OR en un rango del índice (field, id) y puede
+    # recorrer el índice desde el principio u ordenar con filesort
+    if before:
+        fecha, pk = decode_cursor(before)
+        return queryset.filter(**{f'{field}__gte': fecha}).filter(
+            Q(**{f'{field}__gt': fecha}) | Q(**{field: fecha, 'pk__gt': pk})
+        ).order_by(field, 'pk')[:per_page + 1]
+    if after:
+        fecha, pk = decode_cursor(after)
+        queryset = queryset.filter(**{f'{field}__lte': fecha}).filter(
+            Q(**{f'{field}__lt': fecha}) | Q(**{field: fecha, 'pk__lt': pk})
+        )
+    return queryset.order_by(f'-{field}', '-pk')[:per_page + 1]
+
+
+def _armar_pagina(rows, per_page, after, before, field):
+    """Recorta las filas leídas y calcula los cursores de navegación"""
+    if before:
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_previous, has_next = has_more, True
+    else:
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = bool(after)
+
+    next_cursor = previous_cursor = None
+    if rows and has_next:
+        ultimo = rows[-1]
+        next_cursor = encode_cursor(_valor(ultimo, field), _valor(ultimo, 'pk'))
+    if rows and has_previous:
+        primero = rows[0]
+        previous_cursor = encode_cursor(_valor(primero, field), _valor(primero, 'pk'))
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def paginate_keyset(queryset, per_page, after=None, before=None, field='fecha'):
+    """
+    Pagina un queryset en orden descendente por (``field``, id).
+
+    Solo se consulta una página más una fila adicional para saber si
+    existen más resultados, independiente de la posición en el historial.
+    Acepta querysets de instancias o de ``.values()`` (que incluyan ``pk``
+    y ``field``).
+
+    Args:
+        queryset (QuerySet): Queryset ya filtrado
+        per_page (int): Cantidad de filas por página
+        after (str): Cursor de la última fila vista (avanzar)
+        before (str): Cursor de la primera fila vista (retroceder)
+        field (str): Campo de fecha usado como primera clave de orden
+
+    Returns:
+        KeysetPage: Página con las filas y los cursores de navegación
+
+    Raises:
+        ValueError: Si alguno de los cursores es inválido
+    """
+    rows = list(_consulta_keyset(queryset, per_page, after, before, field))
+    return _armar_pagina(rows, per_page, after, before, field)
+
+
+async def apaginate_keyset(queryset, per_page, after=None, before=None, field='fecha'):
+    """Versión asíncrona de ``paginate_keyset`` (usa el ORM asíncrono)"""
+    consulta = _consulta_keyset(queryset, per_page, after, before, field)
+    rows = [fila async for fila in consulta]
+    return _armar_pagina(rows, per_page, after, before, field)
+
+
+def keyset_queryset(queryset, per_page, after=None, field='fecha'):
+    """
+    Consulta de una página hacia adelante, sin evaluarla.
+
+    Permite recorrer la página por bloques (``iterator``/``aiterator``) en
+    vez de cargarla completa. Incluye una fila adicional para saber si hay
+    una página siguiente; quien la recorra debe descartarla.
+
+    Raises:
+        ValueError: Si el cursor es inválido
+    """
+    return _consulta_keyset(queryset, per_page, after, None, field)
+
+
+def _clave(fila, field):
+    return _valor(fila, field), _valor(fila, 'pk')
+
+
+def _mezclar_pagina(consultas, per_page, before, field):
+    """Mezcla las páginas leídas de cada consulta en el orden de la paginación"""
+    rows = [fila for consulta in consultas for fila in consulta]
+    rows.sort(key=lambda fila: _clave(fila, field), reverse=not before)
+    return rows[:per_page + 1]
+
+
+def paginate_keyset_union(querysets, per_page, after=None, before=None, field='fecha'):
+    """
+    Pagina varias consultas como un solo listado descendente por (``field``, id).
+
+    Cada consulta lee como máximo una página más una fila, por lo que el
+    costo crece con la cantidad de consultas y no con su tamaño. Los ids
+    deben ser únicos entre las consultas para que los cursores no se
+    confundan.
+
+    Args:
+        querysets (list): Querysets ya filtrados, con los mismos campos
+        per_page (int): Cantidad de filas por página
+        after (str): Cursor de la última fila vista (avanzar)
+        before (str): Cursor de la primera fila vista (retroceder)
+        field (str): Campo de fecha usado como primera clave de orden
+
+    Returns:
+        KeysetPage: Página con las filas y los cursores de navegación
+
+    Raises:
+        ValueError: Si alguno de los cursores es inválido
+    """
+    consultas = [_consulta_keyset(q, per_page, after, before, field) for q in querysets]
+    rows = _mezclar_pagina(consultas, per_page, before, field)
+    return _armar_pagina(rows, per_page, after, before, field)
+
+
+async def apaginate_keyset_union(querysets, per_page, after=None, before=None, field='fecha'):
+    """Versión asíncrona de ``paginate_keyset_union`` (usa el ORM asíncrono)"""
+    consultas = []
+    for queryset in querysets:
+        consulta = _consulta_keyset(queryset, per_page, after, before, field)
+        consultas.append([fila async for fila in consulta])
+    rows = _mezclar_pagina(consultas, per_page, before, field)
+    return _armar_pagina(rows, per_page, after, before, field)
+
+
+class KeysetUnion:
+    """
+    Páginas de varias consultas recorridas como una sola, sin evaluarlas.
+
+    Mezcla en orden descendente por (``field``, id) las consultas de
+    ``keyset_queryset`` a medida que se leen por bloques. Expone
+    ``iterator``/``aiterator`` como un QuerySet, de modo que se puede
+    recorrer en lugar de una consulta (por ejemplo, con ``api.Recorrido``).
+
+    Args:
+        querysets (list): Consultas de ``keyset_queryset`` con los mismos campos
+        field (str): Campo de fecha usado como primera clave de orden
+    """
+
+    def __init__(self, querysets, field='fecha'):
+        self.querysets = querysets
+        self.field = field
+
+    def iterator(self, chunk_size=None):
+        return heapq.merge(
+            *(queryset.iterator(chunk_size=chunk_size) for queryset in self.querysets),
+            key=lambda fila: _clave(fila, self.field),
+            reverse=True,
+        )
+
+    async def aiterator(self, chunk_size=None):
+        iteradores = [queryset.aiterator(chunk_size=chunk_size) for queryset in self.querysets]
+        siguientes = {}
+        for indice, iterador in enumerate(iteradores):
+            fila = await anext(iterador, None)
+            if fila is not None:
+                siguientes[indice] = fila
+        while siguientes:
+            indice = max(siguientes, key=lambda i: _clave(siguientes[i], self.field))
+            yield siguientes[indice]
+            fila = await anext(iteradores[indice], None)
+            if fila is None:
+                del siguientes[indice]
+            else:
+                siguientes[indice] = fila
+
+
+class PaginadorContado(Paginator):
+    """
+    ``Paginator`` con el total de resultados ya conocido.
+
+    No recibe los resultados: solo calcula el número de páginas y arma la
+    página con filas leídas por otro medio (por ejemplo, desde la cache).
+
+    Args:
+        total (int): Cantidad de resultados
+        per_page (int): Resultados por página
+    """
+
+    def __init__(self, total, per_page, **kwargs):
+        super().__init__((), per_page, **kwargs)
+        self.total = total
+
+    @cached_property
+    def count(self):
+        return self.total
+
+    def pagina(self, filas, numero):
+        """
+        Página ``numero`` con las filas indicadas.
+
+        Raises:
+            InvalidPage: Si el número no corresponde a una página
+        """
+        return Page(filas, self.validate_number(numero), self)
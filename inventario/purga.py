@@ -0,0 +1,71 @@
+"""
+Borrado por bloques de filas que se acumulan (sesiones y claves vencidas,
+movimientos trasladados al archivo).
+
+Un único DELETE sobre una tabla grande bloquea y llena el log de
+transacciones de una vez. ``purgar_por_bloques`` lee las claves primarias
+de a ``tamano`` siguiendo el orden de la consulta (normalmente un índice)
+y borra cada bloque en su propia transacción.
+
+Las filas se borran con un DELETE por claves primarias ejecutado con el
+cursor de la conexión: no se leen las filas ni se emiten señales por fila.
+Solo se usa en tablas de las que nada depende por clave foránea, o cuyas
+dependencias no se borran en cascada; quien llama registra el cambio una
+vez al final si hace falta.
+"""
+import time
+
+from django.db import connections, router, transaction
+
+
+def borrar_filas(modelo, claves):
+    """
+    Borra las filas de ``modelo`` con las claves primarias indicadas.
+
+    Args:
+        modelo: Modelo de la tabla
+        claves (list): Claves primarias a borrar
+
+    Returns:
+        int: Filas borradas
+    """
+    if not claves:
+        return 0
+    conexion = connections[router.db_for_write(modelo)]
+    tabla = conexion.ops.quote_name(modelo._meta.db_table)
+    columna = conexion.ops.quote_name(modelo._meta.pk.column)
+    marcadores = ', '.join(['%s'] * len(claves))
+    with conexion.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {tabla} WHERE {columna} IN ({marcadores})', list(claves))
+        return cursor.rowcount
+
+
+def purgar_por_bloques(modelo, consulta, tamano, pausa=0, antes_de_borrar=None):
+    """
+    Borra por bloques las filas de ``modelo`` que devuelve ``consulta``.
+
+    Args:
+        modelo: Modelo de la tabla
+        consulta (QuerySet): ``values_list`` ordenado cuya primera columna
+            (o única, con ``flat=True``) es la clave primaria
+        tamano (int): Filas borradas por transacción
+        pausa (float): Segundos de espera entre bloques, para ceder el
+            servidor de base de datos a las peticiones en curso
+        antes_de_borrar (callable): Recibe las filas del bloque y se ejecuta
+            en la misma transacción, antes del DELETE
+
+    Returns:
+        int: Filas borradas
+    """
+    borradas = 0
+    while True:
+        with transaction.atomic(using=router.db_for_write(modelo)):
+            filas = list(consulta[:tamano])
+            if filas and antes_de_borrar is not None:
+                antes_de_borrar(filas)
+            borrar_filas(modelo, [fila[0] if isinstance(fila, tuple) else fila for fila in filas])
+        borradas += len(filas)
+        if len(filas) < tamano:
+            return borradas
+        if pausa:
+            time.sleep(pausa)
@@ -0,0 +1,278 @@
+"""
+Reconciliación del stock denormalizado contra el historial de movimientos.
+
+``Insumo.stock_actual`` es un contador que se ajusta en cada movimiento.
+El stock inicial de un insumo y sus correcciones manuales también entran
+al historial, como movimientos de ajuste (``services.ajustar_stock``),
+por lo que contador e historial solo difieren si algo escribió el
+contador por fuera de los servicios. Este módulo reconstruye el saldo de
+cada insumo a partir del último cierre (``CierreStock``) más los
+movimientos posteriores, detecta diferencias y, opcionalmente, las
+corrige: llevando el contador al historial (``reparar``) o registrando la
+diferencia en el historial como ajuste (``ajustar``, para bases de datos
+cargadas antes de que existieran los ajustes).
+
+Todas las consultas se recorren con ``.iterator()`` y se combinan en
+orden de insumo, por lo que la memoria usada no depende del tamaño del
+historial ni de la cantidad de insumos.
+"""
+import heapq
+
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from . import alertas, archivo, cambios, ubicaciones
+from .models import CierreStock, Insumo, Movimiento
+from .services import movimiento_de_ajuste
+
+# Filas leídas por ida a la base de datos al recorrer cada consulta
+TAMANO_BLOQUE = 2000
+
+
+class Discrepancia:
+    """
+    Insumo cuyo contador no coincide con el historial.
+
+    Attributes:
+        insumo_id (int): Insumo afectado
+        stock_actual (int): Valor del contador al momento de la revisión
+        stock_libro (int): Saldo según cierre + movimientos
+        reparada (bool): Si el contador fue corregido
+    """
+
+    def __init__(self, insumo_id, stock_actual, stock_libro, reparada=False):
+        self.insumo_id = insumo_id
+        self.stock_actual = stock_actual
+        self.stock_libro = stock_libro
+        self.reparada = reparada
+
+    @property
+    def diferencia(self):
+        return self.stock_actual - self.stock_libro
+
+
+def ultimo_corte(hasta=None):
+    """
+    Retorna la fecha del último cierre, opcionalmente no posterior a ``hasta``.
+
+    Returns:
+        datetime: Fecha del cierre o None si no hay cierres
+    """
+    cierres = CierreStock.objects.all()
+    if hasta is not None:
+        cierres = cierres.filter(fecha__lte=hasta)
+    return cierres.aggregate(ultimo=Max('fecha'))['ultimo']
+
+
+def _netos(modelo, desde, hasta, insumo_ids=None):
+    movimientos = modelo.objects.all()
+    if insumo_ids is not None:
+        movimientos = movimientos.filter(insumo__in=insumo_ids)
+    if desde is not None:
+        movimientos = movimientos.filter(fecha__gt=desde)
+    if hasta is not None:
+        movimientos = movimientos.filter(fecha__lte=hasta)
+    return (
+        movimientos.order_by()
+        .values('insumo')
+        .annotate(
+            entradas=Sum('cantidad', filter=Q(tipo='ENTRADA'), default=0),
+            salidas=Sum('cantidad', filter=Q(tipo='SALIDA'), default=0),
+        )
+        .order_by('insumo')
+        .values_list('insumo', 'entradas', 'salidas')
+    )
+
+
+def netos_por_insumo(desde=None, hasta=None, insumo_ids=None):
+    """
+    Agrega en la base de datos el neto de movimientos por insumo.
+
+    Suma entradas y salidas por separado (``cantidad`` no tiene signo)
+    para el intervalo ``(desde, hasta]``. Si el intervalo llega a fechas
+    archivadas, se agregan también los movimientos del archivo. Con
+    ``insumo_ids`` se limita a esos insumos.
+
+    Yields:
+        tuple: ``(insumo_id, entradas, salidas)`` en orden de insumo
+    """
+    consultas = [
+        _netos(modelo, desde, hasta, insumo_ids).iterator(chunk_size=TAMANO_BLOQUE)
+        for modelo in archivo.historiales(desde)
+    ]
+    # Cada consulta viene ordenada por insumo: se suman los del mismo insumo
+    actual = None
+    for insumo_id, entradas, salidas in heapq.merge(*consultas):
+        if actual is not None and actual[0] == insumo_id:
+            actual = (insumo_id, actual[1] + entradas, actual[2] + salidas)
+            continue
+        if actual is not None:
+            yield actual
+        actual = (insumo_id, entradas, salidas)
+    if actual is not None:
+        yield actual
+
+
+def saldos_libro(hasta=None):
+    """
+    Reconstruye el saldo de cada insumo según el historial.
+
+    Parte del último cierre no posterior a ``hasta`` y suma los movimientos
+    del intervalo siguiente. Los insumos sin fila en ese cierre parten de 0.
+
+    Args:
+        hasta (datetime): Fecha de corte (None = todo el historial)
+
+    Yields:
+        tuple: ``(insumo_id, stock_actual, stock_libro)`` en orden de insumo
+    """
+    corte = ultimo_corte(hasta)
+    insumos = Insumo.objects.order_by('pk').values_list('pk', 'stock_actual')
+    cierres = (
+        CierreStock.objects.filter(fecha=corte).order_by('insumo').values_list('insumo', 'stock')
+        if corte is not None else CierreStock.objects.none().values_list('insumo', 'stock')
+    )
+    cierres_iter = cierres.iterator(chunk_size=TAMANO_BLOQUE)
+    netos_iter = netos_por_insumo(desde=corte, hasta=hasta)
+    cierre = next(cierres_iter, None)
+    neto = next(netos_iter, None)
+    for insumo_id, stock_actual in insumos.iterator(chunk_size=TAMANO_BLOQUE):
+        saldo = 0
+        while cierre is not None and cierre[0] < insumo_id:
+            cierre = next(cierres_iter, None)
+        if cierre is not None and cierre[0] == insumo_id:
+            saldo = cierre[1]
+        while neto is not None and neto[0] < insumo_id:
+            neto = next(netos_iter, None)
+        if neto is not None and neto[0] == insumo_id:
+            saldo += neto[1] - neto[2]
+        yield insumo_id, stock_actual, saldo
+
+
+def tomar_cierre(fecha=None):
+    """
+    Registra un cierre de stock para todos los insumos.
+
+    Args:
+        fecha (datetime): Fecha de corte (por defecto, ahora)
+
+    Returns:
+        int: Cantidad de cierres creados
+    """
+    fecha = fecha or timezone.now()
+    creados = 0
+    lote = []
+    with transaction.atomic():
+        for insumo_id, _, saldo in saldos_libro(hasta=fecha):
+            lote.append(CierreStock(insumo_id=insumo_id, fecha=fecha, stock=saldo))
+            if len(lote) >= TAMANO_BLOQUE:
+                CierreStock.objects.bulk_create(lote)
+                creados += len(lote)
+                lote = []
+        CierreStock.objects.bulk_create(lote)
+        creados += len(lote)
+    return creados
+
+
+def _saldos_de(insumo_ids):
+    """Saldo según el historial (último cierre más movimientos) de los insumos indicados"""
+    corte = ultimo_corte()
+    saldos = dict.fromkeys(insumo_ids, 0)
+    if corte is not None:
+        saldos.update(
+            CierreStock.objects.filter(fecha=corte, insumo__in=insumo_ids).values_list('insumo', 'stock')
+        )
+    for insumo_id, entradas, salidas in netos_por_insumo(desde=corte, insumo_ids=insumo_ids):
+        saldos[insumo_id] += entradas - salidas
+    return saldos
+
+
+def _confirmar(candidatas):
+    """
+    Vuelve a leer contador e historial de los insumos con diferencias, bajo bloqueo.
+
+    La revisión completa lee el historial y los contadores en consultas
+    distintas: un movimiento confirmado entre ambas aparece en el contador
+    pero no en el saldo. Con los insumos bloqueados (como los bloquea
+    ``registrar_movimiento`` hasta confirmar) ambos lados ven los mismos
+    movimientos. Debe llamarse dentro de una transacción.
+
+    Returns:
+        list: Las discrepancias que persisten, con los valores releídos
+    """
+    ids = [discrepancia.insumo_id for discrepancia in candidatas]
+    vigentes = dict(
+        Insumo.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', 'stock_actual')
+    )
+    saldos = _saldos_de(ids)
+    confirmadas = []
+    for discrepancia in candidatas:
+        stock_actual = vigentes.get(discrepancia.insumo_id)
+        if stock_actual is not None and stock_actual != saldos[discrepancia.insumo_id]:
+            discrepancia.stock_actual = stock_actual
+            discrepancia.stock_libro = saldos[discrepancia.insumo_id]
+            confirmadas.append(discrepancia)
+    return confirmadas
+
+
+def reconciliar(reparar=False, ajustar=False):
+    """
+    Compara ``stock_actual`` con el historial y opcionalmente lo corrige.
+
+    Con ``reparar`` el contador toma el saldo del historial, salvo que ese
+    saldo sea negativo: un historial que no alcanza a cubrir las salidas
+    indica un stock inicial sin registrar, y esos insumos se dejan sin
+    corregir (ver ``ajustar``). Con ``ajustar`` se confía en el contador y
+    la diferencia se registra en el historial como movimiento de ajuste.
+
+    La revisión completa no bloquea nada. Los insumos con diferencias se
+    vuelven a revisar por bloques, con sus filas bloqueadas y en la misma
+    transacción que la corrección (``_confirmar``): una diferencia causada
+    por un movimiento registrado durante la revisión desaparece ahí, y no
+    se corrige ni se informa.
+
+    Args:
+        reparar (bool): Si se deben corregir los contadores
+        ajustar (bool): Si se deben registrar las diferencias como ajustes
+
+    Returns:
+        list: Una ``Discrepancia`` por cada insumo con diferencias
+
+    Raises:
+        ValueError: Si se piden ``reparar`` y ``ajustar`` a la vez
+    """
+    if reparar and ajustar:
+        raise ValueError('Indique reparar o ajustar, no ambos.')
+    candidatas = [
+        Discrepancia(insumo_id, stock_actual, stock_libro)
+        for insumo_id, stock_actual, stock_libro in saldos_libro()
+        if stock_actual != stock_libro
+    ]
+    discrepancias = []
+    for inicio in range(0, len(candidatas), TAMANO_BLOQUE):
+        with transaction.atomic():
+            bloque = _confirmar(candidatas[inicio:inicio + TAMANO_BLOQUE])
+            if ajustar:
+                Movimiento.objects.bulk_create([
+                    movimiento_de_ajuste(discrepancia.insumo_id, discrepancia.diferencia)
+                    for discrepancia in bloque
+                ])
+                for discrepancia in bloque:
+                    discrepancia.reparada = True
+            if reparar:
+                for discrepancia in bloque:
+                    if discrepancia.stock_libro >= 0:
+                        Insumo.objects.filter(pk=discrepancia.insumo_id).update(
+                            stock_actual=discrepancia.stock_libro
+                        )
+                        discrepancia.reparada = True
+        discrepancias.extend(bloque)
+    reparadas = [discrepancia.insumo_id for discrepancia in discrepancias if discrepancia.reparada]
+    if reparadas:
+        # bulk_create y update no emiten señales
+        cambios.registrar_cambio()
+        if reparar:
+            alertas.recalcular(reparadas)
+            ubicaciones.sincronizar(reparadas)
+    return discrepancias
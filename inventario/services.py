@@ -0,0 +1,348 @@
+"""
+Servicios de la aplicación de inventario.
+Concentra las operaciones que modifican el stock para que se ejecuten de
+forma atómica en la base de datos, sin importar desde dónde se invoquen.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from . import alertas, cambios, feed
+from .models import Insumo, Movimiento, StockUbicacion, Ubicacion
+
+# Filas por sentencia INSERT al registrar lotes con bulk_create
+TAMANO_INSERCION = 1000
+
+
+class StockInsuficiente(Exception):
+    """
+    Se lanza cuando una salida supera el stock disponible del insumo.
+
+    Attributes:
+        disponible (int): Stock disponible al momento de la operación
+        solicitado (int): Cantidad que se intentó retirar
+        ubicacion (Ubicacion): Ubicación sin stock suficiente, o None si
+            lo que no alcanza es el stock total
+    """
+
+    def __init__(self, disponible, solicitado, ubicacion=None):
+        self.disponible = disponible
+        self.solicitado = solicitado
+        self.ubicacion = ubicacion
+        donde = f' en {ubicacion}' if ubicacion is not None else ''
+        super().__init__(
+            f'Stock insuficiente{donde}. Disponible: {disponible} unidades. '
+            f'Solicitado: {solicitado} unidades.'
+        )
+
+
+def _ajustar_ubicacion(insumo_id, ubicacion_id, delta):
+    """
+    Suma ``delta`` al stock del insumo en la ubicación.
+
+    Las restas son un UPDATE condicional, como el del stock total. Debe
+    llamarse con la fila del insumo ya bloqueada: así las entradas
+    concurrentes no compiten al crear la fila de la ubicación.
+
+    Raises:
+        StockInsuficiente: Si la resta supera el stock de la ubicación
+    """
+    filas = StockUbicacion.objects.filter(insumo_id=insumo_id, ubicacion_id=ubicacion_id)
+    if delta < 0:
+        if not filas.filter(cantidad__gte=-delta).update(cantidad=F('cantidad') + delta):
+            disponible = filas.values_list('cantidad', flat=True).first()
+            raise StockInsuficiente(
+                disponible or 0, -delta, ubicacion=Ubicacion.objects.get(pk=ubicacion_id)
+            )
+    elif not filas.update(cantidad=F('cantidad') + delta):
+        StockUbicacion.objects.create(insumo_id=insumo_id, ubicacion_id=ubicacion_id, cantidad=delta)
+
+
+def registrar_movimiento(insumo, tipo, cantidad, usuario=None, origen=None, destino=None):
+    """
+    Registra un movimiento y ajusta el stock del insumo en una transacción.
+
+    El ajuste se realiza con un UPDATE condicional sobre ``stock_actual``
+    usando ``F()``, de modo que la base de datos aplica la suma o resta
+    sobre el valor vigente y, en el caso de una SALIDA, solo actualiza la
+    fila si el stock alcanza. Dos salidas concurrentes nunca pueden leer
+    el mismo valor y pisarse entre sí.
+
+    El stock por ubicación se ajusta en la misma transacción (ver
+    ``inventario/ubicaciones.py``): una ENTRADA suma en ``destino`` y una
+    SALIDA resta de ``origen``, por defecto el almacén principal del
+    insumo. Un TRASPASO mueve unidades de ``origen`` a ``destino`` sin
+    cambiar el stock total.
+
+    Args:
+        insumo (Insumo): Insumo a mover
+        tipo (str): 'ENTRADA', 'SALIDA' o 'TRASPASO'
+        cantidad (int): Unidades a mover (positivo)
+        usuario (User): Usuario responsable del movimiento
+        origen (Ubicacion): Ubicación de la que sale el stock
+        destino (Ubicacion): Ubicación a la que entra el stock
+
+    Returns:
+        Movimiento: Movimiento creado
+
+    Raises:
+        StockInsuficiente: Si la salida supera el stock disponible, total
+            o de la ubicación
+        ValueError: Si un traspaso no indica dos ubicaciones distintas
+    """
+    if tipo == 'TRASPASO':
+        if origen is None or destino is None or origen.pk == destino.pk:
+            raise ValueError('Un traspaso requiere dos ubicaciones distintas.')
+        with transaction.atomic():
+            # Bloquea el insumo, como el UPDATE de las entradas y salidas
+            Insumo.objects.select_for_update().filter(pk=insumo.pk).exists()
+            _ajustar_ubicacion(insumo.pk, origen.pk, -cantidad)
+            _ajustar_ubicacion(insumo.pk, destino.pk, cantidad)
+            return Movimiento.objects.create(
+                insumo=insumo, tipo=tipo, cantidad=cantidad, usuario=usuario,
+                origen=origen, destino=destino,
+            )
+
+    delta = cantidad if tipo == 'ENTRADA' else -cantidad
+    with transaction.atomic():
+        filas = Insumo.objects.filter(pk=insumo.pk)
+        if tipo == 'SALIDA':
+            filas = filas.filter(stock_actual__gte=cantidad)
+        if not filas.update(stock_actual=F('stock_actual') + delta):
+            disponible = (
+                Insumo.objects.filter(pk=insumo.pk)
+                .values_list('stock_actual', flat=True)
+                .first()
+            )
+            raise StockInsuficiente(disponible or 0, cantidad)
+        # La fila ya está bloqueada por el UPDATE: el stock leído es el vigente
+        stock, minimo, principal_id = (
+            Insumo.objects.filter(pk=insumo.pk)
+            .values_list('stock_actual', 'stock_minimo', 'ubicacion_principal')
+            .get()
+        )
+        ubicacion = destino if tipo == 'ENTRADA' else origen
+        ubicacion_id = ubicacion.pk if ubicacion is not None else principal_id
+        if ubicacion_id is not None:
+            # Un insumo sin almacén principal solo lleva el stock total
+            _ajustar_ubicacion(insumo.pk, ubicacion_id, delta)
+        alertas.evaluar(insumo.pk, stock, minimo, delta=delta)
+        movimiento = Movimiento.objects.create(
+            insumo=insumo,
+            tipo=tipo,
+            cantidad=cantidad,
+            usuario=usuario,
+            origen_id=ubicacion_id if tipo == 'SALIDA' else None,
+            destino_id=ubicacion_id if tipo == 'ENTRADA' else None,
+        )
+        transaction.on_commit(
+            lambda: feed.publicar_stock(
+                insumo.pk, insumo.codigo, delta, stock=stock, movimiento_id=movimiento.pk
+            ),
+            robust=True,
+        )
+    return movimiento
+
+
+def movimiento_de_ajuste(insumo_id, delta, usuario=None):
+    """
+    Movimiento (sin guardar) que registra un ajuste de ``delta`` unidades.
+
+    Los ajustes son entradas o salidas marcadas con ``ajuste=True``: el
+    saldo del historial los suma como cualquier movimiento y el reporte de
+    consumo los excluye.
+    """
+    return Movimiento(
+        insumo_id=insumo_id, tipo='ENTRADA' if delta > 0 else 'SALIDA',
+        cantidad=abs(delta), usuario=usuario, ajuste=True,
+    )
+
+
+def ajustar_stock(insumo, stock, usuario=None):
+    """
+    Fija el stock de un insumo y registra la diferencia en el historial.
+
+    Es el camino del stock inicial al crear un insumo y de las
+    correcciones manuales: el contador y el historial cambian en la misma
+    transacción, por lo que la reconciliación y el stock histórico siguen
+    coincidiendo con ``stock_actual``. Las ubicaciones no se tocan; la
+    diferencia se asigna al almacén principal con
+    ``ubicaciones.sincronizar``.
+
+    Args:
+        insumo (Insumo): Insumo a ajustar (ya guardado)
+        stock (int): Stock resultante (no negativo)
+        usuario (User): Usuario responsable del ajuste
+
+    Returns:
+        Movimiento: Movimiento de ajuste, o None si el stock no cambió
+    """
+    with transaction.atomic():
+        anterior, minimo = (
+            Insumo.objects.select_for_update()
+            .filter(pk=insumo.pk)
+            .values_list('stock_actual', 'stock_minimo')
+            .get()
+        )
+        delta = stock - anterior
+        if not delta:
+            return None
+        Insumo.objects.filter(pk=insumo.pk).update(stock_actual=stock)
+        movimiento = movimiento_de_ajuste(insumo.pk, delta, usuario=usuario)
+        movimiento.save()
+        alertas.evaluar(insumo.pk, stock, minimo, delta=delta)
+        transaction.on_commit(
+            lambda: feed.publicar_stock(
+                insumo.pk, insumo.codigo, delta, stock=stock, movimiento_id=movimiento.pk
+            ),
+            robust=True,
+        )
+    insumo.stock_actual = stock
+    return movimiento
+
+
+class ResultadoLote:
+    """
+    Resultado de registrar un lote de movimientos.
+
+    Attributes:
+        creados (list): Movimientos creados
+        rechazados (list): Diccionarios ``{'fila': n, 'error': texto}``
+    """
+
+    def __init__(self, creados, rechazados):
+        self.creados = creados
+        self.rechazados = rechazados
+
+    def as_dict(self):
+        """Representación serializable del resultado"""
+        return {
+            'creados': len(self.creados),
+            'rechazados': self.rechazados,
+        }
+
+
+def registrar_lote(filas, usuario=None):
+    """
+    Registra un lote de movimientos con una escritura agregada por insumo.
+
+    Las filas se validan en una sola pasada contra el stock vigente: se
+    bloquean los insumos involucrados, se simula el saldo fila por fila en
+    memoria (en el orden recibido) y se rechazan las salidas que dejarían
+    el stock negativo. Luego se insertan los movimientos aceptados con
+    ``bulk_create`` y se aplica un único UPDATE por insumo, todo dentro de
+    la misma transacción.
+
+    Los movimientos del lote usan el almacén principal de cada insumo, cuyo
+    saldo se simula y se ajusta igual que el total. Los traspasos se
+    registran de a uno con ``registrar_movimiento``.
+
+    Args:
+        filas (list): Diccionarios con las claves ``codigo``, ``tipo`` y
+            ``cantidad``
+        usuario (User): Usuario responsable de los movimientos
+
+    Returns:
+        ResultadoLote: Movimientos creados y filas rechazadas
+    """
+    rechazados = []
+    validas = []
+    tipos = {'ENTRADA', 'SALIDA'}
+    for numero, fila in enumerate(filas, start=1):
+        codigo = str(fila.get('codigo') or '').strip()
+        tipo = str(fila.get('tipo') or '').strip().upper()
+        try:
+            cantidad = int(fila.get('cantidad'))
+        except (TypeError, ValueError):
+            cantidad = 0
+        if not codigo:
+            rechazados.append({'fila': numero, 'error': 'Falta el código del insumo.'})
+        elif tipo not in tipos:
+            rechazados.append({'fila': numero, 'error': f'Tipo de movimiento inválido: "{tipo}".'})
+        elif cantidad <= 0:
+            rechazados.append({'fila': numero, 'error': 'La cantidad debe ser un entero positivo.'})
+        else:
+            validas.append((numero, codigo, tipo, cantidad))
+
+    creados = []
+    with transaction.atomic():
+        codigos = {codigo for _, codigo, _, _ in validas}
+        # El nombre del almacén principal viene en la misma consulta (para los
+        # mensajes de rechazo); solo se bloquean las filas de insumos
+        insumos = {
+            insumo.codigo: insumo
+            for insumo in Insumo.objects.select_for_update(of=('self',))
+            .select_related('ubicacion_principal')
+            .filter(codigo__in=codigos)
+            .only('codigo', 'stock_actual', 'stock_minimo', 'ubicacion_principal__nombre')
+        }
+        saldos = {insumo.pk: insumo.stock_actual for insumo in insumos.values()}
+        # Saldo de cada insumo en su almacén principal
+        ubicados = {
+            insumo.pk: 0 for insumo in insumos.values() if insumo.ubicacion_principal_id
+        }
+        ubicados.update(
+            StockUbicacion.objects.select_for_update()
+            .filter(insumo_id__in=list(ubicados), ubicacion_id=F('insumo__ubicacion_principal'))
+            .values_list('insumo_id', 'cantidad')
+        )
+        deltas = {}
+        nuevos = []
+        for numero, codigo, tipo, cantidad in validas:
+            insumo = insumos.get(codigo)
+            if insumo is None:
+                rechazados.append({'fila': numero, 'error': f'Insumo "{codigo}" no existe.'})
+                continue
+            delta = cantidad if tipo == 'ENTRADA' else -cantidad
+            if saldos[insumo.pk] + delta < 0:
+                rechazados.append({
+                    'fila': numero,
+                    'error': str(StockInsuficiente(saldos[insumo.pk], cantidad)),
+                })
+                continue
+            principal = insumo.ubicacion_principal_id
+            if principal and ubicados[insumo.pk] + delta < 0:
+                rechazados.append({
+                    'fila': numero,
+                    'error': str(StockInsuficiente(
+                        ubicados[insumo.pk], cantidad, ubicacion=insumo.ubicacion_principal
+                    )),
+                })
+                continue
+            if principal:
+                ubicados[insumo.pk] += delta
+            saldos[insumo.pk] += delta
+            deltas[insumo.pk] = deltas.get(insumo.pk, 0) + delta
+            nuevos.append(Movimiento(
+                insumo=insumo, tipo=tipo, cantidad=cantidad, usuario=usuario,
+                origen_id=principal if tipo == 'SALIDA' else None,
+                destino_id=principal if tipo == 'ENTRADA' else None,
+            ))
+
+        if nuevos:
+            creados = Movimiento.objects.bulk_create(nuevos, batch_size=TAMANO_INSERCION)
+        minimos = {insumo.pk: insumo.stock_minimo for insumo in insumos.values()}
+        for insumo_id, delta in deltas.items():
+            if delta:
+                Insumo.objects.filter(pk=insumo_id).update(stock_actual=F('stock_actual') + delta)
+                alertas.evaluar(insumo_id, saldos[insumo_id], minimos[insumo_id], delta=delta)
+        principales = {insumo.pk: insumo.ubicacion_principal_id for insumo in insumos.values()}
+        for insumo_id, delta in deltas.items():
+            if delta and principales[insumo_id]:
+                _ajustar_ubicacion(insumo_id, principales[insumo_id], delta)
+        if nuevos:
+            # bulk_create y update() no emiten señales
+            cambios.registrar_cambio()
+            codigos_por_id = {insumo.pk: codigo for codigo, insumo in insumos.items()}
+
+            def publicar():
+                # Un evento por insumo con su saldo final (ya conocido)
+                for insumo_id, delta in deltas.items():
+                    if delta:
+                        feed.publicar_stock(
+                            insumo_id, codigos_por_id[insumo_id], delta, stock=saldos[insumo_id]
+                        )
+
+            transaction.on_commit(publicar, robust=True)
+
+    rechazados.sort(key=lambda rechazo: rechazo['fila'])
+    return ResultadoLote(creados, rechazados)
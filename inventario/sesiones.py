@@ -0,0 +1,56 @@
+"""
+Sesiones fuera de la base de datos y purga de sesiones vencidas.
+
+El modo de sesión se configura con ``SESSION_MODO`` (ver ``settings.py``).
+Con el modo por defecto ('db') cada petición autenticada lee una fila de
+``django_session``; con 'cached_db', 'cache' o 'firmada' esa lectura se
+resuelve en la cache o en la propia cookie.
+
+La tabla ``django_session`` no se limpia sola: las sesiones vencidas se
+quedan hasta que alguien las borra. ``clearsessions`` de Django las elimina
+con un único DELETE, que en una tabla grande bloquea y llena el log de
+transacciones de una vez. ``purgar`` las elimina por bloques de claves
+primarias, cada uno en su propia transacción, recorriendo el índice de
+``expire_date`` (ver ``inventario/purga.py``).
+"""
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from . import purga
+
+# Sesiones eliminadas por transacción
+TAMANO_BLOQUE = 5000
+
+# Motores que guardan las sesiones en ``django_session``
+MOTORES_CON_TABLA = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+def usa_tabla():
+    """Indica si el motor de sesiones configurado escribe en ``django_session``"""
+    return settings.SESSION_ENGINE in MOTORES_CON_TABLA
+
+
+def vencidas(hasta=None):
+    """Sesiones de la tabla vencidas antes de ``hasta`` (por defecto, ahora)"""
+    return Session.objects.filter(expire_date__lt=hasta or timezone.now())
+
+
+def purgar(tamano=TAMANO_BLOQUE, pausa=0, hasta=None):
+    """
+    Elimina las sesiones vencidas por bloques.
+
+    Args:
+        tamano (int): Sesiones eliminadas por transacción
+        pausa (float): Segundos de espera entre bloques, para ceder el
+            servidor de base de datos a las peticiones en curso
+        hasta (datetime): Elimina las vencidas antes de esta fecha
+
+    Returns:
+        int: Sesiones eliminadas
+    """
+    consulta = vencidas(hasta).order_by('expire_date').values_list('pk', flat=True)
+    return purga.purgar_por_bloques(Session, consulta, tamano, pausa=pausa)
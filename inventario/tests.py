@@ -1,3 +1,1828 @@
-from django.test import TestCase
+"""
+Pruebas de la aplicación de inventario.
+"""
+import asyncio
+import csv
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as hora, timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipIf
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    alertas, api, archivo, benchmark, benchmark_concurrencia, busqueda, cache_versionada, cambios, consumo,
+    feed, generador, idempotencia, inicializacion, middleware, reconciliacion, sesiones, ubicaciones,
+)
+from .exportacion import recorrer_por_bloques
+from .forms import InsumoFiltroForm
+from .models import (
+    AlertaStock, CierreStock, ClaveIdempotencia, ConsumoDiario, Insumo, MarcaCambios, Movimiento,
+    MovimientoArchivado, StockUbicacion, Ubicacion,
+)
+from .pagination import decode_cursor, encode_cursor, keyset_queryset
+from .reconciliacion import reconciliar, saldos_libro, tomar_cierre
+from .services import registrar_lote, registrar_movimiento, StockInsuficiente
+
+
+class InventarioTestCase(TestCase):
+    """Datos base compartidos por las pruebas de vistas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='clave-segura-123')
+        cls.otro = User.objects.create_user(username='otro', password='clave-segura-123')
+        cls.hacha = Insumo.objects.create(
+            codigo='HER-002', nombre='Hacha Forestal', stock_actual=40, ubicacion='A2'
+        )
+        cls.casco = Insumo.objects.create(
+            codigo='EPP-001', nombre='Casco Forestal', stock_actual=30, ubicacion='B1'
+        )
+
+    def setUp(self):
+        # La base de datos vuelve a su estado inicial en cada prueba, sin
+        # señales que invaliden la cache de lecturas
+        cache.clear()
+        self.client.force_login(self.user)
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        """
+        Falla si el bloque ejecuta más de ``budget`` consultas SQL.
+
+        A diferencia de ``assertNumQueries`` no exige un número exacto, de
+        modo que solo un aumento (por ejemplo, consultas por fila) rompe
+        la prueba.
+        """
+        with CaptureQueriesContext(connection) as ctx:
+            yield ctx
+        ejecutadas = len(ctx.captured_queries)
+        if ejecutadas > budget:
+            detalle = '\n'.join(q['sql'] for q in ctx.captured_queries)
+            self.fail(f'{ejecutadas} consultas ejecutadas, presupuesto {budget}:\n{detalle}')
+
+    def crear_movimientos(self, cantidad, insumo=None, tipo='ENTRADA', usuario=None, inicio=None):
+        """Crea ``cantidad`` movimientos con fechas separadas por un minuto"""
+        inicio = inicio or timezone.now() - timedelta(days=1)
+        movimientos = Movimiento.objects.bulk_create([
+            Movimiento(
+                insumo=insumo or self.hacha,
+                tipo=tipo,
+                cantidad=1,
+                usuario=usuario or self.user,
+            )
+            for _ in range(cantidad)
+        ])
+        # auto_now_add ignora el valor asignado al crear; se fija después
+        for i, mov in enumerate(movimientos):
+            mov.fecha = inicio + timedelta(minutes=i)
+        Movimiento.objects.bulk_update(movimientos, ['fecha'])
+        return movimientos
+
+
+class KeysetPaginationTests(InventarioTestCase):
+    """Pruebas de la paginación por cursor del historial de movimientos"""
+
+    def test_cursor_ida_y_vuelta(self):
+        fecha = timezone.now()
+        self.assertEqual(decode_cursor(encode_cursor(fecha, 42)), (fecha, 42))
+
+    @skipIf(connection.vendor != 'sqlite', 'El plan se comprueba con EXPLAIN QUERY PLAN de SQLite')
+    def test_pagina_profunda_usa_rango_del_indice(self):
+        cursor = encode_cursor(timezone.now(), 10)
+        for consulta, rango in (
+            (Movimiento.objects.all(), 'fecha<?'),
+            (Movimiento.objects.filter(tipo='SALIDA'), 'tipo=? AND fecha<?'),
+        ):
+            plan = keyset_queryset(consulta, 50, after=cursor).explain()
+            # Búsqueda por rango (SEARCH ... fecha<?), no un recorrido del índice (SCAN)
+            self.assertIn(rango, plan)
+            self.assertNotIn('SCAN', plan)
+
+    def test_cursor_invalido_responde_404(self):
+        response = self.client.get(reverse('movimiento_list'), {'despues': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_recorre_todas_las_paginas_sin_repetir(self):
+        creados = self.crear_movimientos(120)
+        # Dos movimientos con la misma fecha para probar el desempate por id
+        Movimiento.objects.filter(pk=creados[10].pk).update(fecha=creados[11].fecha)
+
+        vistos = []
+        params = {}
+        while True:
+            response = self.client.get(reverse('movimiento_list'), params)
+            page = response.context['page_obj']
+            vistos.extend(mov.pk for mov in page)
+            if not page.has_next():
+                break
+            params = {'despues': page.next_cursor}
+
+        self.assertEqual(len(vistos), 120)
+        self.assertEqual(len(set(vistos)), 120)
+
+    def test_pagina_anterior(self):
+        self.crear_movimientos(120)
+        primera = self.client.get(reverse('movimiento_list')).context['page_obj']
+        segunda = self.client.get(
+            reverse('movimiento_list'), {'despues': primera.next_cursor}
+        ).context['page_obj']
+        anterior = self.client.get(
+            reverse('movimiento_list'), {'antes': segunda.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual([m.pk for m in anterior], [m.pk for m in primera])
+        self.assertFalse(anterior.has_previous())
+
+    def test_filtros(self):
+        self.crear_movimientos(3, insumo=self.hacha)
+        self.crear_movimientos(2, insumo=self.casco, tipo='SALIDA', usuario=self.otro)
+        url = reverse('movimiento_list')
+
+        response = self.client.get(url, {'insumo': self.casco.pk})
+        self.assertEqual(len(response.context['movimientos']), 2)
+        response = self.client.get(url, {'tipo': 'ENTRADA'})
+        self.assertEqual(len(response.context['movimientos']), 3)
+        response = self.client.get(url, {'usuario': self.otro.pk, 'tipo': 'SALIDA'})
+        self.assertEqual(len(response.context['movimientos']), 2)
+
+    def test_filtro_rango_de_fechas(self):
+        hace_diez_dias = timezone.now() - timedelta(days=10)
+        self.crear_movimientos(2, inicio=hace_diez_dias)
+        self.crear_movimientos(4)
+        desde = timezone.localdate() - timedelta(days=3)
+        response = self.client.get(reverse('movimiento_list'), {'fecha_desde': desde.isoformat()})
+        self.assertEqual(len(response.context['movimientos']), 4)
+        hasta = timezone.localdate(hace_diez_dias)
+        response = self.client.get(reverse('movimiento_list'), {'fecha_hasta': hasta.isoformat()})
+        self.assertEqual(len(response.context['movimientos']), 2)
+
+
+class QueryBudgetTests(InventarioTestCase):
+    """Los listados deben usar un número fijo de consultas, sin importar las filas"""
+
+    # Sesión, usuario, marca de cambios (ETag), opciones del filtro de
+    # usuarios y la página del historial activo y del archivo (los insumos
+    # se buscan bajo demanda con el selector)
+    PRESUPUESTO_MOVIMIENTOS = 6
+    # Sesión, usuario, marca de cambios (ETag), el total y la página de
+    # insumos y, con la cache vacía, las opciones del filtro por almacén
+    PRESUPUESTO_INSUMOS = 6
+
+    def test_listado_movimientos(self):
+        self.crear_movimientos(25, insumo=self.hacha)
+        self.crear_movimientos(25, insumo=self.casco, usuario=self.otro)
+        with self.assertQueryBudget(self.PRESUPUESTO_MOVIMIENTOS):
+            response = self.client.get(reverse('movimiento_list'))
+        self.assertContains(response, 'Casco Forestal')
+        self.assertContains(response, 'otro')
+
+    def test_listado_insumos(self):
+        Insumo.objects.bulk_create([
+            Insumo(codigo=f'REP-{i:03d}', nombre=f'Repuesto {i}', ubicacion='C1')
+            for i in range(40)
+        ])
+        with self.assertQueryBudget(self.PRESUPUESTO_INSUMOS):
+            response = self.client.get(reverse('insumo_list'))
+        self.assertContains(response, 'REP-039')
+
+
+class InsumoBusquedaTests(InventarioTestCase):
+    """Pruebas del selector de insumos con búsqueda bajo demanda"""
+
+    def buscar(self, termino, **extra):
+        response = self.client.get(reverse('insumo_buscar'), {'q': termino, **extra})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['resultados']
+
+    def test_busca_por_prefijo_de_codigo_y_nombre(self):
+        Insumo.objects.create(codigo='HER-010', nombre='Motosierra', ubicacion='A1')
+        self.assertEqual([r['codigo'] for r in self.buscar('her')], ['HER-002', 'HER-010'])
+        resultado = self.buscar('casco')
+        self.assertEqual(resultado, [
+            {'id': self.casco.pk, 'codigo': 'EPP-001', 'nombre': 'Casco Forestal', 'stock': 30}
+        ])
+        self.assertEqual(self.buscar(''), [])
+        self.assertEqual(len(self.buscar('her', limite=1)), 1)
+
+    def test_formulario_no_carga_todas_las_opciones(self):
+        Insumo.objects.bulk_create([
+            Insumo(codigo=f'REP-{i:03d}', nombre=f'Repuesto {i}', ubicacion='C1')
+            for i in range(200)
+        ])
+        # Sesión, usuario y opciones de almacén (cache vacía)
+        with self.assertQueryBudget(3):
+            response = self.client.get(reverse('movimiento_create'))
+        self.assertNotContains(response, 'REP-150')
+        self.assertContains(response, reverse('insumo_buscar'))
+
+    def test_formulario_valida_el_insumo_elegido(self):
+        datos = {'insumo': self.hacha.pk, 'tipo': 'ENTRADA', 'cantidad': 5}
+        response = self.client.post(reverse('movimiento_create'), datos)
+        self.assertRedirects(response, reverse('movimiento_list'))
+        response = self.client.post(reverse('movimiento_create'), {**datos, 'insumo': 999999})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['form'].is_valid())
+
+
+class BusquedaTextoTests(InventarioTestCase):
+    """Pruebas de la búsqueda de texto completo del listado de insumos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.motosierra = Insumo.objects.create(
+            codigo='HER-100', nombre='Motosierra STIHL', ubicacion='A1',
+            descripcion='Motosierra a gasolina para tala',
+        )
+        cls.cadena = Insumo.objects.create(
+            codigo='REP-200', nombre='Cadena', ubicacion='C1',
+            descripcion='Repuesto para motosierra',
+        )
+
+    def test_terminos_normalizados(self):
+        self.assertEqual(busqueda.terminos('HER-002 Pantalón Anticorte'), ['her', '002', 'pantalon', 'anticorte'])
+
+    def test_ordena_por_relevancia_y_acepta_prefijos(self):
+        response = self.client.get(reverse('insumo_list'), {'q': 'motosierra'})
+        codigos = [insumo.codigo for insumo in response.context['insumos']]
+        # El nombre pesa más que la descripción
+        self.assertEqual(codigos, ['HER-100', 'REP-200'])
+        response = self.client.get(reverse('insumo_list'), {'q': 'casc'})
+        self.assertEqual([i.codigo for i in response.context['insumos']], ['EPP-001'])
+        response = self.client.get(reverse('insumo_list'), {'q': 'inexistente'})
+        self.assertContains(response, 'No se encontraron insumos')
+
+    def test_indice_sigue_los_cambios(self):
+        self.client.get(reverse('insumo_list'), {'q': 'motosierra'})
+        self.cadena.nombre = 'Cadena Oregon'
+        self.cadena.descripcion = ''
+        self.cadena.save()
+        Insumo.objects.create(codigo='HER-300', nombre='Motosierra Husqvarna', ubicacion='A1')
+        self.motosierra.delete()
+        response = self.client.get(reverse('insumo_list'), {'q': 'motosierra'})
+        self.assertEqual([i.codigo for i in response.context['insumos']], ['HER-300'])
+
+    def test_pagina_resultados_con_as_of(self):
+        Insumo.objects.bulk_create([
+            Insumo(codigo=f'COM-{i:03d}', nombre=f'Aceite {i}', ubicacion='D1')
+            for i in range(60)
+        ])
+        dia = timezone.localdate().isoformat()
+        # La primera búsqueda construye el índice; las siguientes solo
+        # comprueban su firma (totales y marca ``insumos``). ``as_of``
+        # consulta el último cierre y la fecha más reciente del archivo
+        self.client.get(reverse('insumo_list'), {'q': 'aceite'})
+        with self.assertQueryBudget(8):
+            response = self.client.get(reverse('insumo_list'), {'q': 'aceite', 'as_of': dia, 'page': 2})
+        page = response.context['page_obj']
+        self.assertEqual(page.paginator.count, 60)
+        self.assertEqual(len(page.object_list), 10)
+        self.assertEqual(page.object_list[0].stock_al, 0)
+        self.assertContains(response, 'page=1')
+
+    def test_recortar_resultados_no_carga_insumos(self):
+        with self.assertNumQueries(0):
+            resultados = busqueda.ResultadosRanqueados(Insumo.objects.all(), [
+                self.cadena.pk, self.motosierra.pk, self.casco.pk,
+            ])[:2]
+        self.assertEqual(resultados.count(), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(resultados[1:]), [self.motosierra])
+
+    def test_indice_detecta_ediciones_sin_senales(self):
+        self.client.get(reverse('insumo_list'), {'q': 'motosierra'})
+        # Edición hecha por otro proceso (o con ``update()``): misma cantidad
+        # y último id, pero sube la marca de cambios de insumos
+        with self.captureOnCommitCallbacks(execute=True):
+            Insumo.objects.filter(pk=self.cadena.pk).update(descripcion='Repuesto para tala')
+            cambios.registrar_cambio(insumos=True)
+        response = self.client.get(reverse('insumo_list'), {'q': 'motosierra'})
+        self.assertEqual([i.codigo for i in response.context['insumos']], ['HER-100'])
+
+    def test_exportar_busqueda(self):
+        response = self.client.get(reverse('insumo_exportar'), {'q': 'motosierra'})
+        contenido = b''.join(response.streaming_content).decode('utf-8-sig')
+        filas = list(csv.reader(StringIO(contenido)))
+        self.assertEqual(sorted(fila[1] for fila in filas[1:]), ['HER-100', 'REP-200'])
+
+
+class CacheVersionadaTests(InventarioTestCase):
+    """Pruebas de la cache de lecturas del listado y del catálogo"""
+
+    def setUp(self):
+        super().setUp()
+        cache_versionada.reiniciar_estadisticas()
+
+    def stock_listado(self, codigo):
+        response = self.client.get(reverse('insumo_list'))
+        return {i.codigo: i.stock_actual for i in response.context['insumos']}[codigo]
+
+    def test_aciertos_sin_consultar_la_tabla(self):
+        self.client.get(reverse('insumo_list'))
+        with self.assertNumQueries(3):  # Solo sesión, usuario y marca de cambios
+            response = self.client.get(reverse('insumo_list'))
+        self.assertContains(response, 'HER-002')
+        self.assertEqual(
+            cache_versionada.estadisticas()['insumos'],
+            {'aciertos': 1, 'fallos': 1, 'tasa': 0.5},
+        )
+
+    def test_guarda_solo_la_pagina(self):
+        Insumo.objects.bulk_create([
+            Insumo(codigo=f'REP-{i:03d}', nombre=f'Repuesto {i}', ubicacion='C1')
+            for i in range(60)
+        ])
+        response = self.client.get(reverse('insumo_list'), {'page': 2})
+        self.assertEqual(response.context['paginator'].count, 62)
+        self.assertEqual(len(response.context['insumos']), 12)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('insumo_list'), {'page': 2})
+        self.assertEqual(response.context['insumos'][-1].codigo, 'REP-059')
+        self.assertContains(response, 'page=1')
+        self.assertEqual(self.client.get(reverse('insumo_list'), {'page': 9}).status_code, 404)
+
+    def test_estadisticas_para_el_personal(self):
+        self.client.get(reverse('insumo_list'))
+        self.client.get(reverse('insumo_list'))
+        url = reverse('cache_estadisticas')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        datos = self.client.get(url).json()
+        self.assertEqual(datos['pid'], os.getpid())
+        self.assertEqual(datos['espacios']['insumos'], {'aciertos': 1, 'fallos': 1, 'tasa': 0.5})
+
+    def test_movimientos_invalidan(self):
+        self.assertEqual(self.stock_listado('HER-002'), 40)
+        registrar_movimiento(self.hacha, 'SALIDA', 5, usuario=self.user)
+        self.assertEqual(self.stock_listado('HER-002'), 35)
+        # La carga masiva usa bulk_create y update(), sin señales
+        registrar_lote([{'codigo': 'HER-002', 'tipo': 'ENTRADA', 'cantidad': 10}])
+        self.assertEqual(self.stock_listado('HER-002'), 45)
+
+    def test_catalogo_del_selector(self):
+        url = reverse('insumo_buscar')
+        self.client.get(url, {'q': 'HER'})
+        with self.assertNumQueries(2):
+            resultados = self.client.get(url, {'q': 'her'}).json()['resultados']
+        self.assertEqual(resultados[0]['stock'], 40)
+        self.hacha.nombre = 'Hacha'
+        self.hacha.save()
+        self.assertEqual(self.client.get(url, {'q': 'HER'}).json()['resultados'][0]['nombre'], 'Hacha')
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.mkdtemp(prefix='inventario-cache-'),
+    }})
+    def test_backend_de_archivos(self):
+        self.assertEqual(self.stock_listado('EPP-001'), 30)
+        self.assertEqual(self.stock_listado('EPP-001'), 30)
+        registrar_movimiento(self.casco, 'ENTRADA', 3, usuario=self.user)
+        self.assertEqual(self.stock_listado('EPP-001'), 33)
+        self.assertEqual(cache_versionada.estadisticas()['insumos']['aciertos'], 1)
+
+
+class RespuestaCondicionalTests(InventarioTestCase):
+    """Pruebas de ETag/Last-Modified en los listados"""
+
+    def test_304_sin_consultas_del_listado(self):
+        for ruta in ('insumo_list', 'movimiento_list'):
+            with self.subTest(ruta=ruta):
+                response = self.client.get(reverse(ruta))
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('no-cache', response['Cache-Control'])
+                with self.assertNumQueries(3):  # Sesión, usuario y marca de cambios
+                    response = self.client.get(reverse(ruta), HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_cambios_y_parametros_cambian_la_etag(self):
+        etag = self.client.get(reverse('insumo_list'))['ETag']
+        filtrado = self.client.get(reverse('insumo_list'), {'q': 'hacha'})
+        self.assertNotEqual(filtrado['ETag'], etag)
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_movimiento(self.hacha, 'ENTRADA', 1, usuario=self.user)
+        response = self.client.get(reverse('insumo_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(MarcaCambios.objects.get().version, 1)
+
+    def test_last_modified(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.casco.save()
+        response = self.client.get(reverse('movimiento_list'))
+        response = self.client.get(
+            reverse('movimiento_list'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_usuario_distinto_y_mensajes_pendientes(self):
+        etag = self.client.get(reverse('insumo_list'))['ETag']
+        self.client.force_login(self.otro)
+        response = self.client.get(reverse('insumo_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        # Tras crear un insumo la vista redirige al listado con un mensaje. La
+        # marca aún no cambia (el commit no ocurre dentro de la prueba); el
+        # mensaje pendiente es lo que evita el 304
+        datos = {
+            'codigo': 'REP-001', 'nombre': 'Bujía', 'stock_actual': 1, 'stock_minimo': 2, 'ubicacion': 'C1',
+        }
+        response = self.client.post(reverse('insumo_create'), datos, follow=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'REP-001')
+
+
+class BrokerDePrueba:
+    """Reemplazo del broker que solo registra lo publicado"""
+
+    def __init__(self):
+        self.eventos = []
+
+    def publicar(self, evento):
+        self.eventos.append(evento)
+        return len(self.eventos)
+
+
+class StockFeedTests(InventarioTestCase):
+    """Pruebas del canal en vivo de cambios de stock"""
+
+    def usar_broker(self, broker):
+        anterior = feed.configurar_broker(broker)
+        self.addCleanup(feed.configurar_broker, anterior)
+        return broker
+
+    def test_servicios_publican_despues_del_commit(self):
+        broker = self.usar_broker(BrokerDePrueba())
+        with self.captureOnCommitCallbacks(execute=True):
+            movimiento = registrar_movimiento(self.hacha, 'SALIDA', 5, usuario=self.user)
+            self.assertEqual(broker.eventos, [])
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_lote([
+                {'codigo': 'EPP-001', 'tipo': 'ENTRADA', 'cantidad': 4},
+                {'codigo': 'EPP-001', 'tipo': 'SALIDA', 'cantidad': 1},
+            ])
+        self.assertEqual(broker.eventos, [
+            {'tipo': 'stock', 'insumo': self.hacha.pk, 'codigo': 'HER-002', 'delta': -5,
+             'stock': 35, 'movimiento': movimiento.pk},
+            {'tipo': 'stock', 'insumo': self.casco.pk, 'codigo': 'EPP-001', 'delta': 3,
+             'stock': 33, 'movimiento': None},
+        ])
+
+    def test_edicion_del_stock_publica(self):
+        broker = self.usar_broker(BrokerDePrueba())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('insumo_update', args=[self.hacha.pk]), {
+                'codigo': 'HER-002', 'nombre': 'Hacha Forestal', 'stock_actual': 45,
+                'stock_minimo': 0, 'ubicacion': 'A2',
+            })
+        ajuste = Movimiento.objects.get(insumo=self.hacha, ajuste=True)
+        self.assertEqual(broker.eventos, [
+            {'tipo': 'stock', 'insumo': self.hacha.pk, 'codigo': 'HER-002', 'delta': 5,
+             'stock': 45, 'movimiento': ajuste.pk},
+        ])
+
+    def test_contrapresion_y_reanudacion(self):
+        async def escenario():
+            broker = feed.BrokerLocal(capacidad=3, historial=5)
+            lento = broker.suscribir()
+            filtrado = broker.suscribir(filtro={self.casco.pk})
+            # Se publica desde otro hilo, como lo hacen las vistas síncronas
+            hilo = threading.Thread(target=lambda: [
+                broker.publicar({'tipo': 'stock', 'insumo': self.hacha.pk}) for _ in range(5)
+            ])
+            hilo.start()
+            hilo.join()
+            await asyncio.sleep(0)
+            self.assertEqual(await lento.siguiente(timeout=1), {'tipo': 'reinicio'})
+            self.assertEqual((await lento.siguiente(timeout=1))['id'], 5)
+            self.assertIsNone(await filtrado.siguiente(timeout=0.01))
+            # Reanudar desde el evento 3 reenvía 4 y 5; desde 0 ya se perdió el 1
+            reanudada = broker.suscribir(desde=3)
+            self.assertEqual([(await reanudada.siguiente(timeout=1))['id'] for _ in range(2)], [4, 5])
+            self.assertEqual(await broker.suscribir(desde=-1).siguiente(timeout=1), {'tipo': 'reinicio'})
+            # El flujo se suscribe al empezar y, al desconectarse el cliente,
+            # cierra la suscripción
+            self.assertEqual(broker.conexiones, 4)
+            flujo = feed.eventos_sse(broker, latido=0.01)
+            self.assertEqual(broker.conexiones, 4)
+            self.assertEqual(await anext(flujo), 'retry: 3000\n\n')
+            self.assertEqual(broker.conexiones, 5)
+            self.assertEqual(await anext(flujo), ': latido\n\n')
+            await flujo.aclose()
+            self.assertEqual(broker.conexiones, 4)
+            # Un flujo que nunca se envió no deja suscripciones
+            await feed.eventos_sse(broker).aclose()
+            self.assertEqual(broker.conexiones, 4)
+
+        asyncio.run(escenario())
+
+    async def test_flujo_sse(self):
+        broker = self.usar_broker(feed.BrokerLocal())
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('stock_feed'), {'insumo': self.hacha.pk})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        flujo = aiter(response.streaming_content)
+        self.assertEqual(await anext(flujo), b'retry: 3000\n\n')
+        feed.publicar_stock(self.casco.pk, 'EPP-001', 2)
+        feed.publicar_stock(self.hacha.pk, 'HER-002', -1, stock=39)
+        evento = (await anext(flujo)).decode()
+        self.assertTrue(evento.startswith('id: 2\nevent: stock\n'))
+        self.assertEqual(json.loads(evento.split('data: ')[1])['stock'], 39)
+        self.assertEqual(broker.conexiones, 1)
+
+    def test_requiere_asgi(self):
+        self.assertEqual(self.client.get(reverse('stock_feed')).status_code, 501)
+
+
+@tag('benchmark')
+class FeedBenchmark(TestCase):
+    """Conexiones inactivas por proceso y costo de publicar a todas"""
+
+    CONEXIONES = 5000
+
+    def test_miles_de_conexiones_inactivas(self):
+        async def escenario():
+            broker = feed.BrokerLocal()
+            suscripciones = [broker.suscribir() for _ in range(self.CONEXIONES)]
+            esperas = [asyncio.ensure_future(s.siguiente(timeout=10)) for s in suscripciones]
+            await asyncio.sleep(0)
+            broker.publicar({'tipo': 'stock', 'insumo': 1})
+            return await asyncio.gather(*esperas)
+
+        recibidos = asyncio.run(escenario())
+        self.assertEqual(len([evento for evento in recibidos if evento]), self.CONEXIONES)
+
+
+class VistasAsincronasTests(InventarioTestCase):
+    """Las versiones asíncronas responden lo mismo que las síncronas"""
+
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.user)
+
+    async def test_listados_equivalentes(self):
+        await sync_to_async(self.crear_movimientos)(60, insumo=self.casco)
+        for sincrona, asincrona, variable in (
+            ('insumo_list', 'insumo_list_async', 'insumos'),
+            ('movimiento_list', 'movimiento_list_async', 'movimientos'),
+        ):
+            with self.subTest(vista=asincrona):
+                esperado = await sync_to_async(self.client.get)(reverse(sincrona))
+                response = await self.async_client.get(reverse(asincrona))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [obj.pk for obj in response.context[variable]],
+                    [obj.pk for obj in esperado.context[variable]],
+                )
+                response = await self.async_client.get(
+                    reverse(asincrona), headers={'if-none-match': response['ETag']}
+                )
+                self.assertEqual(response.status_code, 304)
+
+    async def test_pagina_de_insumos(self):
+        await Insumo.objects.abulk_create([
+            Insumo(codigo=f'REP-{i:03d}', nombre=f'Repuesto {i}', ubicacion='C1')
+            for i in range(60)
+        ])
+        esperado = await sync_to_async(self.client.get)(reverse('insumo_list'), {'page': 'last'})
+        # Sin la entrada que guardó la vista síncrona
+        await sync_to_async(cache.clear)()
+        response = await self.async_client.get(reverse('insumo_list_async'), {'page': 'last'})
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual(
+            [i.pk for i in response.context['insumos']], [i.pk for i in esperado.context['insumos']]
+        )
+        response = await self.async_client.get(reverse('insumo_list_async'), {'page': 3})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_pagina_siguiente_y_filtros(self):
+        await sync_to_async(self.crear_movimientos)(60, insumo=self.casco)
+        await sync_to_async(self.crear_movimientos)(5, insumo=self.hacha)
+        primera = await self.async_client.get(reverse('movimiento_list_async'))
+        cursor = primera.context['page_obj'].next_cursor
+        segunda = await self.async_client.get(reverse('movimiento_list_async'), {'despues': cursor})
+        self.assertEqual(len(segunda.context['movimientos']), 15)
+        filtrada = await self.async_client.get(reverse('movimiento_list_async'), {'insumo': self.hacha.pk})
+        self.assertEqual(len(filtrada.context['movimientos']), 5)
+
+    async def test_requiere_sesion(self):
+        await self.async_client.alogout()
+        response = await self.async_client.get(reverse('insumo_list_async'))
+        self.assertEqual(response.status_code, 302)
+        response = await self.async_client.get(reverse('api_insumos'))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_api_json(self):
+        await sync_to_async(self.crear_movimientos)(3, insumo=self.casco)
+
+        async def leer(ruta, params):
+            response = await self.async_client.get(reverse(ruta), params)
+            return json.loads(b''.join([parte async for parte in response.streaming_content]))
+
+        datos = await leer('api_insumos', {'limite': 1})
+        self.assertEqual(datos['total'], 2)
+        self.assertEqual(datos['resultados'][0]['codigo'], 'HER-002')
+        datos = await leer('api_insumos', {'despues': datos['siguiente']})
+        self.assertEqual([f['codigo'] for f in datos['resultados']], ['EPP-001'])
+        self.assertIsNone(datos['siguiente'])
+        datos = await leer('api_movimientos', {'limite': 2})
+        self.assertEqual(len(datos['resultados']), 2)
+        self.assertEqual(datos['resultados'][0]['insumo_codigo'], 'EPP-001')
+        restante = await leer('api_movimientos', {'despues': datos['siguiente']})
+        self.assertEqual(len(restante['resultados']), 1)
+        response = await self.async_client.get(reverse('api_movimientos'), {'tipo': 'OTRO'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ApiTests(InventarioTestCase):
+    """API JSON: campos, cursores, flujo y compresión"""
+
+    def leer(self, response):
+        contenido = b''.join(response.streaming_content) if response.streaming else response.content
+        if response.get('Content-Encoding') == 'gzip':
+            contenido = gzip.decompress(contenido)
+        return json.loads(contenido)
+
+    def test_campos_seleccionados(self):
+        self.crear_movimientos(3, insumo=self.casco)
+        datos = self.leer(self.client.get(reverse('api_movimientos'), {'fields': 'cantidad,tipo'}))
+        self.assertEqual(datos['resultados'][0], {'cantidad': 1, 'tipo': 'ENTRADA'})
+        datos = self.leer(self.client.get(
+            reverse('api_insumo_detalle', args=[self.casco.pk]), {'fields': 'codigo,stock_actual'}
+        ))
+        self.assertEqual(datos, {'codigo': 'EPP-001', 'stock_actual': 30})
+        response = self.client.get(reverse('api_insumos'), {'fields': 'codigo,precio'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('precio', response.json()['error'])
+        response = self.client.get(reverse('api_movimiento_detalle', args=[999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_paginas_en_ambos_sentidos(self):
+        movimientos = self.crear_movimientos(7, insumo=self.hacha)
+        esperados = [m.pk for m in sorted(movimientos, key=lambda m: m.fecha, reverse=True)]
+        primera = self.leer(self.client.get(reverse('api_movimientos'), {'limite': 3, 'fields': 'id'}))
+        segunda = self.leer(self.client.get(
+            reverse('api_movimientos'), {'limite': 3, 'fields': 'id', 'despues': primera['siguiente']}
+        ))
+        self.assertIsNone(primera['anterior'])
+        self.assertEqual([f['id'] for f in primera['resultados'] + segunda['resultados']], esperados[:6])
+        volver = self.leer(self.client.get(
+            reverse('api_movimientos'), {'limite': 3, 'fields': 'id', 'antes': segunda['anterior']}
+        ))
+        self.assertEqual(volver['resultados'], primera['resultados'])
+        response = self.client.get(reverse('api_movimientos'), {'despues': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_flujo_en_bloques_y_comprimido(self):
+        self.crear_movimientos(1200, insumo=self.hacha)
+        with self.assertQueryBudget(5):
+            response = self.client.get(
+                reverse('api_movimientos'), {'limite': 1100}, headers={'accept-encoding': 'gzip, br;q=0'}
+            )
+            partes = list(response.streaming_content)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        plano = gzip.decompress(b''.join(partes))
+        datos = json.loads(plano)
+        self.assertEqual(len(datos['resultados']), 1100)
+        self.assertIsNotNone(datos['siguiente'])
+        self.assertLess(sum(map(len, partes)), len(plano) / 5)
+
+    def test_negociacion(self):
+        solicitud = RequestFactory()
+        for encabezado, esperado in (
+            ('', None),
+            ('gzip', 'gzip'),
+            ('gzip;q=0', None),
+            ('identity, *;q=0.5', 'br' if api.brotli else 'gzip'),
+            ('br;q=0.4, gzip;q=0.8', 'gzip'),
+        ):
+            with self.subTest(encabezado=encabezado):
+                request = solicitud.get('/', headers={'accept-encoding': encabezado})
+                self.assertEqual(api.negociar_codificacion(request), esperado)
+
+
+@tag('benchmark')
+class ConcurrenciaBenchmark(TransactionTestCase):
+    """Peticiones por segundo con clientes lentos bajo WSGI y ASGI"""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Requiere una base de datos en archivo o servidor (TEST NAME)')
+        call_command('populate_db', insumos=50, movimientos=300, users=2, workers=1, stdout=StringIO())
+
+    def test_clientes_lentos(self):
+        resultados = benchmark_concurrencia.ejecutar(
+            clientes=20, hilos=2, lentitud=0.5, vistas=['api_movimientos']
+        )
+        for nombre, modos in resultados.items():
+            for modo, m in modos.items():
+                self.assertEqual(m['status'], [200], (nombre, modo))
+            # Con 2 hilos y 0,5 s por cliente WSGI no supera 4 req/s; el
+            # event loop no queda limitado por los clientes lentos
+            self.assertGreater(
+                modos['asgi_vista_asincrona']['peticiones_por_segundo'],
+                modos['wsgi']['peticiones_por_segundo'],
+            )
+
+
+class RegistrarMovimientoTests(InventarioTestCase):
+    """Pruebas del ajuste atómico de stock"""
+
+    def test_entrada_y_salida(self):
+        registrar_movimiento(self.hacha, 'ENTRADA', 10, usuario=self.user)
+        registrar_movimiento(self.hacha, 'SALIDA', 25, usuario=self.user)
+        self.hacha.refresh_from_db()
+        self.assertEqual(self.hacha.stock_actual, 25)
+        self.assertEqual(Movimiento.objects.filter(insumo=self.hacha).count(), 2)
+
+    def test_salida_sin_stock_no_escribe(self):
+        with self.assertRaises(StockInsuficiente) as ctx:
+            registrar_movimiento(self.casco, 'SALIDA', 31, usuario=self.user)
+        self.assertEqual(ctx.exception.disponible, 30)
+        self.casco.refresh_from_db()
+        self.assertEqual(self.casco.stock_actual, 30)
+        self.assertFalse(Movimiento.objects.exists())
+
+    def test_vista_muestra_error_sin_stock(self):
+        datos = {'insumo': self.casco.pk, 'tipo': 'SALIDA', 'cantidad': 31}
+        response = self.client.post(reverse('movimiento_create'), datos)
+        self.assertContains(response, 'Stock insuficiente')
+        self.assertFalse(Movimiento.objects.exists())
+
+
+class AlertasStockTests(InventarioTestCase):
+    """Alertas de reorden mantenidas en el camino de los movimientos"""
+
+    def en_alerta(self):
+        return set(AlertaStock.objects.values_list('insumo__codigo', flat=True))
+
+    def test_movimientos_que_cruzan_el_minimo(self):
+        registrar_movimiento(self.casco, 'SALIDA', 15, usuario=self.user)
+        self.assertEqual(self.en_alerta(), set())
+        registrar_movimiento(self.casco, 'SALIDA', 5, usuario=self.user)
+        self.assertEqual(self.en_alerta(), {'EPP-001'})
+        # Seguir bajando no vuelve a escribir la alerta
+        with CaptureQueriesContext(connection) as consultas:
+            registrar_movimiento(self.casco, 'SALIDA', 1, usuario=self.user)
+        self.assertFalse([q for q in consultas.captured_queries if 'alertastock' in q['sql']])
+        registrar_movimiento(self.casco, 'ENTRADA', 20, usuario=self.user)
+        self.assertEqual(self.en_alerta(), set())
+
+    def test_lote_y_edicion_del_minimo(self):
+        registrar_lote([
+            {'codigo': 'HER-002', 'tipo': 'SALIDA', 'cantidad': 35},
+            {'codigo': 'EPP-001', 'tipo': 'SALIDA', 'cantidad': 5},
+        ], usuario=self.user)
+        self.assertEqual(self.en_alerta(), {'HER-002'})
+        self.casco.refresh_from_db()
+        self.casco.stock_minimo = 25
+        self.casco.save()
+        self.assertEqual(self.en_alerta(), {'HER-002', 'EPP-001'})
+
+    def test_recalcular_y_reporte(self):
+        Insumo.objects.filter(pk=self.hacha.pk).update(stock_actual=0)
+        AlertaStock.objects.create(insumo=self.casco)
+        self.assertEqual(alertas.recalcular(), (1, 1))
+        self.assertEqual(self.en_alerta(), {'HER-002'})
+
+        with self.assertQueryBudget(5):
+            response = self.client.get(reverse('alerta_list'))
+        self.assertContains(response, 'HER-002')
+        self.assertNotContains(response, 'EPP-001')
+        self.assertEqual(response.context['alertas'][0].faltante, 10)
+
+        salida = StringIO()
+        call_command('reporte_reorden', '--csv', stdout=salida)
+        filas = list(csv.reader(StringIO(salida.getvalue())))
+        self.assertEqual(filas[1][:5], ['HER-002', 'Hacha Forestal', '0', '10', '10'])
+
+
+class ConsumoTests(InventarioTestCase):
+    """Agregados diarios incrementales y pronóstico de quiebre"""
+
+    def mediodia(self, dias_atras):
+        return timezone.make_aware(
+            datetime.combine(timezone.localdate() - timedelta(days=dias_atras), hora(12))
+        )
+
+    def agregados(self):
+        return list(ConsumoDiario.objects.values_list('insumo__codigo', 'dia', 'tipo', 'cantidad', 'movimientos'))
+
+    def test_actualizar_incremental_coincide_con_reconstruir(self):
+        self.crear_movimientos(3, self.casco, 'SALIDA', inicio=self.mediodia(2))
+        self.crear_movimientos(2, self.hacha, 'ENTRADA', inicio=self.mediodia(2))
+        self.assertEqual(consumo.actualizar(), 1)
+        agregados = self.agregados()
+        # Sin movimientos nuevos solo se revisan los días desde la anterior
+        self.assertLessEqual(consumo.actualizar(), 2)
+        self.assertEqual(self.agregados(), agregados)
+
+        self.crear_movimientos(4, self.casco, 'SALIDA', inicio=self.mediodia(1))
+        with CaptureQueriesContext(connection) as consultas:
+            dias = consumo.actualizar()
+        # El día con movimientos nuevos más los días desde la actualización
+        # anterior; no los días más antiguos
+        borrados = [q for q in consultas.captured_queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(borrados), dias)
+        self.assertLessEqual(dias, 3)
+
+        incremental = self.agregados()
+        self.assertIn(('EPP-001', timezone.localdate() - timedelta(days=1), 'SALIDA', 4, 4), incremental)
+        consumo.reconstruir()
+        self.assertEqual(self.agregados(), incremental)
+
+    def test_movimiento_confirmado_tarde_se_incorpora(self):
+        tarde, _ = self.crear_movimientos(2, self.casco, 'SALIDA', inicio=timezone.now() - timedelta(minutes=5))
+        Movimiento.objects.filter(pk=tarde.pk).delete()
+        consumo.actualizar()
+        # Un movimiento con id menor que la marca que se confirma después
+        Movimiento.objects.bulk_create([
+            Movimiento(pk=tarde.pk, insumo=self.casco, tipo='SALIDA', cantidad=3, usuario=self.user)
+        ])
+        consumo.actualizar()
+        total = ConsumoDiario.objects.filter(insumo=self.casco, tipo='SALIDA').aggregate(total=Sum('cantidad'))
+        self.assertEqual(total['total'], 4)
+
+    @skipIf(consumo.np is None, 'NumPy no está instalado')
+    def test_pronostico_numpy_igual_a_python(self):
+        for dias_atras in range(10):
+            self.crear_movimientos(dias_atras % 3 + 1, self.casco, 'SALIDA', inicio=self.mediodia(dias_atras))
+        self.crear_movimientos(2, self.hacha, 'SALIDA', inicio=self.mediodia(20))
+        consumo.actualizar()
+
+        con_numpy = consumo.pronosticar(ventana=28, corta=7, plazo=7)
+        with mock.patch.object(consumo, 'np', None):
+            sin_numpy = consumo.pronosticar(ventana=28, corta=7, plazo=7)
+        self.assertEqual(con_numpy, sin_numpy)
+
+        casco = con_numpy[0]
+        self.assertEqual(casco['codigo'], 'EPP-001')
+        # Últimos 7 días: 1+2+3+1+2+3+1 = 13 unidades
+        self.assertEqual(casco['media_corta'], round(13 / 7, 3))
+        self.assertEqual(casco['dias_hasta_quiebre'], round(30 / (13 / 7), 1))
+        self.assertFalse(casco['reponer'])
+
+    def test_pronostico_limitado_coincide_con_el_completo(self):
+        for i in range(6):
+            insumo = Insumo.objects.create(codigo=f'REP-{i:03}', nombre=f'Repuesto {i}', stock_actual=10 * i)
+            for dias_atras in range(i + 1):
+                self.crear_movimientos(i % 3 + 1, insumo, 'SALIDA', inicio=self.mediodia(dias_atras * 4))
+        consumo.actualizar()
+
+        completo = consumo.pronosticar(plazo=10)
+        self.assertEqual(len(completo), 6)
+        with self.assertQueryBudget(3):
+            self.assertEqual(consumo.pronosticar(plazo=10, limite=3), completo[:3])
+        self.assertEqual(consumo.contar(plazo=10), (6, sum(1 for fila in completo if fila['reponer'])))
+
+    def test_reporte_y_comando(self):
+        self.crear_movimientos(28, self.hacha, 'SALIDA', inicio=self.mediodia(1))
+        response = self.client.get(reverse('consumo_reporte'), {'plazo': 30})
+        self.assertContains(response, 'manage.py consumo')
+        self.assertFalse(ConsumoDiario.objects.exists())
+
+        consumo.actualizar()
+        # El reporte solo lee los agregados: sesión, usuario, totales, fecha
+        # de actualización y pronóstico de la página (candidatos, salidas e
+        # insumos), sin importar cuántos movimientos o insumos haya
+        with self.assertQueryBudget(7):
+            response = self.client.get(reverse('consumo_reporte'), {'plazo': 30})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Agregados actualizados el')
+        fila = response.context['filas'][0]
+        self.assertEqual(fila['codigo'], 'HER-002')
+        self.assertEqual(fila['dias_hasta_quiebre'], 10.0)
+        self.assertTrue(fila['reponer'])
+
+        salida = StringIO()
+        call_command('consumo', '--csv', '--plazo', '5', stdout=salida, stderr=StringIO())
+        filas = list(csv.DictReader(StringIO(salida.getvalue())))
+        self.assertEqual([f['codigo'] for f in filas], ['HER-002'])
+        self.assertEqual(filas[0]['reponer'], 'False')
+
+
+@tag('stress')
+class StockConcurrencyStressTests(TransactionTestCase):
+    """
+    Prueba de estrés multi-hilo sobre ``registrar_movimiento``.
+
+    Requiere una base de datos real (MySQL o SQLite en archivo); con la
+    base SQLite en memoria los hilos no pueden compartir conexiones.
+    """
+
+    HILOS = 8
+    OPERACIONES_POR_HILO = 25
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Requiere una base de datos en archivo o servidor (TEST NAME)')
+        self.user = User.objects.create_user(username='stress', password='clave-segura-123')
+
+    def ejecutar_concurrente(self, operacion):
+        """Ejecuta ``operacion`` desde varios hilos a la vez"""
+        barrera = threading.Barrier(self.HILOS)
+        errores = []
+
+        def trabajador():
+            try:
+                barrera.wait()
+                for _ in range(self.OPERACIONES_POR_HILO):
+                    operacion()
+            except Exception as exc:  # pragma: no cover - se reporta abajo
+                errores.append(exc)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=trabajador) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(errores, [])
+
+    def test_entradas_concurrentes_no_pierden_actualizaciones(self):
+        insumo = Insumo.objects.create(codigo='STR-001', nombre='Stress', ubicacion='X')
+        self.ejecutar_concurrente(
+            lambda: registrar_movimiento(insumo, 'ENTRADA', 1, usuario=self.user)
+        )
+        total = self.HILOS * self.OPERACIONES_POR_HILO
+        insumo.refresh_from_db()
+        self.assertEqual(insumo.stock_actual, total)
+        self.assertEqual(Movimiento.objects.filter(insumo=insumo).count(), total)
+
+    def test_salidas_concurrentes_no_dejan_stock_negativo(self):
+        stock_inicial = self.HILOS * self.OPERACIONES_POR_HILO // 2
+        insumo = Insumo.objects.create(
+            codigo='STR-002', nombre='Stress', ubicacion='X', stock_actual=stock_inicial
+        )
+        rechazadas = []
+
+        def salida():
+            try:
+                registrar_movimiento(insumo, 'SALIDA', 1, usuario=self.user)
+            except StockInsuficiente:
+                rechazadas.append(1)
+
+        self.ejecutar_concurrente(salida)
+        insumo.refresh_from_db()
+        self.assertEqual(insumo.stock_actual, 0)
+        self.assertEqual(Movimiento.objects.filter(insumo=insumo).count(), stock_inicial)
+        self.assertEqual(len(rechazadas), self.HILOS * self.OPERACIONES_POR_HILO - stock_inicial)
+
+    def test_envios_duplicados_concurrentes_registran_un_movimiento(self):
+        insumo = Insumo.objects.create(codigo='STR-003', nombre='Stress', ubicacion='X', stock_actual=5)
+        huella = 'f' * 64
+        registrados = []
+
+        def envio():
+            # Mismo camino que la vista: búsqueda previa y registro con la clave
+            if idempotencia.buscar(self.user, 'doble-clic', huella) is None:
+                _, repetido = idempotencia.registrar(
+                    self.user, 'doble-clic', huella,
+                    lambda: (registrar_movimiento(insumo, 'SALIDA', 5, usuario=self.user), 'Salida'),
+                )
+                if not repetido:
+                    registrados.append(1)
+
+        self.ejecutar_concurrente(envio)
+        insumo.refresh_from_db()
+        self.assertEqual(insumo.stock_actual, 0)
+        self.assertEqual(len(registrados), 1)
+        self.assertEqual(Movimiento.objects.filter(insumo=insumo).count(), 1)
+
+
+class CargaMasivaTests(InventarioTestCase):
+    """Pruebas del registro de movimientos por lotes"""
+
+    def test_lote_valida_en_orden_y_agrega_por_insumo(self):
+        resultado = registrar_lote([
+            {'codigo': 'EPP-001', 'tipo': 'SALIDA', 'cantidad': 20},
+            {'codigo': 'EPP-001', 'tipo': 'SALIDA', 'cantidad': 20},  # sin stock
+            {'codigo': 'EPP-001', 'tipo': 'ENTRADA', 'cantidad': 5},
+            {'codigo': 'HER-002', 'tipo': 'ENTRADA', 'cantidad': '3'},
+            {'codigo': 'NO-EXISTE', 'tipo': 'ENTRADA', 'cantidad': 1},
+            {'codigo': 'HER-002', 'tipo': 'PRESTAMO', 'cantidad': 1},
+        ], usuario=self.user)
+        self.assertEqual(len(resultado.creados), 3)
+        self.assertEqual([r['fila'] for r in resultado.rechazados], [2, 5, 6])
+        self.casco.refresh_from_db()
+        self.hacha.refresh_from_db()
+        self.assertEqual(self.casco.stock_actual, 15)
+        self.assertEqual(self.hacha.stock_actual, 43)
+
+    def test_endpoint_json(self):
+        response = self.client.post(
+            reverse('movimiento_lote'),
+            json.dumps({'movimientos': [
+                {'codigo': 'HER-002', 'tipo': 'SALIDA', 'cantidad': 10},
+                {'codigo': 'HER-002', 'tipo': 'SALIDA', 'cantidad': 0},
+            ]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['creados'], 1)
+        self.assertEqual(response.json()['rechazados'][0]['fila'], 2)
+
+    def test_endpoint_csv(self):
+        contenido = 'codigo,tipo,cantidad\nHER-002,ENTRADA,2\nEPP-001,SALIDA,1\n'
+        response = self.client.post(reverse('movimiento_lote'), contenido, content_type='text/csv')
+        self.assertEqual(response.json(), {'creados': 2, 'rechazados': []})
+
+    def test_endpoint_rechaza_contenido_invalido(self):
+        response = self.client.post(
+            reverse('movimiento_lote'), '{no es json', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_comando_importar_movimientos(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as archivo:
+            archivo.write('codigo,tipo,cantidad\n')
+            archivo.write('HER-002,ENTRADA,1\n' * 7)
+            archivo.write('EPP-001,SALIDA,99\n')
+        salida = StringIO()
+        call_command(
+            'importar_movimientos', archivo.name, '--usuario', 'tester',
+            '--tamano-lote', '3', stdout=salida,
+        )
+        self.assertIn('7 movimientos importados, 1 filas rechazadas', salida.getvalue())
+        self.assertIn('Fila 8', salida.getvalue())
+        self.hacha.refresh_from_db()
+        self.assertEqual(self.hacha.stock_actual, 47)
+
+
+@tag('benchmark')
+class CargaMasivaBenchmark(InventarioTestCase):
+    """Compara eventos por segundo entre la carga masiva y un POST por evento"""
+
+    EVENTOS = 300
+
+    def test_eventos_por_segundo(self):
+        eventos = [
+            {'codigo': 'HER-002', 'tipo': 'ENTRADA' if i % 2 else 'SALIDA', 'cantidad': 1}
+            for i in range(self.EVENTOS)
+        ]
+
+        inicio = time.perf_counter()
+        for evento in eventos:
+            datos = {**evento, 'insumo': self.hacha.pk}
+            self.client.post(reverse('movimiento_create'), datos)
+        por_peticion = self.EVENTOS / (time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        response = self.client.post(
+            reverse('movimiento_lote'), json.dumps(eventos), content_type='application/json'
+        )
+        por_lote = self.EVENTOS / (time.perf_counter() - inicio)
+
+        self.assertEqual(response.json()['creados'], self.EVENTOS)
+        self.assertEqual(Movimiento.objects.count(), 2 * self.EVENTOS)
+        self.assertGreater(por_lote, por_peticion)
+
+
+class ReconciliacionTests(InventarioTestCase):
+    """Pruebas de cierres de stock y detección de diferencias"""
+
+    def setUp(self):
+        super().setUp()
+        # Los insumos de prueba se crean con stock fuera del historial, como
+        # en una base de datos anterior a los ajustes
+        self.assertEqual(len(reconciliar(ajustar=True)), 2)
+
+    def test_saldo_desde_cierre_mas_movimientos_posteriores(self):
+        self.assertEqual(tomar_cierre(), 2)
+        # Los movimientos anteriores al cierre ya no se vuelven a sumar
+        Movimiento.objects.filter(fecha__lte=CierreStock.objects.first().fecha).delete()
+        registrar_movimiento(self.hacha, 'SALIDA', 15, usuario=self.user)
+        saldos = {insumo_id: libro for insumo_id, _, libro in saldos_libro()}
+        self.assertEqual(saldos, {self.hacha.pk: 25, self.casco.pk: 30})
+        self.assertEqual(reconciliar(), [])
+
+    def test_detecta_y_repara_diferencias(self):
+        Insumo.objects.filter(pk=self.casco.pk).update(stock_actual=99)
+        discrepancias = reconciliar()
+        self.assertEqual(len(discrepancias), 1)
+        self.assertEqual(discrepancias[0].diferencia, 69)
+        self.assertFalse(discrepancias[0].reparada)
+
+        self.assertTrue(reconciliar(reparar=True)[0].reparada)
+        self.casco.refresh_from_db()
+        self.assertEqual(self.casco.stock_actual, 30)
+
+    def test_movimiento_entre_lecturas_no_se_repara(self):
+        original = reconciliacion.netos_por_insumo
+        registrados = []
+
+        def netos_y_movimiento(*args, **kwargs):
+            # El historial ya se leyó; el movimiento llega antes de leer contadores
+            netos = list(original(*args, **kwargs))
+            if not registrados:
+                registrados.append(registrar_movimiento(self.hacha, 'ENTRADA', 5, usuario=self.user))
+            yield from netos
+
+        for opciones in ({'reparar': True}, {'ajustar': True}):
+            registrados.clear()
+            ajustes = Movimiento.objects.filter(ajuste=True).count()
+            with mock.patch.object(reconciliacion, 'netos_por_insumo', netos_y_movimiento):
+                self.assertEqual(reconciliar(**opciones), [])
+            self.assertEqual(len(registrados), 1)
+            self.assertEqual(Movimiento.objects.filter(ajuste=True).count(), ajustes)
+        self.hacha.refresh_from_db()
+        self.assertEqual(self.hacha.stock_actual, 50)
+        self.assertEqual(reconciliar(), [])
+
+    def test_comando_reconciliar_stock(self):
+        Insumo.objects.filter(pk=self.hacha.pk).update(stock_actual=1)
+        salida = StringIO()
+        call_command('reconciliar_stock', '--cierre', '--reparar', stdout=salida)
+        self.assertIn('HER-002', salida.getvalue())
+        self.assertIn('1 reparados', salida.getvalue())
+        self.assertEqual(CierreStock.objects.count(), 2)
+
+    def test_stock_del_formulario_queda_en_el_historial(self):
+        datos = {
+            'codigo': 'REP-001', 'nombre': 'Bujía', 'stock_actual': 25, 'stock_minimo': 2, 'ubicacion': 'C1',
+        }
+        self.client.post(reverse('insumo_create'), datos)
+        bujia = Insumo.objects.get(codigo='REP-001')
+        self.assertEqual(bujia.stock_actual, 25)
+        self.assertEqual(reconciliar(), [])
+
+        # Una edición sin cambiar el stock no registra nada
+        self.client.post(reverse('insumo_update', args=[bujia.pk]), dict(datos, nombre='Bujía NGK'))
+        self.assertEqual(Movimiento.objects.filter(insumo=bujia).count(), 1)
+        self.client.post(reverse('insumo_update', args=[bujia.pk]), dict(datos, stock_actual=10))
+        self.assertEqual(reconciliar(), [])
+        self.assertEqual(bujia.stock_al(timezone.now()), 10)
+        ajustes = Movimiento.objects.filter(insumo=bujia).order_by('pk')
+        self.assertEqual(
+            list(ajustes.values_list('tipo', 'cantidad', 'ajuste')),
+            [('ENTRADA', 25, True), ('SALIDA', 15, True)],
+        )
+        # Los ajustes no son consumo
+        consumo.reconstruir()
+        self.assertFalse(ConsumoDiario.objects.filter(insumo=bujia).exists())
+
+    def test_no_repara_con_saldo_negativo(self):
+        pala = Insumo.objects.create(codigo='HER-009', nombre='Pala', stock_actual=4)
+        self.crear_movimientos(3, insumo=pala, tipo='SALIDA')
+        discrepancia, = reconciliar(reparar=True)
+        self.assertEqual((discrepancia.stock_libro, discrepancia.reparada), (-3, False))
+        pala.refresh_from_db()
+        self.assertEqual(pala.stock_actual, 4)
+
+        # El stock inicial faltante se registra como ajuste
+        salida = StringIO()
+        call_command('reconciliar_stock', '--ajustar', stdout=salida)
+        self.assertIn('(ajuste registrado)', salida.getvalue())
+        self.assertEqual(reconciliar(), [])
+        self.assertEqual(pala.stock_al(timezone.now()), 4)
+
+
+class StockHistoricoTests(InventarioTestCase):
+    """Pruebas de la consulta de stock a una fecha pasada"""
+
+    def setUp(self):
+        super().setUp()
+        ahora = timezone.now()
+        self.hace_20 = ahora - timedelta(days=20)
+        self.hace_10 = ahora - timedelta(days=10)
+        # Stock inicial de los insumos de prueba (40 y 30), anterior al resto
+        reconciliar(ajustar=True)
+        Movimiento.objects.filter(ajuste=True).update(fecha=ahora - timedelta(days=30))
+        self.crear_movimientos(5, insumo=self.hacha, inicio=self.hace_20)
+        self.crear_movimientos(2, insumo=self.hacha, tipo='SALIDA', inicio=self.hace_10)
+
+    def test_sin_cierres(self):
+        self.assertEqual(self.hacha.stock_al(self.hace_20 - timedelta(days=20)), 0)
+        self.assertEqual(self.hacha.stock_al(self.hace_20 + timedelta(days=1)), 45)
+        self.assertEqual(self.hacha.stock_al(timezone.now()), 43)
+        self.assertEqual(self.casco.stock_al(timezone.now()), self.casco.stock_actual)
+
+    def test_insumo_del_formulario(self):
+        self.client.post(reverse('insumo_create'), {
+            'codigo': 'REP-001', 'nombre': 'Bujía', 'stock_actual': 12, 'stock_minimo': 2, 'ubicacion': 'C1',
+        })
+        response = self.client.get(reverse('insumo_list'), {'as_of': timezone.localdate().isoformat()})
+        stocks = {insumo.codigo: insumo.stock_al for insumo in response.context['insumos']}
+        self.assertEqual(stocks['REP-001'], 12)
+        self.assertEqual(stocks['EPP-001'], 30)
+
+    def test_combina_cierre_y_movimientos_posteriores(self):
+        tomar_cierre(self.hace_20 + timedelta(days=1))
+        self.assertEqual(CierreStock.objects.get(insumo=self.casco).stock, 30)
+        # Un cierre corregido a mano demuestra que no se vuelve a sumar lo anterior
+        CierreStock.objects.filter(insumo=self.hacha).update(stock=100)
+        self.assertEqual(self.hacha.stock_al(self.hace_20 + timedelta(days=2)), 100)
+        self.assertEqual(self.hacha.stock_al(timezone.now()), 98)
+        # Antes del cierre se usa el historial completo
+        self.assertEqual(self.hacha.stock_al(self.hace_20 + timedelta(minutes=2)), 43)
+
+    def test_listado_con_as_of(self):
+        dia = timezone.localdate(self.hace_20 + timedelta(days=1))
+        response = self.client.get(reverse('insumo_list'), {'as_of': dia.isoformat()})
+        stocks = {insumo.codigo: insumo.stock_al for insumo in response.context['insumos']}
+        self.assertEqual(stocks, {'HER-002': 45, 'EPP-001': 30})
+        self.assertContains(response, f'Stock al {dia:%d/%m/%Y}')
+
+
+class ArchivoTests(InventarioTestCase):
+    """Archivo de movimientos antiguos y lecturas sobre ambas tablas"""
+
+    def setUp(self):
+        super().setUp()
+        self.hace_40 = timezone.now() - timedelta(days=40)
+        self.antiguos = self.crear_movimientos(30, insumo=self.hacha, inicio=self.hace_40)
+        self.crear_movimientos(5, insumo=self.casco, tipo='SALIDA', inicio=self.hace_40)
+        self.recientes = self.crear_movimientos(30, insumo=self.hacha, tipo='SALIDA')
+        self.corte = timezone.now() - timedelta(days=30)
+
+    def recorrer_listado(self):
+        vistos, params = [], {}
+        while True:
+            page = self.client.get(reverse('movimiento_list'), params).context['page_obj']
+            vistos.extend(mov.pk for mov in page)
+            if not page.has_next():
+                return vistos, page
+            params = {'despues': page.next_cursor}
+
+    def test_archivar_conserva_saldos(self):
+        saldos = list(saldos_libro())
+        stock_pasado = self.hacha.stock_al(self.hace_40 + timedelta(days=1))
+        consumo.actualizar()
+        agregados = list(ConsumoDiario.objects.values_list('insumo', 'dia', 'tipo', 'cantidad'))
+
+        self.assertEqual(archivo.archivar(self.corte, tamano=7), (2, 35))
+        self.assertEqual(Movimiento.objects.count(), 30)
+        self.assertEqual(MovimientoArchivado.objects.count(), 35)
+        self.assertEqual(CierreStock.objects.get(insumo=self.hacha, fecha=self.corte).stock, 30)
+        # Volver a ejecutar no duplica el cierre ni los movimientos
+        self.assertEqual(archivo.archivar(self.corte), (0, 0))
+
+        self.assertEqual(list(saldos_libro()), saldos)
+        self.assertEqual(self.hacha.stock_al(self.hace_40 + timedelta(days=1)), stock_pasado)
+        consumo.reconstruir()
+        self.assertEqual(
+            list(ConsumoDiario.objects.values_list('insumo', 'dia', 'tipo', 'cantidad')), agregados
+        )
+
+    def test_listado_y_api_leen_el_archivo(self):
+        antes, _ = self.recorrer_listado()
+        archivo.archivar(self.corte)
+        despues, ultima = self.recorrer_listado()
+        self.assertEqual(despues, antes)
+        self.assertEqual(len(despues), 65)
+
+        # Volver desde la última página, que solo tiene movimientos archivados
+        anterior = self.client.get(
+            reverse('movimiento_list'), {'antes': ultima.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual([m.pk for m in anterior], despues[:50])
+
+        response = self.client.get(reverse('movimiento_list'), {'insumo': self.casco.pk})
+        self.assertEqual(len(response.context['movimientos']), 5)
+
+        datos = json.loads(b''.join(
+            self.client.get(reverse('api_movimientos'), {'limite': 40}).streaming_content
+        ))
+        self.assertEqual([fila['id'] for fila in datos['resultados']], despues[:40])
+        response = self.client.get(reverse('api_movimiento_detalle', args=[self.antiguos[0].pk]))
+        self.assertEqual(response.json()['tipo'], 'ENTRADA')
+
+    def test_exportacion_y_comando(self):
+        salida = StringIO()
+        call_command('archivar_movimientos', '--dias', '30', '--simular', stdout=salida)
+        self.assertIn('35 movimientos', salida.getvalue())
+        self.assertEqual(MovimientoArchivado.objects.count(), 0)
+
+        call_command('archivar_movimientos', '--dias', '30', stdout=StringIO())
+        self.assertEqual(MovimientoArchivado.objects.count(), 35)
+        response = self.client.get(reverse('movimiento_exportar'), {'insumo': self.hacha.pk})
+        filas = list(csv.reader(StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        ids = [int(fila[0]) for fila in filas[1:]]
+        self.assertEqual(ids, sorted(m.pk for m in self.antiguos + self.recientes))
+
+    def test_congelar_meses_cerrados(self):
+        saldos = list(saldos_libro())
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        stock_reciente = self.hacha.stock_al(hace_una_hora)
+        consumo.actualizar()
+        agregados = list(ConsumoDiario.objects.values_list('insumo', 'dia', 'tipo', 'cantidad'))
+        archivo.archivar(self.corte)
+
+        with tempfile.TemporaryDirectory() as directorio, self.settings(ARCHIVO_DIRECTORIO=directorio):
+            meses, congelados = archivo.congelar(timezone.now(), tamano=7)
+            self.assertEqual(congelados, 35)
+            self.assertEqual(len(archivo.periodos_congelados()), meses)
+            self.assertFalse(MovimientoArchivado.objects.exists())
+            self.assertTrue(CierreStock.objects.filter(fecha=archivo.horizonte()).exists())
+            # Volver a ejecutar no reescribe ni duplica nada
+            self.assertEqual(archivo.congelar(timezone.now()), (0, 0))
+
+            self.assertEqual(list(saldos_libro()), saldos)
+            self.assertEqual(self.hacha.stock_al(hace_una_hora), stock_reciente)
+            consumo.reconstruir()
+            self.assertEqual(
+                list(ConsumoDiario.objects.values_list('insumo', 'dia', 'tipo', 'cantidad')), agregados
+            )
+            form = InsumoFiltroForm({'as_of': timezone.localdate(self.hace_40)})
+            self.assertIn('almacenamiento en frío', str(form.errors))
+            with self.assertRaises(ValueError):
+                archivo.archivar(self.hace_40)
+
+            response = self.client.get(reverse('movimiento_exportar'), {'insumo': self.hacha.pk})
+            filas = list(csv.reader(StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+            ids = [int(fila[0]) for fila in filas[1:]]
+            self.assertEqual(ids, sorted(m.pk for m in self.antiguos + self.recientes))
+            self.assertEqual(filas[1][3:6], ['HER-002', self.hacha.nombre, '1'])
+
+
+class UbicacionesTests(InventarioTestCase):
+    """Stock por almacén, traspasos y filtros por ubicación"""
+
+    def setUp(self):
+        super().setUp()
+        self.central = Ubicacion.objects.create(nombre='Almacén Central')
+        self.epp = Ubicacion.objects.create(nombre='Almacén EPP')
+        Insumo.objects.filter(pk=self.hacha.pk).update(ubicacion_principal=self.central)
+        self.hacha.refresh_from_db()
+        ubicaciones.sincronizar()
+
+    def stock_en(self, ubicacion):
+        return StockUbicacion.objects.filter(insumo=self.hacha, ubicacion=ubicacion).values_list(
+            'cantidad', flat=True
+        ).first() or 0
+
+    def test_entradas_salidas_y_traspasos(self):
+        self.assertEqual(self.stock_en(self.central), 40)
+        registrar_movimiento(self.hacha, 'ENTRADA', 5, destino=self.epp)
+        movimiento = registrar_movimiento(self.hacha, 'SALIDA', 10)
+        self.assertEqual(movimiento.origen, self.central)
+        registrar_movimiento(self.hacha, 'TRASPASO', 20, origen=self.central, destino=self.epp)
+        self.hacha.refresh_from_db()
+        self.assertEqual(self.hacha.stock_actual, 35)
+        self.assertEqual((self.stock_en(self.central), self.stock_en(self.epp)), (10, 25))
+
+        with self.assertRaises(StockInsuficiente) as contexto:
+            registrar_movimiento(self.hacha, 'SALIDA', 11)
+        self.assertEqual(contexto.exception.ubicacion, self.central)
+        with self.assertRaises(StockInsuficiente):
+            registrar_movimiento(self.hacha, 'TRASPASO', 26, origen=self.epp, destino=self.central)
+        with self.assertRaises(ValueError):
+            registrar_movimiento(self.hacha, 'TRASPASO', 1, origen=self.epp, destino=self.epp)
+        self.hacha.refresh_from_db()
+        self.assertEqual(self.hacha.stock_actual, 35)
+        self.assertEqual((self.stock_en(self.central), self.stock_en(self.epp)), (10, 25))
+        # Los traspasos no cuentan como consumo
+        consumo.actualizar()
+        self.assertFalse(ConsumoDiario.objects.filter(tipo='TRASPASO').exists())
+
+        resultado = registrar_lote([
+            {'codigo': 'HER-002', 'tipo': 'SALIDA', 'cantidad': 8},
+            {'codigo': 'HER-002', 'tipo': 'SALIDA', 'cantidad': 5},
+            {'codigo': 'HER-002', 'tipo': 'TRASPASO', 'cantidad': 1},
+        ])
+        self.assertEqual([r['fila'] for r in resultado.rechazados], [2, 3])
+        self.assertIn('Almacén Central', resultado.rechazados[0]['error'])
+        self.assertEqual(self.stock_en(self.central), 2)
+        # El nombre del almacén no cuesta una consulta por insumo rechazado
+        Insumo.objects.filter(pk=self.casco.pk).update(ubicacion_principal=self.epp)
+        salidas = [
+            {'codigo': 'HER-002', 'tipo': 'SALIDA', 'cantidad': 5},
+            {'codigo': 'EPP-001', 'tipo': 'SALIDA', 'cantidad': 5},
+        ]
+        with CaptureQueriesContext(connection) as una:
+            registrar_lote(salidas[:1])
+        with self.assertNumQueries(len(una)):
+            resultado = registrar_lote(salidas)
+        self.assertIn('Almacén EPP', resultado.rechazados[1]['error'])
+
+    def test_formulario_de_traspaso(self):
+        datos = {'insumo': self.hacha.pk, 'tipo': 'TRASPASO', 'cantidad': 15}
+        response = self.client.post(reverse('movimiento_create'), datos)
+        self.assertContains(response, 'requiere almacén de origen y de destino')
+        response = self.client.post(
+            reverse('movimiento_create'), {**datos, 'origen': self.epp.pk, 'destino': self.central.pk}
+        )
+        self.assertContains(response, 'Stock insuficiente en Almacén EPP')
+        response = self.client.post(
+            reverse('movimiento_create'), {**datos, 'origen': self.central.pk, 'destino': self.epp.pk}
+        )
+        self.assertRedirects(response, reverse('movimiento_list'))
+        self.assertEqual(self.stock_en(self.epp), 15)
+
+    def test_listado_filtrado_y_totales(self):
+        registrar_movimiento(self.hacha, 'TRASPASO', 15, origen=self.central, destino=self.epp)
+        Insumo.objects.bulk_create([
+            Insumo(codigo=f'REP-{i:03d}', nombre=f'Repuesto {i}', ubicacion='C1')
+            for i in range(40)
+        ])
+        self.client.get(reverse('insumo_list'))
+        # Sesión, usuario, marca de cambios, total y página
+        with self.assertQueryBudget(5):
+            response = self.client.get(reverse('insumo_list'), {'ubicacion': self.epp.pk})
+        self.assertEqual(
+            [(i.codigo, i.stock_ubicacion) for i in response.context['insumos']], [('HER-002', 15)]
+        )
+        self.assertContains(response, 'Stock en Almacén')
+
+        response = self.client.get(reverse('ubicacion_list'))
+        totales = {u.nombre: (u.con_stock, u.unidades) for u in response.context['ubicaciones']}
+        self.assertEqual(totales, {'Almacén Central': (1, 25), 'Almacén EPP': (1, 15)})
+
+    def test_comando_exportar_con_filtros_del_listado(self):
+        registrar_movimiento(self.hacha, 'TRASPASO', 15, origen=self.central, destino=self.epp)
+        salida = StringIO()
+        call_command('exportar', 'insumos', '--ubicacion', 'Almacén EPP', stdout=salida)
+        filas = list(csv.reader(StringIO(salida.getvalue().lstrip('﻿'))))
+        self.assertEqual(filas[0][-1], 'Stock en Almacén')
+        self.assertEqual([(f[1], f[-1]) for f in filas[1:]], [('HER-002', '15')])
+
+        salida = StringIO()
+        call_command('exportar', 'insumos', '--q', 'casco', stdout=salida)
+        filas = list(csv.reader(StringIO(salida.getvalue().lstrip('﻿'))))
+        self.assertEqual([f[1] for f in filas[1:]], ['EPP-001'])
+
+        with self.assertRaisesMessage(CommandError, 'No existe el almacén'):
+            call_command('exportar', 'insumos', '--ubicacion', 'Bodega', stdout=StringIO())
+
+    def test_sincronizar_y_asignar_almacenes(self):
+        self.casco.ubicacion = 'Almacén EPP - Estante B1'
+        self.casco.save()
+        self.assertEqual(ubicaciones.asignar_almacenes(), 1)
+        self.assertEqual(ubicaciones.sincronizar(), (1, []))
+        self.assertEqual(
+            StockUbicacion.objects.get(insumo=self.casco, ubicacion=self.epp).cantidad, 30
+        )
+        # Una edición del stock se asigna al almacén principal
+        response = self.client.post(reverse('insumo_update', args=[self.hacha.pk]), {
+            'codigo': 'HER-002', 'nombre': 'Hacha Forestal', 'stock_actual': 25, 'stock_minimo': 0,
+            'ubicacion_principal': self.central.pk, 'ubicacion': 'A2',
+        })
+        self.assertRedirects(response, reverse('insumo_list'))
+        self.assertEqual(self.stock_en(self.central), 25)
+
+
+class ExportacionTests(InventarioTestCase):
+    """Pruebas de la exportación en streaming"""
+
+    def leer_csv(self, response):
+        contenido = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(StringIO(contenido)))
+
+    def test_recorrer_por_bloques_lee_todo(self):
+        self.crear_movimientos(25)
+        filas = list(recorrer_por_bloques(Movimiento.objects.all(), ['pk', 'cantidad'], tamano=10))
+        self.assertEqual(len(filas), 25)
+        self.assertEqual([f[0] for f in filas], sorted(f[0] for f in filas))
+
+    def test_exportar_movimientos_con_filtros(self):
+        self.crear_movimientos(3, insumo=self.hacha)
+        self.crear_movimientos(2, insumo=self.casco, tipo='SALIDA')
+        response = self.client.get(reverse('movimiento_exportar'), {'tipo': 'SALIDA'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        filas = self.leer_csv(response)
+        self.assertEqual(filas[0][:3], ['ID', 'Fecha', 'Tipo'])
+        self.assertEqual(len(filas), 3)
+        self.assertTrue(all(fila[3] == 'EPP-001' for fila in filas[1:]))
+        self.assertEqual(filas[0][-1], 'Ajuste')
+        self.assertEqual({fila[-1] for fila in filas[1:]}, {'No'})
+
+        # El stock inicial registrado como ajuste se distingue en la exportación
+        reconciliar(ajustar=True)
+        filas = self.leer_csv(self.client.get(reverse('movimiento_exportar'), {'insumo': self.casco.pk}))
+        ajustes = [fila for fila in filas[1:] if fila[-1] == 'Sí']
+        self.assertEqual([(fila[2], fila[5]) for fila in ajustes], [('ENTRADA', '32')])
+
+    def test_exportar_insumos_as_of(self):
+        response = self.client.get(reverse('insumo_exportar'), {'as_of': '2020-01-01'})
+        filas = self.leer_csv(response)
+        self.assertEqual(filas[0][-1], 'Stock al 01/01/2020')
+        self.assertEqual(len(filas), 3)
+
+    def test_filtros_invalidos(self):
+        response = self.client.get(reverse('movimiento_exportar'), {'tipo': 'OTRO'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('insumo_exportar'), {'formato': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_exportar_xlsx(self):
+        try:
+            import openpyxl
+        except ImportError:
+            self.skipTest('openpyxl no está instalado')
+        response = self.client.get(reverse('insumo_exportar'), {'formato': 'xlsx'})
+        libro = openpyxl.load_workbook(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(libro.active.max_row, 3)
+
+    def test_comando_exportar(self):
+        self.crear_movimientos(4, insumo=self.casco)
+        salida = StringIO()
+        call_command('exportar', 'movimientos', '--insumo', 'EPP-001', stdout=salida)
+        filas = list(csv.reader(StringIO(salida.getvalue().lstrip('\ufeff'))))
+        self.assertEqual(len(filas), 5)
+
+
+class GeneradorVolumenTests(TestCase):
+    """Pruebas del modo escalable de populate_db"""
+
+    def test_repartir_suma_exacta_y_determinista(self):
+        cantidades = generador.repartir(1000, 7, semilla=42)
+        self.assertEqual(sum(cantidades), 1000)
+        self.assertEqual(cantidades, generador.repartir(1000, 7, semilla=42))
+
+    def test_genera_historial_consistente_con_el_stock(self):
+        call_command(
+            'populate_db', insumos=12, movimientos=300, users=2, workers=1,
+            batch_size=50, stdout=StringIO(),
+        )
+        self.assertEqual(Insumo.objects.count(), 12)
+        self.assertEqual(Movimiento.objects.count(), 300)
+        self.assertEqual(reconciliar(), [])
+        self.assertFalse(Insumo.objects.filter(stock_actual__lt=0).exists())
+
+
+class BenchmarkTests(InventarioTestCase):
+    """Pruebas del benchmark de extremo a extremo"""
+
+    def test_todas_las_rutas_tienen_escenario(self):
+        self.assertEqual(benchmark.rutas_sin_escenario(), [])
+
+    def test_ejecuta_escenarios(self):
+        resultados = benchmark.ejecutar(
+            repeticiones=2, calentamiento=0,
+            escenarios=['insumo_list', 'movimiento_create_post', 'movimiento_exportar'],
+        )
+        self.assertEqual(set(resultados), {'insumo_list', 'movimiento_create_post', 'movimiento_exportar'})
+        self.assertEqual(resultados['insumo_list']['status'], [200])
+        self.assertEqual(resultados['movimiento_create_post']['status'], [302])
+        self.assertGreater(resultados['insumo_list']['bytes'], 0)
+        self.assertGreater(resultados['insumo_list']['consultas'], 0)
+
+    def test_comparar_detecta_regresiones(self):
+        base = {'escenarios': {'a': {'p50_ms': 10.0, 'consultas': 3}, 'b': {'p50_ms': 10.0, 'consultas': 3}}}
+        actual = {'escenarios': {'a': {'p50_ms': 11.0, 'consultas': 3}, 'b': {'p50_ms': 15.0, 'consultas': 4}}}
+        regresiones = benchmark.comparar(actual, base, umbral=0.2)
+        self.assertEqual(len(regresiones), 2)
+        self.assertTrue(all(r.startswith('b:') for r in regresiones))
+        self.assertEqual(benchmark.percentil([5, 1, 3, 2, 4], 50), 3)
+
+    def test_comparar_sesiones(self):
+        resultados = benchmark.comparar_sesiones(repeticiones=2, calentamiento=1)
+        self.assertEqual(list(resultados), ['db', 'cached_db', 'cache', 'firmada'])
+        self.assertTrue(all(m['status'] == [200] for m in resultados.values()))
+        self.assertEqual(resultados['db']['consultas_ahorradas'], 0)
+        # La lectura de la sesión sale de la cache o de la cookie
+        for modo in ('cached_db', 'cache', 'firmada'):
+            self.assertEqual(resultados[modo]['consultas_ahorradas'], 1)
+
+    def test_comparar_idempotencia(self):
+        resultados = benchmark.comparar_idempotencia(repeticiones=2, calentamiento=1)
+        self.assertEqual(list(resultados), ['sin_clave', 'con_clave', 'reintento'])
+        self.assertTrue(all(m['status'] == [302] for m in resultados.values()))
+        # Búsqueda de la clave e INSERT de su fila (más el savepoint del
+        # movimiento, anidado en la transacción de la clave)
+        self.assertEqual(resultados['con_clave']['consultas_extra'], 4)
+        self.assertLess(resultados['reintento']['consultas_extra'], 0)
+
+
+class ConexionesBenchmarkTests(TransactionTestCase):
+    """Comparación de conexión persistente y por petición (cierra la conexión)"""
+
+    def test_compara_los_modos_de_conexion(self):
+        resultados = benchmark.comparar_conexiones(repeticiones=2, calentamiento=0, rutas=['insumo_list'])
+        self.assertEqual(set(resultados), {'insumo_list_persistente', 'insumo_list_por_peticion'})
+        self.assertTrue(all(m['status'] == [200] for m in resultados.values()))
+        self.assertIn('diferencia_p50_ms', resultados['insumo_list_por_peticion'])
+
+
+class InicializacionTests(TransactionTestCase):
+    """Volcado y carga de datos con índices creados después de la carga"""
+
+    def test_volcado_y_carga_conservan_datos_e_indices(self):
+        user = User.objects.create_user(username='tester', password='clave-segura-123')
+        almacen = Ubicacion.objects.create(nombre='Almacén Central')
+        insumo = Insumo.objects.create(
+            codigo='HER-002', nombre='Hacha "Forestal", mango\\largo\nN', stock_actual=40,
+            ubicacion='\\N', ubicacion_principal=almacen,
+        )
+        ubicaciones.sincronizar([insumo.pk])
+        registrar_movimiento(insumo, 'SALIDA', 5, usuario=user)
+
+        def indices():
+            with connection.cursor() as cursor:
+                return {
+                    nombre for nombre, datos in
+                    connection.introspection.get_constraints(cursor, Movimiento._meta.db_table).items()
+                    if datos['index'] or datos['foreign_key']
+                }
+
+        antes = indices()
+        with tempfile.TemporaryDirectory() as directorio:
+            call_command('volcar_datos', directorio, '--tamano', '1', stdout=StringIO())
+            salida = StringIO()
+            with self.assertRaisesMessage(CommandError, 'ya tienen datos'):
+                call_command('inicializar_bd', '--datos', directorio, stdout=salida)
+
+            call_command('flush', interactive=False, verbosity=0)
+            call_command('inicializar_bd', '--datos', directorio, '--tamano', '2', stdout=salida)
+
+        self.assertIn('Crear índices', salida.getvalue())
+        self.assertEqual(indices(), antes)
+        cargado = Insumo.objects.get(codigo='HER-002')
+        self.assertEqual(cargado.nombre, insumo.nombre)
+        self.assertEqual(cargado.ubicacion, '\\N')
+        self.assertEqual(cargado.stock_actual, 35)
+        self.assertEqual(StockUbicacion.objects.get(insumo=cargado, ubicacion=almacen).cantidad, 35)
+        movimiento = Movimiento.objects.get()
+        self.assertEqual((movimiento.usuario.username, movimiento.origen_id, movimiento.destino_id),
+                         ('tester', almacen.pk, None))
+
+    def test_carga_fallida_recrea_indices(self):
+        user = User.objects.create_user(username='tester', password='clave-segura-123')
+        insumo = Insumo.objects.create(codigo='HER-002', nombre='Hacha', stock_actual=40)
+        registrar_movimiento(insumo, 'SALIDA', 5, usuario=user)
+
+        def indices():
+            with connection.cursor() as cursor:
+                return {
+                    nombre for nombre, datos in
+                    connection.introspection.get_constraints(cursor, Movimiento._meta.db_table).items()
+                    if datos['index'] and not datos['unique'] and not datos['primary_key']
+                }
+
+        antes = indices()
+        with tempfile.TemporaryDirectory() as directorio:
+            call_command('volcar_datos', directorio, stdout=StringIO())
+            ruta = inicializacion.archivo_de(directorio, Insumo)
+            contenido = ruta.read_text(encoding='utf-8')
+            ruta.write_text(contenido.replace('codigo', 'clave', 1), encoding='utf-8')
+            call_command('flush', interactive=False, verbosity=0)
+            with self.assertRaisesMessage(CommandError, 'manage.py flush'):
+                call_command('inicializar_bd', '--datos', directorio, stdout=StringIO())
+            self.assertEqual(indices(), antes)
+
+            # Sin la fila del insumo, los movimientos quedan con claves inválidas
+            ruta.write_text(contenido.splitlines(keepends=True)[0], encoding='utf-8')
+            call_command('flush', interactive=False, verbosity=0)
+            with self.assertRaisesMessage(CommandError, 'claves foráneas inválidas'):
+                call_command('inicializar_bd', '--datos', directorio, stdout=StringIO())
+            self.assertEqual(indices(), antes)
+
+            ruta.write_text(contenido, encoding='utf-8')
+            call_command('flush', interactive=False, verbosity=0)
+            call_command('inicializar_bd', '--datos', directorio, stdout=StringIO())
+        self.assertEqual(Movimiento.objects.get().insumo.codigo, 'HER-002')
+
+
+
+class IdempotenciaTests(InventarioTestCase):
+    """Reenvíos de movimientos con clave de idempotencia"""
+
+    def enviar(self, clave, **datos):
+        datos = {'insumo': self.casco.pk, 'tipo': 'SALIDA', 'cantidad': 30, **datos}
+        return self.client.post(reverse('movimiento_create'), {**datos, idempotencia.CAMPO: clave})
+
+    def test_formulario_genera_una_clave_por_envio(self):
+        claves = {
+            self.client.get(reverse('movimiento_create')).context['form'][idempotencia.CAMPO].value()
+            for _ in range(2)
+        }
+        self.assertEqual(len(claves), 2)
+
+    def test_reenvio_responde_el_resultado_original_sin_escribir(self):
+        response = self.enviar('envio-1')
+        self.assertRedirects(response, reverse('movimiento_list'), fetch_redirect_response=False)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+        # Sin stock, el reenvío no vuelve a validar la salida: una consulta
+        # de sesión, una de usuario y la de la clave
+        with self.assertQueryBudget(3):
+            response = self.enviar('envio-1')
+        self.assertRedirects(response, reverse('movimiento_list'), fetch_redirect_response=False)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.casco.refresh_from_db()
+        self.assertEqual(self.casco.stock_actual, 0)
+        self.assertEqual(Movimiento.objects.count(), 1)
+        registro = ClaveIdempotencia.objects.get()
+        self.assertEqual(registro.movimiento, Movimiento.objects.get())
+        self.assertIn('-30 unidades de Casco Forestal', registro.mensaje)
+
+        # La cabecera equivale al campo del formulario
+        response = self.client.post(
+            reverse('movimiento_create'), {'insumo': self.casco.pk, 'tipo': 'SALIDA', 'cantidad': 30},
+            headers={idempotencia.CABECERA: 'envio-1'},
+        )
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+
+    def test_clave_con_otros_datos_o_invalida(self):
+        self.enviar('envio-1', cantidad=5)
+        response = self.enviar('envio-1', cantidad=6)
+        self.assertEqual(response.status_code, 422)
+        self.assertContains(response, 'ya se usó', status_code=422)
+        self.assertEqual(self.enviar('no válida').status_code, 400)
+        self.assertEqual(Movimiento.objects.count(), 1)
+
+    def test_envio_rechazado_no_ocupa_la_clave(self):
+        self.assertContains(self.enviar('envio-1', cantidad=31), 'Stock insuficiente')
+        self.assertFalse(ClaveIdempotencia.objects.exists())
+        self.assertRedirects(self.enviar('envio-1'), reverse('movimiento_list'), fetch_redirect_response=False)
+
+    def test_claves_vencidas_se_reutilizan_y_se_purgan(self):
+        self.enviar('envio-1', tipo='ENTRADA', cantidad=1)
+        self.enviar('envio-2', tipo='ENTRADA', cantidad=1)
+        ClaveIdempotencia.objects.update(expira=timezone.now() - timedelta(minutes=1))
+
+        response = self.enviar('envio-1', tipo='ENTRADA', cantidad=1)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Movimiento.objects.count(), 3)
+
+        salida = StringIO()
+        call_command('purgar_idempotencia', '--simular', stdout=salida)
+        self.assertIn('1 claves vencidas', salida.getvalue())
+        call_command('purgar_idempotencia', stdout=StringIO())
+        self.assertEqual(list(ClaveIdempotencia.objects.values_list('clave', flat=True)), ['envio-1'])
+
+
+class SesionesTests(InventarioTestCase):
+    """Modos de sesión y purga de sesiones vencidas"""
+
+    def crear_sesiones(self, cantidad, vencimiento):
+        Session.objects.bulk_create([
+            Session(session_key=f'{vencimiento:%Y%m%d}-{i:06d}', session_data='', expire_date=vencimiento)
+            for i in range(cantidad)
+        ])
+
+    def test_purga_por_bloques(self):
+        self.crear_sesiones(25, timezone.now() - timedelta(days=1))
+        self.crear_sesiones(5, timezone.now() + timedelta(days=1))
+        vigentes = Session.objects.count() - 25
+
+        salida = StringIO()
+        call_command('purgar_sesiones', '--simular', stdout=salida)
+        self.assertIn('25 sesiones vencidas', salida.getvalue())
+        # Tres bloques, cada uno con SELECT y DELETE en su propia transacción
+        # (un savepoint dentro de la prueba)
+        with self.assertQueryBudget(3 * 4):
+            self.assertEqual(sesiones.purgar(tamano=10), 25)
+        self.assertEqual(Session.objects.count(), vigentes)
+        # La sesión del cliente sigue vigente
+        self.assertEqual(self.client.get(reverse('insumo_list')).status_code, 200)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache')
+    def test_sesion_en_cache_no_usa_la_tabla(self):
+        Session.objects.all().delete()
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('insumo_list')).status_code, 200)
+        self.assertFalse(Session.objects.exists())
+        self.assertFalse(sesiones.usa_tabla())
+
+
+@override_settings(
+    MIDDLEWARE=['inventario.middleware.PerfilMiddleware'] + settings.MIDDLEWARE,
+    PERFIL_MUESTREO=1.0,
+    PERFIL_UMBRAL_LENTO_MS=0,
+)
+class PerfilMiddlewareTests(InventarioTestCase):
+    """Pruebas del middleware de perfilado"""
+
+    def test_server_timing_y_log(self):
+        self.crear_movimientos(3)
+        with tempfile.TemporaryDirectory() as directorio, self.settings(PERFIL_DIRECTORIO=directorio):
+            with self.assertLogs('inventario.perfil', level='INFO') as logs:
+                response = self.client.get(reverse('movimiento_list'))
+            registro = json.loads(logs.records[-1].getMessage())
+            self.assertTrue(Path(registro['perfil']).exists())
+
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        self.assertEqual(registro['vista'], 'movimiento_list')
+        self.assertGreater(registro['consultas'], 0)
+        self.assertGreater(registro['plantilla_ms'], 0)
+        self.assertEqual(registro['duplicadas'], 0)
+
+    def test_detecta_consultas_duplicadas(self):
+        registro = middleware._RegistroConsultas()
+        with connection.execute_wrapper(registro):
+            for _ in range(3):
+                list(Insumo.objects.filter(pk=self.hacha.pk))
+        self.assertEqual(registro.cantidad, 3)
+        self.assertEqual(registro.duplicadas, 2)
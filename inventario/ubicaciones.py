@@ -0,0 +1,179 @@
+"""
+Stock por ubicación (almacenes).
+
+``StockUbicacion`` guarda las unidades de cada insumo en cada ``Ubicacion``
+y ``services.registrar_movimiento`` lo ajusta en la misma transacción que
+cada movimiento:
+
+- ENTRADA suma en ``destino`` y SALIDA resta de ``origen``; si el
+  movimiento no indica ubicación se usa ``Insumo.ubicacion_principal``.
+  Un insumo sin almacén principal solo lleva el stock total.
+- TRASPASO resta de ``origen`` y suma en ``destino`` sin cambiar
+  ``Insumo.stock_actual``.
+
+Las restas son ``UPDATE`` condicionales (``cantidad >= n``), como las del
+stock total, por lo que ninguna ubicación queda negativa. Las escrituras
+que cambian ``stock_actual`` sin un movimiento (edición del insumo, cargas
+masivas, reparaciones de la reconciliación) llaman a ``sincronizar``, que
+asigna la diferencia al almacén principal.
+
+Los totales por ubicación y el filtro del listado de insumos leen solo el
+índice (ubicacion, insumo, cantidad) de ``StockUbicacion``.
+"""
+from django.db import transaction
+from django.db.models import Count, F, FilteredRelation, Q, Sum
+from django.db.models.functions import Coalesce
+
+from . import cache_versionada, cambios
+from .models import Insumo, StockUbicacion, Ubicacion
+
+# Insumos por consulta al sincronizar
+TAMANO_BLOQUE = 1000
+
+
+def almacen_de(texto):
+    """
+    Nombre del almacén según el texto libre de ``Insumo.ubicacion``.
+
+    El texto tiene la forma ``'Almacén EPP - Estante B1'``: el almacén es
+    lo anterior al primer guion.
+
+    Returns:
+        str: Nombre del almacén, o '' si el texto está vacío
+    """
+    return (texto or '').split(' - ', 1)[0].strip()[:100]
+
+
+def sincronizar(insumo_ids=None):
+    """
+    Asigna al almacén principal el stock total que no está ubicado.
+
+    Para cada insumo cuyo ``stock_actual`` difiere de la suma de sus
+    ubicaciones, suma (o resta) la diferencia en ``ubicacion_principal``.
+
+    Args:
+        insumo_ids (iterable): Insumos a revisar (por defecto, todos)
+
+    Returns:
+        tuple: (insumos ajustados, ids de insumos que no se pudieron ajustar
+        por no tener almacén principal o stock suficiente en él)
+    """
+    insumos = Insumo.objects.order_by('pk')
+    if insumo_ids is not None:
+        insumos = insumos.filter(pk__in=list(insumo_ids))
+    diferencias = (
+        insumos.annotate(ubicado=Coalesce(Sum('stocks__cantidad'), 0))
+        .exclude(stock_actual=F('ubicado'))
+        .values_list('pk', 'ubicacion_principal', F('stock_actual') - F('ubicado'))
+    )
+    ajustados, pendientes = 0, []
+    with transaction.atomic():
+        diferencias = list(diferencias)
+        for inicio in range(0, len(diferencias), TAMANO_BLOQUE):
+            bloque = diferencias[inicio:inicio + TAMANO_BLOQUE]
+            existentes = {
+                (fila.insumo_id, fila.ubicacion_id): fila
+                for fila in StockUbicacion.objects.select_for_update().filter(
+                    insumo_id__in=[pk for pk, _, _ in bloque]
+                )
+            }
+            nuevas = []
+            for insumo_id, ubicacion_id, diferencia in bloque:
+                fila = existentes.get((insumo_id, ubicacion_id))
+                if ubicacion_id is None or (fila.cantidad if fila else 0) + diferencia < 0:
+                    pendientes.append(insumo_id)
+                    continue
+                if fila is None:
+                    nuevas.append(StockUbicacion(
+                        insumo_id=insumo_id, ubicacion_id=ubicacion_id, cantidad=diferencia
+                    ))
+                else:
+                    StockUbicacion.objects.filter(pk=fila.pk).update(cantidad=F('cantidad') + diferencia)
+                ajustados += 1
+            StockUbicacion.objects.bulk_create(nuevas, batch_size=TAMANO_BLOQUE)
+        if ajustados:
+            cambios.registrar_cambio()
+    return ajustados, pendientes
+
+
+def asignar_almacenes(insumo_ids=None):
+    """
+    Asigna el almacén principal según el texto de ``Insumo.ubicacion``.
+
+    Crea las ubicaciones que falten. Solo modifica los insumos sin almacén
+    principal.
+
+    Returns:
+        int: Insumos actualizados
+    """
+    insumos = Insumo.objects.filter(ubicacion_principal__isnull=True)
+    if insumo_ids is not None:
+        insumos = insumos.filter(pk__in=list(insumo_ids))
+    por_almacen = {}
+    for pk, texto in insumos.values_list('pk', 'ubicacion').iterator(chunk_size=TAMANO_BLOQUE):
+        nombre = almacen_de(texto)
+        if nombre:
+            por_almacen.setdefault(nombre, []).append(pk)
+    actualizados = 0
+    with transaction.atomic():
+        for nombre, ids in por_almacen.items():
+            ubicacion, _ = Ubicacion.objects.get_or_create(nombre=nombre)
+            for inicio in range(0, len(ids), TAMANO_BLOQUE):
+                actualizados += Insumo.objects.filter(pk__in=ids[inicio:inicio + TAMANO_BLOQUE]).update(
+                    ubicacion_principal=ubicacion
+                )
+        if actualizados:
+            cambios.registrar_cambio()
+    return actualizados
+
+
+def totales():
+    """
+    Ubicaciones con sus totales, calculados sobre el índice de ``StockUbicacion``.
+
+    Returns:
+        QuerySet: Ubicaciones anotadas con ``con_stock`` (insumos con stock) y
+        ``unidades`` (stock total), ordenadas por nombre
+    """
+    return Ubicacion.objects.annotate(
+        con_stock=Count('stocks', filter=Q(stocks__cantidad__gt=0)),
+        unidades=Coalesce(Sum('stocks__cantidad'), 0),
+    ).order_by('nombre')
+
+
+def opciones(vacia=None):
+    """
+    Opciones ``(id, nombre)`` para los selectores de ubicación.
+
+    Se leen de la cache versionada: un alta de ubicación invalida la cache
+    como cualquier cambio del inventario.
+
+    Args:
+        vacia (str): Etiqueta de la opción vacía inicial (si se indica)
+
+    Returns:
+        list: Pares (id, nombre) ordenados por nombre
+    """
+    filas = cache_versionada.obtener(
+        'catalogo', ('ubicaciones',), lambda: list(Ubicacion.objects.values_list('pk', 'nombre'))
+    )
+    return [('', vacia)] + filas if vacia is not None else filas
+
+
+def con_stock_en(queryset, ubicacion_id):
+    """
+    Restringe un queryset de insumos a los que tienen stock en la ubicación.
+
+    Usa un solo JOIN con ``StockUbicacion`` filtrado por ubicación, que se
+    resuelve con el índice (ubicacion, insumo, cantidad).
+
+    Returns:
+        QuerySet: Insumos anotados con ``stock_ubicacion``
+    """
+    return (
+        queryset.annotate(
+            en_ubicacion=FilteredRelation('stocks', condition=Q(stocks__ubicacion_id=ubicacion_id))
+        )
+        .filter(en_ubicacion__cantidad__gt=0)
+        .annotate(stock_ubicacion=F('en_ubicacion__cantidad'))
+    )
@@ -21,6 +21,9 @@ urlpatterns = [
     # Listar todos los insumos (ruta principal)
     path('insumos/', views.InsumoListView.as_view(), name='insumo_list'),
     
+    # Buscar insumos por código o nombre (selector del formulario de movimientos)
+    path('insumos/buscar/', views.insumo_buscar, name='insumo_buscar'),
+    
     # Crear un nuevo insumo
     path('insumos/nuevo/', views.InsumoCreateView.as_view(), name='insumo_create'),
     
@@ -29,6 +32,9 @@ urlpatterns = [
     
     # Eliminar un insumo
     path('insumos/<int:pk>/eliminar/', views.InsumoDeleteView.as_view(), name='insumo_delete'),
+    
+    # Exportar insumos (CSV o XLSX)
+    path('insumos/exportar/', views.insumo_exportar, name='insumo_exportar'),
 
     # ==================== GESTIÓN DE MOVIMIENTOS ====================
     # Listar todos los movimientos (entradas y salidas)
@@ -36,4 +42,41 @@ urlpatterns = [
     
     # Crear un nuevo movimiento (entrada o salida de stock)
     path('movimientos/nuevo/', views.movimiento_create, name='movimiento_create'),
+    
+    # Carga masiva de movimientos (JSON o CSV)
+    path('movimientos/lote/', views.movimiento_lote, name='movimiento_lote'),
+    
+    # Exportar movimientos (CSV o XLSX)
+    path('movimientos/exportar/', views.movimiento_exportar, name='movimiento_exportar'),
+    
+    # ==================== UBICACIONES ====================
+    # Almacenes con sus totales de insumos y unidades
+    path('ubicaciones/', views.UbicacionListView.as_view(), name='ubicacion_list'),
+    
+    # Crear un nuevo almacén
+    path('ubicaciones/nueva/', views.UbicacionCreateView.as_view(), name='ubicacion_create'),
+    
+    # ==================== ALERTAS DE STOCK ====================
+    # Insumos en o bajo su nivel de reorden
+    path('alertas/', views.AlertaListView.as_view(), name='alerta_list'),
+    
+    # Consumo por insumo y pronóstico de quiebre de stock
+    path('reportes/consumo/', views.consumo_reporte, name='consumo_reporte'),
+    
+    # ==================== VISTAS ASÍNCRONAS ====================
+    # Versiones asíncronas de los listados (ORM asíncrono, pensadas para ASGI)
+    path('async/insumos/', views.InsumoListAsyncView.as_view(), name='insumo_list_async'),
+    path('async/movimientos/', views.MovimientoListAsyncView.as_view(), name='movimiento_list_async'),
+    
+    # API JSON de solo lectura (campos con ?fields=, respuestas comprimidas)
+    path('api/insumos/', views.api_insumos, name='api_insumos'),
+    path('api/insumos/<int:pk>/', views.api_insumo_detalle, name='api_insumo_detalle'),
+    path('api/movimientos/', views.api_movimientos, name='api_movimientos'),
+    path('api/movimientos/<int:pk>/', views.api_movimiento_detalle, name='api_movimiento_detalle'),
+    
+    # Canal en vivo de cambios de stock (Server-Sent Events, requiere ASGI)
+    path('stock/eventos/', views.stock_feed, name='stock_feed'),
+    
+    # Aciertos y fallos de la cache de lecturas del proceso (solo personal)
+    path('estado/cache/', views.cache_estadisticas, name='cache_estadisticas'),
 ]
@@ -2,16 +2,65 @@
 Vistas de la aplicación de inventario.
 Maneja la lógica de negocio para autenticación, gestión de insumos y movimientos.
 """
+import itertools
+import os
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView
+from django.views.generic import ListView, CreateView, UpdateView, DeleteView, View
 from django.urls import reverse_lazy
 from django.contrib import messages
-from .models import Insumo, Movimiento
-from .forms import InsumoForm, MovimientoForm
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import InvalidPage
+from django.db import transaction
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from asgiref.sync import sync_to_async
+from django.views.decorators.cache import cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition, require_POST
+from .models import Insumo, Movimiento, MovimientoArchivado, Ubicacion
+from .forms import (
+    InsumoForm, InsumoFiltroForm, MovimientoForm, MovimientoFiltroForm, PronosticoForm, UbicacionForm,
+)
+from .pagination import (
+    KeysetUnion, PaginadorContado, apaginate_keyset_union, encode_cursor, keyset_queryset,
+    paginate_keyset_union,
+)
+from . import alertas, api, busqueda, cache_versionada, consumo, feed, idempotencia, ubicaciones
+from .cambios import acondicion, etag_listado, ultima_modificacion
+from .exportacion import (
+    COLUMNAS_MOVIMIENTO, FORMATOS, FormatoNoDisponible,
+    generar_csv, generar_xlsx, recorrer_consultas,
+)
+from .lotes import leer_lote, formato_desde_content_type, LoteInvalido
+from .services import ajustar_stock, registrar_movimiento, registrar_lote, StockInsuficiente
+
+
+# Máximo de filas aceptadas por petición en la carga masiva
+MAX_FILAS_LOTE = 10000
+
+# Insumos mostrados en el reporte de consumo (los más próximos al quiebre)
+MAX_FILAS_REPORTE = 500
+
+
+# Los listados responden 304 Not Modified si el inventario no cambió desde
+# la copia que tiene el navegador (ver ``inventario/cambios.py``), sin
+# ejecutar sus consultas ni renderizar el template
+respuesta_condicional = [
+    cache_control(private=True, no_cache=True),
+    condition(etag_func=etag_listado, last_modified_func=ultima_modificacion),
+]
 
 
 # ==================== AUTENTICACIÓN ====================
@@ -48,30 +97,178 @@ def register(request):
 
 # ==================== VISTAS DE INSUMOS ====================
 
+@method_decorator(respuesta_condicional, name='dispatch')
 class InsumoListView(LoginRequiredMixin, ListView):
     """
     Vista para listar todos los insumos del inventario.
     
     Muestra una tabla con todos los insumos registrados en el sistema,
-    incluyendo código, nombre, stock actual y ubicación.
+    incluyendo código, nombre, stock actual y ubicación. Con el parámetro
+    ``as_of`` (por ejemplo ``/insumos/?as_of=2026-01-31``) muestra además el
+    stock que tenía cada insumo al final de ese día. Con ``q`` muestra solo
+    los insumos que coinciden con la búsqueda, ordenados por relevancia.
+    Con ``ubicacion`` (id del almacén) muestra solo los insumos con stock
+    en ese almacén y la cantidad que hay en él.
+    El listado se pagina y cada página (sus filas y el total) se sirve
+    desde la cache versionada (``cache_versionada``), que se invalida con
+    cualquier cambio de insumos o movimientos. Si el navegador ya tiene la
+    versión vigente se responde 304.
     Requiere que el usuario esté autenticado.
     
     Attributes:
         model: Modelo Insumo a listar
         template_name: Template HTML a renderizar
         context_object_name: Nombre de la variable en el template
+        paginate_by: Insumos por página (también lo que guarda cada entrada de cache)
     """
     model = Insumo
     template_name = 'inventario/insumo_list.html'
     context_object_name = 'insumos'
+    paginate_by = 50
+    # Máximo de resultados al buscar con ``q``
+    max_resultados_busqueda = 1000
+    
+    def get_queryset(self):
+        """
+        Carga solo las columnas que muestra el listado (omite la descripción).
+        
+        Solo valida los filtros: los que consultan la base de datos se
+        aplican en ``cargar_pagina``, cuando la página no está en cache.
+        
+        Returns:
+            QuerySet: Insumos del listado (sin evaluar)
+        """
+        self.leer_filtros()
+        return super().get_queryset().only(
+            'codigo', 'nombre', 'stock_actual', 'stock_minimo', 'ubicacion'
+        )
+    
+    def leer_filtros(self):
+        """Valida los filtros recibidos por GET (no consulta la base de datos)"""
+        self.filtro_form = InsumoFiltroForm(self.request.GET or None)
+        self.as_of = None
+        self.termino = ''
+        self.ubicacion = None
+        if self.filtro_form.is_valid():
+            self.as_of = self.filtro_form.cleaned_data.get('as_of')
+            self.termino = self.filtro_form.cleaned_data.get('q', '').strip()
+            self.ubicacion = self.filtro_form.cleaned_data.get('ubicacion')
+    
+    def clave_cache(self):
+        pedida = self.request.GET.get(self.page_kwarg) or 1
+        return (self.as_of, self.termino.lower(), self.ubicacion, str(pedida))
+    
+    def filtrar(self, queryset):
+        """
+        Aplica los filtros del listado.
+        
+        Si se recibe ``as_of``, anota cada insumo con el stock que tenía al
+        final de ese día (ver ``InsumoQuerySet.con_stock_al``). Si se recibe
+        ``q``, filtra y ordena por relevancia (ver ``inventario/busqueda.py``).
+        """
+        if self.as_of:
+            queryset = queryset.con_stock_al(self.filtro_form.fecha_consulta())
+        if self.ubicacion:
+            queryset = ubicaciones.con_stock_en(queryset, self.ubicacion)
+        if self.termino:
+            queryset = busqueda.buscar(queryset, self.termino)[:self.max_resultados_busqueda]
+        return queryset
+    
+    def cargar_pagina(self, queryset, page_size):
+        """
+        Cuenta los resultados y lee solo la página pedida (si no está en cache).
+        
+        Returns:
+            tuple: (total, número de página, lista de insumos de la página)
+        """
+        paginator, page, filas, _ = super().paginate_queryset(self.filtrar(queryset), page_size)
+        return paginator.count, page.number, list(filas)
+    
+    def pagina_de(self, entrada, page_size):
+        """Reconstruye la página guardada en cache, con la forma de ``paginate_queryset``"""
+        total, numero, filas = entrada
+        page = PaginadorContado(total, page_size).pagina(filas, numero)
+        return (page.paginator, page, filas, page.has_other_pages())
+    
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Lee la página de la cache o la consulta y la guarda.
+        
+        Cada entrada guarda a lo más ``paginate_by`` insumos, no el listado
+        completo.
+        """
+        entrada = cache_versionada.obtener(
+            'insumos', self.clave_cache(), lambda: self.cargar_pagina(queryset, page_size)
+        )
+        return self.pagina_de(entrada, page_size)
     
     def get_context_data(self, **kwargs):
         """Agrega datos adicionales al contexto del template"""
         context = super().get_context_data(**kwargs)
         context['titulo'] = 'Lista de Insumos'
+        context['filtro_form'] = self.filtro_form
+        context['as_of'] = self.as_of
+        context['termino'] = self.termino
+        context['ubicacion'] = self.ubicacion
+        # Filtros actuales sin la página, para armar los enlaces de paginación
+        filtros = self.request.GET.copy()
+        filtros.pop('page', None)
+        context['filtros_query'] = filtros.urlencode()
         return context
 
 
+@login_required
+@cache_control(private=True, max_age=30)
+def insumo_buscar(request):
+    """
+    Búsqueda de insumos para el selector del formulario de movimientos.
+    
+    Busca por prefijo del código (índice único de ``codigo``) y completa
+    con coincidencias por prefijo del nombre (índice de ``nombre``), sin
+    recorrer la tabla completa. Retorna a lo más ``limite`` resultados
+    (máximo 50).
+    
+    Args:
+        request: Objeto HttpRequest con los parámetros ``q`` y ``limite``
+        
+    Returns:
+        JsonResponse: Lista de insumos con id, código, nombre y stock
+    """
+    termino = request.GET.get('q', '').strip()
+    try:
+        limite = min(max(int(request.GET.get('limite', 20)), 1), 50)
+    except ValueError:
+        limite = 20
+    if not termino:
+        return JsonResponse({'resultados': []})
+    
+    resultados = cache_versionada.obtener(
+        'catalogo', ('buscar', termino.lower(), limite),
+        lambda: _buscar_insumos(termino, limite),
+    )
+    return JsonResponse({'resultados': resultados})
+
+
+def _buscar_insumos(termino, limite):
+    """Coincidencias por prefijo de código y luego de nombre"""
+    campos = ('pk', 'codigo', 'nombre', 'stock_actual')
+    resultados = list(
+        Insumo.objects.filter(codigo__istartswith=termino)
+        .order_by('codigo').values_list(*campos)[:limite]
+    )
+    if len(resultados) < limite:
+        vistos = [fila[0] for fila in resultados]
+        resultados += list(
+            Insumo.objects.filter(nombre__istartswith=termino)
+            .exclude(pk__in=vistos)
+            .order_by('nombre').values_list(*campos)[:limite - len(resultados)]
+        )
+    return [
+        {'id': pk, 'codigo': codigo, 'nombre': nombre, 'stock': stock}
+        for pk, codigo, nombre, stock in resultados
+    ]
+
+
 class InsumoCreateView(LoginRequiredMixin, CreateView):
     """
     Vista para crear un nuevo insumo.
@@ -93,7 +290,14 @@ class InsumoCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         """Ejecuta acciones adicionales cuando el formulario es válido"""
         messages.success(self.request, 'Insumo creado exitosamente.')
-        return super().form_valid(form)
+        with transaction.atomic():
+            # El stock inicial entra al historial como ajuste
+            form.instance.stock_actual = 0
+            respuesta = super().form_valid(form)
+            ajustar_stock(self.object, form.cleaned_data['stock_actual'], usuario=self.request.user)
+            # y queda en el almacén principal
+            ubicaciones.sincronizar([self.object.pk])
+        return respuesta
     
     def get_context_data(self, **kwargs):
         """Agrega datos adicionales al contexto del template"""
@@ -123,7 +327,19 @@ class InsumoUpdateView(LoginRequiredMixin, UpdateView):
     def form_valid(self, form):
         """Ejecuta acciones adicionales cuando el formulario es válido"""
         messages.success(self.request, 'Insumo actualizado exitosamente.')
-        return super().form_valid(form)
+        with transaction.atomic():
+            # El stock no se guarda con el resto de los campos (pisaría los
+            # movimientos registrados mientras se editaba): un cambio manual
+            # entra al historial como ajuste
+            self.object = form.save(commit=False)
+            self.object.save(update_fields=[
+                campo for campo in form._meta.fields if campo != 'stock_actual'
+            ])
+            if 'stock_actual' in form.changed_data:
+                ajustar_stock(self.object, form.cleaned_data['stock_actual'], usuario=self.request.user)
+            # Un ajuste manual del stock se asigna al almacén principal
+            ubicaciones.sincronizar([self.object.pk])
+        return redirect(self.get_success_url())
     
     def get_context_data(self, **kwargs):
         """Agrega datos adicionales al contexto del template"""
@@ -158,29 +374,82 @@ class InsumoDeleteView(LoginRequiredMixin, DeleteView):
 
 # ==================== VISTAS DE MOVIMIENTOS ====================
 
+@method_decorator(respuesta_condicional, name='dispatch')
 class MovimientoListView(LoginRequiredMixin, ListView):
     """
-    Vista para listar todos los movimientos de stock.
+    Vista para listar los movimientos de stock.
     
-    Muestra un historial de todos los movimientos (entradas y salidas)
-    registrados en el sistema, ordenados por fecha descendente
-    (los más recientes primero).
+    Muestra el historial de movimientos (entradas y salidas) ordenado por
+    fecha descendente (los más recientes primero). El listado se pagina
+    por cursor sobre (fecha, id), de modo que cada página cuesta lo mismo
+    sin importar cuán antigua sea, y admite filtros por insumo, tipo,
+    usuario y rango de fechas que se resuelven en la base de datos. Cada
+    página se completa con los movimientos archivados (ver
+    ``inventario/archivo.py``), de modo que el historial continúa sin
+    cortes después del corte de archivo. Si el navegador ya tiene la
+    versión vigente se responde 304.
     
     Attributes:
         model: Modelo Movimiento a listar
         template_name: Template HTML a renderizar
         context_object_name: Nombre de la variable en el template
-        ordering: Orden de los registros (por fecha descendente)
+        ordering: Orden de los registros (por fecha e id descendente)
+        paginate_by: Cantidad de movimientos por página
     """
     model = Movimiento
     template_name = 'inventario/movimiento_list.html'
     context_object_name = 'movimientos'
-    ordering = ['-fecha']  # Más recientes primero
+    ordering = ['-fecha', '-id']  # Más recientes primero
+    paginate_by = 50
+    
+    def get_queryset(self):
+        """Aplica los filtros recibidos por GET sobre el queryset base"""
+        self.filtro_form = MovimientoFiltroForm(self.request.GET or None)
+        return self.filtrar(super().get_queryset())
+    
+    def filtrar(self, queryset):
+        """Columnas mostradas y filtros válidos sobre el historial activo o el archivo"""
+        # Insumo y usuario se traen en la misma consulta (evita N+1 en el template)
+        # y solo se cargan las columnas que se muestran
+        queryset = queryset.select_related('insumo', 'usuario').only(
+            'fecha', 'tipo', 'cantidad', 'ajuste', 'insumo__nombre', 'usuario__username'
+        )
+        if self.filtro_form.is_valid():
+            queryset = self.filtro_form.filtrar(queryset)
+        return queryset
+    
+    def consultas(self, queryset):
+        """Historial activo y archivo con los mismos filtros"""
+        return [queryset, self.filtrar(MovimientoArchivado.objects.all())]
+    
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Reemplaza la paginación por OFFSET de ListView por paginación keyset.
+        
+        Returns:
+            tuple: (paginator, página, lista de objetos, hay más páginas)
+        """
+        try:
+            page = paginate_keyset_union(
+                self.consultas(queryset),
+                page_size,
+                after=self.request.GET.get('despues'),
+                before=self.request.GET.get('antes'),
+            )
+        except ValueError:
+            raise Http404('Cursor de paginación inválido.')
+        return (None, page, page.object_list, page.has_other_pages())
     
     def get_context_data(self, **kwargs):
         """Agrega datos adicionales al contexto del template"""
         context = super().get_context_data(**kwargs)
         context['titulo'] = 'Historial de Movimientos'
+        context['filtro_form'] = self.filtro_form
+        # Query string de filtros (sin cursores) para los enlaces de navegación
+        filtros = self.request.GET.copy()
+        filtros.pop('despues', None)
+        filtros.pop('antes', None)
+        context['filtros_query'] = filtros.urlencode()
         return context
 
 
@@ -194,9 +463,17 @@ def movimiento_create(request):
     de movimiento:
     - ENTRADA: suma la cantidad al stock actual
     - SALIDA: resta la cantidad del stock actual
+    - TRASPASO: mueve la cantidad entre dos almacenes (el stock total no cambia)
     
     La vista también valida que haya stock suficiente antes de permitir
-    una salida (validación realizada en el formulario).
+    una salida: el formulario lo revisa para dar una respuesta rápida y
+    ``registrar_movimiento`` lo vuelve a exigir de forma atómica en la base
+    de datos, por lo que salidas concurrentes no pueden dejar stock negativo.
+    
+    Con una clave de idempotencia (cabecera ``Idempotency-Key`` o el campo
+    oculto del formulario) los reenvíos del mismo movimiento reciben el
+    resultado original con la cabecera ``Idempotent-Replayed`` y no se
+    registran de nuevo.
     
     Args:
         request: Objeto HttpRequest con los datos de la petición
@@ -204,35 +481,63 @@ def movimiento_create(request):
     Returns:
         HttpResponse: Renderiza el formulario o redirige a la lista de movimientos
     """
+    status = 200
     if request.method == 'POST':
         form = MovimientoForm(request.POST)
-        if form.is_valid():
-            # Crear el movimiento sin guardarlo aún en la BD
-            movimiento = form.save(commit=False)
-            # Asignar el usuario actual al movimiento
-            movimiento.usuario = request.user
-            
-            # Obtener el insumo relacionado
-            insumo = movimiento.insumo
-            
-            # Actualizar el stock según el tipo de movimiento
-            if movimiento.tipo == 'ENTRADA':
-                # Entrada: aumentar el stock
-                insumo.stock_actual += movimiento.cantidad
-                mensaje = f'Entrada registrada: +{movimiento.cantidad} unidades de {insumo.nombre}'
-            elif movimiento.tipo == 'SALIDA':
-                # Salida: disminuir el stock
-                insumo.stock_actual -= movimiento.cantidad
-                mensaje = f'Salida registrada: -{movimiento.cantidad} unidades de {insumo.nombre}'
-            
-            # Guardar el insumo con el stock actualizado
-            insumo.save()
-            # Guardar el movimiento en la base de datos
-            movimiento.save()
-            
-            # Mostrar mensaje de éxito
-            messages.success(request, mensaje)
-            return redirect('movimiento_list')
+        try:
+            # Un reintento con una clave ya usada recibe el resultado
+            # original antes de validar el stock (ver inventario/idempotencia.py)
+            clave = idempotencia.clave_de(request)
+            if clave:
+                huella = idempotencia.huella(request.POST, MovimientoForm.Meta.fields)
+                previo = idempotencia.buscar(request.user, clave, huella)
+                if previo is not None:
+                    return _movimiento_repetido(request, previo)
+        except ValueError as exc:
+            return HttpResponseBadRequest(str(exc))
+        except idempotencia.ClaveReutilizada as exc:
+            form.is_valid()
+            form.add_error(None, str(exc))
+            status = 422
+        else:
+            if form.is_valid():
+                insumo = form.cleaned_data['insumo']
+                tipo = form.cleaned_data['tipo']
+                cantidad = form.cleaned_data['cantidad']
+                origen = form.cleaned_data.get('origen')
+                destino = form.cleaned_data.get('destino')
+                
+                if tipo == 'ENTRADA':
+                    mensaje = f'Entrada registrada: +{cantidad} unidades de {insumo.nombre}'
+                elif tipo == 'TRASPASO':
+                    mensaje = (
+                        f'Traspaso registrado: {cantidad} unidades de {insumo.nombre} '
+                        f'de {origen} a {destino}'
+                    )
+                else:
+                    mensaje = f'Salida registrada: -{cantidad} unidades de {insumo.nombre}'
+                
+                def operacion():
+                    # Ajusta el stock y guarda el movimiento en una sola transacción;
+                    # la validación de stock se repite de forma atómica en la BD
+                    movimiento = registrar_movimiento(
+                        insumo, tipo, cantidad, usuario=request.user, origen=origen, destino=destino
+                    )
+                    return movimiento, mensaje
+                
+                try:
+                    if clave:
+                        registro, repetido = idempotencia.registrar(request.user, clave, huella, operacion)
+                        if repetido:
+                            return _movimiento_repetido(request, registro)
+                    else:
+                        operacion()
+                except (StockInsuficiente, idempotencia.ClaveReutilizada) as exc:
+                    form.add_error(None, str(exc))
+                else:
+                    # Mostrar mensaje de éxito
+                    messages.success(request, mensaje)
+                    return redirect('movimiento_list')
     else:
         # Mostrar formulario vacío para GET request
         form = MovimientoForm()
@@ -241,4 +546,517 @@ def movimiento_create(request):
         'form': form,
         'titulo': 'Nuevo Movimiento',
         'boton_texto': 'Registrar Movimiento'
+    }, status=status)
+
+
+def _movimiento_repetido(request, registro):
+    """Respuesta de un reenvío: el mismo resultado que el envío original"""
+    messages.success(request, registro.mensaje)
+    response = redirect('movimiento_list')
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+@login_required
+@require_POST
+def movimiento_lote(request):
+    """
+    Endpoint de carga masiva de movimientos.
+    
+    Recibe en el cuerpo de la petición una lista de movimientos en JSON
+    (``application/json``) o CSV (``text/csv``) con las columnas
+    ``codigo``, ``tipo`` y ``cantidad``. El lote se valida completo contra
+    el stock vigente y se registra en una sola transacción (ver
+    ``registrar_lote``).
+    
+    Args:
+        request: Objeto HttpRequest con el lote en el cuerpo
+        
+    Returns:
+        JsonResponse: Cantidad de movimientos creados y filas rechazadas
+    """
+    try:
+        filas = leer_lote(
+            request.body.decode('utf-8-sig'),
+            formato_desde_content_type(request.content_type),
+        )
+    except (UnicodeDecodeError, LoteInvalido) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    if len(filas) > MAX_FILAS_LOTE:
+        return JsonResponse(
+            {'error': f'El lote supera el máximo de {MAX_FILAS_LOTE} filas.'}, status=400
+        )
+    
+    resultado = registrar_lote(filas, usuario=request.user)
+    return JsonResponse(resultado.as_dict())
+
+
+# ==================== ALERTAS DE STOCK ====================
+
+@method_decorator(respuesta_condicional, name='dispatch')
+class AlertaListView(LoginRequiredMixin, ListView):
+    """
+    Vista del reporte de reorden: insumos en o bajo su stock mínimo.
+    
+    Lee solo la tabla de alertas, que se mantiene en cada movimiento (ver
+    ``inventario/alertas.py``), por lo que su costo depende de la cantidad
+    de alertas y no de la cantidad de insumos. Las más antiguas primero.
+    
+    Attributes:
+        template_name: Template HTML a renderizar
+        context_object_name: Nombre de la variable en el template
+        paginate_by: Cantidad de alertas por página
+    """
+    template_name = 'inventario/alerta_list.html'
+    context_object_name = 'alertas'
+    paginate_by = 100
+    
+    def get_queryset(self):
+        return alertas.activas()
+
+
+# ==================== UBICACIONES ====================
+
+class UbicacionListView(LoginRequiredMixin, ListView):
+    """
+    Vista de los almacenes con la cantidad de insumos y unidades en cada uno.
+    
+    Los totales se agregan sobre el índice (ubicacion, insumo, cantidad)
+    de ``StockUbicacion`` (ver ``inventario/ubicaciones.py``), sin leer la
+    tabla de insumos.
+    
+    Attributes:
+        template_name: Template HTML a renderizar
+        context_object_name: Nombre de la variable en el template
+    """
+    template_name = 'inventario/ubicacion_list.html'
+    context_object_name = 'ubicaciones'
+    
+    def get_queryset(self):
+        return ubicaciones.totales()
+
+
+class UbicacionCreateView(LoginRequiredMixin, CreateView):
+    """Vista para registrar un nuevo almacén"""
+    model = Ubicacion
+    form_class = UbicacionForm
+    template_name = 'inventario/ubicacion_form.html'
+    success_url = reverse_lazy('ubicacion_list')
+    
+    def form_valid(self, form):
+        """Ejecuta acciones adicionales cuando el formulario es válido"""
+        messages.success(self.request, 'Almacén creado exitosamente.')
+        return super().form_valid(form)
+
+
+# ==================== REPORTE DE CONSUMO ====================
+
+@login_required
+def consumo_reporte(request):
+    """
+    Reporte de consumo y pronóstico de quiebre de stock por insumo.
+    
+    Calcula, sobre los agregados diarios, las medias de salidas y los días
+    hasta agotar el stock (ver ``inventario/consumo.py``). Primero los
+    insumos más próximos a quedarse sin stock. Solo lee: los agregados los
+    actualiza el comando ``consumo``, y el reporte muestra cuándo fue.
+    
+    Args:
+        request: Objeto HttpRequest
+        
+    Returns:
+        HttpResponse: Reporte renderizado
+    """
+    form = PronosticoForm(request.GET or None)
+    parametros = form.parametros() if form.is_valid() else {}
+    # Solo se calcula el pronóstico de las filas que se muestran; los
+    # totales se cuentan en la base de datos
+    total, reponer = consumo.contar(**parametros)
+    return render(request, 'inventario/consumo_reporte.html', {
+        'form': form,
+        'actualizado': consumo.actualizado(),
+        'filas': consumo.pronosticar(limite=MAX_FILAS_REPORTE, **parametros),
+        'total': total,
+        'reponer': reponer,
     })
+
+
+# ==================== EXPORTACIÓN ====================
+
+def _respuesta_exportacion(request, nombre, columnas, *querysets, previas=()):
+    """
+    Construye la respuesta de descarga en el formato pedido (``?formato=``).
+    
+    El CSV se envía con ``StreamingHttpResponse`` a medida que se leen los
+    bloques de filas; el XLSX se escribe a un archivo temporal y se envía
+    por partes con ``FileResponse``. ``previas`` son filas que se exportan
+    antes que las de los querysets (los periodos congelados del archivo).
+    """
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return HttpResponseBadRequest(f'Formato no soportado: "{formato}".')
+    filas = itertools.chain(previas, recorrer_consultas(querysets, [campo for _, campo in columnas]))
+    archivo = f'{nombre}_{timezone.localdate():%Y%m%d}.{formato}'
+    
+    if formato == 'xlsx':
+        try:
+            contenido = generar_xlsx(columnas, filas, titulo=nombre.capitalize())
+        except FormatoNoDisponible as exc:
+            return HttpResponse(str(exc), status=501)
+        return FileResponse(contenido, as_attachment=True, filename=archivo)
+    
+    response = StreamingHttpResponse(
+        generar_csv(columnas, filas), content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{archivo}"'
+    return response
+
+
+@login_required
+def insumo_exportar(request):
+    """
+    Exporta los insumos en CSV o XLSX.
+    
+    Acepta los mismos filtros que el listado de insumos (``q`` restringe a
+    los insumos encontrados, ``as_of`` agrega la columna de stock a esa
+    fecha y ``ubicacion`` la del stock en ese almacén).
+    
+    Args:
+        request: Objeto HttpRequest con los filtros y el formato
+        
+    Returns:
+        HttpResponse: Archivo de descarga o error 400 si los filtros no son válidos
+    """
+    filtro_form = InsumoFiltroForm(request.GET)
+    if not filtro_form.is_valid():
+        return HttpResponseBadRequest('Filtros inválidos.')
+    columnas, queryset = filtro_form.exportacion()
+    return _respuesta_exportacion(request, 'insumos', columnas, queryset)
+
+
+@login_required
+def movimiento_exportar(request):
+    """
+    Exporta el historial de movimientos en CSV o XLSX.
+    
+    Acepta los mismos filtros que el listado de movimientos (insumo, tipo,
+    usuario y rango de fechas). Incluye los movimientos archivados (primero
+    los de los periodos congelados, luego los de la tabla de archivo) antes
+    que los del historial activo.
+    
+    Args:
+        request: Objeto HttpRequest con los filtros y el formato
+        
+    Returns:
+        HttpResponse: Archivo de descarga o error 400 si los filtros no son válidos
+    """
+    filtro_form = MovimientoFiltroForm(request.GET)
+    if not filtro_form.is_valid():
+        return HttpResponseBadRequest('Filtros inválidos.')
+    return _respuesta_exportacion(
+        request, 'movimientos', COLUMNAS_MOVIMIENTO,
+        filtro_form.filtrar(MovimientoArchivado.objects.all()),
+        filtro_form.filtrar(Movimiento.objects.all()),
+        previas=filtro_form.congelados([campo for _, campo in COLUMNAS_MOVIMIENTO]),
+    )
+
+
+# ==================== VISTAS ASÍNCRONAS ====================
+# Versiones de los listados de solo lectura que usan el ORM asíncrono. Bajo
+# ASGI no ocupan un hilo mientras esperan a la base de datos ni mientras el
+# cliente recibe la respuesta (ver ``benchmark_concurrencia``). Los pasos
+# que aún son síncronos (validar filtros que consultan la base de datos y
+# renderizar el template) los ejecuta Django en su hilo de trabajo.
+
+# Filas máximas por página de la API JSON (se envían en flujo, sin cargar
+# la página completa en memoria)
+MAX_FILAS_API = 5000
+
+class ListadoAsincronoMixin:
+    """
+    Autenticación y respuesta condicional sin bloquear el event loop.
+    
+    Reemplaza a ``LoginRequiredMixin`` y al decorador ``condition`` de la
+    vista síncrona, que consultan la base de datos de forma síncrona.
+    """
+    
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        etag, modificado = await acondicion(request)
+        ultima = int(modificado.timestamp()) if modificado else None
+        etag = quote_etag(etag) if etag else None
+        response = get_conditional_response(request, etag=etag, last_modified=ultima)
+        if response is None:
+            response = await View.dispatch(self, request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD') and response.status_code == 200:
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+                if ultima:
+                    response.headers.setdefault('Last-Modified', http_date(ultima))
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class InsumoListAsyncView(ListadoAsincronoMixin, InsumoListView):
+    """Versión asíncrona de ``InsumoListView`` (mismo template y cache)"""
+    
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        entrada = await cache_versionada.aobtener(
+            'insumos', self.clave_cache(), lambda: self.acargar_pagina(self.object_list)
+        )
+        self.pagina = self.pagina_de(entrada, self.paginate_by)
+        return self.render_to_response(self.get_context_data())
+    
+    async def acargar_pagina(self, queryset):
+        if self.termino or self.as_of:
+            # El índice de búsqueda en memoria y el último cierre se leen de
+            # forma síncrona
+            return await sync_to_async(self.cargar_pagina)(queryset, self.paginate_by)
+        queryset = self.filtrar(queryset)
+        paginador = PaginadorContado(await queryset.acount(), self.paginate_by)
+        pedida = self.request.GET.get(self.page_kwarg) or 1
+        try:
+            numero = paginador.validate_number(paginador.num_pages if pedida == 'last' else pedida)
+        except InvalidPage:
+            raise Http404('Página inválida.')
+        inicio = (numero - 1) * self.paginate_by
+        filas = [insumo async for insumo in queryset[inicio:inicio + self.paginate_by]]
+        return paginador.count, numero, filas
+    
+    def paginate_queryset(self, queryset, page_size):
+        """La página ya se obtuvo con el ORM asíncrono en ``get``"""
+        return self.pagina
+
+
+class MovimientoListAsyncView(ListadoAsincronoMixin, MovimientoListView):
+    """Versión asíncrona de ``MovimientoListView`` (mismo template y paginación)"""
+    
+    async def get(self, request, *args, **kwargs):
+        # Validar los filtros consulta el insumo y el usuario elegidos
+        queryset = await sync_to_async(self.get_queryset)()
+        try:
+            self.pagina = await apaginate_keyset_union(
+                self.consultas(queryset),
+                self.paginate_by,
+                after=request.GET.get('despues'),
+                before=request.GET.get('antes'),
+            )
+        except ValueError:
+            raise Http404('Cursor de paginación inválido.')
+        self.object_list = queryset
+        return self.render_to_response(self.get_context_data())
+    
+    def paginate_queryset(self, queryset, page_size):
+        """La página ya se obtuvo con el ORM asíncrono en ``get``"""
+        return (None, self.pagina, self.pagina.object_list, self.pagina.has_other_pages())
+
+
+def _limite_api(request, defecto=100):
+    try:
+        return min(max(int(request.GET.get('limite', defecto)), 1), MAX_FILAS_API)
+    except ValueError:
+        return defecto
+
+
+@login_required
+@api.comprimido
+async def api_insumos(request):
+    """
+    API JSON de insumos.
+    
+    Recorre los insumos por id con ``?despues=<id>`` y ``?limite=`` (máximo
+    ``MAX_FILAS_API``). Con ``?fields=`` se eligen los campos de
+    ``api.CAMPOS_INSUMO``. La primera página incluye el total de insumos.
+    
+    Args:
+        request: Objeto HttpRequest
+        
+    Returns:
+        StreamingHttpResponse: ``resultados``, ``siguiente`` (cursor o None)
+        y ``total`` en la primera página; 400 si los parámetros son inválidos
+    """
+    try:
+        campos = api.campos_solicitados(request.GET.get('fields'), api.CAMPOS_INSUMO)
+        despues = int(request.GET['despues']) if request.GET.get('despues') else None
+    except api.CamposInvalidos as exc:
+        return exc.respuesta()
+    except ValueError:
+        return HttpResponseBadRequest('Cursor inválido.')
+    limite = _limite_api(request)
+    queryset = Insumo.objects.order_by('pk').values(*api.columnas(campos, 'pk'))
+    if despues is not None:
+        queryset = queryset.filter(pk__gt=despues)
+    recorrido = api.Recorrido(queryset[:limite + 1], limite, cursor=lambda fila: fila['pk'])
+    pie = {}
+    if despues is None:
+        pie['total'] = await Insumo.objects.acount()
+    return api.respuesta_en_flujo(
+        request, recorrido, campos, lambda: {'siguiente': recorrido.siguiente, **pie}
+    )
+
+
+@login_required
+@api.comprimido
+async def api_insumo_detalle(request, pk):
+    """
+    API JSON de un insumo (acepta ``?fields=``).
+    
+    Returns:
+        JsonResponse: Campos pedidos del insumo, o 404 si no existe
+    """
+    try:
+        campos = api.campos_solicitados(request.GET.get('fields'), api.CAMPOS_INSUMO)
+    except api.CamposInvalidos as exc:
+        return exc.respuesta()
+    try:
+        fila = await Insumo.objects.values(*api.columnas(campos)).aget(pk=pk)
+    except Insumo.DoesNotExist:
+        raise Http404('Insumo no encontrado.')
+    return JsonResponse({nombre: fila[columna] for nombre, columna in campos})
+
+
+@login_required
+@api.comprimido
+async def api_movimientos(request):
+    """
+    API JSON del historial de movimientos.
+    
+    Acepta los mismos filtros que el listado de movimientos, ``?fields=``
+    (campos de ``api.CAMPOS_MOVIMIENTO``) y se pagina por cursor
+    (``despues``/``antes``) en orden de fecha descendente, incluidos los
+    movimientos archivados. Las páginas hacia adelante se leen y envían por
+    bloques.
+    
+    Args:
+        request: Objeto HttpRequest
+        
+    Returns:
+        StreamingHttpResponse: ``resultados``, ``siguiente`` y ``anterior``
+        (cursores); 400 si los filtros, campos o cursores son inválidos
+    """
+    try:
+        campos = api.campos_solicitados(request.GET.get('fields'), api.CAMPOS_MOVIMIENTO)
+    except api.CamposInvalidos as exc:
+        return exc.respuesta()
+    filtro_form = MovimientoFiltroForm(request.GET)
+    if not await sync_to_async(filtro_form.is_valid)():
+        return JsonResponse({'errores': filtro_form.errors}, status=400)
+    # Historial activo y archivo, mezclados por (fecha, id)
+    querysets = [
+        filtro_form.filtrar(modelo.objects.all()).values(*api.columnas(campos, 'pk', 'fecha'))
+        for modelo in (Movimiento, MovimientoArchivado)
+    ]
+    limite = _limite_api(request, defecto=50)
+    despues, antes = request.GET.get('despues'), request.GET.get('antes')
+    try:
+        if antes:
+            # Hacia atrás las filas se leen en orden inverso: la página
+            # (acotada por ``limite``) se carga completa para invertirla
+            pagina = await apaginate_keyset_union(querysets, limite, before=antes)
+            filas = pagina.object_list
+        else:
+            pagina = None
+            filas = api.Recorrido(
+                KeysetUnion([keyset_queryset(q, limite, after=despues) for q in querysets]), limite,
+                cursor=lambda fila: encode_cursor(fila['fecha'], fila['pk']),
+            )
+    except ValueError:
+        return HttpResponseBadRequest('Cursor inválido.')
+
+    def pie():
+        if pagina is not None:
+            return {'siguiente': pagina.next_cursor, 'anterior': pagina.previous_cursor}
+        return {'siguiente': filas.siguiente, 'anterior': filas.anterior if despues else None}
+
+    return api.respuesta_en_flujo(request, filas, campos, pie)
+
+
+@login_required
+@api.comprimido
+async def api_movimiento_detalle(request, pk):
+    """
+    API JSON de un movimiento (acepta ``?fields=``).
+    
+    Returns:
+        JsonResponse: Campos pedidos del movimiento, o 404 si no existe
+    """
+    try:
+        campos = api.campos_solicitados(request.GET.get('fields'), api.CAMPOS_MOVIMIENTO)
+    except api.CamposInvalidos as exc:
+        return exc.respuesta()
+    try:
+        fila = await Movimiento.objects.values(*api.columnas(campos)).aget(pk=pk)
+    except Movimiento.DoesNotExist:
+        # Los movimientos archivados conservan su id
+        try:
+            fila = await MovimientoArchivado.objects.values(*api.columnas(campos)).aget(pk=pk)
+        except MovimientoArchivado.DoesNotExist:
+            raise Http404('Movimiento no encontrado.')
+    return JsonResponse({nombre: fila[columna] for nombre, columna in campos})
+
+
+# ==================== CAMBIOS EN VIVO ====================
+
+@login_required
+async def stock_feed(request):
+    """
+    Canal en vivo de cambios de stock (Server-Sent Events).
+    
+    Cada movimiento confirmado envía un evento ``stock`` con el insumo, la
+    variación y, cuando se conoce, el stock resultante. Con ``?insumo=`` (se
+    puede repetir) se reciben solo los eventos de esos insumos. Si la
+    conexión se corta, el navegador reconecta enviando ``Last-Event-ID`` y
+    recibe los eventos perdidos, o un evento ``reinicio`` si ya no están
+    disponibles (ver ``inventario/feed.py``).
+    
+    Requiere ASGI: cada conexión abierta es una corrutina en espera.
+    
+    Args:
+        request: Objeto HttpRequest
+        
+    Returns:
+        StreamingHttpResponse: Flujo ``text/event-stream``, 501 bajo WSGI o
+        503 si se alcanzó el máximo de conexiones
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse('El canal en vivo requiere un servidor ASGI.', status=501)
+    try:
+        filtro = {int(valor) for valor in request.GET.getlist('insumo')} or None
+        desde = request.headers.get('Last-Event-ID')
+        desde = int(desde) if desde else None
+    except ValueError:
+        return HttpResponseBadRequest('Parámetros inválidos.')
+    broker = feed.obtener_broker()
+    if broker.conexiones >= getattr(settings, 'FEED_MAX_CONEXIONES', 5000):
+        response = HttpResponse('Demasiadas conexiones.', status=503)
+        response['Retry-After'] = '30'
+        return response
+    
+    response = StreamingHttpResponse(
+        feed.eventos_sse(
+            broker, desde=desde, filtro=filtro, latido=getattr(settings, 'FEED_LATIDO', 15)
+        ),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Evita que nginx acumule el flujo antes de enviarlo
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@staff_member_required
+def cache_estadisticas(request):
+    """
+    Aciertos y fallos de la cache versionada (solo personal).
+    
+    Los contadores son propios del proceso que atiende la petición (ver
+    ``cache_versionada.estadisticas``): con varios workers cada uno lleva
+    los suyos, y la respuesta incluye el pid para distinguirlos.
+    
+    Returns:
+        JsonResponse: ``{'pid': ..., 'espacios': {espacio: {...}}}``
+    """
+    return JsonResponse({'pid': os.getpid(), 'espacios': cache_versionada.estadisticas()})
@@ -0,0 +1,40 @@
+"""
+Conexión a MySQL para los scripts de inicialización.
+
+Lee las mismas variables de entorno que ``DATABASES`` en
+``ev3backend/settings.py``, con tiempo de espera de conexión acotado y
+juego de caracteres utf8mb4. Usar con ``contextlib.closing`` para que la
+conexión se cierre aunque el script falle.
+"""
+import os
+
+import MySQLdb
+from dotenv import load_dotenv
+
+load_dotenv()
+
+NOMBRE_BD = os.getenv('MYSQL_DB_NAME', 'ev3backend')
+
+
+def conectar(base_de_datos=NOMBRE_BD):
+    """
+    Abre una conexión a MySQL.
+
+    Args:
+        base_de_datos (str): Base de datos a usar, o None para conectarse
+            solo al servidor (por ejemplo, para crearla)
+
+    Returns:
+        Connection: Conexión de MySQLdb
+    """
+    parametros = {
+        'host': os.getenv('MYSQL_HOST', 'localhost'),
+        'user': os.getenv('MYSQL_USER', 'root'),
+        'passwd': os.getenv('MYSQL_PASSWORD', ''),
+        'port': int(os.getenv('MYSQL_PORT', '3306')),
+        'charset': 'utf8mb4',
+        'connect_timeout': int(os.getenv('MYSQL_CONNECT_TIMEOUT', '5')),
+    }
+    if base_de_datos:
+        parametros['db'] = base_de_datos
+    return MySQLdb.connect(**parametros)
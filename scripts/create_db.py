@@ -1,21 +1,15 @@
-import MySQLdb
-import os
-from dotenv import load_dotenv
+import sys
+from contextlib import closing
 
-load_dotenv()
+from conexion import NOMBRE_BD, conectar
 
 try:
-    db = MySQLdb.connect(
-        host=os.getenv('MYSQL_HOST'),
-        user=os.getenv('MYSQL_USER'),
-        passwd=os.getenv('MYSQL_PASSWORD'),
-        port=int(os.getenv('MYSQL_PORT'))
-    )
-    cursor = db.cursor()
-    cursor.execute("CREATE DATABASE IF NOT EXISTS ev3backend CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;")
-    print("Database 'ev3backend' created successfully (or already exists).")
+    with closing(conectar(None)) as db, closing(db.cursor()) as cursor:
+        cursor.execute(
+            f"CREATE DATABASE IF NOT EXISTS `{NOMBRE_BD}` "
+            "CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
+        )
+    print(f"Database '{NOMBRE_BD}' created successfully (or already exists).")
 except Exception as e:
     print(f"Error creating database: {e}")
-finally:
-    if 'db' in locals():
-        db.close()
+    sys.exit(1)
@@ -1,42 +1,22 @@
-import MySQLdb
+"""
+Script para crear las tablas de la base de datos.
+Ejecuta el comando Django 'inicializar_bd', que aplica las migraciones y,
+con --datos <directorio>, carga un volcado generado con 'volcar_datos'.
+"""
 import os
-from dotenv import load_dotenv
+import sys
+import django
 
-load_dotenv()
+# Configurar el path para Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ev3backend.settings')
 
-# Leer el archivo SQL
-with open('create_tables.sql', 'r', encoding='utf-8') as f:
-    sql_script = f.read()
+# Inicializar Django
+django.setup()
 
-# Dividir el script en comandos individuales
-sql_commands = [cmd.strip() for cmd in sql_script.split(';') if cmd.strip()]
+# Importar y ejecutar el comando
+from django.core.management import call_command
 
-try:
-    # Conectar a la base de datos
-    db = MySQLdb.connect(
-        host=os.getenv('MYSQL_HOST', 'localhost'),
-        user=os.getenv('MYSQL_USER', 'root'),
-        passwd=os.getenv('MYSQL_PASSWORD', ''),
-        db='ev3backend',  # Nombre de la base de datos
-        port=int(os.getenv('MYSQL_PORT', '3306'))
-    )
-    cursor = db.cursor()
-    
-    print("Ejecutando comandos SQL...")
-    for i, command in enumerate(sql_commands, 1):
-        if command:
-            try:
-                cursor.execute(command)
-                print(f"✓ Comando {i} ejecutado correctamente")
-            except Exception as e:
-                print(f"✗ Error en comando {i}: {e}")
-                print(f"  Comando: {command[:100]}...")
-    
-    db.commit()
-    print("\n¡Todas las tablas fueron creadas exitosamente!")
-    
-except Exception as e:
-    print(f"Error conectando a la base de datos: {e}")
-finally:
-    if 'db' in locals():
-        db.close()
+if __name__ == '__main__':
+    print("Inicializando la base de datos...\n")
+    call_command('inicializar_bd', *sys.argv[1:])